@@ -8,9 +8,11 @@ import { Badge } from './ui/badge';
 import { Plus, Edit, Trash2, Search, Filter, AlertTriangle, CheckCircle } from 'lucide-react';
 
 const API_BASE = '/api';
+const PAGE_SIZE = 100;
 
 const BloodManagement = () => {
   const [bloodUnits, setBloodUnits] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
 
   const [isAdding, setIsAdding] = useState(false);
   const [editingUnit, setEditingUnit] = useState(null);
@@ -32,13 +34,18 @@ const BloodManagement = () => {
     // DISABLED: Automatic alerts to prevent unwanted popups
     // const interval = setInterval(checkForMatches, 30000);
     // return () => clearInterval(interval);
-  }, []);
+  }, [filterStatus]);
 
-  const fetchData = async () => {
+  // Fetch one keyset page of units (soonest-expiring first); the status filter runs server-side
+  const fetchData = async (cursor = null) => {
     try {
-      const unitsRes = await fetch(`${API_BASE}/blood_units`);
-      const unitsData = await unitsRes.json();
-      setBloodUnits(unitsData);
+      const params = new URLSearchParams({ limit: PAGE_SIZE });
+      if (filterStatus !== 'all') params.set('status', filterStatus);
+      if (cursor) params.set('cursor', cursor);
+      const unitsRes = await fetch(`${API_BASE}/blood_units?${params}`);
+      const page = await unitsRes.json();
+      setBloodUnits(previous => cursor ? [...previous, ...page.items] : page.items);
+      setNextCursor(page.next_cursor);
     } catch (error) {
       console.error('Error fetching data:', error);
     }
@@ -428,6 +435,13 @@ const BloodManagement = () => {
                 </tbody>
               </table>
             </div>
+            {nextCursor && (
+              <div className="flex justify-center mt-4">
+                <Button variant="outline" onClick={() => fetchData(nextCursor)}>
+                  Load more units
+                </Button>
+              </div>
+            )}
           </CardContent>
         </Card>
       </div>
@@ -18,6 +18,7 @@ import {
 } from 'lucide-react';
 import { useNavigate } from 'react-router-dom';
 import SimpleRouteMap from '../SimpleRouteMap';
+import realtimeService from '../../services/realtimeService';
 
 const API_BASE = '/api';
 
@@ -173,13 +174,14 @@ const DriverRoutes = () => {
     // Don't call fetchData here since it's not defined yet
     // We'll call it in the next useEffect after user/entity are set
     
-    // Refresh data every 15 seconds for real-time updates
-    const interval = setInterval(() => {
-      if (typeof fetchData === 'function') {
-        fetchData();
-      }
-    }, 15000);
-    return () => clearInterval(interval);
+    // Refresh when the stream reports a route assignment or status change
+    const unsubscribers = ['request_approved', 'request_cancelled', 'route_started', 'route_completed']
+      .map(eventType => realtimeService.on(eventType, () => {
+        if (typeof fetchData === 'function') {
+          fetchData();
+        }
+      }));
+    return () => unsubscribers.forEach(unsubscribe => unsubscribe());
   }, []);
 
   // Call fetchData when user and entityDetails are set
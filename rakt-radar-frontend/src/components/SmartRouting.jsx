@@ -7,6 +7,7 @@ import { Input } from './ui/input';
 import { Label } from './ui/label';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from './ui/select';
 import { generateUniqueId } from '../lib/utils';
+import realtimeService from '../services/realtimeService';
 import { 
   Route, 
   MapPin, 
@@ -72,9 +73,10 @@ const SmartRouting = () => {
   useEffect(() => {
     console.log('SmartRouting - Component mounted, fetching data...');
     fetchData();
-    // Real-time AI monitoring every 15 seconds
-    const interval = setInterval(fetchMatches, 15000);
-    return () => clearInterval(interval);
+    // Re-run AI matching when the stream reports inventory-changing events
+    const unsubscribers = ['request_created', 'request_approved', 'request_cancelled', 'route_completed']
+      .map(eventType => realtimeService.on(eventType, () => fetchMatches()));
+    return () => unsubscribers.forEach(unsubscribe => unsubscribe());
   }, []);
 
   // Set default hospital when hospitals are loaded - prioritize SRM Global Hospitals
@@ -100,44 +102,28 @@ const SmartRouting = () => {
     }
   }, [hospitals, emergencyRequest.hospital_id]);
 
-  // Monitor for route start notifications and redirect to tracking
+  // Monitor the notification inbox for route starts and redirect to tracking
   useEffect(() => {
-    const checkRouteNotifications = () => {
-      const notifications = JSON.parse(localStorage.getItem('routeNotifications') || '[]');
-      const activeNotifications = notifications.filter(n => 
-        n.status === 'active' && 
-        n.type === 'route_started' &&
-        new Date(n.timestamp) > new Date(Date.now() - 60000) // Only notifications from last minute
-      );
+    const stopWatching = realtimeService.watchNotifications((notifications) => {
+      const routeStarts = notifications.filter(n => n.type === 'route_started');
       
-      if (activeNotifications.length > 0) {
-        const latestNotification = activeNotifications[activeNotifications.length - 1];
-        console.log('🏥 Hospital - Route start notification detected:', latestNotification);
+      if (routeStarts.length > 0) {
+        const latestNotification = routeStarts[routeStarts.length - 1];
+        console.log('🏥 Hospital - Route start notification received:', latestNotification);
         
         // Show notification to user
-        setRouteNotifications(activeNotifications);
+        setRouteNotifications(routeStarts.map(n => ({ ...n.payload, id: n.seq })));
         setShowRouteNotification(true);
         
         // Auto-redirect to tracking after 3 seconds
         setTimeout(() => {
           console.log('🏥 Hospital - Auto-redirecting to tracking page...');
-          
-          // Mark notification as processed
-          const updatedNotifications = notifications.map(n => 
-            n.id === latestNotification.id ? { ...n, status: 'processed' } : n
-          );
-          localStorage.setItem('routeNotifications', JSON.stringify(updatedNotifications));
-          
           navigate('/tracking');
         }, 3000);
       }
-    };
-
-    // Check immediately and then every 2 seconds
-    checkRouteNotifications();
-    const interval = setInterval(checkRouteNotifications, 2000);
+    });
     
-    return () => clearInterval(interval);
+    return stopWatching;
   }, [navigate]);
 
   useEffect(() => {
@@ -300,13 +286,14 @@ const SmartRouting = () => {
         fetch(`${API_BASE}/demand_matching`),
         fetch(`${API_BASE}/hospitals`),
         fetch(`${API_BASE}/blood_banks`),
-        fetch(`${API_BASE}/blood_units`)
+        // Only available units can be routed; one page of the soonest-expiring is plenty
+        fetch(`${API_BASE}/blood_units?status=available&limit=500`)
       ]);
       
       const matchesData = await matchesRes.json();
       const hospitalsData = await hospitalsRes.json();
       const banksData = await banksRes.json();
-      const unitsData = await unitsRes.json();
+      const unitsData = (await unitsRes.json()).items;
       
       console.log('SmartRouting - Fetched data:', {
         matches: matchesData,
@@ -1,13 +1,16 @@
 /**
  * Real-time Service for RAKT-RADAR Hackathon Demo
  * Handles communication across 3 laptops (Hospital, Blood Bank, Driver)
- * Uses HTTP polling for reliable real-time updates
+ * Uses the /api/stream Server-Sent Events channel, falling back to HTTP polling
+ * when EventSource is unavailable
  */
 
 class RealtimeService {
     constructor() {
-        this.baseUrl = 'http://localhost:8000';
+        this.baseUrl = '';
         this.pollingIntervals = {};
+        this.eventSource = null;
+        this.streamListeners = {};
         this.callbacks = {
             emergencyRequests: [],
             driverUpdates: [],
@@ -30,12 +33,122 @@ class RealtimeService {
         
         console.log(`🔌 RealtimeService connected as ${role} to ${serverUrl}`);
         
-        // Start polling for updates
-        this.startPolling();
+        // Prefer the push channel; poll only where EventSource is missing
+        if (typeof EventSource !== 'undefined') {
+            this.on('request_created', () => this.pollEmergencyRequests());
+            this.on('request_approved', () => this.pollEmergencyRequests());
+            this.on('request_cancelled', () => this.pollEmergencyRequests());
+            this.on('route_progress', (data) => this.notifyDriverUpdates([data]));
+        } else {
+            this.startPolling();
+        }
         
         return true;
     }
 
+    /**
+     * Open the shared /api/stream connection (EventSource reconnects on its own
+     * and resumes from the last event id it saw). The stream is authenticated
+     * by the session cookie, so it is sent to a separate server URL too
+     */
+    openStream() {
+        if (this.eventSource) return this.eventSource;
+
+        this.eventSource = new EventSource(`${this.baseUrl}/api/stream`, { withCredentials: true });
+        this.eventSource.onopen = () => console.log('📡 Realtime stream connected');
+        this.eventSource.onerror = () => console.log('📡 Realtime stream interrupted, reconnecting...');
+
+        Object.keys(this.streamListeners).forEach(eventType => this.attachStreamListener(eventType));
+        return this.eventSource;
+    }
+
+    attachStreamListener(eventType) {
+        this.eventSource.addEventListener(eventType, (message) => {
+            let event;
+            try {
+                event = JSON.parse(message.data);
+            } catch (error) {
+                console.error('Realtime stream parse error:', error);
+                return;
+            }
+            (this.streamListeners[eventType] || []).forEach(callback => {
+                try {
+                    callback(event.data, event);
+                } catch (error) {
+                    console.error(`${eventType} callback error:`, error);
+                }
+            });
+        });
+    }
+
+    /**
+     * Subscribe to a stream event type ('request_created', 'request_approved',
+     * 'request_cancelled', 'route_started', 'route_progress', 'route_completed')
+     */
+    on(eventType, callback) {
+        if (!this.streamListeners[eventType]) {
+            this.streamListeners[eventType] = [];
+            if (this.eventSource) this.attachStreamListener(eventType);
+        }
+        this.streamListeners[eventType].push(callback);
+        this.openStream();
+
+        return () => {
+            const listeners = this.streamListeners[eventType] || [];
+            const index = listeners.indexOf(callback);
+            if (index > -1) {
+                listeners.splice(index, 1);
+            }
+        };
+    }
+
+    /**
+     * Long-poll the signed-in user's notification inbox (/api/notifications).
+     * The first request only primes the cursor, so callbacks see new notifications.
+     */
+    watchNotifications(callback) {
+        let active = true;
+        let cursor = null;
+
+        const poll = async () => {
+            while (active) {
+                try {
+                    const query = cursor === null ? '' : `?after=${cursor}&wait=25`;
+                    const response = await fetch(`${this.baseUrl}/api/notifications${query}`, {
+                        credentials: 'include'
+                    });
+                    if (!response.ok) {
+                        throw new Error(`HTTP ${response.status}`);
+                    }
+                    const data = await response.json();
+                    if (active && cursor !== null && data.notifications.length > 0) {
+                        callback(data.notifications);
+                    }
+                    cursor = data.cursor;
+                } catch (error) {
+                    console.log('📬 Notifications polling error:', error);
+                    await new Promise(resolve => setTimeout(resolve, 5000));
+                }
+            }
+        };
+        poll();
+
+        return () => {
+            active = false;
+        };
+    }
+
+    /**
+     * Close the stream connection
+     */
+    closeStream() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+        }
+        this.streamListeners = {};
+    }
+
     /**
      * Start polling for real-time updates
      */
@@ -218,6 +331,7 @@ class RealtimeService {
      */
     disconnect() {
         this.stopPolling();
+        this.closeStream();
         this.callbacks = {
             emergencyRequests: [],
             driverUpdates: [],
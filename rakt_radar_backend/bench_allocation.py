@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: multi-bank split allocation over a synthetic 500-bank network
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from src.services.allocation import lower_bound, solve_split, travel_minutes
+from src.services.geo import distances
+
+
+def bench_split(banks, need, runs=20):
+    rng = np.random.default_rng(500)
+    # Banks scattered over Tamil Nadu, each holding one to eight units of compatible stock
+    lats = rng.uniform(8.0, 13.5, banks)
+    lons = rng.uniform(76.0, 80.5, banks)
+    supply = rng.integers(1, 9, banks).astype(np.float64) * 450
+    per_ml = rng.uniform(0, 30, banks) / 450
+    origin = (13.0827, 80.2707)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fixed = travel_minutes(distances(origin, lats, lons), 'critical')
+        amounts, cost = solve_split(supply, fixed, per_ml, need)
+        timings.append(time.perf_counter() - start)
+    bound = lower_bound(np.minimum(supply, need), fixed, per_ml, need)
+
+    timings = np.array(timings) * 1000
+    print(f"🧩 {banks} banks, {need:>6,.0f} ml: {len(amounts)} sources, cost {cost:7.1f} "
+          f"(bound {bound:7.1f}) | median {np.median(timings):6.2f} ms, max {timings.max():6.2f} ms")
+
+
+if __name__ == "__main__":
+    print("🏁 Split allocation benchmark")
+    print("=" * 50)
+    for need in (1_800, 4_500, 9_000, 18_000):
+        bench_split(500, need)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark: concurrent approve (reserve units + route) and GPS progress writes per database profile
+
+Runs SQLite with its defaults and with the tuned profile, each on a fresh file. Set
+BENCH_DATABASE_URL to a throwaway PostgreSQL database to add the pooled backend (its tables are
+created and dropped).
+"""
+
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+
+import src.services.inventory  # noqa: F401 -- keeps inventory_summary in step, as in the server
+from src.models.models import BloodBank, BloodUnit, Driver, EmergencyRequest, Hospital, Route, db
+from src.routes.emergency_requests import reserve_units
+from src.services.database import database_metrics, engine_options, init_app, sqlite_pragmas
+
+THREADS = 8
+APPROVALS = 300
+PROGRESS_WRITES = 3000
+ACTIVE_ROUTES = 16
+
+
+def build_app(url, environ):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url, environ)
+    app.config['SQLITE_PRAGMAS'] = sqlite_pragmas(environ) if url.startswith('sqlite') else {}
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    init_app(app, db)
+    return app
+
+
+def seed():
+    """One bank with enough O+ for every approval, pending requests and active routes"""
+    hospital = Hospital(name="Bench Hospital", address="Test Road", city="Chennai", state="Tamil Nadu",
+                        latitude=13.0, longitude=80.2, contact_person="Bench",
+                        contact_email="bench-h@example.com", contact_phone="+91-00000-00000")
+    bank = BloodBank(name="Bench Bank", address="Test Road", city="Chennai", state="Tamil Nadu",
+                     latitude=12.9, longitude=80.1, contact_person="Bench",
+                     contact_email="bench-b@example.com", contact_phone="+91-00000-00000")
+    db.session.add_all([hospital, bank, Driver(name="bench_driver", phone="+91-00000-00000",
+                                               vehicle_number="TN-00-XX-0000")])
+    db.session.flush()
+    today = date.today()
+    db.session.add_all([
+        BloodUnit(blood_bank_id=bank.id, blood_type='O+', quantity_ml=450, collection_date=today,
+                  expiry_date=today + timedelta(days=30), current_location_latitude=12.9,
+                  current_location_longitude=80.1)
+        for _ in range(APPROVALS + 50)
+    ])
+    requests = [EmergencyRequest(hospital_id=hospital.id, blood_type='O+', quantity_ml=450, urgency='high',
+                                 suggested_bank_id=bank.id, status='pending') for _ in range(APPROVALS + ACTIVE_ROUTES)]
+    db.session.add_all(requests)
+    db.session.flush()
+    routes = [Route(request_id=req.id, driver_name="bench_driver", start_latitude=12.9, start_longitude=80.1,
+                    end_latitude=13.0, end_longitude=80.2, eta_minutes=30, distance_km=15.0, status='active')
+              for req in requests[APPROVALS:]]
+    db.session.add_all(routes)
+    db.session.commit()
+    return bank.id, [req.id for req in requests[:APPROVALS]], [route.id for route in routes]
+
+
+def approve(request_id, bank_id):
+    request_obj = db.session.get(EmergencyRequest, request_id)
+    reserve_units(request_obj, bank_id, request_obj.quantity_ml, ['O+'])
+    request_obj.status = 'approved'
+    db.session.add(Route(request_id=request_id, driver_name="bench_driver", start_latitude=12.9,
+                         start_longitude=80.1, end_latitude=13.0, end_longitude=80.2, eta_minutes=30,
+                         distance_km=15.0, status='pending'))
+    db.session.commit()
+
+
+def progress(route_id, rng):
+    route = db.session.get(Route, route_id)
+    latitude, longitude = 12.9 + rng.random() * 0.1, 80.1 + rng.random() * 0.1
+    db.session.add(route.record_track_point(latitude, longitude))
+    driver = Driver.query.filter_by(name=route.driver_name).first()
+    driver.current_latitude, driver.current_longitude = latitude, longitude
+    db.session.commit()
+
+
+def run(app):
+    with app.app_context():
+        db.create_all()
+        bank_id, request_ids, route_ids = seed()
+
+    rng = random.Random(21)
+    tasks = [('approve', request_id) for request_id in request_ids]
+    tasks += [('progress', rng.choice(route_ids)) for _ in range(PROGRESS_WRITES)]
+    rng.shuffle(tasks)
+    work = queue.Queue()
+    for task in tasks:
+        work.put(task)
+
+    latencies = {'approve': [], 'progress': []}
+    errors = []
+    lock = threading.Lock()
+
+    def worker(seed_value):
+        local_rng = random.Random(seed_value)
+        with app.app_context():
+            while True:
+                try:
+                    kind, target = work.get_nowait()
+                except queue.Empty:
+                    return
+                started = time.perf_counter()
+                try:
+                    approve(target, bank_id) if kind == 'approve' else progress(target, local_rng)
+                except OperationalError as e:
+                    db.session.rollback()
+                    with lock:
+                        errors.append(str(e.orig))
+                    continue
+                with lock:
+                    latencies[kind].append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        metrics = database_metrics(db)
+    return elapsed, latencies, errors, metrics
+
+
+def report(name, elapsed, latencies, errors, metrics):
+    done = sum(len(values) for values in latencies.values())
+    parts = [f"{done / elapsed:7.0f} tx/s"]
+    for kind, values in latencies.items():
+        values = np.array(values) * 1000
+        parts.append(f"{kind} p50 {np.percentile(values, 50):6.2f} ms p95 {np.percentile(values, 95):7.2f} ms")
+    parts.append(f"{len(errors)} lock errors")
+    print(f"🗄️ {name:<15} " + " | ".join(parts))
+    if 'pragmas' in metrics:
+        print(f"   {metrics['pragmas']}")
+
+
+if __name__ == "__main__":
+    print(f"🏁 Database write benchmark: {THREADS} threads, {APPROVALS} approvals + {PROGRESS_WRITES} progress writes")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, environ in [('sqlite default', {'SQLITE_TUNING': '0'}), ('sqlite tuned', {})]:
+            app = build_app(f"sqlite:///{os.path.join(directory, name.replace(' ', '_'))}.db", environ)
+            report(name, *run(app))
+            with app.app_context():
+                db.engine.dispose()
+
+    url = os.environ.get('BENCH_DATABASE_URL')
+    if url:
+        app = build_app(url, os.environ)
+        with app.app_context():
+            db.drop_all()
+        try:
+            report('postgresql', *run(app))
+        finally:
+            with app.app_context():
+                db.session.remove()
+                db.drop_all()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: ETA model fit and vectorized batch inference versus one prediction per trip
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from src.services.eta import fit_eta_model
+
+
+def synthetic_trips(count, corridors=400, seed=20):
+    rng = np.random.default_rng(seed)
+    distance = rng.uniform(2, 120, count)
+    corridor = rng.integers(0, corridors, count)
+    slowness = rng.uniform(0.7, 1.6, corridors)[corridor]
+    return {
+        'distance_km': distance,
+        'hour': rng.uniform(0, 24, count),
+        'urgency': rng.choice(['low', 'medium', 'high', 'critical'], count).astype(object),
+        'corridor': np.array([f"c{value}" for value in corridor.tolist()], dtype=object),
+        'minutes': (8 + distance / 45 * 60 * slowness) * rng.lognormal(0, 0.1, count),
+        'order': np.arange(count),
+        'full': np.ones(count, dtype=bool)
+    }
+
+
+if __name__ == "__main__":
+    print("🏁 ETA model benchmark")
+    print("=" * 50)
+    for count in (10_000, 200_000):
+        samples = synthetic_trips(count)
+        started = time.perf_counter()
+        model = fit_eta_model(samples)
+        fit_ms = (time.perf_counter() - started) * 1000
+        print(f"🧮 Fit on {count:>7,} samples, {len(model.corridors)} corridors: {fit_ms:8.1f} ms")
+
+    trips = synthetic_trips(10_000, seed=21)
+    args = (trips['distance_km'], trips['urgency'], trips['hour'], trips['corridor'])
+    started = time.perf_counter()
+    batch = model.predict(*args)
+    batch_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    single = [model.predict([d], u, h, [c])[0] for d, u, h, c in zip(*args)]
+    single_ms = (time.perf_counter() - started) * 1000
+    assert np.allclose(batch, single)
+    print(f"⚡ 10,000 predictions: batch {batch_ms:.1f} ms vs one by one {single_ms:.1f} ms "
+          f"({single_ms / batch_ms:.0f}x)")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: scalar calculate_distance loop vs the vectorized NumPy Haversine kernel
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from src.services.geo import calculate_distance, distances, distance_matrix
+
+
+def best_of(runs, fn):
+    """Fastest wall-clock time of `runs` calls to fn"""
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_one_to_many(count, runs=5):
+    rng = np.random.default_rng(42)
+    # Points scattered over Tamil Nadu
+    lats = rng.uniform(8.0, 13.5, count)
+    lons = rng.uniform(76.0, 80.5, count)
+    origin = (13.0827, 80.2707)
+    lat_list, lon_list = lats.tolist(), lons.tolist()
+
+    scalar = best_of(runs, lambda: [
+        calculate_distance(origin[0], origin[1], lat, lon) for lat, lon in zip(lat_list, lon_list)
+    ])
+    vectorized = best_of(runs, lambda: distances(origin, lats, lons))
+
+    expected = [calculate_distance(origin[0], origin[1], lat, lon) for lat, lon in zip(lat_list, lon_list)]
+    assert np.allclose(distances(origin, lats, lons), expected)
+
+    print(f"📍 one-to-many {count:>7,} points: scalar {scalar * 1000:8.2f} ms | "
+          f"numpy {vectorized * 1000:7.2f} ms | speedup {scalar / vectorized:6.1f}x")
+
+
+def bench_matrix(rows, cols, runs=3):
+    rng = np.random.default_rng(7)
+    lats1, lons1 = rng.uniform(8.0, 13.5, rows), rng.uniform(76.0, 80.5, rows)
+    lats2, lons2 = rng.uniform(8.0, 13.5, cols), rng.uniform(76.0, 80.5, cols)
+    pairs1 = list(zip(lats1.tolist(), lons1.tolist()))
+    pairs2 = list(zip(lats2.tolist(), lons2.tolist()))
+
+    scalar = best_of(runs, lambda: [
+        [calculate_distance(a, b, c, d) for c, d in pairs2] for a, b in pairs1
+    ])
+    vectorized = best_of(runs, lambda: distance_matrix(lats1, lons1, lats2, lons2))
+
+    print(f"🧮 matrix {rows} x {cols} ({rows * cols:,} pairs): scalar {scalar * 1000:8.2f} ms | "
+          f"numpy {vectorized * 1000:7.2f} ms | speedup {scalar / vectorized:6.1f}x")
+
+
+if __name__ == "__main__":
+    print("🏁 Haversine benchmark (best of several runs)")
+    print("=" * 50)
+    for count in (10_000, 100_000):
+        bench_one_to_many(count)
+    bench_matrix(40, 500)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark: 1,000 single POST /routes/<id>/progress calls vs one POST /routes/<id>/progress/batch
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import FacilityFactory
+from test_route_progress import seed_route, cleanup
+
+FIX_COUNT = 1000
+
+
+def make_fixes(count):
+    """A straight drive of `count` fixes, one every 100 ms so the last stays within the allowed clock skew"""
+    base = datetime.utcnow() + timedelta(seconds=1)
+    return [
+        {
+            'latitude': 12.9716 + 0.0001 * step,
+            'longitude': 80.2200 + 0.00005 * step,
+            'timestamp': (base + timedelta(milliseconds=100 * step)).isoformat()
+        }
+        for step in range(count)
+    ]
+
+
+def started_route(app, db, facilities):
+    """Seed a route, log its driver in and start it; returns (client, ids)"""
+    with app.app_context():
+        ids = seed_route(db, facilities)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids['user_id']
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert client.post(f"/api/routes/{ids['route_id']}/start").status_code == 200
+    return client, ids
+
+
+def main():
+    from src.main import app, db
+    from src.models.models import Route
+
+    with app.app_context():
+        db.create_all()
+
+    results = {}
+
+    facilities = FacilityFactory()
+    client, ids = started_route(app, db, facilities)
+    fixes = make_fixes(FIX_COUNT)
+    try:
+        start = time.perf_counter()
+        for fix in fixes:
+            response = client.post(f"/api/routes/{ids['route_id']}/progress", json=fix)
+            assert response.status_code == 200
+        results['single'] = time.perf_counter() - start
+        with app.app_context():
+            single_distance = db.session.get(Route, ids['route_id']).distance_covered_km
+    finally:
+        with app.app_context():
+            cleanup(db, ids)
+        facilities.cleanup()
+
+    facilities = FacilityFactory()
+    client, ids = started_route(app, db, facilities)
+    fixes = make_fixes(FIX_COUNT)
+    try:
+        start = time.perf_counter()
+        response = client.post(f"/api/routes/{ids['route_id']}/progress/batch", json={'fixes': fixes})
+        results['batch'] = time.perf_counter() - start
+        assert response.get_json()['accepted'] == FIX_COUNT, response.get_json()
+        with app.app_context():
+            batch_distance = db.session.get(Route, ids['route_id']).distance_covered_km
+    finally:
+        with app.app_context():
+            cleanup(db, ids)
+        facilities.cleanup()
+
+    # Both paths must record the same trip
+    assert abs(single_distance - batch_distance) < 1e-6
+
+    print(f"🛰️  {FIX_COUNT:,} single posts: {results['single'] * 1000:9.1f} ms "
+          f"({results['single'] / FIX_COUNT * 1000:.2f} ms/fix)")
+    print(f"📦 one batch of {FIX_COUNT:,}:  {results['batch'] * 1000:9.1f} ms "
+          f"({results['batch'] / FIX_COUNT * 1000:.3f} ms/fix)")
+    print(f"⚡ speedup {results['single'] / results['batch']:.1f}x, {batch_distance:.2f} km recorded either way")
+
+
+if __name__ == "__main__":
+    main()
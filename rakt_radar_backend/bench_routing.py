@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: bidirectional A* over a synthetic city-scale road grid, cold and LRU-cached
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from src.services.geo import haversine
+from src.services.routing import RoadGraph, RoutingEngine
+
+
+def street_grid(size, seed=18):
+    """size x size jittered grid, 500 m blocks, every street two-way"""
+    rng = np.random.default_rng(seed)
+    rows, cols = np.divmod(np.arange(size * size), size)
+    lats = 12.6 + rows * 0.0045 + rng.uniform(-0.001, 0.001, size * size)
+    lons = 79.9 + cols * 0.0045 + rng.uniform(-0.001, 0.001, size * size)
+    east = np.flatnonzero(cols < size - 1)
+    north = np.flatnonzero(rows < size - 1)
+    sources = np.concatenate([east, east + 1, north, north + size])
+    targets = np.concatenate([east + 1, east, north + size, north])
+    lengths = haversine(lats[sources], lons[sources], lats[targets], lons[targets]) * 1000
+    speeds = rng.choice([20.0, 40.0, 60.0], size=sources.size) / 3.6
+    return RoadGraph.from_edges(lats, lons, sources, targets, lengths, lengths / speeds)
+
+
+if __name__ == "__main__":
+    print("🏁 Offline routing benchmark")
+    print("=" * 50)
+    for size in (100, 300):
+        started = time.perf_counter()
+        graph = street_grid(size)
+        build = time.perf_counter() - started
+
+        engine = RoutingEngine()
+        engine.set_graph(graph)
+        rng = np.random.default_rng(1)
+        pairs = [(graph.lats[a], graph.lons[a], graph.lats[b], graph.lons[b])
+                 for a, b in rng.integers(0, graph.node_count, (20, 2)).tolist()]
+
+        cold = []
+        for pair in pairs:
+            started = time.perf_counter()
+            engine.route(*pair)
+            cold.append(time.perf_counter() - started)
+        warm = []
+        for pair in pairs:
+            started = time.perf_counter()
+            engine.route(*pair)
+            warm.append(time.perf_counter() - started)
+
+        print(f"🛣️ {graph.node_count:>7,} nodes / {graph.edge_count:>7,} edges (built in {build:.2f}s): "
+              f"cold median {np.median(cold) * 1000:7.2f} ms | cached median {np.median(warm) * 1000:5.2f} ms "
+              f"| {engine.hits} hits")
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Convert an OpenStreetMap XML extract (.osm) into the compact CSR road graph used by /api/routing
+
+Usage: python build_road_graph.py region.osm [src/data/road_graph.npz]
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.services.routing import graph_from_osm
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), 'src', 'data', 'road_graph.npz')
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__.strip())
+        sys.exit(1)
+    source = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_OUTPUT
+
+    started = time.perf_counter()
+    graph = graph_from_osm(source)
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    graph.save(output)
+    print(f"🛣️ {graph.node_count:,} nodes, {graph.edge_count:,} edges from {source} "
+          f"in {time.perf_counter() - started:.1f}s -> {output} ({os.path.getsize(output) / 1e6:.1f} MB)")
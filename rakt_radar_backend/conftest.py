@@ -0,0 +1,83 @@
+import os
+import secrets
+import sys
+import uuid
+
+import pytest
+
+# src.main refuses to start without a private SECRET_KEY; tests sign with a throwaway one
+os.environ.setdefault('SECRET_KEY', secrets.token_hex(32))
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_instance(tmp_path_factory):
+    """Point src.main at a throwaway database, travel matrix and ETA model directory.
+
+    src.main reads these when it is first imported, which the tests do inside
+    their bodies, so the developer's instance/ folder is never touched.
+    """
+    assert 'src.main' not in sys.modules, "src.main was imported before the test instance was set up"
+    root = tmp_path_factory.mktemp('instance')
+    os.environ['DATABASE_URL'] = f"sqlite:///{root / 'rakt_radar.db'}"
+    os.environ['TRAVEL_MATRIX_DIR'] = str(root / 'travel_matrix')
+    os.environ['ETA_MODEL_DIR'] = str(root / 'eta_models')
+    yield root
+
+    from src.main import app
+    from src.services.facilities import check_facilities
+    with app.app_context():
+        # Every test removed its hospitals and blood banks without orphaning their registry rows
+        assert check_facilities() == []
+
+
+class FacilityFactory:
+    """Builds uuid-tagged test hospitals and blood banks and deletes them again.
+
+    The records are added to the current app's session (the caller commits);
+    cleanup() deletes them through the session of the app that built them, so
+    the facilities, summary and cache hooks see it. Rows that reference them
+    are the test's to delete first.
+    """
+
+    def __init__(self):
+        self.tag = uuid.uuid4().hex[:8]
+        self._created = []
+
+    def _build(self, model, name, latitude, longitude, city, state):
+        from flask import current_app
+        from src.models.models import db
+
+        record = model(
+            id=str(uuid.uuid4()), name=name, address="Test Road", city=city, state=state,
+            latitude=latitude, longitude=longitude, contact_person="Test",
+            contact_email=f"{uuid.uuid4().hex[:12]}@example.com", contact_phone="+91-00000-00000"
+        )
+        db.session.add(record)
+        self._created.append((current_app._get_current_object(), model, record.id))
+        return record
+
+    def hospital(self, name, latitude, longitude, city="Chennai", state="Tamil Nadu"):
+        from src.models.models import Hospital
+        return self._build(Hospital, name, latitude, longitude, city, state)
+
+    def blood_bank(self, name, latitude, longitude, city="Chennai", state="Tamil Nadu"):
+        from src.models.models import BloodBank
+        return self._build(BloodBank, name, latitude, longitude, city, state)
+
+    def cleanup(self):
+        from src.models.models import db
+
+        for app, model, entity_id in reversed(self._created):
+            with app.app_context():
+                record = db.session.get(model, entity_id)
+                if record:
+                    db.session.delete(record)
+                db.session.commit()
+
+
+@pytest.fixture
+def facilities():
+    """A FacilityFactory whose hospitals and blood banks are deleted after the test"""
+    factory = FacilityFactory()
+    yield factory
+    factory.cleanup()
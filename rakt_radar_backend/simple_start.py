@@ -10,11 +10,16 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from src.services.auth import require_secret_key
+from src.services.database import database_url, engine_options, init_app as init_database, sqlite_pragmas
 
 # Create Flask app
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///rakt_radar.db"
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
+require_secret_key(app)
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+app.config['SQLITE_PRAGMAS'] = sqlite_pragmas()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Enable CORS
@@ -23,6 +28,7 @@ CORS(app, supports_credentials=True)
 # Create database instance
 db = SQLAlchemy()
 db.init_app(app)
+init_database(app, db)
 
 # Define models here to avoid circular imports
 class Hospital(db.Model):
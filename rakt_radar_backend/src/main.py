@@ -3,60 +3,145 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, Response, request, send_from_directory, jsonify
 from flask_cors import CORS
+import json
 import threading
 import time
 from datetime import datetime
 
 # Create Flask app first
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+# Signs sessions and bearer tokens; must be private (startup refuses a missing or published key)
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
 
 # Enable CORS for all routes - CRITICAL for multi-laptop demo
 CORS(app, supports_credentials=True, origins=["*"])
 
-# Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:///rakt_radar.db"
+# Database configuration: DATABASE_URL picks the backend (the local SQLite file by default,
+# or PostgreSQL with a DB_*-tuned connection pool); SQLite connections get the SQLITE_* profile
+from src.services.database import database_metrics, database_url, engine_options, init_app as init_database, sqlite_pragmas
+app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+app.config['SQLITE_PRAGMAS'] = sqlite_pragmas()
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Expiry sweeper: flag units expiring within the horizon, expire the rest on their date
+app.config['EXPIRY_HORIZON_DAYS'] = int(os.environ.get('EXPIRY_HORIZON_DAYS', 7))
+app.config['EXPIRY_SWEEP_INTERVAL_SECONDS'] = int(os.environ.get('EXPIRY_SWEEP_INTERVAL_SECONDS', 3600))
+
+# Offline road graph (see build_road_graph.py); routing falls back to straight lines without it
+app.config['ROAD_GRAPH_PATH'] = os.environ.get(
+    'ROAD_GRAPH_PATH', os.path.join(os.path.dirname(__file__), 'data', 'road_graph.npz')
+)
+# Memory-mapped bank x hospital travel matrix, filled row/column by row/column as facilities appear or move
+app.config['TRAVEL_MATRIX_DIR'] = os.environ.get('TRAVEL_MATRIX_DIR', os.path.join(app.instance_path, 'travel_matrix'))
+# Versioned ETA models trained on completed routes (see train_eta_model.py)
+app.config['ETA_MODEL_DIR'] = os.environ.get('ETA_MODEL_DIR', os.path.join(app.instance_path, 'eta_models'))
+# Lifetime of the signed bearer tokens handed out at login
+app.config['AUTH_TOKEN_TTL_SECONDS'] = int(os.environ.get('AUTH_TOKEN_TTL_SECONDS', 12 * 3600))
+# Serialized hospitals, blood banks and drivers kept in process (LRU)
+app.config['ENTITY_CACHE_SIZE'] = int(os.environ.get('ENTITY_CACHE_SIZE', 4096))
+# ...and how long each stays before it is re-read, so other workers' commits show up within it
+app.config['ENTITY_CACHE_TTL_SECONDS'] = int(os.environ.get('ENTITY_CACHE_TTL_SECONDS', 60))
+
 # Initialize database
 from src.models.models import db
 db.init_app(app)
+init_database(app, db)
+
+# Register the session hooks that keep inventory_summary in step with blood units
+import src.services.inventory
+# ...that mirror hospitals and blood banks into the facilities registry
+import src.services.facilities
+# ...and the ones that announce committed notifications on the event bus
+import src.services.notifications
+
+# Resolve the caller from a signed bearer token (or the session) before every request
+from src.services.auth import current_principal, token_authority
+token_authority.init_app(app)
+
+# Read-through cache of facility and driver records, invalidated when their rows commit
+from src.services.entity_cache import entity_cache
+entity_cache.init_app(app)
+
+# Scheduled in-process expiry sweeps; started with the server below
+from src.services.expiry import expiry_sweeper
+expiry_sweeper.init_app(app)
+
+# Road routing engine; the graph file loads on the first routing request
+from src.services.routing import routing_engine
+routing_engine.init_app(app)
+from src.services.travel_matrix import travel_matrix
+travel_matrix.init_app(app)
+from src.services.eta import eta_service
+eta_service.init_app(app)
 
-# Global state for real-time updates
-real_time_updates = {
-    'emergency_requests': [],
-    'driver_locations': {},
-    'delivery_status': {},
-    'last_update': datetime.now().isoformat()
-}
+# Global bus for real-time updates, pushed to clients over /api/stream
+from src.services.event_bus import event_bus
+from src.services.notifications import viewer_keys
+
+@app.route('/api/stream', methods=['GET'])
+def stream_events():
+    """Server-Sent Events stream of realtime deltas (approvals, route start/progress/completion, cancellations).
+
+    Callers only receive events about their own facility's requests, or their own
+    routes for drivers; admins receive everything.
+    """
+    user = current_principal()
+    if not user:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    event_types = [t for t in request.args.get('types', '').split(',') if t]
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    last_event_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    
+    subscription = event_bus.subscribe(event_types or None, last_event_id, viewer=viewer_keys(user))
+    
+    def generate():
+        try:
+            # Ask the browser to reconnect quickly if the connection drops
+            yield 'retry: 3000\n\n'
+            while True:
+                event = subscription.get(timeout=15)
+                if event is None:
+                    # Heartbeat comment keeps proxies from closing an idle stream
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 # Real-time update endpoints for hackathon demo
 @app.route('/api/realtime/emergency-requests', methods=['GET'])
 def get_realtime_emergency_requests():
     """Real-time endpoint for emergency requests - works across all laptops"""
     try:
-        from src.models.models import EmergencyRequest, Hospital, BloodBank
-        from src.models.user import User
+        from src.models.models import EmergencyRequest
+        from sqlalchemy.orm import joinedload
         
-        # Get all emergency requests with full details
-        requests = EmergencyRequest.query.all()
+        # Get all emergency requests with hospital and bank joined in a single query
+        requests = EmergencyRequest.query.options(
+            joinedload(EmergencyRequest.hospital),
+            joinedload(EmergencyRequest.suggested_bank)
+        ).all()
         requests_data = []
         
         for req in requests:
             req_dict = req.to_dict()
             
             # Get hospital details
-            hospital = Hospital.query.get(req.hospital_id)
-            if hospital:
-                req_dict['hospital'] = hospital.to_dict()
+            if req.hospital:
+                req_dict['hospital'] = req.hospital.to_dict()
             
             # Get suggested bank details
-            if req.suggested_bank_id:
-                bank = BloodBank.query.get(req.suggested_bank_id)
-                if bank:
-                    req_dict['suggested_bank'] = bank.to_dict()
+            if req.suggested_bank:
+                req_dict['suggested_bank'] = req.suggested_bank.to_dict()
             
             requests_data.append(req_dict)
         
@@ -80,16 +165,20 @@ def get_realtime_driver_updates():
         routes = Route.query.filter_by(status='active').all()
         driver_updates = []
         
+        # Routes name their driver; load them all at once rather than per route
+        names = {route.driver_name for route in routes}
+        drivers = {driver.name: driver for driver in Driver.query.filter(Driver.name.in_(names))} if names else {}
+        
         for route in routes:
-            driver = Driver.query.get(route.driver_id) if route.driver_id else None
+            driver = drivers.get(route.driver_name)
             if driver:
                 driver_updates.append({
                     'route_id': route.id,
                     'driver_id': driver.id,
                     'driver_name': driver.name,
                     'vehicle_number': driver.vehicle_number,
-                    'current_latitude': route.current_latitude or 13.0827,
-                    'current_longitude': route.current_longitude or 80.2707,
+                    'current_latitude': route.last_latitude or 13.0827,
+                    'current_longitude': route.last_longitude or 80.2707,
                     'status': route.status,
                     'eta_minutes': route.eta_minutes or 30,
                     'last_updated': datetime.now().isoformat()
@@ -131,6 +220,24 @@ def get_realtime_status():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/database/metrics', methods=['GET'])
+def get_database_metrics():
+    """Database backend with its connection pool status and applied SQLite settings"""
+    try:
+        return jsonify(database_metrics(db)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/entity_cache/metrics', methods=['GET'])
+def get_entity_cache_metrics():
+    """Hospital, blood bank and driver cache size and hit rate"""
+    return jsonify(entity_cache.metrics()), 200
+
+@app.route('/api/auth/metrics', methods=['GET'])
+def get_auth_metrics():
+    """Issued, verified and rejected tokens, revocation list size and legacy session cache hits"""
+    return jsonify(token_authority.metrics()), 200
+
 # Register blueprints
 from src.routes.hospitals import hospitals_bp
 from src.routes.blood_banks import blood_banks_bp
@@ -140,6 +247,8 @@ from src.routes.intelligence import intelligence_bp
 from src.routes.user import user_bp
 from src.routes.emergency_requests import emergency_requests_bp
 from src.routes.routes import routes_bp
+from src.routes.notifications import notifications_bp
+from src.routes.exports import exports_bp
 
 app.register_blueprint(hospitals_bp, url_prefix='/api')
 app.register_blueprint(blood_banks_bp, url_prefix='/api')
@@ -149,12 +258,22 @@ app.register_blueprint(intelligence_bp, url_prefix='/api')
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(emergency_requests_bp, url_prefix='/api')
 app.register_blueprint(routes_bp, url_prefix='/api')
+app.register_blueprint(notifications_bp, url_prefix='/api')
+app.register_blueprint(exports_bp, url_prefix='/api')
 
 def initialize_database():
     """Initialize database and seed demo data"""
     with app.app_context():
         db.create_all()
         
+        # create_all() never alters existing tables: add the route running-total columns to
+        # databases created before them, then fill them in from the recorded track points
+        from src.models.models import Route, rebuild_route_totals
+        from src.services.database import add_missing_columns
+        added = add_missing_columns(db, Route)
+        if added:
+            print(f"🔧 Added route columns {', '.join(added)}; backfilled {rebuild_route_totals()} routes")
+        
         # Check if we need to populate mock data
         from src.models.models import Hospital
         if Hospital.query.count() == 0:
@@ -167,6 +286,20 @@ def initialize_database():
             from src.demo_seed import seed_demo_users, seed_demo_blood_units
             seed_demo_users()
             seed_demo_blood_units()
+        
+        # Rebuild the inventory summary if it drifted from the units (e.g. first run after upgrade)
+        from src.services.inventory import check_inventory_summary
+        mismatches = check_inventory_summary(repair=True)
+        if mismatches:
+            print(f"🔧 Rebuilt inventory summary ({len(mismatches)} stale rows)")
+        
+        # Likewise the facilities registry (e.g. first run after it was added)
+        from src.services.facilities import check_facilities
+        mismatches = check_facilities(repair=True)
+        if mismatches:
+            print(f"🔧 Rebuilt facilities registry ({len(mismatches)} stale rows)")
+        
+        print(f"🏥 Entity cache warmed with {entity_cache.warm()} hospital, blood bank, driver and facility records")
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
@@ -191,6 +324,7 @@ def serve(path):
 if __name__ == '__main__':
     # Initialize database before starting the server
     initialize_database()
+    expiry_sweeper.start()
     
     print("🚀 RAKT-RADAR 3-POV Demo System starting...")
     print("📊 Database initialized with demo data")
@@ -200,6 +334,14 @@ if __name__ == '__main__':
     print("   - /api/realtime/emergency-requests")
     print("   - /api/realtime/driver-updates")
     print("   - /api/realtime/status")
+    print("   - /api/stream (Server-Sent Events)")
+    print("   - /api/notifications?after=<seq>&wait=<seconds> (notification inbox)")
+    print("   - /api/exports/<dataset>?format=ndjson|csv&cursor=<_cursor> (streaming exports)")
+    print(f"🧊 Expiry sweeper every {expiry_sweeper.interval_seconds}s, "
+          f"flagging units within {expiry_sweeper.horizon_days} days (/api/blood_units/expiry_sweep)")
+    print(f"🛣️ Road routing graph: {routing_engine.path}"
+          + ("" if os.path.exists(routing_engine.path or "") else " (missing; straight-line fallback)"))
+    print(f"🗄️ Database: {db.engine.url.render_as_string(hide_password=True)}")
     print("🔌 CORS enabled for multi-laptop demo")
     
     app.run(host='0.0.0.0', port=8000, debug=False, threaded=True)
@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
+import json
 import uuid
 from datetime import datetime, date
+from src.services.geo import calculate_distance, path_length
 
 db = SQLAlchemy()
 
@@ -10,7 +12,7 @@ class Hospital(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(255), nullable=False, unique=True)
     address = db.Column(db.Text, nullable=False)
-    city = db.Column(db.String(100), nullable=False)
+    city = db.Column(db.String(100), nullable=False, index=True)
     state = db.Column(db.String(100), nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
@@ -40,7 +42,7 @@ class BloodBank(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     name = db.Column(db.String(255), nullable=False, unique=True)
     address = db.Column(db.Text, nullable=False)
-    city = db.Column(db.String(100), nullable=False)
+    city = db.Column(db.String(100), nullable=False, index=True)
     state = db.Column(db.String(100), nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
@@ -64,8 +66,44 @@ class BloodBank(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class Facility(db.Model):
+    """Every hospital and blood bank under one key, so an entity id resolves in one lookup.
+
+    Rows are written by the session hooks in src.services.facilities, never directly.
+    """
+    __tablename__ = 'facilities'
+
+    id = db.Column(db.String(36), primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # hospital, blood_bank
+    name = db.Column(db.String(255), nullable=False)
+    city = db.Column(db.String(100), nullable=False)
+    state = db.Column(db.String(100), nullable=False)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'name': self.name,
+            'city': self.city,
+            'state': self.state,
+            'latitude': self.latitude,
+            'longitude': self.longitude
+        }
+
 class BloodUnit(db.Model):
     __tablename__ = 'blood_units'
+    __table_args__ = (
+        # Stock lookups: a bank's available units of one type
+        db.Index('ix_blood_units_bank_type_status', 'blood_bank_id', 'blood_type', 'status'),
+        # Network-wide stock of one type, and status/expiry sweeps
+        db.Index('ix_blood_units_type_status', 'blood_type', 'status'),
+        db.Index('ix_blood_units_status_expiry', 'status', 'expiry_date'),
+        db.Index('ix_blood_units_flagged', 'is_flagged_for_expiry'),
+        # Keyset pages of the inventory list, soonest-expiring first
+        db.Index('ix_blood_units_expiry_id', 'expiry_date', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     blood_bank_id = db.Column(db.String(36), db.ForeignKey('blood_banks.id'), nullable=False)
@@ -101,13 +139,50 @@ class BloodUnit(db.Model):
             return (self.expiry_date - today).days
         return None
 
+class InventorySummary(db.Model):
+    """Available stock per blood bank and blood type, maintained from BloodUnit changes"""
+    __tablename__ = 'inventory_summary'
+    __table_args__ = (
+        db.Index('ix_inventory_summary_type_available', 'blood_type', 'available_ml'),
+    )
+    
+    blood_bank_id = db.Column(db.String(36), db.ForeignKey('blood_banks.id'), primary_key=True)
+    blood_type = db.Column(db.String(10), primary_key=True)
+    available_ml = db.Column(db.Integer, nullable=False, default=0)
+    unit_count = db.Column(db.Integer, nullable=False, default=0)
+    min_expiry = db.Column(db.Date, nullable=True)
+    expiry_ordinal_sum = db.Column(db.Integer, nullable=False, default=0)  # Sum of expiry_date.toordinal() for average shelf life
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def avg_days_until_expiry(self, today=None):
+        """Average days until expiry across the available units"""
+        if not self.unit_count:
+            return 0
+        today = today or date.today()
+        return self.expiry_ordinal_sum / self.unit_count - today.toordinal()
+    
+    def to_dict(self):
+        return {
+            'blood_bank_id': self.blood_bank_id,
+            'blood_type': self.blood_type,
+            'available_ml': self.available_ml,
+            'unit_count': self.unit_count,
+            'min_expiry': self.min_expiry.isoformat() if self.min_expiry else None,
+            'avg_days_until_expiry': round(self.avg_days_until_expiry(), 1),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class Transfer(db.Model):
     __tablename__ = 'transfers'
+    __table_args__ = (
+        # Keyset pages of the transfer list, newest first
+        db.Index('ix_transfers_created_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    blood_unit_id = db.Column(db.String(36), db.ForeignKey('blood_units.id'), nullable=False)
-    from_entity_id = db.Column(db.String(36), nullable=False)  # ID of the entity transferring the blood
-    to_entity_id = db.Column(db.String(36), nullable=False)    # ID of the entity receiving the blood
+    blood_unit_id = db.Column(db.String(36), db.ForeignKey('blood_units.id'), nullable=False, index=True)
+    from_entity_id = db.Column(db.String(36), nullable=False, index=True)  # ID of the entity transferring the blood
+    to_entity_id = db.Column(db.String(36), nullable=False, index=True)    # ID of the entity receiving the blood
     transfer_date = db.Column(db.DateTime, nullable=False)
     status = db.Column(db.String(50), nullable=False, default='pending')  # pending, completed, cancelled
     notes = db.Column(db.Text, nullable=True)
@@ -129,6 +204,14 @@ class Transfer(db.Model):
 
 class EmergencyRequest(db.Model):
     __tablename__ = 'emergency_requests'
+    __table_args__ = (
+        # Hospital and blood bank inboxes, newest first
+        db.Index('ix_emergency_requests_hospital_created', 'hospital_id', 'created_at'),
+        db.Index('ix_emergency_requests_bank_status', 'suggested_bank_id', 'status'),
+        db.Index('ix_emergency_requests_status_created', 'status', 'created_at'),
+        # Keyset pages of the admin list, newest first
+        db.Index('ix_emergency_requests_created_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     hospital_id = db.Column(db.String(36), db.ForeignKey('hospitals.id'), nullable=False)
@@ -145,6 +228,10 @@ class EmergencyRequest(db.Model):
     ml_confidence_score = db.Column(db.Float, nullable=True)
     predicted_eta_minutes = db.Column(db.Integer, nullable=True)
     
+    # Related facilities; load with joinedload() on list endpoints to avoid N+1 lookups
+    hospital = db.relationship('Hospital', foreign_keys=[hospital_id], lazy='select')
+    suggested_bank = db.relationship('BloodBank', foreign_keys=[suggested_bank_id], lazy='select')
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -165,8 +252,8 @@ class RequestItem(db.Model):
     __tablename__ = 'request_items'
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    request_id = db.Column(db.String(36), db.ForeignKey('emergency_requests.id'), nullable=False)
-    unit_id = db.Column(db.String(36), db.ForeignKey('blood_units.id'), nullable=False)
+    request_id = db.Column(db.String(36), db.ForeignKey('emergency_requests.id'), nullable=False, index=True)
+    unit_id = db.Column(db.String(36), db.ForeignKey('blood_units.id'), nullable=False, index=True)
     source_bank_id = db.Column(db.String(36), db.ForeignKey('blood_banks.id'), nullable=False)
     quantity_ml = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -183,9 +270,15 @@ class RequestItem(db.Model):
 
 class Route(db.Model):
     __tablename__ = 'routes'
+    __table_args__ = (
+        db.Index('ix_routes_driver_status', 'driver_name', 'status'),
+        db.Index('ix_routes_status', 'status'),
+        # Keyset pages of the route list, newest first
+        db.Index('ix_routes_created_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    request_id = db.Column(db.String(36), db.ForeignKey('emergency_requests.id'), nullable=False)
+    request_id = db.Column(db.String(36), db.ForeignKey('emergency_requests.id'), nullable=False, index=True)
     driver_name = db.Column(db.String(255), nullable=False)
     start_latitude = db.Column(db.Float, nullable=False)
     start_longitude = db.Column(db.Float, nullable=False)
@@ -197,6 +290,52 @@ class Route(db.Model):
     started_at = db.Column(db.DateTime, nullable=True)
     completed_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Running totals over the route's track points, so progress never re-reads them
+    distance_covered_km = db.Column(db.Float, nullable=False, default=0.0)
+    last_latitude = db.Column(db.Float, nullable=True)
+    last_longitude = db.Column(db.Float, nullable=True)
+    last_point_at = db.Column(db.DateTime, nullable=True)
+    point_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def record_track_point(self, latitude, longitude, timestamp=None):
+        """Fold a new GPS fix into the running totals and return its TrackPoint (not yet added)"""
+        timestamp = timestamp or datetime.utcnow()
+        if self.point_count and self.last_latitude is not None and self.last_longitude is not None:
+            self.distance_covered_km = (self.distance_covered_km or 0.0) + calculate_distance(
+                self.last_latitude, self.last_longitude, latitude, longitude
+            )
+        self.last_latitude = latitude
+        self.last_longitude = longitude
+        self.last_point_at = timestamp
+        self.point_count = (self.point_count or 0) + 1
+        return TrackPoint(route_id=self.id, latitude=latitude, longitude=longitude, timestamp=timestamp)
+    
+    def record_track_points(self, latitudes, longitudes, timestamps):
+        """Fold a time-ordered batch of fixes into the running totals at once.
+        
+        Returns TrackPoint row dicts ready for a bulk (executemany) insert.
+        """
+        if not len(timestamps):
+            return []
+        path_latitudes, path_longitudes = list(latitudes), list(longitudes)
+        if self.point_count and self.last_latitude is not None and self.last_longitude is not None:
+            path_latitudes.insert(0, self.last_latitude)
+            path_longitudes.insert(0, self.last_longitude)
+        self.distance_covered_km = (self.distance_covered_km or 0.0) + path_length(path_latitudes, path_longitudes)
+        self.last_latitude = float(latitudes[-1])
+        self.last_longitude = float(longitudes[-1])
+        self.last_point_at = timestamps[-1]
+        self.point_count = (self.point_count or 0) + len(timestamps)
+        return [
+            {'id': str(uuid.uuid4()), 'route_id': self.id, 'latitude': float(latitude), 'longitude': float(longitude), 'timestamp': timestamp}
+            for latitude, longitude, timestamp in zip(latitudes, longitudes, timestamps)
+        ]
+    
+    def progress_fraction(self):
+        """Share of the planned distance covered so far, capped at 1.0"""
+        if not self.distance_km or self.distance_km <= 0:
+            return 0.0
+        return min(1.0, (self.distance_covered_km or 0.0) / self.distance_km)
     
     def to_dict(self):
         return {
@@ -212,11 +351,20 @@ class Route(db.Model):
             'status': self.status,
             'started_at': self.started_at.isoformat() if self.started_at else None,
             'completed_at': self.completed_at.isoformat() if self.completed_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'distance_covered_km': round(self.distance_covered_km or 0.0, 2),
+            'last_latitude': self.last_latitude,
+            'last_longitude': self.last_longitude,
+            'last_point_at': self.last_point_at.isoformat() if self.last_point_at else None,
+            'point_count': self.point_count or 0
         }
 
 class TrackPoint(db.Model):
     __tablename__ = 'track_points'
+    __table_args__ = (
+        # A route's track in time order
+        db.Index('ix_track_points_route_timestamp', 'route_id', 'timestamp'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     route_id = db.Column(db.String(36), db.ForeignKey('routes.id'), nullable=False)
@@ -233,11 +381,34 @@ class TrackPoint(db.Model):
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
         }
 
+def rebuild_route_totals():
+    """Recompute every route's running totals from its track points; returns the number of routes updated.
+
+    For routes recorded before the totals were kept (see initialize_database).
+    """
+    tracks = {}
+    points = db.session.query(TrackPoint.route_id, TrackPoint.latitude, TrackPoint.longitude, TrackPoint.timestamp)
+    for route_id, latitude, longitude, timestamp in points.order_by(TrackPoint.route_id, TrackPoint.timestamp):
+        tracks.setdefault(route_id, []).append((latitude, longitude, timestamp))
+    updated = 0
+    for route in Route.query.filter(Route.id.in_(list(tracks))):
+        track = tracks[route.id]
+        route.distance_covered_km = path_length([point[0] for point in track], [point[1] for point in track])
+        route.last_latitude, route.last_longitude, route.last_point_at = track[-1]
+        route.point_count = len(track)
+        updated += 1
+    db.session.commit()
+    return updated
+
 class Driver(db.Model):
     __tablename__ = 'drivers'
+    __table_args__ = (
+        # Loading the dispatch index reads only available drivers
+        db.Index('ix_drivers_available', 'is_available'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    name = db.Column(db.String(255), nullable=False)
+    name = db.Column(db.String(255), nullable=False, index=True)
     phone = db.Column(db.String(20), nullable=False)
     vehicle_number = db.Column(db.String(20), nullable=False)
     current_latitude = db.Column(db.Float, nullable=True)
@@ -257,3 +428,34 @@ class Driver(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class Notification(db.Model):
+    """Durable notification for one recipient, written in the same transaction as the change it reports"""
+    __tablename__ = 'notifications'
+    __table_args__ = (
+        # A recipient's inbox after a cursor is a single index range scan
+        db.Index('ix_notifications_recipient', 'recipient_role', 'recipient_id', 'seq'),
+        {'sqlite_autoincrement': True}  # Never reuse a seq, so client cursors stay valid
+    )
+    
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    recipient_role = db.Column(db.String(20), nullable=False)  # 'hospital', 'blood_bank', 'driver', 'admin'
+    recipient_id = db.Column(db.String(36), nullable=True)  # Entity id of the recipient (User.entity_id)
+    type = db.Column(db.String(50), nullable=False)  # 'route_assigned', 'route_started', ...
+    request_id = db.Column(db.String(36), db.ForeignKey('emergency_requests.id'), nullable=True)
+    route_id = db.Column(db.String(36), db.ForeignKey('routes.id'), nullable=True)
+    message = db.Column(db.Text, nullable=True)
+    payload = db.Column(db.Text, nullable=True)  # JSON body of the notification
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'recipient_role': self.recipient_role,
+            'recipient_id': self.recipient_id,
+            'type': self.type,
+            'request_id': self.request_id,
+            'route_id': self.route_id,
+            'message': self.message,
+            'payload': json.loads(self.payload) if self.payload else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
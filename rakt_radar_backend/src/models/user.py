@@ -6,6 +6,9 @@ from .models import db
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_role_active', 'role', 'is_active'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -42,3 +45,13 @@ class User(db.Model):
             'entity_id': self.entity_id,
             'is_active': self.is_active
         }
+
+class TokenRevocation(db.Model):
+    """A revoked bearer token (id = its jti) or every token of a user issued before revoked_at (id = 'user:<id>')"""
+    __tablename__ = 'token_revocations'
+    
+    id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.String(36), nullable=False)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Once every token it covers has expired the entry can go
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -1,14 +1,28 @@
 from flask import Blueprint, request, jsonify
 from src.models.models import BloodBank, db
+from src.services.pagination import list_body
+from src.services.spatial_index import blood_bank_index
+from src.services.travel_matrix import travel_matrix
 
 blood_banks_bp = Blueprint('blood_banks', __name__)
 
 @blood_banks_bp.route('/blood_banks', methods=['GET'])
 def get_blood_banks():
-    """Get all blood banks"""
+    """Get blood banks, optionally filtered by city/state and paginated with limit/cursor"""
     try:
-        blood_banks = BloodBank.query.all()
-        return jsonify([blood_bank.to_dict() for blood_bank in blood_banks]), 200
+        query = BloodBank.query
+        city = request.args.get('city')
+        state = request.args.get('state')
+        if city:
+            query = query.filter(BloodBank.city == city)
+        if state:
+            query = query.filter(BloodBank.state == state)
+        
+        body = list_body(query, [BloodBank.id], request.args,
+                         lambda rows: [blood_bank.to_dict() for blood_bank in rows])
+        return jsonify(body), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -51,6 +65,10 @@ def create_blood_bank():
         db.session.add(blood_bank)
         db.session.commit()
         
+        # Keep the nearest-bank index and the travel matrix in step with the table
+        blood_bank_index.insert(blood_bank.id, blood_bank.latitude, blood_bank.longitude)
+        travel_matrix.update_bank(blood_bank)
+        
         return jsonify(blood_bank.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -77,6 +95,11 @@ def update_blood_bank(blood_bank_id):
                     setattr(blood_bank, field, data[field])
         
         db.session.commit()
+        
+        # Re-bucket the bank in case it moved; only a move recomputes its matrix column
+        blood_bank_index.insert(blood_bank.id, blood_bank.latitude, blood_bank.longitude)
+        travel_matrix.update_bank(blood_bank)
+        
         return jsonify(blood_bank.to_dict()), 200
     except Exception as e:
         db.session.rollback()
@@ -93,6 +116,9 @@ def delete_blood_bank(blood_bank_id):
         db.session.delete(blood_bank)
         db.session.commit()
         
+        blood_bank_index.remove(blood_bank_id)
+        travel_matrix.remove_bank(blood_bank_id)
+        
         return jsonify({'message': 'Blood bank deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
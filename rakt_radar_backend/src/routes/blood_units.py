@@ -1,12 +1,17 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime, date
-from src.models.models import BloodUnit, BloodBank, db
+from src.models.models import BloodUnit, BloodBank, InventorySummary, db
+from src.services.auth import current_principal
+from src.services.inventory import check_inventory_summary
+from src.services.expiry import expiry_sweeper
+from src.services.pagination import list_body
+from src.services.entity_cache import entity_cache
 
 blood_units_bp = Blueprint('blood_units', __name__)
 
 @blood_units_bp.route('/blood_units', methods=['GET'])
 def get_blood_units():
-    """Get all blood units with optional filters"""
+    """Get blood units with optional filters, paginated with limit/cursor"""
     try:
         query = BloodUnit.query
         
@@ -26,26 +31,31 @@ def get_blood_units():
         if blood_bank_id:
             query = query.filter(BloodUnit.blood_bank_id == blood_bank_id)
         
-        blood_units = query.all()
-        
-        # Add additional info to each blood unit
-        result = []
-        for unit in blood_units:
-            unit_dict = unit.to_dict()
-            unit_dict['days_until_expiry'] = unit.days_until_expiry()
-            
-            # Add blood bank info
-            blood_bank = BloodBank.query.get(unit.blood_bank_id)
-            if blood_bank:
-                unit_dict['blood_bank_name'] = blood_bank.name
-                unit_dict['blood_bank_city'] = blood_bank.city
-            
-            result.append(unit_dict)
-        
-        return jsonify(result), 200
+        # Soonest-expiring first; id breaks ties so pages are stable
+        body = list_body(query, [BloodUnit.expiry_date, BloodUnit.id], request.args, blood_unit_rows)
+        return jsonify(body), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def blood_unit_rows(blood_units):
+    """Serialize blood units with their bank's name and city, fetched in one query"""
+    bank_ids = {unit.blood_bank_id for unit in blood_units}
+    banks = {bank.id: bank for bank in BloodBank.query.filter(BloodBank.id.in_(bank_ids))} if bank_ids else {}
+    result = []
+    for unit in blood_units:
+        unit_dict = unit.to_dict()
+        unit_dict['days_until_expiry'] = unit.days_until_expiry()
+        
+        blood_bank = banks.get(unit.blood_bank_id)
+        if blood_bank:
+            unit_dict['blood_bank_name'] = blood_bank.name
+            unit_dict['blood_bank_city'] = blood_bank.city
+        
+        result.append(unit_dict)
+    return result
+
 @blood_units_bp.route('/blood_units/<blood_unit_id>', methods=['GET'])
 def get_blood_unit(blood_unit_id):
     """Get a specific blood unit"""
@@ -58,10 +68,10 @@ def get_blood_unit(blood_unit_id):
         unit_dict['days_until_expiry'] = blood_unit.days_until_expiry()
         
         # Add blood bank info
-        blood_bank = BloodBank.query.get(blood_unit.blood_bank_id)
+        blood_bank = entity_cache.get(BloodBank, blood_unit.blood_bank_id)
         if blood_bank:
-            unit_dict['blood_bank_name'] = blood_bank.name
-            unit_dict['blood_bank_city'] = blood_bank.city
+            unit_dict['blood_bank_name'] = blood_bank['name']
+            unit_dict['blood_bank_city'] = blood_bank['city']
         
         return jsonify(unit_dict), 200
     except Exception as e:
@@ -185,10 +195,10 @@ def get_flagged_blood_units():
             unit_dict['days_until_expiry'] = unit.days_until_expiry()
             
             # Add blood bank info
-            blood_bank = BloodBank.query.get(unit.blood_bank_id)
+            blood_bank = entity_cache.get(BloodBank, unit.blood_bank_id)
             if blood_bank:
-                unit_dict['blood_bank_name'] = blood_bank.name
-                unit_dict['blood_bank_city'] = blood_bank.city
+                unit_dict['blood_bank_name'] = blood_bank['name']
+                unit_dict['blood_bank_city'] = blood_bank['city']
             
             result.append(unit_dict)
         
@@ -196,3 +206,70 @@ def get_flagged_blood_units():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+@blood_units_bp.route('/blood_units/summary', methods=['GET'])
+def get_inventory_summary():
+    """Get available stock per blood bank and blood type"""
+    try:
+        query = InventorySummary.query
+        
+        blood_type = request.args.get('blood_type')
+        blood_bank_id = request.args.get('blood_bank_id')
+        
+        if blood_type:
+            query = query.filter(InventorySummary.blood_type == blood_type)
+        if blood_bank_id:
+            query = query.filter(InventorySummary.blood_bank_id == blood_bank_id)
+        
+        return jsonify([summary.to_dict() for summary in query.all()]), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@blood_units_bp.route('/blood_units/summary/check', methods=['GET'])
+def check_blood_unit_summary():
+    """Diff the inventory summary against live blood units (?repair=true rebuilds it, admin only)"""
+    try:
+        repair = request.args.get('repair', 'false').lower() == 'true'
+        if repair:
+            user = current_principal()
+            if not user:
+                return jsonify({'error': 'Not authenticated'}), 401
+            
+            if user.role != 'admin':
+                return jsonify({'error': 'Admin access required'}), 403
+        
+        mismatches = check_inventory_summary(repair=repair)
+        
+        return jsonify({
+            'consistent': not mismatches,
+            'mismatches': mismatches,
+            'repaired': repair and bool(mismatches)
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@blood_units_bp.route('/blood_units/expiry_sweep', methods=['GET'])
+def get_expiry_sweep_metrics():
+    """Get the expiry sweeper's horizon, last run and cumulative counts"""
+    try:
+        return jsonify(expiry_sweeper.metrics()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@blood_units_bp.route('/blood_units/expiry_sweep', methods=['POST'])
+def run_expiry_sweep():
+    """Run the expiry sweep now instead of waiting for the next scheduled pass (admin only)"""
+    try:
+        user = current_principal()
+        if not user:
+            return jsonify({'error': 'Not authenticated'}), 401
+        
+        if user.role != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        result = expiry_sweeper.run_once()
+        return jsonify({'success': True, 'result': result, 'metrics': expiry_sweeper.metrics()}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
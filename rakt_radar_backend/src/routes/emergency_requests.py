@@ -1,27 +1,32 @@
-from flask import Blueprint, request, jsonify, session
-import math
-import random
-from datetime import datetime, timedelta
-from src.models.models import EmergencyRequest, RequestItem, Route, TrackPoint, BloodUnit, Hospital, BloodBank, Driver, db
+from flask import Blueprint, request, jsonify
+from datetime import datetime, date, timedelta
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from src.models.models import EmergencyRequest, RequestItem, Route, TrackPoint, BloodUnit, Hospital, BloodBank, Driver, InventorySummary, db
+from src.services.spatial_index import get_blood_bank_index
+from src.services.event_bus import event_bus
+from src.services.notifications import notify, request_audience
+from src.services.pagination import list_body
+from src.services.compatibility import donor_types, plan_cover, substitution_rank
+from src.services.allocation import plan_allocation
+from src.services.dispatch import dispatch_drivers
+from src.services.travel_matrix import travel_matrix
+from src.services.eta import corridor_key, eta_service
+from src.services.inventory import refresh_inventory_keys
+from src.services.auth import current_principal
 
 emergency_requests_bp = Blueprint('emergency_requests', __name__)
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-    
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-    
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
+# Score multiplier per substitution rank, so an exact match wins over a nearby substitute
+SUBSTITUTE_PENALTY = 0.85
+
+def match_score(distance_km, days_to_expiry, rank, urgency_score):
+    """Mock ML score of sourcing from a bank: closer and longer-dated stock scores higher, substitutes lower"""
+    distance_score = max(0, 100 - (distance_km * 2))  # Closer = better
+    expiry_score = min(100, days_to_expiry * 10)  # More days = better
+    return (distance_score * 0.4 + expiry_score * 0.6) * urgency_score * SUBSTITUTE_PENALTY ** rank
 
 def ml_predict_bank(hospital_id, blood_type, quantity_ml, urgency):
     """ML service integration for bank matching (mocked for demo)"""
@@ -31,87 +36,115 @@ def ml_predict_bank(hospital_id, blood_type, quantity_ml, urgency):
         if not hospital:
             return None, 0.0
         
-        # Get all blood banks with available units
-        blood_banks = BloodBank.query.all()
-        best_match = None
-        best_score = 0.0
+        urgency_multiplier = {'low': 1.0, 'medium': 1.2, 'high': 1.5, 'critical': 2.0}
+        urgency_score = urgency_multiplier.get(urgency, 1.0)
         
-        for bank in blood_banks:
-            # Check if bank has required blood type and quantity
-            available_units = BloodUnit.query.filter_by(
-                blood_bank_id=bank.id,
-                blood_type=blood_type,
-                status='available'
-            ).all()
+        best_match_id = None
+        best_score = 0.0
+        usable_types = donor_types(blood_type, urgency)
+        
+        # Walk the bank index outward from the hospital, one ring of grid cells at a time
+        bank_index = get_blood_bank_index()
+        for min_distance, candidates in bank_index.iter_rings(hospital.latitude, hospital.longitude):
+            # Best score any bank at least min_distance away could reach (expiry score caps at 100)
+            score_bound = (max(0, 100 - (min_distance * 2)) * 0.4 + 100 * 0.6) * urgency_score
+            if best_match_id and score_bound <= best_score:
+                break
+            if not candidates:
+                continue
             
-            total_available = sum(unit.quantity_ml for unit in available_units)
+            # Read every compatible type's stock for the whole ring from the inventory summary in one query
+            stock_by_bank = {}
+            for summary in InventorySummary.query.filter(
+                InventorySummary.blood_bank_id.in_([bank_id for bank_id, _, _ in candidates]),
+                InventorySummary.blood_type.in_(usable_types)
+            ):
+                stock_by_bank.setdefault(summary.blood_bank_id, []).append(summary)
             
-            if total_available >= quantity_ml:
-                # Calculate distance
-                distance = calculate_distance(
-                    hospital.latitude, hospital.longitude,
-                    bank.latitude, bank.longitude
-                )
+            # Banks that can cover the request, exact type first, then the least universal substitutes
+            covers = {}
+            for bank_id, rows in stock_by_bank.items():
+                used, rank = plan_cover(blood_type, rows, quantity_ml, urgency)
+                if used:
+                    covers[bank_id] = (used, rank)
+            
+            stocked = [(bank_id, lat, lon) for bank_id, lat, lon in candidates if bank_id in covers]
+            if not stocked:
+                continue
+            
+            # Distances to every stocked bank in the ring, read from the travel matrix
+            ring_distances, _ = travel_matrix.from_hospital(hospital, stocked)
+            
+            today = date.today()
+            for (bank_id, _, _), distance in zip(stocked, ring_distances.tolist()):
+                used, rank = covers[bank_id]
                 
                 # Mock ML scoring algorithm
-                # Factors: distance, urgency, availability, expiry risk
-                distance_score = max(0, 100 - (distance * 2))  # Closer = better
-                urgency_multiplier = {'low': 1.0, 'medium': 1.2, 'high': 1.5, 'critical': 2.0}
-                urgency_score = urgency_multiplier.get(urgency, 1.0)
-                
-                # Check expiry risk (prefer units with longer shelf life)
-                avg_days_to_expiry = 0
-                if available_units:
-                    total_days = sum(unit.days_until_expiry() or 0 for unit in available_units)
-                    avg_days_to_expiry = total_days / len(available_units)
-                
-                expiry_score = min(100, avg_days_to_expiry * 10)  # More days = better
-                
-                # Calculate final score
-                final_score = (distance_score * 0.4 + expiry_score * 0.6) * urgency_score
+                # Factors: distance, urgency, availability, expiry risk, substitution
+                used_ml = sum(stock.available_ml for stock in used)
+                avg_days_to_expiry = sum(stock.avg_days_until_expiry(today) * stock.available_ml for stock in used) / used_ml
+                final_score = match_score(distance, avg_days_to_expiry, rank, urgency_score)
                 
                 if final_score > best_score:
                     best_score = final_score
-                    best_match = bank
-        
+                    best_match_id = bank_id
+        
+        if not best_match_id:
+            # No single bank can cover it: suggest the bank carrying the largest share of a split
+            allocation = plan_allocation(hospital.latitude, hospital.longitude, blood_type, quantity_ml, urgency)
+            if allocation:
+                leg = max(allocation['legs'], key=lambda leg: (leg['quantity_ml'], -leg['distance_km']))
+                best_match_id = leg['blood_bank_id']
+                # Score the whole plan: each leg as a single bank would be, weighted by its share
+                best_score = sum(
+                    match_score(leg['distance_km'], leg['avg_days_until_expiry'],
+                                max(substitution_rank(blood_type, donor) for donor in leg['blood_types']), urgency_score)
+                    * leg['quantity_ml'] for leg in allocation['legs']
+                ) / quantity_ml
+        
+        best_match = BloodBank.query.get(best_match_id) if best_match_id else None
         return best_match, best_score
         
     except Exception as e:
         print(f"ML prediction error: {e}")
         return None, 0.0
 
-def ml_predict_eta(distance_km, urgency):
-    """ML service integration for ETA prediction (mocked for demo)"""
+def hospital_bank_distances(requests):
+    """Hospital-to-suggested-bank distance for each request, read from the travel matrix"""
+    return [
+        travel_matrix.pair(req.hospital, req.suggested_bank)[0] if req.hospital and req.suggested_bank else np.nan
+        for req in requests
+    ]
+
+def ml_predict_eta(distance_km, urgency, origin=None, destination=None):
+    """ETA in minutes from the active learned model (the speed heuristic until one is trained)"""
     try:
-        # Mock ETA prediction based on distance and urgency
-        base_speed_kmh = 60  # Base speed in km/h
-        
-        # Urgency affects speed
-        urgency_multiplier = {'low': 0.8, 'medium': 1.0, 'high': 1.2, 'critical': 1.5}
-        speed_multiplier = urgency_multiplier.get(urgency, 1.0)
-        
-        # Calculate ETA in minutes
-        effective_speed = base_speed_kmh * speed_multiplier
-        eta_hours = distance_km / effective_speed
-        eta_minutes = int(eta_hours * 60)
-        
-        # Add some randomness for demo purposes
-        eta_minutes += random.randint(-10, 10)
-        eta_minutes = max(15, eta_minutes)  # Minimum 15 minutes
-        
-        return eta_minutes
+        corridor = corridor_key(*origin, *destination) if origin and destination else None
+        eta_minutes = int(round(eta_service.predict(distance_km, urgency, corridor=corridor)))
+        return max(15, eta_minutes)  # Minimum 15 minutes
         
     except Exception as e:
         print(f"ETA prediction error: {e}")
         return 60  # Default 1 hour
 
+def request_etas(requests, request_distances):
+    """ETA minutes for every request's suggested bank -> hospital trip in one batch"""
+    corridors = [
+        corridor_key(req.suggested_bank.latitude, req.suggested_bank.longitude,
+                     req.hospital.latitude, req.hospital.longitude) if req.hospital and req.suggested_bank else None
+        for req in requests
+    ]
+    etas = eta_service.predict_batch(np.nan_to_num(request_distances), [req.urgency for req in requests],
+                                     corridors=corridors)
+    return [max(15, int(round(eta))) for eta in etas.tolist()]
+
 @emergency_requests_bp.route('/emergency_requests', methods=['POST'])
 def create_emergency_request():
     """Create a new emergency blood request"""
     try:
         # Check authentication
-        user_id = session.get('user_id')
-        if not user_id:
+        user = current_principal()
+        if not user:
             return jsonify({'error': 'Not authenticated'}), 401
         
         data = request.json
@@ -129,9 +162,7 @@ def create_emergency_request():
             return jsonify({'error': 'Invalid urgency level'}), 400
         
         # Get hospital ID from user's entity (should be SRM Global Hospitals)
-        from src.models.user import User
-        user = User.query.get(user_id)
-        if not user or user.role != 'hospital':
+        if user.role != 'hospital':
             return jsonify({'error': 'Only hospitals can create emergency requests'}), 403
         
         hospital_id = user.entity_id
@@ -155,12 +186,10 @@ def create_emergency_request():
         
         # Predict ETA
         hospital = Hospital.query.get(hospital_id)
-        distance = calculate_distance(
-            hospital.latitude, hospital.longitude,
-            suggested_bank.latitude, suggested_bank.longitude
-        )
+        distance, _ = travel_matrix.pair(hospital, suggested_bank)
         
-        predicted_eta = ml_predict_eta(distance, urgency)
+        predicted_eta = ml_predict_eta(distance, urgency, (suggested_bank.latitude, suggested_bank.longitude),
+                                       (hospital.latitude, hospital.longitude))
         
         # Create emergency request
         emergency_request = EmergencyRequest(
@@ -177,6 +206,12 @@ def create_emergency_request():
         db.session.add(emergency_request)
         db.session.commit()
         
+        event_bus.publish('request_created', {
+            'request': emergency_request.to_dict(),
+            'hospital_id': hospital_id,
+            'suggested_bank_id': suggested_bank.id
+        }, audience=request_audience(emergency_request))
+        
         return jsonify({
             'success': True,
             'request': emergency_request.to_dict(),
@@ -191,68 +226,80 @@ def create_emergency_request():
 
 @emergency_requests_bp.route('/emergency_requests', methods=['GET'])
 def get_emergency_requests():
-    """Get emergency requests based on user role with consistent distance/time calculations"""
+    """Get emergency requests based on user role, newest first, paginated with limit/cursor"""
     try:
         # Check authentication
-        user_id = session.get('user_id')
-        if not user_id:
-            return jsonify({'error': 'Not authenticated'}), 401
-        
-        from src.models.user import User
-        user = User.query.get(user_id)
+        user = current_principal()
         if not user:
-            return jsonify({'error': 'User not found'}), 404
+            return jsonify({'error': 'Not authenticated'}), 401
         
         # Filter requests based on role
+        query = EmergencyRequest.query.options(
+            joinedload(EmergencyRequest.hospital),
+            joinedload(EmergencyRequest.suggested_bank)
+        )
         if user.role == 'hospital':
             # Hospitals see their own requests
-            requests = EmergencyRequest.query.filter_by(hospital_id=user.entity_id).all()
+            query = query.filter_by(hospital_id=user.entity_id)
         elif user.role == 'blood_bank':
             # Blood banks see requests where they are suggested
-            requests = EmergencyRequest.query.filter_by(suggested_bank_id=user.entity_id).all()
-        elif user.role == 'admin':
+            query = query.filter_by(suggested_bank_id=user.entity_id)
+        elif user.role != 'admin':
             # Admins see all requests
-            requests = EmergencyRequest.query.all()
-        else:
             return jsonify({'error': 'Unauthorized role'}), 403
         
-        # Include related data with consistent distance/time calculations
-        requests_data = []
-        for req in requests:
-            req_dict = req.to_dict()
-            
-            # Get hospital details
-            hospital = Hospital.query.get(req.hospital_id)
-            if hospital:
-                req_dict['hospital'] = hospital.to_dict()
-            
-            # Get suggested bank details
-            if req.suggested_bank_id:
-                bank = BloodBank.query.get(req.suggested_bank_id)
-                if bank:
-                    req_dict['suggested_bank'] = bank.to_dict()
-                    
-                    # Calculate consistent distance and time for both hospital and blood bank views
-                    if hospital:
-                        distance_km = calculate_distance(
-                            hospital.latitude, hospital.longitude,
-                            bank.latitude, bank.longitude
-                        )
-                        req_dict['calculated_distance_km'] = round(distance_km, 1)
-                        req_dict['calculated_eta_minutes'] = ml_predict_eta(distance_km, req.urgency)
-            
-            # Get route details if exists
-            route = Route.query.filter_by(request_id=req.id).first()
-            if route:
-                req_dict['route'] = route.to_dict()
-            
-            requests_data.append(req_dict)
+        for field in ('status', 'urgency', 'blood_type'):
+            value = request.args.get(field)
+            if value:
+                query = query.filter(getattr(EmergencyRequest, field) == value)
         
-        return jsonify(requests_data), 200
+        body = list_body(query, [EmergencyRequest.created_at, EmergencyRequest.id], request.args,
+                         emergency_request_rows, descending=True)
+        return jsonify(body), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def emergency_request_rows(requests):
+    """Serialize requests with facilities, consistent distance/ETA and their route"""
+    request_ids = [req.id for req in requests]
+    routes = {}
+    for route in (Route.query.filter(Route.request_id.in_(request_ids)) if request_ids else []):
+        routes.setdefault(route.request_id, route)
+    
+    # Include related data with consistent distance/time calculations
+    requests_data = []
+    request_distances = hospital_bank_distances(requests)
+    request_eta_minutes = request_etas(requests, request_distances)
+    for index, req in enumerate(requests):
+        req_dict = req.to_dict()
+        
+        # Get hospital details
+        hospital = req.hospital
+        if hospital:
+            req_dict['hospital'] = hospital.to_dict()
+        
+        # Get suggested bank details
+        bank = req.suggested_bank
+        if bank:
+            req_dict['suggested_bank'] = bank.to_dict()
+            
+            # Calculate consistent distance and time for both hospital and blood bank views
+            if hospital:
+                distance_km = request_distances[index]
+                req_dict['calculated_distance_km'] = round(distance_km, 1)
+                req_dict['calculated_eta_minutes'] = request_eta_minutes[index]
+        
+        # Get route details if exists
+        route = routes.get(req.id)
+        if route:
+            req_dict['route'] = route.to_dict()
+        
+        requests_data.append(req_dict)
+    return requests_data
+
 @emergency_requests_bp.route('/demo/emergency_requests', methods=['GET'])
 def get_demo_emergency_requests():
     """Demo endpoint to get all emergency requests without authentication (for hackathon demo)"""
@@ -260,39 +307,13 @@ def get_demo_emergency_requests():
         print("🔍 Demo endpoint called - returning all emergency requests")
         
         # Get all emergency requests
-        requests = EmergencyRequest.query.all()
+        requests = EmergencyRequest.query.options(
+            joinedload(EmergencyRequest.hospital),
+            joinedload(EmergencyRequest.suggested_bank)
+        ).all()
         
-        # Include related data with consistent distance/time calculations
-        requests_data = []
-        for req in requests:
-            req_dict = req.to_dict()
-            
-            # Get hospital details
-            hospital = Hospital.query.get(req.hospital_id)
-            if hospital:
-                req_dict['hospital'] = hospital.to_dict()
-            
-            # Get suggested bank details
-            if req.suggested_bank_id:
-                bank = BloodBank.query.get(req.suggested_bank_id)
-                if bank:
-                    req_dict['suggested_bank'] = bank.to_dict()
-                    
-                    # Calculate consistent distance and time for demo consistency
-                    if hospital:
-                        distance_km = calculate_distance(
-                            hospital.latitude, hospital.longitude,
-                            bank.latitude, bank.longitude
-                        )
-                        req_dict['calculated_distance_km'] = round(distance_km, 1)
-                        req_dict['calculated_eta_minutes'] = ml_predict_eta(distance_km, req.urgency)
-            
-            # Get route details if exists
-            route = Route.query.filter_by(request_id=req.id).first()
-            if route:
-                req_dict['route'] = route.to_dict()
-            
-            requests_data.append(req_dict)
+        # Same rows as the authenticated listing, routes included, in one batch
+        requests_data = emergency_request_rows(requests)
         
         print(f"🔍 Demo endpoint returning {len(requests_data)} requests")
         return jsonify(requests_data), 200
@@ -341,12 +362,10 @@ def create_demo_emergency_request():
             return jsonify({'error': 'No suitable blood bank found'}), 404
         
         # Predict ETA
-        distance = calculate_distance(
-            hospital.latitude, hospital.longitude,
-            suggested_bank.latitude, suggested_bank.longitude
-        )
+        distance, _ = travel_matrix.pair(hospital, suggested_bank)
         
-        predicted_eta = ml_predict_eta(distance, urgency)
+        predicted_eta = ml_predict_eta(distance, urgency, (suggested_bank.latitude, suggested_bank.longitude),
+                                       (hospital.latitude, hospital.longitude))
         
         # Create emergency request
         emergency_request = EmergencyRequest(
@@ -363,6 +382,12 @@ def create_demo_emergency_request():
         db.session.add(emergency_request)
         db.session.commit()
         
+        event_bus.publish('request_created', {
+            'request': emergency_request.to_dict(),
+            'hospital_id': hospital_id,
+            'suggested_bank_id': suggested_bank.id
+        }, audience=request_audience(emergency_request))
+        
         print(f"✅ Demo emergency request created: {blood_type} {quantity_ml}ml")
         
         return jsonify({
@@ -383,8 +408,8 @@ def get_emergency_request(request_id):
     """Get specific emergency request details"""
     try:
         # Check authentication
-        user_id = session.get('user_id')
-        if not user_id:
+        user = current_principal()
+        if not user:
             return jsonify({'error': 'Not authenticated'}), 401
         
         request_obj = EmergencyRequest.query.get(request_id)
@@ -392,11 +417,6 @@ def get_emergency_request(request_id):
             return jsonify({'error': 'Request not found'}), 404
         
         # Check authorization
-        from src.models.user import User
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
         if user.role == 'hospital' and request_obj.hospital_id != user.entity_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
@@ -429,28 +449,71 @@ def get_emergency_request(request_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def reserve_units(request_obj, blood_bank_id, quantity_ml, usable_types):
+    """Reserve units at one bank for a request, adding a RequestItem per unit.
+
+    Exact type first, then the least universal substitutes, soonest-expiring first within a type.
+    Each unit is claimed with a conditional UPDATE ... WHERE status = 'available' and only counts
+    if a row changed, so a unit a concurrent approval took first is skipped, never booked twice.
+    On PostgreSQL the candidate read also locks rows with SKIP LOCKED, so parallel approvals draw
+    disjoint units instead of queueing on the same ones. Returns the units actually reserved.
+    """
+    available_units = sorted(
+        BloodUnit.query.filter(
+            BloodUnit.blood_bank_id == blood_bank_id,
+            BloodUnit.blood_type.in_(usable_types),
+            BloodUnit.status == 'available'
+        ).with_for_update(skip_locked=True).all(),
+        key=lambda unit: (substitution_rank(request_obj.blood_type, unit.blood_type), unit.expiry_date)
+    )
+    
+    remaining_quantity = quantity_ml
+    reserved_units = []
+    for unit in available_units:
+        if remaining_quantity <= 0:
+            break
+        
+        claimed = db.session.execute(
+            update(BloodUnit).where(BloodUnit.id == unit.id, BloodUnit.status == 'available')
+            .values(status='reserved').execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            continue
+        set_committed_value(unit, 'status', 'reserved')
+        
+        quantity_to_reserve = min(remaining_quantity, unit.quantity_ml)
+        remaining_quantity -= quantity_to_reserve
+        
+        # Create request item
+        db.session.add(RequestItem(
+            request_id=request_obj.id,
+            unit_id=unit.id,
+            source_bank_id=blood_bank_id,
+            quantity_ml=quantity_to_reserve
+        ))
+        reserved_units.append(unit)
+    
+    # The UPDATEs bypass the ORM hooks that maintain the inventory summary and mark the dashboard stale
+    refresh_inventory_keys(db.session.connection(), {(blood_bank_id, unit.blood_type) for unit in reserved_units})
+    if reserved_units:
+        db.session.info['dashboard_stale'] = True
+    return reserved_units
+
 @emergency_requests_bp.route('/emergency_requests/<request_id>/approve', methods=['POST'])
 def approve_emergency_request(request_id):
     """Approve emergency request and create route (blood bank only)"""
     try:
         print(f"🔍 Approval endpoint called for request: {request_id}")
-        print(f"📋 Session data: {dict(session)}")
         
         # Check authentication
-        user_id = session.get('user_id')
-        print(f"🆔 User ID from session: {user_id}")
-        
-        if not user_id:
-            print("❌ No user_id in session")
-            return jsonify({'error': 'Not authenticated'}), 401
+        user = current_principal()
+        print(f"🆔 User ID from session: {user.id if user else None}")
         
-        from src.models.user import User
-        user = User.query.get(user_id)
         if not user:
-            print(f"❌ User not found for ID: {user_id}")
-            return jsonify({'error': 'User not found'}), 404
+            print("❌ No valid token or user_id in session")
+            return jsonify({'error': 'Not authenticated'}), 401
         
-        print(f"🔍 Approval attempt - User ID: {user_id}, Username: {user.username}, Role: '{user.role}', Entity ID: {user.entity_id}")
+        print(f"🔍 Approval attempt - User ID: {user.id}, Username: {user.username}, Role: '{user.role}', Entity ID: {user.entity_id}")
         print(f"🔍 Role comparison - user.role: '{user.role}', expected: 'blood_bank', match: {user.role == 'blood_bank'}")
         
         if user.role != 'blood_bank':
@@ -470,124 +533,164 @@ def approve_emergency_request(request_id):
         if request_obj.status != 'created':
             return jsonify({'error': 'Request already processed'}), 400
         
-        # Check blood availability
-        available_units = BloodUnit.query.filter_by(
-            blood_bank_id=user.entity_id,
-            blood_type=request_obj.blood_type,
-            status='available'
-        ).all()
-        
-        total_available = sum(unit.quantity_ml for unit in available_units)
-        if total_available < request_obj.quantity_ml:
-            return jsonify({'error': 'Insufficient blood units available'}), 400
+        # Claim the request atomically, so a second click or a concurrent approval finds it taken
+        claimed = db.session.execute(
+            update(EmergencyRequest).where(EmergencyRequest.id == request_id, EmergencyRequest.status == 'created')
+            .values(status='approved').execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            return jsonify({'error': 'Request already processed'}), 400
+        set_committed_value(request_obj, 'status', 'approved')
         
-        # Reserve blood units
-        remaining_quantity = request_obj.quantity_ml
-        reserved_units = []
+        hospital = Hospital.query.get(request_obj.hospital_id)
         
-        for unit in available_units:
-            if remaining_quantity <= 0:
-                break
-            
-            quantity_to_reserve = min(remaining_quantity, unit.quantity_ml)
-            unit.status = 'reserved'
-            remaining_quantity -= quantity_to_reserve
-            
-            # Create request item
-            request_item = RequestItem(
-                request_id=request_id,
-                unit_id=unit.id,
-                source_bank_id=user.entity_id,
-                quantity_ml=quantity_to_reserve
+        # Check compatible blood availability from the inventory summary before touching any units
+        usable_types = donor_types(request_obj.blood_type, request_obj.urgency)
+        stock = InventorySummary.query.filter(
+            InventorySummary.blood_bank_id == user.entity_id,
+            InventorySummary.blood_type.in_(usable_types)
+        ).all()
+        allocation = None
+        if sum(row.available_ml for row in stock) >= request_obj.quantity_ml:
+            legs = [{'blood_bank_id': user.entity_id, 'quantity_ml': request_obj.quantity_ml}]
+        else:
+            # Not enough here: this bank sends what it has and nearby banks cover the rest
+            allocation = plan_allocation(
+                hospital.latitude, hospital.longitude, request_obj.blood_type,
+                request_obj.quantity_ml, request_obj.urgency, forced_bank_id=user.entity_id
             )
-            db.session.add(request_item)
-            reserved_units.append(unit)
+            if not allocation:
+                return jsonify({'error': 'Insufficient blood units available'}), 400
+            legs = sorted(allocation['legs'], key=lambda leg: leg['blood_bank_id'] != user.entity_id)
+            print(f"🧩 Splitting {request_obj.quantity_ml}ml across {len(legs)} banks")
+        
+        # Reserve blood units at each source bank
+        reserved_units = []
+        for leg in legs:
+            leg_units = reserve_units(request_obj, leg['blood_bank_id'], leg['quantity_ml'], usable_types)
+            if sum(unit.quantity_ml for unit in leg_units) < leg['quantity_ml']:
+                # Concurrent approvals took the stock the summary showed; keep nothing and let the user retry
+                db.session.rollback()
+                return jsonify({'error': 'Blood units were reserved by another approval, please retry'}), 409
+            reserved_units.extend(leg_units)
         
         # Update request status
         request_obj.status = 'approved'
         
-        # Create route
-        hospital = Hospital.query.get(request_obj.hospital_id)
-        blood_bank = BloodBank.query.get(user.entity_id)
-        
-        # Get available driver
-        from src.models.user import User
-        driver_user = User.query.filter_by(role='driver', is_active=True).first()
-        if not driver_user:
-            print("❌ No driver users found in database")
-            return jsonify({'error': 'No drivers available'}), 400
-        
-        print(f"🔍 Using driver: {driver_user.username}")
-        
-        # Create or get driver entity
-        driver = Driver.query.filter_by(name=driver_user.username).first()
-        if not driver:
-            driver = Driver(
-                name=driver_user.username,
-                phone="+91-98765-43210",
-                vehicle_number="TN-01-AB-1234"
+        # Dispatch the nearest available drivers to the source banks, one per route
+        banks = {bank.id: bank for bank in BloodBank.query.filter(BloodBank.id.in_([leg['blood_bank_id'] for leg in legs]))}
+        assignments = dispatch_drivers([
+            (banks[leg['blood_bank_id']].latitude, banks[leg['blood_bank_id']].longitude) for leg in legs
+        ])
+        if not all(assignments):
+            # No located, free driver for every route: fall back to the first active driver login
+            from src.models.user import User
+            fallback_user = User.query.filter_by(role='driver', is_active=True).first()
+            if not fallback_user:
+                print("❌ No driver users found in database")
+                return jsonify({'error': 'No drivers available'}), 400
+            
+            # Create or get driver entity
+            fallback_driver = ((db.session.get(Driver, fallback_user.entity_id) if fallback_user.entity_id else None)
+                               or Driver.query.filter_by(name=fallback_user.username).first())
+            if not fallback_driver:
+                fallback_driver = Driver(
+                    name=fallback_user.username,
+                    phone="+91-98765-43210",
+                    vehicle_number="TN-01-AB-1234"
+                )
+                db.session.add(fallback_driver)
+                db.session.flush()
+            if fallback_user.entity_id != fallback_driver.id:
+                # Driver inboxes are keyed by Driver id; link the login so it sees the route_assigned notification
+                fallback_user.entity_id = fallback_driver.id
+            assignments = [assignment or (fallback_driver, fallback_user) for assignment in assignments]
+        
+        # Create one route per source bank
+        routes = []
+        driver_notifications = []
+        for leg, (driver, driver_user) in zip(legs, assignments):
+            blood_bank = banks[leg['blood_bank_id']]
+            print(f"🔍 Using driver: {driver_user.username}")
+            
+            # Calculate route details
+            distance, _ = travel_matrix.pair(hospital, blood_bank)
+            eta_minutes = (request_obj.predicted_eta_minutes if blood_bank.id == user.entity_id
+                           else ml_predict_eta(distance, request_obj.urgency, (blood_bank.latitude, blood_bank.longitude),
+                                               (hospital.latitude, hospital.longitude)))
+            
+            route = Route(
+                request_id=request_id,
+                driver_name=driver_user.username,  # Use the existing driver's username
+                start_latitude=blood_bank.latitude,
+                start_longitude=blood_bank.longitude,
+                end_latitude=hospital.latitude,
+                end_longitude=hospital.longitude,
+                eta_minutes=eta_minutes,
+                distance_km=distance,
+                status='pending'
             )
-            db.session.add(driver)
+            
+            db.session.add(route)
             db.session.flush()
+            routes.append(route)
+            
+            # Create driver notification in the same transaction as the approval
+            try:
+                # Create a notification object for the driver
+                driver_notification = {
+                    'id': f'driver_notification_{request_id}' + ('' if len(legs) == 1 else f'_{route.id}'),
+                    'type': 'route_assigned',
+                    'route_id': route.id,
+                    'request_id': request_id,
+                    'driver_name': driver_user.username,
+                    'blood_type': request_obj.blood_type,
+                    'quantity_ml': leg['quantity_ml'],
+                    'urgency': request_obj.urgency,
+                    'hospital_name': hospital.name,
+                    'blood_bank_name': blood_bank.name,
+                    'distance_km': distance,
+                    'eta_minutes': eta_minutes,
+                    'timestamp': datetime.utcnow().isoformat(),
+                    'status': 'active',
+                    'message': f'🚚 New blood delivery route assigned! {request_obj.blood_type} blood ({leg["quantity_ml"]}ml) from {blood_bank.name} to {hospital.name}. Distance: {distance:.1f}km, ETA: {eta_minutes} minutes.'
+                }
+                
+                # Store notification in the driver's inbox
+                notify([('driver', driver.id)], 'route_assigned', driver_notification,
+                       message=driver_notification['message'], request_id=request_id, route_id=route.id)
+                driver_notifications.append(driver_notification)
+                print(f"🔔 Driver notification created: {driver_notification}")
+                
+            except Exception as e:
+                print(f"⚠️ Warning: Could not create driver notification: {e}")
+                # Don't fail the approval if notification fails
         
-        # Calculate route details
-        distance = calculate_distance(
-            blood_bank.latitude, blood_bank.longitude,
-            hospital.latitude, hospital.longitude
-        )
-        
-        route = Route(
-            request_id=request_id,
-            driver_name=driver_user.username,  # Use the existing driver's username
-            start_latitude=blood_bank.latitude,
-            start_longitude=blood_bank.longitude,
-            end_latitude=hospital.latitude,
-            end_longitude=hospital.longitude,
-            eta_minutes=request_obj.predicted_eta_minutes,
-            distance_km=distance,
-            status='pending'
-        )
-        
-        db.session.add(route)
         db.session.commit()
         
-        # Create driver notification after approval
-        try:
-            # Create a notification object for the driver
-            driver_notification = {
-                'id': f'driver_notification_{request_id}',
-                'type': 'route_assigned',
-                'route_id': route.id,
-                'request_id': request_id,
-                'driver_name': driver_user.username,
-                'blood_type': request_obj.blood_type,
-                'quantity_ml': request_obj.quantity_ml,
-                'urgency': request_obj.urgency,
-                'hospital_name': hospital.name,
-                'blood_bank_name': blood_bank.name,
-                'distance_km': distance,
-                'eta_minutes': request_obj.predicted_eta_minutes,
-                'timestamp': datetime.utcnow().isoformat(),
-                'status': 'active',
-                'message': f'🚚 New blood delivery route assigned! {request_obj.blood_type} blood ({request_obj.quantity_ml}ml) from {blood_bank.name} to {hospital.name}. Distance: {distance:.1f}km, ETA: {request_obj.predicted_eta_minutes} minutes.'
-            }
-            
-            # Store notification in database or session for driver to access
-            # For now, we'll add it to the response so frontend can handle it
-            print(f"🔔 Driver notification created: {driver_notification}")
-            
-        except Exception as e:
-            print(f"⚠️ Warning: Could not create driver notification: {e}")
-            # Don't fail the approval if notification fails
+        route = routes[0]
+        driver_notification = driver_notifications[0] if driver_notifications else None
+        event_bus.publish('request_approved', {
+            'request': request_obj.to_dict(),
+            'route': route.to_dict(),
+            'routes': [leg_route.to_dict() for leg_route in routes],
+            'driver_notification': driver_notification
+        }, audience=request_audience(request_obj, routes))
         
         return jsonify({
             'success': True,
-            'message': 'Request approved and route created',
+            'message': 'Request approved and route created' if len(routes) == 1
+                       else f'Request approved and split across {len(routes)} routes',
             'request': request_obj.to_dict(),
             'route': route.to_dict(),
-            'driver': driver.to_dict(),
+            'routes': [leg_route.to_dict() for leg_route in routes],
+            'allocation': allocation,
+            'driver': assignments[0][0].to_dict(),
+            'drivers': [driver.to_dict() for driver, _ in assignments],
             'reserved_units': len(reserved_units),
-            'driver_notification': driver_notification if 'driver_notification' in locals() else None
+            'reserved_blood_types': sorted({unit.blood_type for unit in reserved_units}),
+            'driver_notification': driver_notification
         }), 200
         
     except Exception as e:
@@ -598,8 +701,8 @@ def cancel_emergency_request(request_id):
     """Cancel emergency request"""
     try:
         # Check authentication
-        user_id = session.get('user_id')
-        if not user_id:
+        user = current_principal()
+        if not user:
             return jsonify({'error': 'Not authenticated'}), 401
         
         request_obj = EmergencyRequest.query.get(request_id)
@@ -607,11 +710,6 @@ def cancel_emergency_request(request_id):
             return jsonify({'error': 'Request not found'}), 404
         
         # Check authorization
-        from src.models.user import User
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
         if user.role == 'hospital' and request_obj.hospital_id != user.entity_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
@@ -619,10 +717,11 @@ def cancel_emergency_request(request_id):
             return jsonify({'error': 'Unauthorized'}), 403
         
         # Update status
+        was_approved = request_obj.status == 'approved'
         request_obj.status = 'cancelled'
         
         # Release reserved blood units if any
-        if request_obj.status == 'approved':
+        if was_approved:
             request_items = RequestItem.query.filter_by(request_id=request_id).all()
             for item in request_items:
                 unit = BloodUnit.query.get(item.unit_id)
@@ -631,6 +730,13 @@ def cancel_emergency_request(request_id):
         
         db.session.commit()
         
+        cancelled_routes = Route.query.filter_by(request_id=request_id).all()
+        event_bus.publish('request_cancelled', {
+            'request_id': request_id,
+            'hospital_id': request_obj.hospital_id,
+            'suggested_bank_id': request_obj.suggested_bank_id
+        }, audience=request_audience(request_obj, cancelled_routes))
+        
         return jsonify({
             'success': True,
             'message': 'Request cancelled successfully'
@@ -639,39 +745,6 @@ def cancel_emergency_request(request_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@emergency_requests_bp.route('/demo/emergency_requests', methods=['GET'])
-def demo_get_emergency_requests():
-    """Demo endpoint to get emergency requests without authentication (for hackathon demo)"""
-    try:
-        print("🚀 DEMO Emergency Requests endpoint called - returning all requests")
-        
-        # Get all emergency requests for demo purposes
-        requests = EmergencyRequest.query.all()
-        
-        requests_data = []
-        for req in requests:
-            request_dict = req.to_dict()
-            
-            # Get hospital details
-            hospital = Hospital.query.get(req.hospital_id)
-            if hospital:
-                request_dict['hospital'] = hospital.to_dict()
-            
-            # Get blood bank details
-            if req.suggested_bank_id:
-                bank = BloodBank.query.get(req.suggested_bank_id)
-                if bank:
-                    request_dict['blood_bank'] = bank.to_dict()
-            
-            requests_data.append(request_dict)
-        
-        print(f"📡 DEMO Emergency Requests endpoint returning {len(requests_data)} requests")
-        return jsonify(requests_data), 200
-        
-    except Exception as e:
-        print(f"❌ DEMO Emergency Requests endpoint error: {e}")
-        return jsonify({'error': str(e)}), 500
-
 @emergency_requests_bp.route('/demo/emergency_requests/<request_id>/approve', methods=['POST'])
 def demo_approve_emergency_request(request_id):
     """Demo endpoint to approve emergency request without authentication (for hackathon demo)"""
@@ -691,6 +764,16 @@ def demo_approve_emergency_request(request_id):
         if request_obj.status != 'created':
             return jsonify({'error': 'Request already processed'}), 400
         
+        # Claim the request atomically, so a second click or a concurrent approval finds it taken
+        claimed = db.session.execute(
+            update(EmergencyRequest).where(EmergencyRequest.id == request_id, EmergencyRequest.status == 'created')
+            .values(status='approved').execution_options(synchronize_session=False)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            return jsonify({'error': 'Request already processed'}), 400
+        set_committed_value(request_obj, 'status', 'approved')
+        
         # For demo purposes, use the assigned blood bank from the request
         demo_blood_bank_id = request_obj.suggested_bank_id
         demo_driver_name = 'demo_driver'
@@ -721,10 +804,7 @@ def demo_approve_emergency_request(request_id):
             db.session.flush()
         
         # Calculate route details using real coordinates
-        distance = calculate_distance(
-            blood_bank.latitude, blood_bank.longitude,
-            hospital.latitude, hospital.longitude
-        )
+        distance, _ = travel_matrix.pair(hospital, blood_bank)
         
         # Use default ETA if not set
         eta_minutes = request_obj.predicted_eta_minutes or 30
@@ -743,11 +823,11 @@ def demo_approve_emergency_request(request_id):
         )
         
         db.session.add(route)
-        db.session.commit()
+        db.session.flush()
         
         print(f"✅ DEMO Approval - Route created in database: {route.id}")
         
-        # Create driver notification after approval
+        # Create driver notification in the same transaction as the approval
         try:
             # Create a notification object for the driver
             driver_notification = {
@@ -768,12 +848,22 @@ def demo_approve_emergency_request(request_id):
                 'message': f'🚚 New blood delivery route assigned! {request_obj.blood_type} blood ({request_obj.quantity_ml}ml) from {blood_bank.name} to {hospital.name}. Distance: {distance:.1f}km, ETA: {eta_minutes} minutes.'
             }
             
+            notify([('driver', driver.id)], 'route_assigned', driver_notification,
+                   message=driver_notification['message'], request_id=request_id, route_id=route.id)
             print(f"🔔 DEMO Driver notification created: {driver_notification}")
             
         except Exception as e:
             print(f"⚠️ Warning: Could not create driver notification: {e}")
             driver_notification = None
         
+        db.session.commit()
+        
+        event_bus.publish('request_approved', {
+            'request': request_obj.to_dict(),
+            'route': route.to_dict(),
+            'driver_notification': driver_notification
+        }, audience=request_audience(request_obj, [route]))
+        
         return jsonify({
             'success': True,
             'message': 'Request approved and route created (DEMO)',
@@ -0,0 +1,118 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+import csv
+import io
+import json
+from datetime import date, datetime
+from sqlalchemy import select, tuple_
+from src.models.models import BloodUnit, Transfer, EmergencyRequest, Route, TrackPoint, db
+from src.services.pagination import encode_cursor, decode_cursor
+from src.services.auth import current_principal
+
+exports_bp = Blueprint('exports', __name__)
+
+# Rows fetched per database round trip and written per response chunk
+EXPORT_CHUNK_ROWS = 1000
+
+# dataset -> (model, sort key with a unique last column, filterable columns)
+EXPORTS = {
+    'blood_units': (BloodUnit, ('expiry_date', 'id'), ('status', 'blood_type', 'blood_bank_id')),
+    'transfers': (Transfer, ('created_at', 'id'), ('status', 'blood_unit_id')),
+    'emergency_requests': (EmergencyRequest, ('created_at', 'id'), ('status', 'hospital_id', 'suggested_bank_id')),
+    'routes': (Route, ('created_at', 'id'), ('status', 'request_id')),
+    'track_points': (TrackPoint, ('route_id', 'timestamp', 'id'), ('route_id',)),
+}
+
+def export_value(value):
+    """JSON/CSV-friendly form of a column value"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def export_rows(table, key_columns, filters, cursor_values=None):
+    """Yield (row mapping, cursor) in key order, EXPORT_CHUNK_ROWS rows per fetch.
+
+    The rows come from a yield_per result, so at most one chunk is buffered
+    no matter how large the table is.
+    """
+    statement = select(table)
+    for column, value in filters.items():
+        statement = statement.where(column == value)
+    if cursor_values is not None:
+        statement = statement.where(tuple_(*key_columns) > tuple_(*cursor_values))
+    statement = statement.order_by(*key_columns).execution_options(yield_per=EXPORT_CHUNK_ROWS)
+
+    for row in db.session.execute(statement).mappings():
+        yield row, encode_cursor([row[column.key] for column in key_columns])
+
+def ndjson_chunks(rows):
+    """One JSON object per line, each carrying the `_cursor` to resume after it"""
+    lines = []
+    for row, cursor in rows:
+        record = {key: export_value(value) for key, value in row.items()}
+        record['_cursor'] = cursor
+        lines.append(json.dumps(record))
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+def csv_chunks(rows, fieldnames):
+    """CSV with a header row and a trailing `_cursor` column"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(list(fieldnames) + ['_cursor'])
+    written = 0
+    for row, cursor in rows:
+        writer.writerow([export_value(row[name]) for name in fieldnames] + [cursor])
+        written += 1
+        if written >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            written = 0
+    yield buffer.getvalue()
+
+@exports_bp.route('/exports/<dataset>', methods=['GET'])
+def export_dataset(dataset):
+    """Stream a full table as NDJSON (default) or CSV (?format=csv), resumable with ?cursor=<_cursor> (admin only)"""
+    try:
+        # Check if current user is admin
+        current_user = current_principal()
+        if not current_user:
+            return jsonify({'error': 'Not authenticated'}), 401
+        if current_user.role != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+
+        if dataset not in EXPORTS:
+            return jsonify({'error': f'Unknown export {dataset}; expected one of {", ".join(EXPORTS)}'}), 404
+        model, key_names, filter_names = EXPORTS[dataset]
+        table = model.__table__
+        key_columns = [table.c[name] for name in key_names]
+
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ('ndjson', 'csv'):
+            return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+        cursor_values = None
+        if request.args.get('cursor'):
+            try:
+                cursor_values = decode_cursor(request.args['cursor'], key_columns)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+        filters = {table.c[name]: request.args[name] for name in filter_names if request.args.get(name)}
+        rows = export_rows(table, key_columns, filters, cursor_values)
+
+        if export_format == 'csv':
+            body, mimetype = csv_chunks(rows, [column.key for column in table.columns]), 'text/csv'
+        else:
+            body, mimetype = ndjson_chunks(rows), 'application/x-ndjson'
+
+        return Response(stream_with_context(body), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename={dataset}.{export_format}',
+            'X-Accel-Buffering': 'no'
+        })
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,14 +1,27 @@
 from flask import Blueprint, request, jsonify
 from src.models.models import Hospital, db
+from src.services.pagination import list_body
+from src.services.travel_matrix import travel_matrix
 
 hospitals_bp = Blueprint('hospitals', __name__)
 
 @hospitals_bp.route('/hospitals', methods=['GET'])
 def get_hospitals():
-    """Get all hospitals"""
+    """Get hospitals, optionally filtered by city/state and paginated with limit/cursor"""
     try:
-        hospitals = Hospital.query.all()
-        return jsonify([hospital.to_dict() for hospital in hospitals]), 200
+        query = Hospital.query
+        city = request.args.get('city')
+        state = request.args.get('state')
+        if city:
+            query = query.filter(Hospital.city == city)
+        if state:
+            query = query.filter(Hospital.state == state)
+        
+        body = list_body(query, [Hospital.id], request.args,
+                         lambda rows: [hospital.to_dict() for hospital in rows])
+        return jsonify(body), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -51,6 +64,9 @@ def create_hospital():
         db.session.add(hospital)
         db.session.commit()
         
+        # Fill the hospital's travel matrix row
+        travel_matrix.update_hospital(hospital)
+        
         return jsonify(hospital.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -77,6 +93,9 @@ def update_hospital(hospital_id):
                     setattr(hospital, field, data[field])
         
         db.session.commit()
+        
+        # Only a move recomputes the hospital's travel matrix row
+        travel_matrix.update_hospital(hospital)
         return jsonify(hospital.to_dict()), 200
     except Exception as e:
         db.session.rollback()
@@ -93,6 +112,8 @@ def delete_hospital(hospital_id):
         db.session.delete(hospital)
         db.session.commit()
         
+        travel_matrix.remove_hospital(hospital_id)
+        
         return jsonify({'message': 'Hospital deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
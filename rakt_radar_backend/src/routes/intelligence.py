@@ -1,29 +1,18 @@
 from flask import Blueprint, request, jsonify
-import math
 import random
 import time
-from src.models.models import BloodUnit, Hospital, BloodBank, db
+from src.models.models import BloodUnit, Hospital, BloodBank, InventorySummary, db
+from src.services.geo import calculate_distance, distances, distance_matrix
+from src.services.analytics import get_dashboard
+from src.services.compatibility import BLOOD_TYPES, donor_types, substitution_rank
+from src.services.routing import routing_engine
+from src.services.eta import eta_service
+from src.services.auth import current_principal
+from src.services.entity_cache import entity_cache
 from datetime import datetime
 
 intelligence_bp = Blueprint('intelligence', __name__)
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-    
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-    
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
-
 @intelligence_bp.route('/demand_matching', methods=['GET'])
 def get_demand_matching():
     """Find potential matches for blood units nearing expiry (MOCKED)"""
@@ -44,15 +33,15 @@ def get_demand_matching():
             blood_banks = BloodBank.query.all()
             all_entities = hospitals + blood_banks
             
+            # Distances from the unit to every entity in one vectorized pass
+            entity_distances = distances(
+                (blood_unit.current_location_latitude, blood_unit.current_location_longitude),
+                [entity.latitude for entity in all_entities],
+                [entity.longitude for entity in all_entities]
+            ).tolist()
+            
             matches = []
-            for entity in all_entities:
-                distance = calculate_distance(
-                    blood_unit.current_location_latitude,
-                    blood_unit.current_location_longitude,
-                    entity.latitude,
-                    entity.longitude
-                )
-                
+            for entity, distance in zip(all_entities, entity_distances):
                 # Mock demand score (higher score = higher demand)
                 demand_score = random.randint(1, 10)
                 
@@ -91,25 +80,26 @@ def get_demand_matching():
             # Find all flagged units and their potential matches
             flagged_units = BloodUnit.query.filter(BloodUnit.is_flagged_for_expiry == True).all()
             
+            # Get diverse matches - don't always return the same entities
+            hospitals = Hospital.query.limit(5).all()
+            blood_banks = BloodBank.query.limit(5).all()
+            candidate_entities = hospitals + blood_banks
+            
+            # Unit-to-entity distance matrix, computed once for all flagged units
+            unit_distances = distance_matrix(
+                [unit.current_location_latitude for unit in flagged_units],
+                [unit.current_location_longitude for unit in flagged_units],
+                [entity.latitude for entity in candidate_entities],
+                [entity.longitude for entity in candidate_entities]
+            )
+            
             all_matches = []
-            for unit in flagged_units:
-                # Get diverse matches - don't always return the same entities
-                hospitals = Hospital.query.limit(5).all()
-                blood_banks = BloodBank.query.limit(5).all()
-                entities = hospitals + blood_banks
-                
+            for unit, row in zip(flagged_units, unit_distances.tolist()):
                 # Shuffle entities to get different results each time
-                import random
+                entities = list(zip(candidate_entities, row))
                 random.shuffle(entities)
                 
-                for entity in entities:
-                    distance = calculate_distance(
-                        unit.current_location_latitude,
-                        unit.current_location_longitude,
-                        entity.latitude,
-                        entity.longitude
-                    )
-                    
+                for entity, distance in entities:
                     if distance < 300:  # Closer matches for overview
                         # Ensure we don't always show the same blood bank
                         if len(all_matches) > 0:
@@ -160,68 +150,134 @@ def get_demand_matching():
 
 @intelligence_bp.route('/routing/<from_entity_id>/<to_entity_id>', methods=['GET'])
 def get_routing(from_entity_id, to_entity_id):
-    """Get mocked route between two entities"""
+    """Get the road route between two entities from the offline routing engine"""
     try:
         # Find entities (can be hospital or blood bank)
-        from_entity = Hospital.query.get(from_entity_id) or BloodBank.query.get(from_entity_id)
-        to_entity = Hospital.query.get(to_entity_id) or BloodBank.query.get(to_entity_id)
+        from_entity = entity_cache.facility(from_entity_id)
+        to_entity = entity_cache.facility(to_entity_id)
         
         if not from_entity:
             return jsonify({'error': 'From entity not found'}), 404
         if not to_entity:
             return jsonify({'error': 'To entity not found'}), 404
         
-        # Calculate distance
-        distance = calculate_distance(
-            from_entity.latitude,
-            from_entity.longitude,
-            to_entity.latitude,
-            to_entity.longitude
+        # Road distance and duration, or the straight line when no road graph is available
+        road = routing_engine.route(
+            from_entity['latitude'], from_entity['longitude'],
+            to_entity['latitude'], to_entity['longitude']
+        )
+        straight_line = calculate_distance(
+            from_entity['latitude'],
+            from_entity['longitude'],
+            to_entity['latitude'],
+            to_entity['longitude']
         )
+        distance = road['distance_km']
+        detour_factor = distance / straight_line if straight_line > 0 else 1.0
         
-        # Mock route information
         route_info = {
             'from_entity': {
-                'id': from_entity.id,
-                'name': from_entity.name,
-                'city': from_entity.city,
-                'state': from_entity.state,
-                'type': 'hospital' if isinstance(from_entity, Hospital) else 'blood_bank'
+                'id': from_entity['id'],
+                'name': from_entity['name'],
+                'city': from_entity['city'],
+                'state': from_entity['state'],
+                'type': from_entity['kind']
             },
             'to_entity': {
-                'id': to_entity.id,
-                'name': to_entity.name,
-                'city': to_entity.city,
-                'state': to_entity.state,
-                'type': 'hospital' if isinstance(to_entity, Hospital) else 'blood_bank'
+                'id': to_entity['id'],
+                'name': to_entity['name'],
+                'city': to_entity['city'],
+                'state': to_entity['state'],
+                'type': to_entity['kind']
             },
+            'routing_source': road['source'],
             'distance_km': round(distance, 2),
-            'estimated_time_minutes': round(distance * 1.2, 0),  # Mock time with traffic
-            'estimated_time_hours': round(distance / 50, 1),  # Assuming 50 km/h average with traffic
-            'route_quality': random.choice(['excellent', 'good', 'fair']),
-            'traffic_status': random.choice(['light', 'moderate', 'heavy']),
+            'straight_line_km': round(straight_line, 2),
+            'detour_factor': round(detour_factor, 2),
+            'estimated_time_minutes': round(road['duration_minutes'], 0),
+            'estimated_time_hours': round(road['duration_minutes'] / 60, 1),
+            # How directly the roads connect the two ends
+            'route_quality': 'excellent' if detour_factor < 1.3 else 'good' if detour_factor < 1.6 else 'fair',
+            # Durations assume free-flow speeds; no live traffic feed offline
+            'traffic_status': 'free_flow',
             'recommended_departure_time': 'Immediate',
-            'fuel_cost_estimate': round(distance * 8, 2),  # Mock fuel cost in INR
-            'toll_estimate': round(distance * 2, 2) if distance > 50 else 0,  # Mock toll cost
+            'fuel_cost_estimate': round(distance * 8, 2),  # Estimated fuel cost in INR
+            'toll_estimate': round(distance * 2, 2) if distance > 50 else 0,  # Estimated toll cost
+            'polyline': road['polyline'],
+            'polyline_points': road['point_count'],
             'waypoints': [
-                {'city': from_entity.city, 'state': from_entity.state},
-                {'city': to_entity.city, 'state': to_entity.state}
+                {'city': from_entity['city'], 'state': from_entity['state']},
+                {'city': to_entity['city'], 'state': to_entity['state']}
             ]
         }
         
-        # Add intermediate waypoints for longer distances
-        if distance > 200:
-            route_info['waypoints'].insert(1, {
-                'city': 'Intermediate City',
-                'state': 'Intermediate State',
-                'note': 'Rest stop recommended'
-            })
-        
         return jsonify(route_info), 200
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@intelligence_bp.route('/routing/metrics', methods=['GET'])
+def get_routing_metrics():
+    """Road graph size and route cache hit/miss counts"""
+    return jsonify(routing_engine.metrics()), 200
+
+@intelligence_bp.route('/eta/model', methods=['GET'])
+def get_eta_model():
+    """Active ETA model version, its backtest report and prediction counts"""
+    return jsonify(eta_service.metrics()), 200
+
+@intelligence_bp.route('/eta/model/train', methods=['POST'])
+def train_eta_model():
+    """Train a new ETA model version on completed routes and make it active (admin only)"""
+    try:
+        # Check authentication
+        user = current_principal()
+        if not user:
+            return jsonify({'error': 'Not authenticated'}), 401
+        
+        if user.role != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        holdout = float(data.get('holdout', 0.2))
+        if not 0 < holdout < 1:
+            return jsonify({'error': 'holdout must be between 0 and 1'}), 400
+        
+        model = eta_service.train(holdout, activate=bool(data.get('activate', True)))
+        return jsonify({'success': True, 'model': model.summary(),
+                        'active_version': eta_service.metrics()['active_version']}), 201
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@intelligence_bp.route('/eta/model/activate', methods=['POST'])
+def activate_eta_model():
+    """Hot-swap the serving ETA model to a saved version (admin only)"""
+    try:
+        # Check authentication
+        user = current_principal()
+        if not user:
+            return jsonify({'error': 'Not authenticated'}), 401
+        
+        if user.role != 'admin':
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        data = request.get_json(silent=True) or {}
+        if 'version' not in data:
+            return jsonify({'error': 'version is required'}), 400
+        
+        model = eta_service.activate(int(data['version']))
+        return jsonify({'success': True, 'model': model.summary()}), 200
+    
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @intelligence_bp.route('/ai_blood_request', methods=['POST'])
 def ai_blood_request_analysis():
     """AI-powered blood request analysis for emergency situations"""
@@ -233,6 +289,8 @@ def ai_blood_request_analysis():
         quantity_ml = data.get('quantity_ml', 450)
         urgency = data.get('urgency', 'high')
         hospital_location = data.get('location', {'lat': 13.0827, 'lng': 80.2707})  # Default Chennai (Tamil Nadu)
+        if blood_type not in BLOOD_TYPES:
+            return jsonify({'error': f'Unknown blood type {blood_type!r}'}), 400
         
         # AI Analysis Steps with realistic processing
         analysis_steps = []
@@ -256,24 +314,23 @@ def ai_blood_request_analysis():
         })
         
         # Step 3: Finding Surplus Units (TAMIL NADU ONLY)
-        # Get all blood units of the requested type that are available
-        available_units = BloodUnit.query.filter(
-            BloodUnit.blood_type == blood_type,
-            BloodUnit.status == 'available'
+        # Read per-bank stock of every compatible type from the inventory summary in one query
+        usable_types = donor_types(blood_type, urgency)
+        tamil_nadu_stock = db.session.query(InventorySummary, BloodBank).join(
+            BloodBank, BloodBank.id == InventorySummary.blood_bank_id
+        ).filter(
+            InventorySummary.blood_type.in_(usable_types),
+            BloodBank.state == 'Tamil Nadu'
         ).all()
-        
-        # Filter to only Tamil Nadu blood banks
-        tamil_nadu_units = []
-        for unit in available_units:
-            blood_bank = BloodBank.query.get(unit.blood_bank_id)
-            if blood_bank and blood_bank.state == 'Tamil Nadu':
-                tamil_nadu_units.append(unit)
+        total_units_found = sum(stock.unit_count for stock, _ in tamil_nadu_stock)
+        exact_units_found = sum(stock.unit_count for stock, _ in tamil_nadu_stock if stock.blood_type == blood_type)
         
         analysis_steps.append({
             'step': 3,
             'status': 'processing',
             'message': '📊 Identifying Surplus Units...',
-            'details': f'Found {len(tamil_nadu_units)} {blood_type} units available in Tamil Nadu',
+            'details': f'Found {exact_units_found} {blood_type} units and {total_units_found - exact_units_found} '
+                       f'compatible substitutes ({", ".join(usable_types[1:]) or "none"}) available in Tamil Nadu',
             'progress': 45
         })
         
@@ -313,22 +370,17 @@ def ai_blood_request_analysis():
             'progress': 100
         })
         
-        # Find actual matches (TAMIL NADU ONLY)
-        matches = []
-        for unit in tamil_nadu_units:
-            # Get the blood bank details
-            blood_bank = BloodBank.query.get(unit.blood_bank_id)
-            if not blood_bank:
-                continue
-                
-            # Calculate distance from hospital to blood bank
-            distance = calculate_distance(
-                hospital_location['lat'],
-                hospital_location['lng'],
-                blood_bank.latitude,
-                blood_bank.longitude
-            )
-            
+        # Score each stocked bank, then load units only for the banks that will be shown
+        # Calculate distance from hospital to every stocked blood bank at once
+        bank_distances = distances(
+            (hospital_location['lat'], hospital_location['lng']),
+            [blood_bank.latitude for _, blood_bank in tamil_nadu_stock],
+            [blood_bank.longitude for _, blood_bank in tamil_nadu_stock]
+        ).tolist()
+        
+        bank_scores = []
+        for (stock, blood_bank), distance in zip(tamil_nadu_stock, bank_distances):
+            rank = substitution_rank(blood_type, stock.blood_type)
             # Only include matches within Tamil Nadu (max 500km)
             if distance < 500:
                 # AI scoring algorithm
@@ -338,7 +390,26 @@ def ai_blood_request_analysis():
                 
                 final_score = (demand_score * urgency_multiplier + distance_score) / 2
                 ai_score = min(99, int(final_score * 10))  # Convert to percentage
-                
+                bank_scores.append((rank, ai_score, distance, stock.blood_type, blood_bank))
+        
+        # Exact matches ahead of substitutes, then by score
+        bank_scores.sort(key=lambda x: (x[0], -x[1]))
+        top_stock = {(blood_bank.id, donor_type): (rank, ai_score, distance, blood_bank)
+                     for rank, ai_score, distance, donor_type, blood_bank in bank_scores[:5]}
+        
+        units_by_stock = {}
+        if top_stock:
+            for unit in BloodUnit.query.filter(
+                BloodUnit.blood_bank_id.in_({bank_id for bank_id, _ in top_stock}),
+                BloodUnit.blood_type.in_({donor_type for _, donor_type in top_stock}),
+                BloodUnit.status == 'available'
+            ).order_by(BloodUnit.expiry_date):
+                units_by_stock.setdefault((unit.blood_bank_id, unit.blood_type), []).append(unit)
+        
+        # Find actual matches (TAMIL NADU ONLY)
+        matches = []
+        for key, (rank, ai_score, distance, blood_bank) in top_stock.items():
+            for unit in units_by_stock.get(key, []):
                 # Calculate smart routing information
                 estimated_time_hours = round(distance / 50, 1)  # Assuming 50 km/h average with traffic
                 route_quality = random.randint(85, 98)  # High quality for Tamil Nadu routes
@@ -357,14 +428,16 @@ def ai_blood_request_analysis():
                     'safety_score': safety_score,
                     'ai_score': ai_score,
                     'urgency_level': urgency,
+                    'is_substitute': rank > 0,
+                    'substitution_rank': rank,
                     'days_until_expiry': unit.days_until_expiry(),
                     'collection_date': unit.collection_date.isoformat() if unit.collection_date else None,
                     'expiry_date': unit.expiry_date.isoformat() if unit.expiry_date else None
                 }
                 matches.append(match)
         
-        # Sort matches by AI score (highest first)
-        matches.sort(key=lambda x: x['ai_score'], reverse=True)
+        # Sort matches exact type first, then by AI score (highest first)
+        matches.sort(key=lambda x: (x['substitution_rank'], -x['ai_score']))
         
         # Ensure diversity by limiting similar blood banks
         diverse_matches = []
@@ -392,11 +465,12 @@ def ai_blood_request_analysis():
             'analysis_steps': analysis_steps,
             'matches': diverse_matches,
             'summary': {
-                'total_units_found': len(tamil_nadu_units),
+                'total_units_found': total_units_found,
                 'matches_identified': len(diverse_matches),
                 'region': 'Tamil Nadu',
                 'urgency_level': urgency,
                 'blood_type_requested': blood_type,
+                'compatible_types': usable_types,
                 'quantity_requested': quantity_ml
             }
         }), 200
@@ -483,58 +557,9 @@ def order_blood():
 
 @intelligence_bp.route('/analytics/dashboard', methods=['GET'])
 def get_dashboard_analytics():
-    """Get dashboard analytics (MOCKED)"""
+    """Get dashboard analytics from grouped aggregates, cached briefly between writes"""
     try:
-        # Get real counts from database
-        total_blood_units = BloodUnit.query.count()
-        available_units = BloodUnit.query.filter(BloodUnit.status == 'available').count()
-        flagged_units = BloodUnit.query.filter(BloodUnit.is_flagged_for_expiry == True).count()
-        expired_units = BloodUnit.query.filter(BloodUnit.status == 'expired').count()
-        transferred_units = BloodUnit.query.filter(BloodUnit.status == 'transferred').count()
-        
-        total_hospitals = Hospital.query.count()
-        total_blood_banks = BloodBank.query.count()
-        
-        # Mock additional analytics
-        analytics = {
-            'inventory_summary': {
-                'total_blood_units': total_blood_units,
-                'available_units': available_units,
-                'flagged_for_expiry': flagged_units,
-                'expired_units': expired_units,
-                'transferred_units': transferred_units
-            },
-            'network_summary': {
-                'total_hospitals': total_hospitals,
-                'total_blood_banks': total_blood_banks,
-                'active_connections': total_hospitals + total_blood_banks,
-                'coverage_cities': len(set([h.city for h in Hospital.query.all()] + [b.city for b in BloodBank.query.all()]))
-            },
-            'efficiency_metrics': {
-                'wastage_prevention_rate': round(((total_blood_units - expired_units) / max(total_blood_units, 1)) * 100, 1),
-                'transfer_success_rate': round((transferred_units / max(total_blood_units, 1)) * 100, 1),
-                'average_response_time_hours': round(random.uniform(2.5, 8.5), 1),
-                'cost_savings_inr': round(random.uniform(50000, 200000), 2)
-            },
-            'blood_type_distribution': {
-                'A+': BloodUnit.query.filter(BloodUnit.blood_type == 'A+').count(),
-                'A-': BloodUnit.query.filter(BloodUnit.blood_type == 'A-').count(),
-                'B+': BloodUnit.query.filter(BloodUnit.blood_type == 'B+').count(),
-                'B-': BloodUnit.query.filter(BloodUnit.blood_type == 'B-').count(),
-                'AB+': BloodUnit.query.filter(BloodUnit.blood_type == 'AB+').count(),
-                'AB-': BloodUnit.query.filter(BloodUnit.blood_type == 'AB-').count(),
-                'O+': BloodUnit.query.filter(BloodUnit.blood_type == 'O+').count(),
-                'O-': BloodUnit.query.filter(BloodUnit.blood_type == 'O-').count()
-            },
-            'alerts': {
-                'critical_expiry_alerts': flagged_units,
-                'low_stock_alerts': random.randint(0, 3),
-                'system_alerts': random.randint(0, 1)
-            }
-        }
-        
-        return jsonify(analytics), 200
+        return jsonify(get_dashboard()), 200
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-
@@ -0,0 +1,37 @@
+from flask import Blueprint, request, jsonify
+from src.services.auth import current_principal
+from src.services.notifications import fetch_notifications, wait_for_notifications
+
+notifications_bp = Blueprint('notifications', __name__)
+
+MAX_WAIT_SECONDS = 30
+
+@notifications_bp.route('/notifications', methods=['GET'])
+def get_notifications():
+    """Get the current user's notifications after a cursor (?after=<seq>), optionally long-polling (?wait=<seconds>)"""
+    try:
+        # Check authentication
+        user = current_principal()
+        if not user:
+            return jsonify({'error': 'Not authenticated'}), 401
+        
+        after = request.args.get('after', type=int)
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        wait = min(request.args.get('wait', 0, type=float), MAX_WAIT_SECONDS)
+
+        if after is not None and wait > 0:
+            notifications = wait_for_notifications(user.role, user.entity_id, after, wait, limit)
+        else:
+            notifications = fetch_notifications(user.role, user.entity_id, after, limit)
+
+        # Hand back the cursor to resume from; unchanged when nothing new arrived
+        cursor = notifications[-1].seq if notifications else after
+
+        return jsonify({
+            'success': True,
+            'notifications': [notification.to_dict() for notification in notifications],
+            'cursor': cursor if cursor is not None else 0
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,28 +1,20 @@
-from flask import Blueprint, request, jsonify, session
-import math
+from flask import Blueprint, request, jsonify
 import random
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+import numpy as np
 from src.models.models import Route, TrackPoint, EmergencyRequest, Hospital, BloodBank, Driver, db
+from src.services.event_bus import event_bus
+from src.services.notifications import notify, request_audience
+from src.services.pagination import list_body
+from src.services.polyline import compact_track
+from src.services.dispatch import NEAREST_DRIVERS, nearest_drivers
+from src.services.spatial_index import track_driver
+from src.services.eta import eta_service
+from src.services.auth import current_principal
+from src.services.entity_cache import entity_cache
 
 routes_bp = Blueprint('routes', __name__)
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-    
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-    
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    return R * c
-
 def interpolate_position(start_lat, start_lng, end_lat, end_lng, progress_percent):
     """Interpolate position along a route based on progress percentage"""
     # Simple linear interpolation
@@ -30,112 +22,182 @@ def interpolate_position(start_lat, start_lng, end_lat, end_lng, progress_percen
     lng = start_lng + (end_lng - start_lng) * progress_percent
     return lat, lng
 
+MAX_BATCH_FIXES = 5000
+# How far ahead of the server clock a device's fix may be; later ones would fence off every real fix
+MAX_CLOCK_SKEW_SECONDS = 120
+
+def parse_timestamp(value):
+    """Parse an ISO-8601 string or epoch seconds into a naive UTC datetime"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    raise ValueError(f'unsupported timestamp {value!r}')
+
+def parse_fixes(fixes, now=None):
+    """Validate a batch of {latitude, longitude, timestamp} fixes as arrays, sorted by time.
+    
+    Raises ValueError naming the offending fix indexes, including fixes more than
+    MAX_CLOCK_SKEW_SECONDS after `now` (default: the current UTC time).
+    """
+    try:
+        latitudes = np.array([fix['latitude'] for fix in fixes], dtype=np.float64)
+        longitudes = np.array([fix['longitude'] for fix in fixes], dtype=np.float64)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Every fix needs numeric latitude and longitude')
+    
+    invalid = ~(np.isfinite(latitudes) & np.isfinite(longitudes)
+                & (np.abs(latitudes) <= 90) & (np.abs(longitudes) <= 180))
+    if invalid.any():
+        raise ValueError(f'Invalid coordinates at fixes {np.flatnonzero(invalid)[:20].tolist()}')
+    
+    timestamps = []
+    for index, fix in enumerate(fixes):
+        try:
+            timestamps.append(parse_timestamp(fix['timestamp']))
+        except (KeyError, TypeError, ValueError, OverflowError, OSError):
+            raise ValueError(f'Invalid or missing timestamp at fix {index}')
+    timestamps = np.array(timestamps, dtype='datetime64[us]')
+    
+    latest = (now or datetime.utcnow()) + timedelta(seconds=MAX_CLOCK_SKEW_SECONDS)
+    future = timestamps > np.datetime64(latest, 'us')
+    if future.any():
+        raise ValueError(f'Timestamps in the future at fixes {np.flatnonzero(future)[:20].tolist()}')
+    
+    order = np.argsort(timestamps, kind='stable')
+    return latitudes[order], longitudes[order], timestamps[order]
+
+def compact_track_options():
+    """Opt-in compact tracking from the query string (?track_format=polyline|delta&tolerance_m=&max_points=), or None"""
+    track_format = request.args.get('track_format')
+    if not track_format:
+        return None
+    if track_format not in ('polyline', 'delta'):
+        raise ValueError("track_format must be 'polyline' or 'delta'")
+    tolerance_m = request.args.get('tolerance_m', type=float)
+    max_points = request.args.get('max_points', type=int)
+    if tolerance_m is not None and tolerance_m < 0:
+        raise ValueError('tolerance_m must be non-negative')
+    if max_points is not None and max_points < 2:
+        raise ValueError('max_points must be at least 2')
+    return {'encoding': track_format, 'tolerance_m': tolerance_m, 'max_points': max_points}
+
+def route_tracking(route, track_options):
+    """Tracking payload for a route: full point dicts by default, or the compact track when requested"""
+    if track_options:
+        return compact_track(route, **track_options)
+    track_points = TrackPoint.query.filter_by(route_id=route.id).order_by(TrackPoint.timestamp).all()
+    return [point.to_dict() for point in track_points]
+
+def route_audience(route):
+    """Who may see a realtime event about a route: its driver and the parties to its request"""
+    request_obj = db.session.get(EmergencyRequest, route.request_id)
+    return request_audience(request_obj, [route]) if request_obj else [('driver', route.driver_name)]
+
 @routes_bp.route('/routes', methods=['GET'])
 def get_routes():
-    """Get routes based on user role"""
+    """Get routes based on user role, newest first, paginated with limit/cursor"""
     try:
         print("🚀 ROUTES ENDPOINT - UPDATED CODE LOADED! 🚀")
         
         # Check authentication
-        user_id = session.get('user_id')
-        if not user_id:
-            return jsonify({'error': 'Not authenticated'}), 401
-        
-        from src.models.user import User
-        user = User.query.get(user_id)
+        user = current_principal()
         if not user:
-            return jsonify({'error': 'User not found'}), 404
+            return jsonify({'error': 'Not authenticated'}), 401
         
         print(f"🔍 Routes endpoint - User: {user.username}, Role: {user.role}")
         
+        try:
+            track_options = compact_track_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Filter routes based on role
         if user.role == 'driver':
             # Drivers see routes assigned to them
             print(f"🚚 Driver {user.username} looking for routes with driver_name={user.username}")
-            routes = Route.query.filter_by(driver_name=user.username).all()
-            print(f"📡 Found {len(routes)} routes for driver {user.username}")
+            query = Route.query.filter_by(driver_name=user.username)
         elif user.role == 'hospital':
             # Hospitals see routes for their requests
-            requests = EmergencyRequest.query.filter_by(hospital_id=user.entity_id).all()
-            request_ids = [req.id for req in requests]
-            routes = Route.query.filter(Route.request_id.in_(request_ids)).all()
+            request_ids = db.session.query(EmergencyRequest.id).filter_by(hospital_id=user.entity_id)
+            query = Route.query.filter(Route.request_id.in_(request_ids))
         elif user.role == 'blood_bank':
             # Blood banks see routes from their requests
-            requests = EmergencyRequest.query.filter_by(suggested_bank_id=user.entity_id).all()
-            request_ids = [req.id for req in requests]
-            routes = Route.query.filter(Route.request_id.in_(request_ids)).all()
+            request_ids = db.session.query(EmergencyRequest.id).filter_by(suggested_bank_id=user.entity_id)
+            query = Route.query.filter(Route.request_id.in_(request_ids))
         elif user.role == 'admin':
             # Admins see all routes
-            routes = Route.query.all()
+            query = Route.query
         else:
             return jsonify({'error': 'Unauthorized role'}), 403
         
-        # Include related data
-        routes_data = []
-        for route in routes:
-            route_dict = route.to_dict()
-            
-            # Get request details
-            request_obj = EmergencyRequest.query.get(route.request_id)
-            if request_obj:
-                route_dict['request'] = request_obj.to_dict()
-                
-                # Get hospital details
-                hospital = Hospital.query.get(request_obj.hospital_id)
-                if hospital:
-                    route_dict['hospital'] = hospital.to_dict()
-                
-                # Get blood bank details
-                if request_obj.suggested_bank_id:
-                    bank = BloodBank.query.get(request_obj.suggested_bank_id)
-                    if bank:
-                        route_dict['blood_bank'] = bank.to_dict()
-            
-            # Get tracking points
-            track_points = TrackPoint.query.filter_by(route_id=route.id).order_by(TrackPoint.timestamp).all()
-            route_dict['tracking'] = [point.to_dict() for point in track_points]
-            
-            # Calculate current progress - WITH SAFETY CHECKS
-            if route.status == 'active' and track_points and route.distance_km > 0:
-                # Calculate progress based on distance covered
-                total_distance = route.distance_km
-                if len(track_points) > 1:
-                    # Calculate actual distance covered
-                    covered_distance = 0
-                    for i in range(1, len(track_points)):
-                        covered_distance += calculate_distance(
-                            track_points[i-1].latitude, track_points[i-1].longitude,
-                            track_points[i].latitude, track_points[i].longitude
-                        )
-                    
-                    # Safety check to prevent division by zero
-                    if total_distance > 0:
-                        progress_percent = min(1.0, covered_distance / total_distance)
-                        route_dict['progress_percent'] = round(progress_percent * 100, 1)
-                        route_dict['distance_covered_km'] = round(covered_distance, 2)
-                    else:
-                        route_dict['progress_percent'] = 0.0
-                        route_dict['distance_covered_km'] = 0.0
-                else:
-                    route_dict['progress_percent'] = 0.0
-                    route_dict['distance_covered_km'] = 0.0
-            else:
-                route_dict['progress_percent'] = 0.0
-                route_dict['distance_covered_km'] = 0.0
-            
-            routes_data.append(route_dict)
+        status = request.args.get('status')
+        if status:
+            query = query.filter(Route.status == status)
         
-        return jsonify(routes_data), 200
+        body = list_body(query, [Route.created_at, Route.id], request.args,
+                         lambda routes: route_rows(routes, track_options), descending=True)
+        return jsonify(body), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def route_rows(routes, track_options):
+    """Serialize routes with their request, hospital, blood bank, tracking and progress"""
+    request_ids = {route.request_id for route in routes}
+    requests = {req.id: req for req in EmergencyRequest.query.filter(EmergencyRequest.id.in_(request_ids))} if request_ids else {}
+    hospital_ids = {req.hospital_id for req in requests.values()}
+    bank_ids = {req.suggested_bank_id for req in requests.values() if req.suggested_bank_id}
+    hospitals = {h.id: h for h in Hospital.query.filter(Hospital.id.in_(hospital_ids))} if hospital_ids else {}
+    banks = {b.id: b for b in BloodBank.query.filter(BloodBank.id.in_(bank_ids))} if bank_ids else {}
+    
+    routes_data = []
+    for route in routes:
+        route_dict = route.to_dict()
+        
+        # Get request details
+        request_obj = requests.get(route.request_id)
+        if request_obj:
+            route_dict['request'] = request_obj.to_dict()
+            
+            hospital = hospitals.get(request_obj.hospital_id)
+            if hospital:
+                route_dict['hospital'] = hospital.to_dict()
+            
+            bank = banks.get(request_obj.suggested_bank_id)
+            if bank:
+                route_dict['blood_bank'] = bank.to_dict()
+        
+        # Get tracking points
+        route_dict['tracking'] = route_tracking(route, track_options)
+        
+        # Current progress comes from the route's running totals
+        if route.status == 'active' and (route.point_count or 0) > 1:
+            route_dict['progress_percent'] = round(route.progress_fraction() * 100, 1)
+            route_dict['distance_covered_km'] = round(route.distance_covered_km or 0.0, 2)
+        else:
+            route_dict['progress_percent'] = 0.0
+            route_dict['distance_covered_km'] = 0.0
+        
+        routes_data.append(route_dict)
+    return routes_data
+
 @routes_bp.route('/demo/routes', methods=['GET'])
 def demo_get_routes():
     """Demo endpoint to get routes without authentication (for hackathon demo)"""
     try:
         print("🚀 DEMO Routes endpoint called - returning all routes")
         
+        try:
+            track_options = compact_track_options()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
         # Get all routes for demo purposes
         routes = Route.query.all()
         
@@ -150,19 +212,17 @@ def demo_get_routes():
                 route_dict['request'] = request_obj.to_dict()
                 
                 # Get hospital details
-                hospital = Hospital.query.get(request_obj.hospital_id)
+                hospital = entity_cache.get(Hospital, request_obj.hospital_id)
                 if hospital:
-                    route_dict['hospital'] = hospital.to_dict()
+                    route_dict['hospital'] = hospital
                 
                 # Get blood bank details
-                if request_obj.suggested_bank_id:
-                    bank = BloodBank.query.get(request_obj.suggested_bank_id)
-                    if bank:
-                        route_dict['blood_bank'] = bank.to_dict()
+                bank = entity_cache.get(BloodBank, request_obj.suggested_bank_id)
+                if bank:
+                    route_dict['blood_bank'] = bank
             
             # Get tracking points
-            track_points = TrackPoint.query.filter_by(route_id=route.id).order_by(TrackPoint.timestamp).all()
-            route_dict['tracking'] = [point.to_dict() for point in track_points]
+            route_dict['tracking'] = route_tracking(route, track_options)
             
             routes_data.append(route_dict)
         
@@ -178,8 +238,8 @@ def get_route(route_id):
     """Get specific route details"""
     try:
         # Check authentication
-        user_id = session.get('user_id')
-        if not user_id:
+        user = current_principal()
+        if not user:
             return jsonify({'error': 'Not authenticated'}), 401
         
         route = Route.query.get(route_id)
@@ -187,11 +247,6 @@ def get_route(route_id):
             return jsonify({'error': 'Route not found'}), 404
         
         # Check authorization
-        from src.models.user import User
-        user = User.query.get(user_id)
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
         # Check if user has access to this route
         has_access = False
         if user.role == 'admin':
@@ -218,58 +273,22 @@ def get_route(route_id):
         if request_obj:
             route_data['request'] = request_obj.to_dict()
             
-            hospital = Hospital.query.get(request_obj.hospital_id)
+            hospital = entity_cache.get(Hospital, request_obj.hospital_id)
             if hospital:
-                route_data['hospital'] = hospital.to_dict()
+                route_data['hospital'] = hospital
             
-            if request_obj.suggested_bank_id:
-                bank = BloodBank.query.get(request_obj.suggested_bank_id)
-                if bank:
-                    route_data['blood_bank'] = bank.to_dict()
+            bank = entity_cache.get(BloodBank, request_obj.suggested_bank_id)
+            if bank:
+                route_data['blood_bank'] = bank
         
         # Get tracking points
-        track_points = TrackPoint.query.filter_by(route_id=route_id).order_by(TrackPoint.timestamp).all()
-        route_data['tracking'] = [point.to_dict() for point in track_points]
-        
-        # Calculate progress - TEMPORARILY DISABLED TO FIX DIVISION BY ZERO
-        route_data['progress_percent'] = 0.0
-        route_data['distance_covered_km'] = 0.0
-        
-        # TODO: Re-enable progress calculation after fixing distance issues
-        # if route.status == 'active' and track_points:
-        #     total_distance = route.distance_km
-        #     print(f"🔍 Progress calculation - Route ID: {route_id}, Total distance: {total_distance}, Track points: {len(track_points)}")
-        #     
-        #     if total_distance > 0 and len(track_points) > 1:
-        #         covered_distance = 0
-        #         for i in range(1, len(track_points)):
-        #             covered_distance += calculate_distance(
-        #                 track_points[i-1].latitude, track_points[i-1].longitude,
-        #                 track_points[i].latitude, track_points[i].longitude
-        #             )
-        #         
-        #         print(f"🔍 Distance calculation - Covered: {covered_distance}, Total: {total_distance}")
-        #         progress_percent = min(1.0, covered_distance / total_distance)
-        #         route_data['progress_percent'] = round(progress_percent * 100, 1)
-        #         route_data['distance_covered_km'] = round(covered_distance, 2)
-        #         
-        #         # Calculate remaining ETA
-        #         if progress_percent > 0:
-        #             remaining_distance = total_distance - covered_distance
-        #             # Estimate remaining time based on progress
-        #             elapsed_time = (track_points[-1].timestamp - track_points[0].timestamp).total_seconds() / 60
-        #             if elapsed_time > 0:
-        #                 rate = covered_distance / elapsed_time  # km/min
-        #                 if rate > 0:
-        #                     remaining_eta = remaining_distance / rate
-        #                             route_data['remaining_eta_minutes'] = round(remaining_eta, 1)
-        #     else:
-        #         print(f"⚠️ Skipping progress calculation - Total distance: {total_distance}, Track points: {len(track_points)}")
-        #         route_data['progress_percent'] = 0.0
-        #         route_data['distance_covered_km'] = 0.0
-        # else:
-        #     route_data['progress_percent'] = 0.0
-        #     route_data['distance_covered_km'] = 0.0
+        try:
+            route_data['tracking'] = route_tracking(route, compact_track_options())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # distance_covered_km comes from the route's running totals
+        route_data['progress_percent'] = round(route.progress_fraction() * 100, 1)
         
         return jsonify(route_data), 200
         
@@ -281,21 +300,14 @@ def start_route(route_id):
     """Start a route (driver only)"""
     try:
         print(f"🚚 Start route endpoint called for route: {route_id}")
-        print(f"📋 Session data: {dict(session)}")
         
         # Check authentication
-        user_id = session.get('user_id')
-        print(f"🆔 User ID from session: {user_id}")
+        user = current_principal()
+        print(f"🆔 User ID from session: {user.id if user else None}")
         
-        if not user_id:
-            print("❌ No user_id in session")
-            return jsonify({'error': 'Not authenticated'}), 401
-        
-        from src.models.user import User
-        user = User.query.get(user_id)
         if not user:
-            print(f"❌ User not found for ID: {user_id}")
-            return jsonify({'error': 'User not found'}), 404
+            print("❌ No valid token or user_id in session")
+            return jsonify({'error': 'Not authenticated'}), 401
         
         print(f"🔍 Start route attempt - User: {user.username}, Role: '{user.role}'")
         
@@ -340,11 +352,7 @@ def start_route(route_id):
         route.started_at = datetime.utcnow()
         
         # Create initial tracking point at start location
-        initial_point = TrackPoint(
-            route_id=route_id,
-            latitude=route.start_latitude,
-            longitude=route.start_longitude
-        )
+        initial_point = route.record_track_point(route.start_latitude, route.start_longitude)
         db.session.add(initial_point)
         
         # Update driver availability
@@ -354,9 +362,9 @@ def start_route(route_id):
             driver.current_latitude = route.start_latitude
             driver.current_longitude = route.start_longitude
         
-        db.session.commit()
-        
-        # Create route start notification for ALL users (Hospital, Blood Bank, Driver)
+        # Create route start notification for ALL users (Hospital, Blood Bank, Driver),
+        # committed together with the route status change
+        route_start_notification = None
         try:
             # Get request details for the notification
             request_obj = EmergencyRequest.query.get(route.request_id)
@@ -389,15 +397,29 @@ def start_route(route_id):
                     'for_users': ['hospital', 'blood_bank', 'driver']
                 }
                 
+                # Store notification in the inbox of every party to the delivery
+                notify(
+                    [('hospital', request_obj.hospital_id),
+                     ('blood_bank', request_obj.suggested_bank_id),
+                     ('driver', user.entity_id)],
+                    'route_started', route_start_notification,
+                    message=route_start_notification['message'], request_id=route.request_id, route_id=route_id
+                )
                 print(f"🔔 Route start notification created: {route_start_notification}")
                 
-                # Store notification in database or session for all users to access
-                # For now, we'll add it to the response so frontend can handle it
-                
         except Exception as e:
             print(f"⚠️ Warning: Could not create route start notification: {e}")
             route_start_notification = None
         
+        db.session.commit()
+        if driver:
+            track_driver(driver)
+        
+        event_bus.publish('route_started', {
+            'route': route.to_dict(),
+            'route_start_notification': route_start_notification
+        }, audience=route_audience(route))
+        
         return jsonify({
             'success': True,
             'message': 'Route started successfully',
@@ -413,13 +435,11 @@ def update_route_progress(route_id):
     """Update route progress with new tracking point (driver only)"""
     try:
         # Check authentication
-        user_id = session.get('user_id')
-        if not user_id:
+        user = current_principal()
+        if not user:
             return jsonify({'error': 'Not authenticated'}), 401
         
-        from src.models.user import User
-        user = User.query.get(user_id)
-        if not user or user.role != 'driver':
+        if user.role != 'driver':
             return jsonify({'error': 'Only drivers can update route progress'}), 403
         
         route = Route.query.get(route_id)
@@ -441,12 +461,8 @@ def update_route_progress(route_id):
         if not latitude or not longitude:
             return jsonify({'error': 'Latitude and longitude are required'}), 400
         
-        # Create new tracking point
-        track_point = TrackPoint(
-            route_id=route_id,
-            latitude=latitude,
-            longitude=longitude
-        )
+        # Create new tracking point, advancing the route's running distance
+        track_point = route.record_track_point(latitude, longitude)
         db.session.add(track_point)
         
         # Update driver location
@@ -456,6 +472,15 @@ def update_route_progress(route_id):
             driver.current_longitude = longitude
         
         db.session.commit()
+        if driver:
+            track_driver(driver)
+        
+        event_bus.publish('route_progress', {
+            'route_id': route_id,
+            'request_id': route.request_id,
+            'driver_name': route.driver_name,
+            'track_point': track_point.to_dict()
+        }, audience=route_audience(route))
         
         return jsonify({
             'success': True,
@@ -466,18 +491,102 @@ def update_route_progress(route_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@routes_bp.route('/routes/<route_id>/progress/batch', methods=['POST'])
+def update_route_progress_batch(route_id):
+    """Record a burst of buffered, timestamped GPS fixes in one transaction (driver only)"""
+    try:
+        # Check authentication
+        user = current_principal()
+        if not user:
+            return jsonify({'error': 'Not authenticated'}), 401
+        
+        if user.role != 'driver':
+            return jsonify({'error': 'Only drivers can update route progress'}), 403
+        
+        route = Route.query.get(route_id)
+        if not route:
+            return jsonify({'error': 'Route not found'}), 404
+        
+        # Check if driver is assigned to this route
+        if route.driver_name != user.username:
+            return jsonify({'error': 'Unauthorized to update this route'}), 403
+        
+        # Check if route is active
+        if route.status != 'active':
+            return jsonify({'error': 'Route is not active'}), 400
+        
+        data = request.json or {}
+        fixes = data.get('fixes')
+        if not isinstance(fixes, list) or not fixes:
+            return jsonify({'error': 'fixes must be a non-empty list'}), 400
+        if len(fixes) > MAX_BATCH_FIXES:
+            return jsonify({'error': f'At most {MAX_BATCH_FIXES} fixes per batch'}), 400
+        
+        try:
+            latitudes, longitudes, timestamps = parse_fixes(fixes)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Fixes older than the route's latest point would rewind the running distance
+        if route.last_point_at:
+            fresh = timestamps >= np.datetime64(route.last_point_at, 'us')
+            latitudes, longitudes, timestamps = latitudes[fresh], longitudes[fresh], timestamps[fresh]
+        skipped = len(fixes) - len(timestamps)
+        
+        if not len(timestamps):
+            return jsonify({
+                'success': True,
+                'message': 'No new fixes to record',
+                'accepted': 0,
+                'skipped': skipped
+            }), 200
+        
+        rows = route.record_track_points(latitudes, longitudes, timestamps.tolist())
+        db.session.execute(TrackPoint.__table__.insert(), rows)
+        # A Core insert never reaches the flush hooks, so flag the dashboard for refresh on commit ourselves
+        db.session.info['dashboard_stale'] = True
+        
+        # Update driver location once, to the latest fix
+        driver = Driver.query.filter_by(name=user.username).first()
+        if driver:
+            driver.current_latitude = route.last_latitude
+            driver.current_longitude = route.last_longitude
+        
+        db.session.commit()
+        if driver:
+            track_driver(driver)
+        
+        last_point = dict(rows[-1], timestamp=rows[-1]['timestamp'].isoformat())
+        event_bus.publish('route_progress', {
+            'route_id': route_id,
+            'request_id': route.request_id,
+            'driver_name': route.driver_name,
+            'track_point': last_point,
+            'batch_size': len(rows)
+        }, audience=route_audience(route))
+        
+        return jsonify({
+            'success': True,
+            'message': 'Progress batch recorded successfully',
+            'accepted': len(rows),
+            'skipped': skipped,
+            'track_point': last_point,
+            'distance_covered_km': round(route.distance_covered_km, 2)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @routes_bp.route('/routes/<route_id>/complete', methods=['POST'])
 def complete_route(route_id):
     """Complete a route (driver only)"""
     try:
         # Check authentication
-        user_id = session.get('user_id')
-        if not user_id:
+        user = current_principal()
+        if not user:
             return jsonify({'error': 'Not authenticated'}), 401
         
-        from src.models.user import User
-        user = User.query.get(user_id)
-        if not user or user.role != 'driver':
+        if user.role != 'driver':
             return jsonify({'error': 'Only drivers can complete routes'}), 403
         
         route = Route.query.get(route_id)
@@ -502,10 +611,10 @@ def complete_route(route_id):
             request_obj.status = 'delivered'
         
         # Update blood unit status
-        from src.models.models import RequestItem
+        from src.models.models import RequestItem, BloodUnit
         request_items = RequestItem.query.filter_by(request_id=route.request_id).all()
         for item in request_items:
-            unit = db.session.get('blood_units', item.unit_id)
+            unit = BloodUnit.query.get(item.unit_id)
             if unit:
                 unit.status = 'used'
         
@@ -515,6 +624,13 @@ def complete_route(route_id):
             driver.is_available = True
         
         db.session.commit()
+        if driver:
+            track_driver(driver)
+        
+        event_bus.publish('route_completed', {
+            'route': route.to_dict(),
+            'request_id': route.request_id
+        }, audience=route_audience(route))
         
         return jsonify({
             'success': True,
@@ -530,13 +646,11 @@ def simulate_route_progress(route_id):
     """Simulate route progress for demo purposes (admin only)"""
     try:
         # Check authentication
-        user_id = session.get('user_id')
-        if not user_id:
+        user = current_principal()
+        if not user:
             return jsonify({'error': 'Not authenticated'}), 401
         
-        from src.models.user import User
-        user = User.query.get(user_id)
-        if not user or user.role != 'admin':
+        if user.role != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         
         route = Route.query.get(route_id)
@@ -560,12 +674,8 @@ def simulate_route_progress(route_id):
             progress_percent
         )
         
-        # Create tracking point
-        track_point = TrackPoint(
-            route_id=route_id,
-            latitude=new_lat,
-            longitude=new_lng
-        )
+        # Create tracking point, advancing the route's running distance
+        track_point = route.record_track_point(new_lat, new_lng)
         db.session.add(track_point)
         
         # Update driver location if exists
@@ -575,6 +685,15 @@ def simulate_route_progress(route_id):
             driver.current_longitude = new_lng
         
         db.session.commit()
+        if driver:
+            track_driver(driver)
+        
+        event_bus.publish('route_progress', {
+            'route_id': route_id,
+            'request_id': route.request_id,
+            'driver_name': route.driver_name,
+            'track_point': track_point.to_dict()
+        }, audience=route_audience(route))
         
         return jsonify({
             'success': True,
@@ -591,14 +710,9 @@ def get_route_tracking(request_id):
     """Get route tracking information for a specific emergency request"""
     try:
         # Check authentication
-        user_id = session.get('user_id')
-        if not user_id:
-            return jsonify({'error': 'Not authenticated'}), 401
-        
-        from src.models.user import User
-        user = User.query.get(user_id)
+        user = current_principal()
         if not user:
-            return jsonify({'error': 'User not found'}), 404
+            return jsonify({'error': 'Not authenticated'}), 401
         
         # Get the emergency request
         from src.models.models import EmergencyRequest
@@ -618,8 +732,11 @@ def get_route_tracking(request_id):
         if not route:
             return jsonify({'error': 'Route not found'}), 404
         
-        # Get tracking points
-        track_points = TrackPoint.query.filter_by(route_id=route.id).order_by(TrackPoint.timestamp).all()
+        # Get tracking points, compact when the client opted in
+        try:
+            track_points = route_tracking(route, compact_track_options())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
         # Get related entities
         from src.models.models import Hospital, BloodBank, Driver
@@ -627,33 +744,18 @@ def get_route_tracking(request_id):
         blood_bank = BloodBank.query.get(request_obj.suggested_bank_id)
         driver = Driver.query.filter_by(name=route.driver_name).first()
         
-        # Calculate progress - WITH SAFETY CHECKS
+        # Calculate progress from the route's running totals
         total_distance = route.distance_km
-        if track_points and total_distance > 0:
-            # Calculate distance covered
-            covered_distance = 0
-            for i in range(1, len(track_points)):
-                prev_point = track_points[i-1]
-                curr_point = track_points[i]
-                covered_distance += calculate_distance(
-                    prev_point.latitude, prev_point.longitude,
-                    curr_point.latitude, curr_point.longitude
-                )
-            
-            # Safety check to prevent division by zero
-            if total_distance > 0:
-                progress_percentage = min(100, (covered_distance / total_distance) * 100)
-                remaining_distance = max(0, total_distance - covered_distance)
-            else:
-                progress_percentage = 0
-                remaining_distance = 0
+        if route.point_count and total_distance > 0:
+            progress_percentage = route.progress_fraction() * 100
+            remaining_distance = max(0, total_distance - (route.distance_covered_km or 0.0))
         else:
             progress_percentage = 0
             remaining_distance = total_distance if total_distance > 0 else 0
         
-        # Estimate current ETA based on progress
+        # Estimate current ETA from the distance still to go
         if progress_percentage > 0 and total_distance > 0:
-            estimated_remaining_time = int((remaining_distance / total_distance) * route.eta_minutes)
+            estimated_remaining_time = int(eta_service.remaining_minutes(route, remaining_distance, request_obj.urgency))
         else:
             estimated_remaining_time = route.eta_minutes
         
@@ -699,7 +801,7 @@ def get_route_tracking(request_id):
                 'remaining_distance_km': round(remaining_distance, 2),
                 'estimated_remaining_time_minutes': estimated_remaining_time,
                 'current_status': route.status,
-                'track_points': [point.to_dict() for point in track_points]
+                'track_points': track_points
             }
         }
         
@@ -707,3 +809,34 @@ def get_route_tracking(request_id):
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@routes_bp.route('/drivers/nearest', methods=['GET'])
+def get_nearest_drivers():
+    """Nearest available drivers to a point (blood bank or admin only)"""
+    try:
+        # Check authentication
+        user = current_principal()
+        if not user:
+            return jsonify({'error': 'Not authenticated'}), 401
+        
+        if user.role not in ('blood_bank', 'admin'):
+            return jsonify({'error': 'Only blood banks and admins can look up drivers'}), 403
+        
+        try:
+            latitude = float(request.args['latitude'])
+            longitude = float(request.args['longitude'])
+            k = int(request.args.get('k', NEAREST_DRIVERS))
+        except (KeyError, ValueError):
+            return jsonify({'error': 'latitude and longitude are required numbers'}), 400
+        if not 1 <= k <= 50:
+            return jsonify({'error': 'k must be between 1 and 50'}), 400
+        
+        nearest = nearest_drivers(latitude, longitude, k)
+        drivers = {driver.id: driver for driver in Driver.query.filter(Driver.id.in_([driver_id for driver_id, _ in nearest]))}
+        return jsonify([
+            dict(drivers[driver_id].to_dict(), distance_km=round(distance, 2))
+            for driver_id, distance in nearest if driver_id in drivers
+        ]), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,46 +1,65 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from src.models.models import Transfer, BloodUnit, Hospital, BloodBank, db
+from src.models.models import Transfer, BloodUnit, db
+from src.services.pagination import list_body
+from src.services.entity_cache import entity_cache
 
 transfers_bp = Blueprint('transfers', __name__)
 
 @transfers_bp.route('/transfers', methods=['GET'])
 def get_transfers():
-    """Get all transfers"""
+    """Get transfers, newest first, with optional filters and limit/cursor pagination"""
     try:
-        transfers = Transfer.query.all()
-        
-        result = []
-        for transfer in transfers:
-            transfer_dict = transfer.to_dict()
-            
-            # Add blood unit info
-            blood_unit = BloodUnit.query.get(transfer.blood_unit_id)
-            if blood_unit:
-                transfer_dict['blood_unit'] = {
-                    'blood_type': blood_unit.blood_type,
-                    'quantity_ml': blood_unit.quantity_ml,
-                    'expiry_date': blood_unit.expiry_date.isoformat() if blood_unit.expiry_date else None
-                }
-            
-            # Add entity names (try both hospital and blood bank)
-            from_entity = Hospital.query.get(transfer.from_entity_id) or BloodBank.query.get(transfer.from_entity_id)
-            to_entity = Hospital.query.get(transfer.to_entity_id) or BloodBank.query.get(transfer.to_entity_id)
-            
-            if from_entity:
-                transfer_dict['from_entity_name'] = from_entity.name
-                transfer_dict['from_entity_type'] = 'hospital' if isinstance(from_entity, Hospital) else 'blood_bank'
-            
-            if to_entity:
-                transfer_dict['to_entity_name'] = to_entity.name
-                transfer_dict['to_entity_type'] = 'hospital' if isinstance(to_entity, Hospital) else 'blood_bank'
-            
-            result.append(transfer_dict)
-        
-        return jsonify(result), 200
+        query = Transfer.query
+        for field in ('status', 'blood_unit_id', 'from_entity_id', 'to_entity_id'):
+            value = request.args.get(field)
+            if value:
+                query = query.filter(getattr(Transfer, field) == value)
+        
+        body = list_body(query, [Transfer.created_at, Transfer.id], request.args, transfer_rows, descending=True)
+        return jsonify(body), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def transfer_rows(transfers):
+    """Serialize transfers with blood unit details and entity names, each fetched in one query"""
+    unit_ids = {transfer.blood_unit_id for transfer in transfers}
+    units = {unit.id: unit for unit in BloodUnit.query.filter(BloodUnit.id.in_(unit_ids))} if unit_ids else {}
+    # Both ends of every transfer on the page, hospitals and blood banks alike, in one lookup
+    facilities = entity_cache.facilities(
+        [transfer.from_entity_id for transfer in transfers] + [transfer.to_entity_id for transfer in transfers]
+    )
+    
+    result = []
+    for transfer in transfers:
+        transfer_dict = transfer.to_dict()
+        
+        # Add blood unit info
+        blood_unit = units.get(transfer.blood_unit_id)
+        if blood_unit:
+            transfer_dict['blood_unit'] = {
+                'blood_type': blood_unit.blood_type,
+                'quantity_ml': blood_unit.quantity_ml,
+                'expiry_date': blood_unit.expiry_date.isoformat() if blood_unit.expiry_date else None
+            }
+        
+        # Add entity names
+        from_entity = facilities.get(transfer.from_entity_id)
+        to_entity = facilities.get(transfer.to_entity_id)
+        
+        if from_entity:
+            transfer_dict['from_entity_name'] = from_entity['name']
+            transfer_dict['from_entity_type'] = from_entity['kind']
+        
+        if to_entity:
+            transfer_dict['to_entity_name'] = to_entity['name']
+            transfer_dict['to_entity_type'] = to_entity['kind']
+        
+        result.append(transfer_dict)
+    return result
+
 @transfers_bp.route('/transfers/<transfer_id>', methods=['GET'])
 def get_transfer(transfer_id):
     """Get a specific transfer"""
@@ -61,16 +80,16 @@ def get_transfer(transfer_id):
             }
         
         # Add entity names
-        from_entity = Hospital.query.get(transfer.from_entity_id) or BloodBank.query.get(transfer.from_entity_id)
-        to_entity = Hospital.query.get(transfer.to_entity_id) or BloodBank.query.get(transfer.to_entity_id)
+        from_entity = entity_cache.facility(transfer.from_entity_id)
+        to_entity = entity_cache.facility(transfer.to_entity_id)
         
         if from_entity:
-            transfer_dict['from_entity_name'] = from_entity.name
-            transfer_dict['from_entity_type'] = 'hospital' if isinstance(from_entity, Hospital) else 'blood_bank'
+            transfer_dict['from_entity_name'] = from_entity['name']
+            transfer_dict['from_entity_type'] = from_entity['kind']
         
         if to_entity:
-            transfer_dict['to_entity_name'] = to_entity.name
-            transfer_dict['to_entity_type'] = 'hospital' if isinstance(to_entity, Hospital) else 'blood_bank'
+            transfer_dict['to_entity_name'] = to_entity['name']
+            transfer_dict['to_entity_type'] = to_entity['kind']
         
         return jsonify(transfer_dict), 200
     except Exception as e:
@@ -94,8 +113,8 @@ def create_transfer():
             return jsonify({'error': 'Blood unit not found'}), 404
         
         # Validate entities exist
-        from_entity = Hospital.query.get(data['from_entity_id']) or BloodBank.query.get(data['from_entity_id'])
-        to_entity = Hospital.query.get(data['to_entity_id']) or BloodBank.query.get(data['to_entity_id'])
+        from_entity = entity_cache.facility(data['from_entity_id'])
+        to_entity = entity_cache.facility(data['to_entity_id'])
         
         if not from_entity:
             return jsonify({'error': 'From entity not found'}), 404
@@ -122,8 +141,8 @@ def create_transfer():
         if transfer.status == 'completed':
             blood_unit.status = 'transferred'
             # Update location to destination
-            blood_unit.current_location_latitude = to_entity.latitude
-            blood_unit.current_location_longitude = to_entity.longitude
+            blood_unit.current_location_latitude = to_entity['latitude']
+            blood_unit.current_location_longitude = to_entity['longitude']
         
         db.session.commit()
         
@@ -153,10 +172,10 @@ def update_transfer(transfer_id):
                 if data['status'] == 'completed' and old_status != 'completed':
                     blood_unit.status = 'transferred'
                     # Update location to destination
-                    to_entity = Hospital.query.get(transfer.to_entity_id) or BloodBank.query.get(transfer.to_entity_id)
+                    to_entity = entity_cache.facility(transfer.to_entity_id)
                     if to_entity:
-                        blood_unit.current_location_latitude = to_entity.latitude
-                        blood_unit.current_location_longitude = to_entity.longitude
+                        blood_unit.current_location_latitude = to_entity['latitude']
+                        blood_unit.current_location_longitude = to_entity['longitude']
                 elif data['status'] == 'cancelled':
                     blood_unit.status = 'available'
         
@@ -1,9 +1,10 @@
 from flask import Blueprint, jsonify, request, session
 import hashlib
-import secrets
 from datetime import datetime, timedelta
 from src.models.user import User, db
 from src.models.models import Hospital, BloodBank, Driver
+from src.services.auth import current_principal, token_authority
+from src.services.pagination import list_body
 
 user_bp = Blueprint('user', __name__)
 
@@ -11,10 +12,6 @@ def hash_password(password):
     """Simple password hashing for demo purposes"""
     return hashlib.sha256(password.encode()).hexdigest()
 
-def generate_session_token():
-    """Generate a secure session token"""
-    return secrets.token_urlsafe(32)
-
 @user_bp.route('/auth/login', methods=['POST'])
 def login():
     """User login endpoint"""
@@ -39,10 +36,11 @@ def login():
         user.last_login = datetime.utcnow()
         db.session.commit()
         
-        # Generate session token
-        session_token = generate_session_token()
+        # Signed, expiring bearer token carrying the user's role and entity
+        session_token, expires_in = token_authority.issue(user)
         session['user_id'] = user.id
         session['role'] = user.role
+        session['token'] = session_token
         
         # Get entity details based on role
         entity_details = None
@@ -64,7 +62,9 @@ def login():
             'success': True,
             'user': user.to_dict_safe(),
             'entity_details': entity_details,
-            'session_token': session_token
+            'session_token': session_token,
+            'token_type': 'Bearer',
+            'expires_in': expires_in
         }), 200
         
     except Exception as e:
@@ -74,6 +74,10 @@ def login():
 def logout():
     """User logout endpoint"""
     try:
+        principal = current_principal()
+        if principal:
+            token_authority.revoke_token(principal)
+            db.session.commit()
         session.clear()
         return jsonify({'success': True, 'message': 'Logged out successfully'}), 200
     except Exception as e:
@@ -83,11 +87,11 @@ def logout():
 def get_current_user():
     """Get current authenticated user details"""
     try:
-        user_id = session.get('user_id')
-        if not user_id:
+        principal = current_principal()
+        if not principal:
             return jsonify({'error': 'Not authenticated'}), 401
         
-        user = User.query.get(user_id)
+        user = User.query.get(principal.id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
@@ -164,20 +168,29 @@ def register():
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    """Get all users (admin only)"""
+    """Get users (admin only), filtered by role/is_active and paginated with limit/cursor"""
     try:
         # Check if current user is admin
-        user_id = session.get('user_id')
-        if not user_id:
+        current_user = current_principal()
+        if not current_user:
             return jsonify({'error': 'Not authenticated'}), 401
         
-        current_user = User.query.get(user_id)
-        if not current_user or current_user.role != 'admin':
+        if current_user.role != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         
-        users = User.query.all()
-        return jsonify([user.to_dict_safe() for user in users]), 200
+        query = User.query
+        role = request.args.get('role')
+        is_active = request.args.get('is_active')
+        if role:
+            query = query.filter(User.role == role)
+        if is_active is not None:
+            query = query.filter(User.is_active == (is_active.lower() == 'true'))
         
+        body = list_body(query, [User.id], request.args, lambda rows: [user.to_dict_safe() for user in rows])
+        return jsonify(body), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -199,16 +212,12 @@ def update_user(user_id):
     """Update user details"""
     try:
         # Check if current user is admin or updating their own profile
-        current_user_id = session.get('user_id')
-        if not current_user_id:
-            return jsonify({'error': 'Not authenticated'}), 401
-        
-        current_user = User.query.get(current_user_id)
+        current_user = current_principal()
         if not current_user:
-            return jsonify({'error': 'Current user not found'}), 404
+            return jsonify({'error': 'Not authenticated'}), 401
         
         # Only allow admin or self-update
-        if current_user.role != 'admin' and current_user_id != user_id:
+        if current_user.role != 'admin' and current_user.id != user_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
         user = User.query.get(user_id)
@@ -218,13 +227,17 @@ def update_user(user_id):
         data = request.json
         
         # Update allowed fields
+        old_username, was_active = user.username, user.is_active
         if 'username' in data:
             user.username = data['username']
         if 'email' in data:
             user.email = data['email']
         if 'is_active' in data and current_user.role == 'admin':
             user.is_active = data['is_active']
-        
+
+        # Issued tokens carry the old username and were only handed to active users
+        if user.username != old_username or (was_active and not user.is_active):
+            token_authority.revoke_user(user.id)
         db.session.commit()
         
         return jsonify({
@@ -241,18 +254,18 @@ def delete_user(user_id):
     """Delete user (admin only)"""
     try:
         # Check if current user is admin
-        current_user_id = session.get('user_id')
-        if not current_user_id:
+        current_user = current_principal()
+        if not current_user:
             return jsonify({'error': 'Not authenticated'}), 401
         
-        current_user = User.query.get(current_user_id)
-        if not current_user or current_user.role != 'admin':
+        if current_user.role != 'admin':
             return jsonify({'error': 'Admin access required'}), 403
         
         user = User.query.get(user_id)
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
+        token_authority.revoke_user(user.id)
         db.session.delete(user)
         db.session.commit()
         
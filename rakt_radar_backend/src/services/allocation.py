@@ -0,0 +1,266 @@
+from datetime import date
+
+import numpy as np
+
+from src.models.models import BloodBank, InventorySummary, db
+from src.services.compatibility import donor_types, substitution_rank
+from src.services.eta import corridor_key, eta_service
+from src.services.geo import distances
+
+UNIT_VOLUME_ML = 450
+SHELF_LIFE_DAYS = 42
+# Costs are in minutes of travel. Each substitution rank and each unit of
+# unused shelf life (a unit that could have waited for another request) is
+# charged the equivalent of some minutes per 450 ml unit.
+SUBSTITUTION_MINUTES_PER_UNIT = 10.0
+SHELF_LIFE_MINUTES_PER_UNIT = 20.0
+# Candidate banks kept for the search, and the most banks a request is split across
+CANDIDATE_BANKS = 32
+MAX_SOURCE_BANKS = 8
+# Search nodes the exact pass may expand before settling for the heuristic answer
+NODE_BUDGET = 20000
+
+def travel_minutes(distance_km, urgency, corridors=None):
+    """Trip minutes per bank from the active ETA model, in one batch"""
+    return eta_service.predict_batch(distance_km, urgency, corridors=corridors)
+
+def load_offers(latitude, longitude, recipient, quantity_ml, urgency, today=None):
+    """Per-bank offers of compatible stock for a request, from one inventory summary query.
+
+    Each bank offers up to `quantity_ml`, drawn from its rows exact type first;
+    its fixed cost is the trip and its per-ml cost the substitution and
+    unused-shelf-life charges of the rows it would draw. Returns a dict of
+    parallel NumPy arrays plus the drawn rows per bank.
+    """
+    today = today or date.today()
+    usable = donor_types(recipient, urgency)
+    rows = db.session.query(InventorySummary, BloodBank.latitude, BloodBank.longitude).join(
+        BloodBank, BloodBank.id == InventorySummary.blood_bank_id
+    ).filter(
+        InventorySummary.blood_type.in_(usable),
+        InventorySummary.available_ml > 0
+    ).all()
+
+    banks = {}
+    for summary, lat, lon in rows:
+        banks.setdefault(summary.blood_bank_id, {'lat': lat, 'lon': lon, 'rows': []})['rows'].append(summary)
+
+    bank_ids, supply, per_ml, lats, lons, drawn = [], [], [], [], [], []
+    for bank_id, bank in banks.items():
+        taken, cost, plan = 0, 0.0, []
+        for summary in sorted(bank['rows'], key=lambda row: substitution_rank(recipient, row.blood_type)):
+            take = min(summary.available_ml, quantity_ml - taken)
+            if take <= 0:
+                break
+            days_to_expiry = summary.avg_days_until_expiry(today)
+            shelf_fraction = min(1.0, max(0.0, days_to_expiry) / SHELF_LIFE_DAYS)
+            unit_cost = (substitution_rank(recipient, summary.blood_type) * SUBSTITUTION_MINUTES_PER_UNIT
+                         + shelf_fraction * SHELF_LIFE_MINUTES_PER_UNIT)
+            cost += take / UNIT_VOLUME_ML * unit_cost
+            taken += take
+            plan.append((summary.blood_type, take, days_to_expiry))
+        bank_ids.append(bank_id)
+        supply.append(taken)
+        per_ml.append(cost / taken)
+        lats.append(bank['lat'])
+        lons.append(bank['lon'])
+        drawn.append(plan)
+
+    supply = np.array(supply, dtype=np.float64)
+    distance_km = distances((latitude, longitude), lats, lons) if bank_ids else np.zeros(0)
+    return {
+        'bank_ids': bank_ids,
+        'supply': supply,
+        'fixed': travel_minutes(np.asarray(distance_km, dtype=np.float64), urgency,
+                                [corridor_key(lat, lon, latitude, longitude) for lat, lon in zip(lats, lons)]),
+        'per_ml': np.array(per_ml, dtype=np.float64),
+        'distance_km': np.asarray(distance_km, dtype=np.float64),
+        'drawn': drawn
+    }
+
+def fill_cost(chosen, supply, fixed, per_ml, need):
+    """Cost and amounts of meeting `need` from the chosen banks, cheapest per-ml first"""
+    chosen = np.asarray(chosen, dtype=np.int64)
+    if chosen.size == 0 or supply[chosen].sum() < need:
+        return np.inf, None
+    order = chosen[np.argsort(per_ml[chosen], kind='stable')]
+    cumulative = np.cumsum(supply[order])
+    amounts = np.minimum(supply[order], np.maximum(0.0, need - (cumulative - supply[order])))
+    used = amounts > 0
+    order, amounts = order[used], amounts[used]
+    return float(fixed[order].sum() + (per_ml[order] * amounts).sum()), dict(zip(order.tolist(), amounts.tolist()))
+
+def lower_bound(supply, fixed, per_ml, need):
+    """LP-relaxation bound: any split costs at least need x the best per-ml rates.
+
+    A bank supplying x <= s ml costs f + p*x >= (f/s + p)*x, so filling the
+    need fractionally at the cheapest (f/s + p) rates can never be beaten.
+    """
+    rate = fixed / supply + per_ml
+    order = np.argsort(rate, kind='stable')
+    cumulative = np.cumsum(supply[order])
+    amounts = np.minimum(supply[order], np.maximum(0.0, need - (cumulative - supply[order])))
+    return float((rate[order] * amounts).sum())
+
+def solve_split(supply, fixed, per_ml, need, max_banks=MAX_SOURCE_BANKS):
+    """Choose source banks minimizing trip plus per-ml cost for `need` ml.
+
+    Greedy by effective rate (trip cost spread over the bank's supply, plus
+    per-ml cost), then drop/swap/add local search over the best-rate
+    candidates until no move improves. The best single-bank cover is also
+    tried, and the result seeds a budgeted branch-and-bound that proves or
+    improves it. Returns (amounts by offer index, cost); amounts is None when
+    the offers cannot cover the need.
+    """
+    supply = np.minimum(supply, need)
+    rate = fixed / supply + per_ml
+    candidates = [int(i) for i in np.argsort(rate, kind='stable')[:CANDIDATE_BANKS]]
+
+    chosen, covered = [], 0.0
+    for index in candidates:
+        if covered >= need or len(chosen) >= max_banks:
+            break
+        chosen.append(index)
+        covered += supply[index]
+    if covered < need:
+        # The best-rate banks ran out of room; fall back to the largest suppliers
+        chosen = [int(i) for i in np.argsort(-supply, kind='stable')[:max_banks]]
+        candidates = sorted(set(candidates) | set(chosen))
+    best_cost, best_amounts = fill_cost(chosen, supply, fixed, per_ml, need)
+    if best_amounts is None:
+        return None, np.inf
+    chosen = list(best_amounts)
+
+    singles = np.flatnonzero(supply >= need)
+    if singles.size:
+        single = int(singles[np.argmin(fixed[singles] + per_ml[singles] * need)])
+        cost, amounts = fill_cost([single], supply, fixed, per_ml, need)
+        if cost < best_cost:
+            best_cost, best_amounts, chosen = cost, amounts, [single]
+
+    improved = True
+    while improved:
+        improved = False
+        outside = [index for index in candidates if index not in chosen]
+        moves = [[index for index in chosen if index != drop] for drop in chosen]
+        moves += [[index for index in chosen if index != drop] + [add] for drop in chosen for add in outside]
+        if len(chosen) < max_banks:
+            moves += [chosen + [add] for add in outside]
+        for move in moves:
+            cost, amounts = fill_cost(move, supply, fixed, per_ml, need)
+            if cost < best_cost - 1e-9:
+                best_cost, best_amounts = cost, amounts
+                improved = True
+        if improved:
+            chosen = list(best_amounts)
+
+    subset, cost = branch_and_bound(supply, fixed, per_ml, need, candidates, max_banks, best_cost)
+    if subset is not None:
+        best_cost, best_amounts = fill_cost(subset, supply, fixed, per_ml, need)
+    return best_amounts, best_cost
+
+def branch_and_bound(supply, fixed, per_ml, need, candidates, max_banks, incumbent, node_budget=NODE_BUDGET):
+    """Exact include/exclude search over the candidates, pruned by the LP bound.
+
+    Banks are branched in effective-rate order. At each node the chosen banks'
+    trips are paid and their stock costs per-ml only, while undecided banks
+    cost their effective rate; filling the remaining need at the cheapest of
+    those rates bounds every completion. Returns (subset, cost) beating
+    `incumbent`, or (None, incumbent) if nothing better turns up within the budget.
+    """
+    order = sorted(candidates, key=lambda i: fixed[i] / supply[i] + per_ml[i])
+    items = [(float(supply[i]), float(fixed[i]), float(per_ml[i])) for i in order]
+    rates = [f / s + p for s, f, p in items]
+    best = [incumbent, None]
+    nodes = [0]
+
+    def bound(chosen_fixed, chosen_rates, k):
+        remaining, total = need, chosen_fixed
+        for rate, capacity in sorted(chosen_rates + [(rates[j], items[j][0]) for j in range(k, len(items))]):
+            take = min(capacity, remaining)
+            total += rate * take
+            remaining -= take
+            if remaining <= 0:
+                return total
+        return float('inf')
+
+    def search(k, chosen, chosen_fixed, chosen_rates, covered):
+        nodes[0] += 1
+        if nodes[0] > node_budget:
+            return
+        if covered >= need:
+            remaining, total = need, chosen_fixed
+            for rate, capacity in sorted(chosen_rates):
+                take = min(capacity, remaining)
+                total += rate * take
+                remaining -= take
+            if total < best[0] - 1e-9:
+                best[0], best[1] = total, list(chosen)
+            return
+        if k == len(items) or len(chosen) >= max_banks:
+            return
+        if bound(chosen_fixed, chosen_rates, k) >= best[0] - 1e-9:
+            return
+        capacity, trip, rate = items[k]
+        chosen.append(order[k])
+        search(k + 1, chosen, chosen_fixed + trip, chosen_rates + [(rate, capacity)], covered + capacity)
+        chosen.pop()
+        search(k + 1, chosen, chosen_fixed, chosen_rates, covered)
+
+    search(0, [], 0.0, [], 0.0)
+    return best[1], best[0]
+
+def plan_allocation(latitude, longitude, recipient, quantity_ml, urgency, forced_bank_id=None, today=None):
+    """Split a request across source banks.
+
+    Returns {'legs': [{'blood_bank_id', 'quantity_ml', 'blood_types',
+    'avg_days_until_expiry', 'distance_km', 'travel_minutes'}], 'cost',
+    'lower_bound'} with legs nearest first, or None
+    when compatible stock across the network falls short. `forced_bank_id`
+    (e.g. the approving bank) is always a source when it has stock.
+    """
+    offers = load_offers(latitude, longitude, recipient, quantity_ml, urgency, today)
+    supply = np.minimum(offers['supply'], quantity_ml)
+
+    # The forced bank gives all it can; the rest of the network covers the remainder
+    amounts, need = {}, float(quantity_ml)
+    if forced_bank_id in offers['bank_ids']:
+        forced = offers['bank_ids'].index(forced_bank_id)
+        amounts[forced] = supply[forced]
+        need -= supply[forced]
+        supply = supply.copy()
+        supply[forced] = 0.0
+    if need > 0:
+        others = np.flatnonzero(supply > 0)
+        if not others.size:
+            return None
+        split, _ = solve_split(supply[others], offers['fixed'][others], offers['per_ml'][others], need)
+        if split is None:
+            return None
+        amounts.update({int(others[index]): amount for index, amount in split.items()})
+    cost = sum(offers['fixed'][index] + offers['per_ml'][index] * amount for index, amount in amounts.items())
+
+    legs = []
+    for index, amount in amounts.items():
+        remaining, types, expiry_ml_days = amount, [], 0.0
+        for blood_type, take, days_to_expiry in offers['drawn'][index]:
+            if remaining <= 0:
+                break
+            types.append(blood_type)
+            expiry_ml_days += min(take, remaining) * days_to_expiry
+            remaining -= take
+        legs.append({
+            'blood_bank_id': offers['bank_ids'][index],
+            'quantity_ml': int(round(amount)),
+            'blood_types': types,
+            'avg_days_until_expiry': round(expiry_ml_days / amount, 1),
+            'distance_km': round(float(offers['distance_km'][index]), 2),
+            'travel_minutes': round(float(offers['fixed'][index]), 1)
+        })
+    legs.sort(key=lambda leg: leg['distance_km'])
+    supply = np.minimum(offers['supply'], quantity_ml)
+    return {
+        'legs': legs,
+        'cost': round(float(cost), 2),
+        'lower_bound': round(lower_bound(supply, offers['fixed'], offers['per_ml'], quantity_ml), 2)
+    }
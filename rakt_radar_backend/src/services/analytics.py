@@ -0,0 +1,166 @@
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, func, literal, select, union
+from sqlalchemy.orm import Session
+
+from src.models.models import (BloodBank, BloodUnit, EmergencyRequest, Hospital, InventorySummary,
+                               RequestItem, Route, db)
+
+BLOOD_TYPES = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+DASHBOARD_TTL_SECONDS = 30
+# NBTC processing charge for one unit of whole blood; a unit delivered through the
+# network is one the hospital did not have to source and process fresh
+UNIT_PROCESSING_COST_INR = 1550
+UNIT_VOLUME_ML = 450
+LOW_STOCK_ML = 2 * UNIT_VOLUME_ML
+
+def _elapsed_hours(start, end):
+    """Dialect-appropriate SQL expression for the hours between two timestamp columns"""
+    if db.engine.dialect.name == 'postgresql':
+        return func.extract('epoch', end - start) / 3600.0
+    return (func.julianday(end) - func.julianday(start)) * 24.0
+
+def compute_dashboard():
+    """Dashboard statistics from two aggregate queries.
+
+    The first groups blood units by type, status and expiry flag; the second
+    collects the network, delivery and stock-alert figures as scalar subqueries.
+    """
+    inventory = {
+        'total_blood_units': 0,
+        'available_units': 0,
+        'flagged_for_expiry': 0,
+        'expired_units': 0,
+        'transferred_units': 0
+    }
+    by_type = dict.fromkeys(BLOOD_TYPES, 0)
+    grouped = db.session.query(
+        BloodUnit.blood_type, BloodUnit.status, BloodUnit.is_flagged_for_expiry, func.count()
+    ).group_by(BloodUnit.blood_type, BloodUnit.status, BloodUnit.is_flagged_for_expiry)
+    for blood_type, status, flagged, count in grouped:
+        inventory['total_blood_units'] += count
+        by_type[blood_type] = by_type.get(blood_type, 0) + count
+        if status == 'available':
+            inventory['available_units'] += count
+        elif status == 'expired':
+            inventory['expired_units'] += count
+        elif status == 'transferred':
+            inventory['transferred_units'] += count
+        if flagged:
+            inventory['flagged_for_expiry'] += count
+
+    now = literal(datetime.utcnow())
+    delivery_hours = _elapsed_hours(Route.started_at, Route.completed_at)
+    cities = union(select(Hospital.city), select(BloodBank.city)).subquery()
+    completed = (Route.status == 'completed') & Route.started_at.isnot(None) & Route.completed_at.isnot(None)
+    network = db.session.execute(select(
+        select(func.count()).select_from(Hospital).scalar_subquery().label('hospitals'),
+        select(func.count()).select_from(BloodBank).scalar_subquery().label('blood_banks'),
+        select(func.count()).select_from(cities).scalar_subquery().label('cities'),
+        select(func.count()).where(completed).select_from(Route).scalar_subquery().label('completed_routes'),
+        select(func.avg(delivery_hours)).where(completed).scalar_subquery().label('avg_delivery_hours'),
+        select(func.coalesce(func.sum(RequestItem.quantity_ml), 0))
+            .join(Route, Route.request_id == RequestItem.request_id)
+            .where(completed).scalar_subquery().label('delivered_ml'),
+        select(func.count()).select_from(Route).where(
+            Route.status == 'active',
+            _elapsed_hours(Route.started_at, now) * 60 > Route.eta_minutes
+        ).scalar_subquery().label('overdue_routes'),
+        select(func.count()).select_from(InventorySummary)
+            .where(InventorySummary.available_ml < LOW_STOCK_ML).scalar_subquery().label('low_stock'),
+        select(func.count()).select_from(EmergencyRequest)
+            .where(EmergencyRequest.status == 'created').scalar_subquery().label('open_requests')
+    )).one()
+
+    total = inventory['total_blood_units']
+    delivered_units = (network.delivered_ml or 0) / UNIT_VOLUME_ML
+    return {
+        'inventory_summary': inventory,
+        'network_summary': {
+            'total_hospitals': network.hospitals,
+            'total_blood_banks': network.blood_banks,
+            'active_connections': network.hospitals + network.blood_banks,
+            'coverage_cities': network.cities
+        },
+        'efficiency_metrics': {
+            'wastage_prevention_rate': round(((total - inventory['expired_units']) / max(total, 1)) * 100, 1),
+            'transfer_success_rate': round((inventory['transferred_units'] / max(total, 1)) * 100, 1),
+            'average_response_time_hours': round(network.avg_delivery_hours or 0.0, 2),
+            'completed_deliveries': network.completed_routes,
+            'units_delivered': round(delivered_units, 1),
+            'cost_savings_inr': round(delivered_units * UNIT_PROCESSING_COST_INR, 2)
+        },
+        'blood_type_distribution': by_type,
+        'alerts': {
+            'critical_expiry_alerts': inventory['flagged_for_expiry'],
+            'low_stock_alerts': network.low_stock,
+            'system_alerts': network.overdue_routes,
+            'open_requests': network.open_requests
+        },
+        'generated_at': datetime.utcnow().isoformat()
+    }
+
+
+class TTLCache:
+    """A single cached value that expires after `ttl` seconds or on invalidate().
+
+    A compute that was running when invalidate() came in still returns its value
+    to its caller but does not store it, since it may predate the commit.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, compute):
+        with self._lock:
+            if self._value is not None and time.monotonic() < self._expires_at:
+                self.hits += 1
+                return self._value
+            generation = self._generation
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            if generation == self._generation:
+                self._value = value
+                self._expires_at = time.monotonic() + self.ttl
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._value = None
+            self._expires_at = 0.0
+
+
+dashboard_cache = TTLCache(DASHBOARD_TTL_SECONDS)
+
+def get_dashboard():
+    """Cached dashboard statistics, recomputed at most once per TTL between writes"""
+    return dashboard_cache.get_or_compute(compute_dashboard)
+
+# Models whose changes move a dashboard figure
+_DASHBOARD_MODELS = (BloodUnit, Hospital, BloodBank, Route, RequestItem, EmergencyRequest)
+
+@event.listens_for(Session, 'before_flush')
+def _note_dashboard_writes(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, _DASHBOARD_MODELS):
+            session.info['dashboard_stale'] = True
+            return
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_dashboard(session):
+    if session.info.pop('dashboard_stale', False):
+        dashboard_cache.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_dashboard_writes(session):
+    session.info.pop('dashboard_stale', None)
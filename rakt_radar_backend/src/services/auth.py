@@ -0,0 +1,253 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import g, request, session
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+from src.models.user import TokenRevocation, User, db
+
+TOKEN_SALT = 'rakt-radar-auth'
+DEFAULT_TOKEN_TTL_SECONDS = 12 * 3600
+# How stale another worker's revocations may be before this one re-reads them
+REVOCATION_REFRESH_SECONDS = 30
+PRINCIPAL_CACHE_SIZE = 1024
+# How long a cached user record vouches for a token's claims before it is re-read
+PRINCIPAL_CACHE_TTL_SECONDS = 30
+# The key main.py used to ship with; anyone with the source can sign tokens and sessions with it
+LEGACY_SECRET_KEYS = frozenset({'asdf#FGSgvasgf$5$WGT'})
+EPOCH = datetime(1970, 1, 1)
+
+def epoch_seconds(moment):
+    return (moment - EPOCH).total_seconds()
+
+def require_secret_key(app):
+    """Refuse to run without a private SECRET_KEY: a missing or published key lets anyone sign tokens"""
+    secret_key = app.config.get('SECRET_KEY')
+    if not secret_key:
+        raise RuntimeError('SECRET_KEY is not set; export a long random value, '
+                           'e.g. python -c "import secrets; print(secrets.token_hex(32))"')
+    if secret_key in LEGACY_SECRET_KEYS:
+        raise RuntimeError('SECRET_KEY is the key published with the source; generate a new one')
+
+
+class Principal:
+    """The authenticated caller: the claims handlers authorize on, with no User row behind it"""
+    __slots__ = ('id', 'username', 'role', 'entity_id', 'token_id', 'issued_at')
+    # Tokens are only issued to, and cached principals only built for, active users
+    is_active = True
+
+    def __init__(self, id, username, role, entity_id, token_id=None, issued_at=None):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.entity_id = entity_id
+        self.token_id = token_id
+        self.issued_at = issued_at
+
+    @classmethod
+    def from_user(cls, user, token_id=None, issued_at=None):
+        return cls(user.id, user.username, user.role, user.entity_id, token_id, issued_at)
+
+    def claims(self):
+        return {'sub': self.id, 'username': self.username, 'role': self.role, 'entity_id': self.entity_id,
+                'jti': self.token_id, 'iat': self.issued_at}
+
+
+class TokenAuthority:
+    """Issues and verifies signed, expiring bearer tokens and keeps the revocation list.
+
+    A token is the user's id, username, role and entity_id signed with the app's
+    SECRET_KEY. Its claims are only trusted while they match the stored user,
+    which is read through a small LRU of principals (re-read after
+    PRINCIPAL_CACHE_TTL_SECONDS) rather than once per request; cookie sessions
+    from before tokens, which only hold a user_id, resolve through the same
+    LRU. Revocations (one token on logout; every earlier token of a user on
+    deactivation, rename or deletion) are stored in token_revocations and
+    mirrored in memory, re-read every REVOCATION_REFRESH_SECONDS so revocations
+    made by other workers apply too.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TOKEN_TTL_SECONDS, cache_size=PRINCIPAL_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self._serializer = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._revoked_tokens = {}  # jti -> expires_at (epoch seconds)
+        self._revoked_users = {}  # user_id -> revoked_at (epoch seconds)
+        self._refreshed_at = None
+        self._principals = OrderedDict()  # user_id -> (Principal, loaded_at)
+        self.issued = 0
+        self.verified = 0
+        self.rejected = 0
+        self.expired = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def init_app(self, app):
+        """Sign with SECRET_KEY, read AUTH_TOKEN_TTL_SECONDS and resolve the caller before every request"""
+        require_secret_key(app)
+        self._serializer = URLSafeTimedSerializer(app.secret_key, salt=TOKEN_SALT)
+        self.ttl_seconds = app.config.get('AUTH_TOKEN_TTL_SECONDS', DEFAULT_TOKEN_TTL_SECONDS)
+        with self._lock:
+            self._reset()
+        app.before_request(self.load_principal)
+
+    def issue(self, user):
+        """A fresh bearer token for an active user, and its lifetime in seconds"""
+        if self._serializer is None:
+            raise RuntimeError('TokenAuthority.init_app() has not been called; no signing key')
+        issued_at = time.time()
+        principal = Principal.from_user(user, uuid.uuid4().hex, issued_at)
+        with self._lock:
+            self.issued += 1
+            # The user was just read to log in, so the token's first requests need not read it again
+            self._remember(Principal.from_user(user), issued_at)
+        return self._serializer.dumps(principal.claims()), self.ttl_seconds
+
+    def verify(self, token):
+        """The token's Principal, or None when it is forged, expired, revoked or no longer matches its user"""
+        try:
+            claims = self._serializer.loads(token, max_age=self.ttl_seconds)
+        except SignatureExpired:
+            with self._lock:
+                self.expired += 1
+            return None
+        except BadSignature:
+            with self._lock:
+                self.rejected += 1
+            return None
+
+        self._refresh_revocations()
+        with self._lock:
+            if (claims['jti'] in self._revoked_tokens
+                    or claims['iat'] <= self._revoked_users.get(claims['sub'], float('-inf'))):
+                self.rejected += 1
+                return None
+
+        # A valid signature only proves the claims were once true; the user must still hold them
+        stored = self.cached_principal(claims.get('sub'))
+        with self._lock:
+            if (stored is None or stored.username != claims.get('username') or stored.role != claims.get('role')
+                    or stored.entity_id != claims.get('entity_id')):
+                self.rejected += 1
+                return None
+            self.verified += 1
+        return Principal(stored.id, stored.username, stored.role, stored.entity_id, claims['jti'], claims['iat'])
+
+    def cached_principal(self, user_id):
+        """Principal for an active user id, or None; one users-table read per user per PRINCIPAL_CACHE_TTL_SECONDS"""
+        if not user_id:
+            return None
+        self._refresh_revocations()
+        now = time.time()
+        with self._lock:
+            entry = self._principals.get(user_id)
+            if (entry and entry[1] > self._revoked_users.get(user_id, float('-inf'))
+                    and now - entry[1] < PRINCIPAL_CACHE_TTL_SECONDS):
+                self._principals.move_to_end(user_id)
+                self.cache_hits += 1
+                return entry[0]
+            self._principals.pop(user_id, None)
+            self.cache_misses += 1
+
+        user = db.session.get(User, user_id)
+        if not user or not user.is_active:
+            return None
+        principal = Principal.from_user(user)
+        with self._lock:
+            self._remember(principal, now)
+        return principal
+
+    def _remember(self, principal, loaded_at):
+        # Called with the lock held
+        self._principals[principal.id] = (principal, loaded_at)
+        self._principals.move_to_end(principal.id)
+        while len(self._principals) > self.cache_size:
+            self._principals.popitem(last=False)
+
+    def _refresh_revocations(self, force=False):
+        now = time.monotonic()
+        if not force and self._refreshed_at is not None and now - self._refreshed_at < REVOCATION_REFRESH_SECONDS:
+            return
+        try:
+            rows = TokenRevocation.query.filter(TokenRevocation.expires_at > datetime.utcnow()).all()
+        except Exception as e:
+            # Keep serving from the last good list rather than failing every request
+            db.session.rollback()
+            print(f"❌ Token revocation refresh failed: {e}")
+            return
+        revoked_tokens, revoked_users = {}, {}
+        for row in rows:
+            if row.id.startswith('user:'):
+                revoked_users[row.user_id] = epoch_seconds(row.revoked_at)
+            else:
+                revoked_tokens[row.id] = epoch_seconds(row.expires_at)
+        with self._lock:
+            self._revoked_tokens = revoked_tokens
+            self._revoked_users = revoked_users
+            self._refreshed_at = now
+
+    def _purge_expired(self):
+        TokenRevocation.query.filter(TokenRevocation.expires_at <= datetime.utcnow()).delete()
+
+    def revoke_token(self, principal):
+        """Revoke one token (the caller commits)"""
+        if not principal.token_id:
+            return
+        expires_at = EPOCH + timedelta(seconds=principal.issued_at + self.ttl_seconds)
+        self._purge_expired()
+        db.session.merge(TokenRevocation(id=principal.token_id, user_id=principal.id, expires_at=expires_at))
+        with self._lock:
+            self._revoked_tokens[principal.token_id] = epoch_seconds(expires_at)
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to a user so far and drop their cached principal (the caller commits)"""
+        now = datetime.utcnow()
+        self._purge_expired()
+        db.session.merge(TokenRevocation(id=f'user:{user_id}', user_id=user_id, revoked_at=now,
+                                         expires_at=now + timedelta(seconds=self.ttl_seconds)))
+        with self._lock:
+            self._revoked_users[user_id] = epoch_seconds(now)
+            self._principals.pop(user_id, None)
+
+    def load_principal(self):
+        """before_request hook: g.principal from the bearer token, else the session's token or user_id"""
+        g.principal = None
+        header = request.headers.get('Authorization', '')
+        if header.startswith('Bearer '):
+            g.principal = self.verify(header[len('Bearer '):].strip())
+        elif session.get('token'):
+            g.principal = self.verify(session['token'])
+        elif session.get('user_id'):
+            g.principal = self.cached_principal(session['user_id'])
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'token_ttl_seconds': self.ttl_seconds,
+                'issued': self.issued,
+                'verified': self.verified,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'revoked_tokens': len(self._revoked_tokens),
+                'revoked_users': len(self._revoked_users),
+                'cached_principals': len(self._principals),
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses
+            }
+
+
+token_authority = TokenAuthority()
+
+def current_principal():
+    """The authenticated caller for this request, or None"""
+    if 'principal' not in g:
+        # Apps that never installed the hook (e.g. ad-hoc test apps) resolve on first use
+        token_authority.load_principal()
+    return g.principal
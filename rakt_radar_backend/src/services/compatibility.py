@@ -0,0 +1,84 @@
+import numpy as np
+
+BLOOD_TYPES = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+TYPE_BIT = {blood_type: 1 << index for index, blood_type in enumerate(BLOOD_TYPES)}
+UNIVERSAL_DONOR = 'O-'
+
+# Red-cell antigens carried by each type: A, B and RhD
+ANTIGEN_A, ANTIGEN_B, ANTIGEN_RHD = 1, 2, 4
+
+def antigens(blood_type):
+    """Antigen bitmask of an ABO/Rh type such as 'AB-'"""
+    group, rh = blood_type[:-1], blood_type[-1]
+    mask = ANTIGEN_RHD if rh == '+' else 0
+    if 'A' in group:
+        mask |= ANTIGEN_A
+    if 'B' in group:
+        mask |= ANTIGEN_B
+    return mask
+
+_ANTIGENS = np.array([antigens(blood_type) for blood_type in BLOOD_TYPES], dtype=np.uint8)
+
+# COMPATIBLE[recipient, donor]: the donor's red cells carry no antigen the recipient lacks
+COMPATIBLE = (_ANTIGENS[np.newaxis, :] & ~_ANTIGENS[:, np.newaxis]) == 0
+
+# Antigens the recipient has but the donor lacks; 0 is an exact match, and the
+# more a donor lacks the more recipients it could serve, so the later we use it
+SUBSTITUTION_RANK = np.where(
+    COMPATIBLE,
+    np.vectorize(lambda mask: bin(int(mask)).count('1'))(_ANTIGENS[:, np.newaxis] & ~_ANTIGENS[np.newaxis, :]),
+    -1
+)
+
+# DONOR_MASK[recipient]: bitmask over BLOOD_TYPES of every compatible donor
+DONOR_MASK = {
+    recipient: sum(TYPE_BIT[donor] for j, donor in enumerate(BLOOD_TYPES) if COMPATIBLE[i, j])
+    for i, recipient in enumerate(BLOOD_TYPES)
+}
+
+def types_in_mask(mask):
+    return [blood_type for blood_type in BLOOD_TYPES if mask & TYPE_BIT[blood_type]]
+
+def donor_mask(recipient, urgency='high'):
+    """Donor types usable for a request, as a bitmask.
+
+    Universal-donor O- is held back for critical requests (and O- recipients,
+    who can receive nothing else).
+    """
+    if recipient not in DONOR_MASK:
+        raise ValueError(f'Unknown blood type {recipient!r}')
+    mask = DONOR_MASK[recipient]
+    if recipient != UNIVERSAL_DONOR and urgency != 'critical':
+        mask &= ~TYPE_BIT[UNIVERSAL_DONOR]
+    return mask
+
+def substitution_rank(recipient, donor):
+    """0 for an exact match, higher for more universal substitutes, -1 if incompatible"""
+    return int(SUBSTITUTION_RANK[BLOOD_TYPES.index(recipient), BLOOD_TYPES.index(donor)])
+
+def donor_types(recipient, urgency='high'):
+    """Usable donor types, exact match first, then substitutes from least to most universal"""
+    return sorted(types_in_mask(donor_mask(recipient, urgency)), key=lambda donor: substitution_rank(recipient, donor))
+
+def is_compatible(recipient, donor):
+    return bool(DONOR_MASK.get(recipient, 0) & TYPE_BIT.get(donor, 0))
+
+def plan_cover(recipient, stock_rows, quantity_ml, urgency='high'):
+    """Pick stock rows (anything with blood_type and available_ml) to cover a request.
+
+    Rows are taken exact match first, then least-universal substitutes, until
+    the quantity is met. Returns (rows used, worst substitution rank), or
+    (None, None) when the usable stock falls short.
+    """
+    usable = donor_mask(recipient, urgency)
+    rows = sorted(
+        (row for row in stock_rows if usable & TYPE_BIT.get(row.blood_type, 0) and row.available_ml > 0),
+        key=lambda row: substitution_rank(recipient, row.blood_type)
+    )
+    used, covered = [], 0
+    for row in rows:
+        used.append(row)
+        covered += row.available_ml
+        if covered >= quantity_ml:
+            return used, substitution_rank(recipient, row.blood_type)
+    return None, None
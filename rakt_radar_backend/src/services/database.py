@@ -0,0 +1,124 @@
+import os
+
+from sqlalchemy import event, inspect
+
+DEFAULT_DATABASE_URL = 'sqlite:///rakt_radar.db'
+
+# PostgreSQL pool defaults, sized for one threaded server process
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+POOL_TIMEOUT_SECONDS = 30
+POOL_RECYCLE_SECONDS = 1800
+STATEMENT_TIMEOUT_MS = 15000
+
+# Single-node SQLite profile: WAL lets readers run alongside the one writer,
+# NORMAL sync drops the per-commit fsync of the WAL (still crash-safe), and
+# writers wait for the lock instead of failing straight away
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_SYNCHRONOUS = 'NORMAL'
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+def database_url(environ=os.environ):
+    """DATABASE_URL, defaulting to the local SQLite file; postgres:// is accepted for postgresql://"""
+    url = environ.get('DATABASE_URL') or DEFAULT_DATABASE_URL
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def is_sqlite(url):
+    return url.startswith('sqlite')
+
+def engine_options(url, environ=os.environ):
+    """SQLALCHEMY_ENGINE_OPTIONS for the backend in `url`, tunable through DB_* environment variables"""
+    if is_sqlite(url):
+        # The driver's own lock wait, matching busy_timeout
+        return {'connect_args': {'timeout': int(environ.get('SQLITE_BUSY_TIMEOUT_MS', SQLITE_BUSY_TIMEOUT_MS)) / 1000}}
+
+    options = {
+        'pool_size': int(environ.get('DB_POOL_SIZE', POOL_SIZE)),
+        'max_overflow': int(environ.get('DB_MAX_OVERFLOW', MAX_OVERFLOW)),
+        'pool_timeout': int(environ.get('DB_POOL_TIMEOUT', POOL_TIMEOUT_SECONDS)),
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', POOL_RECYCLE_SECONDS)),
+        # Replace connections the server dropped (restarts, idle timeouts) before handing them out
+        'pool_pre_ping': True
+    }
+    if url.startswith('postgresql'):
+        timeout_ms = int(environ.get('DB_STATEMENT_TIMEOUT_MS', STATEMENT_TIMEOUT_MS))
+        options['connect_args'] = {
+            'options': f'-c statement_timeout={timeout_ms}',
+            'application_name': environ.get('DB_APPLICATION_NAME', 'rakt_radar')
+        }
+    return options
+
+def sqlite_pragmas(environ=os.environ):
+    """PRAGMAs run on every new SQLite connection; SQLITE_TUNING=0 leaves SQLite's defaults alone"""
+    if environ.get('SQLITE_TUNING', '1') == '0':
+        return {}
+    return {
+        'journal_mode': environ.get('SQLITE_JOURNAL_MODE', SQLITE_JOURNAL_MODE),
+        'synchronous': environ.get('SQLITE_SYNCHRONOUS', SQLITE_SYNCHRONOUS),
+        'busy_timeout': int(environ.get('SQLITE_BUSY_TIMEOUT_MS', SQLITE_BUSY_TIMEOUT_MS)),
+        'mmap_size': int(environ.get('SQLITE_MMAP_SIZE', SQLITE_MMAP_SIZE))
+    }
+
+def init_app(app, db):
+    """Apply the app's SQLITE_PRAGMAS to each connection of a SQLite engine; other backends need nothing"""
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    in_memory = engine.url.database in (None, '', ':memory:')
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            # Memory databases have no journal file to switch to WAL
+            if name == 'journal_mode' and in_memory:
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+def database_metrics(db):
+    """Backend, applied SQLite settings or connection pool occupancy"""
+    engine = db.engine
+    pool = engine.pool
+    metrics = {'backend': engine.dialect.name, 'pool': {'class': type(pool).__name__}}
+    if hasattr(pool, 'checkedout'):
+        metrics['pool'].update(size=pool.size(), checked_out=pool.checkedout(), checked_in=pool.checkedin(),
+                               overflow=pool.overflow())
+    if engine.dialect.name == 'sqlite':
+        with engine.connect() as connection:
+            metrics['pragmas'] = {
+                name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size')
+            }
+    return metrics
+
+def add_missing_columns(db, model):
+    """ALTER TABLE ... ADD COLUMN for the model's columns its existing table lacks; returns their names.
+
+    create_all() only creates missing tables, so columns added to a model never
+    reach a database created before them. Columns with a scalar default get it
+    as the server default (and keep NOT NULL); others are added nullable.
+    Running it again once the table is current does nothing.
+    """
+    table = model.__table__
+    engine = db.engine
+    existing = {column['name'] for column in inspect(engine).get_columns(table.name)}
+    missing = [column for column in table.columns if column.name not in existing]
+    if not missing:
+        return []
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as connection:
+        for column in missing:
+            ddl = f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column.type.compile(dialect=engine.dialect)}'
+            default = column.default.arg if column.default is not None and column.default.is_scalar else None
+            if default is not None:
+                ddl += f' DEFAULT {default!r}'
+                if not column.nullable:
+                    ddl += ' NOT NULL'
+            connection.exec_driver_sql(ddl)
+    return [column.name for column in missing]
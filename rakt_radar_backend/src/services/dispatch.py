@@ -0,0 +1,110 @@
+import numpy as np
+
+from src.models.models import Driver, Route, db
+from src.models.user import User
+from src.services.geo import distance_matrix
+from src.services.spatial_index import get_driver_index
+
+# Nearest drivers considered per pickup before the joint assignment
+NEAREST_DRIVERS = 5
+
+def hungarian(cost):
+    """Minimum-cost assignment of rows to distinct columns (Kuhn-Munkres, O(n^2 m)).
+
+    Returns the assigned column for each row; with more rows than columns the
+    unassigned rows get -1.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    n, m = cost.shape
+    if n > m:
+        rows = [-1] * n
+        for column, row in enumerate(hungarian(cost.T)):
+            if row >= 0:
+                rows[row] = column
+        return rows
+
+    # Row/column potentials and the row matched to each column, 1-based with column 0 as the root
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    match = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        min_reduced = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        # Grow a shortest augmenting path from the new row until it reaches a free column
+        while True:
+            used[column] = True
+            current = match[column]
+            free = ~used[1:]
+            reduced = cost[current - 1] - u[current] - v[1:]
+            better = free & (reduced < min_reduced[1:])
+            min_reduced[1:][better] = reduced[better]
+            way[1:][better] = column
+            masked = np.where(free, min_reduced[1:], np.inf)
+            next_column = int(np.argmin(masked)) + 1
+            delta = masked[next_column - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            min_reduced[1:][free] -= delta
+            column = next_column
+            if match[column] == 0:
+                break
+        # Flip the matching along the path
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+
+    assignment = [-1] * n
+    for column in range(1, m + 1):
+        if match[column]:
+            assignment[match[column] - 1] = column - 1
+    return assignment
+
+def nearest_drivers(latitude, longitude, k=NEAREST_DRIVERS):
+    """The k nearest available drivers as [(driver_id, distance_km), ...], nearest first"""
+    return get_driver_index().nearest(latitude, longitude, k)
+
+def dispatch_drivers(pickups, k=NEAREST_DRIVERS):
+    """Assign distinct drivers to (latitude, longitude) pickups, minimizing total distance.
+
+    Candidates are the nearest indexed drivers to each pickup that have an
+    active driver login and no pending route; the batch is then solved jointly
+    with the Hungarian algorithm. Returns a (Driver, User) pair per pickup, or
+    None where no driver could be found.
+    """
+    if not pickups:
+        return []
+    index = get_driver_index()
+    k = max(k, len(pickups))
+    candidate_ids = {}
+    for latitude, longitude in pickups:
+        for driver_id, _ in index.nearest(latitude, longitude, k):
+            candidate_ids.setdefault(driver_id)
+    if not candidate_ids:
+        return [None] * len(pickups)
+
+    drivers = Driver.query.filter(Driver.id.in_(list(candidate_ids)), Driver.is_available == True).all()
+    users = {user.username: user for user in User.query.filter(
+        User.role == 'driver',
+        User.is_active == True,
+        User.username.in_([driver.name for driver in drivers])
+    )}
+    busy = {name for (name,) in db.session.query(Route.driver_name).filter(
+        Route.status == 'pending',
+        Route.driver_name.in_(list(users))
+    ).distinct()}
+    drivers = [
+        driver for driver in drivers
+        if driver.name in users and driver.name not in busy and driver.current_latitude is not None
+    ]
+    if not drivers:
+        return [None] * len(pickups)
+
+    cost = distance_matrix(
+        [latitude for latitude, _ in pickups], [longitude for _, longitude in pickups],
+        [driver.current_latitude for driver in drivers], [driver.current_longitude for driver in drivers]
+    )
+    return [(drivers[column], users[drivers[column].name]) if column >= 0 else None for column in hungarian(cost)]
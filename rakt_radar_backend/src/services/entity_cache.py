@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from src.models.models import BloodBank, Driver, Facility, Hospital, db
+from src.services.facilities import FACILITY_KINDS, resolve_facilities
+
+DEFAULT_CACHE_SIZE = 4096
+# Bound on how long another process's commit can go unseen here
+DEFAULT_CACHE_TTL_SECONDS = 60
+CACHED_MODELS = (Hospital, BloodBank, Driver)
+# Facility records are derived from hospitals and blood banks and change with them
+SOURCE_MODELS = {Facility: (Hospital, BloodBank)}
+
+# Cached "no such row", so ids that name nothing are not looked up again
+MISSING = object()
+
+def cache_key(model, entity_id):
+    return (model.__tablename__, entity_id)
+
+
+class EntityCache:
+    """Process-wide LRU of serialized hospitals, blood banks, drivers and facilities.
+
+    Reads go through to the database on a miss and store the row's to_dict()
+    (or MISSING). Entries are dropped in after_commit for every cached row the
+    transaction inserted, changed or deleted, and a load that overlapped such
+    a commit is not stored (the generation moved). A session holding its own
+    uncommitted change to a row reads that row around the cache. Callers get a
+    copy they may extend freely.
+
+    Invalidation only sees commits made in this process. With several workers,
+    or scripts writing to the same database, another process's change shows
+    here once the entry expires, ttl_seconds after it was loaded.
+    """
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE, ttl_seconds=DEFAULT_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def init_app(self, app):
+        """Size the cache from ENTITY_CACHE_SIZE and expire entries after ENTITY_CACHE_TTL_SECONDS"""
+        self.maxsize = app.config.get('ENTITY_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+        self.ttl_seconds = app.config.get('ENTITY_CACHE_TTL_SECONDS', DEFAULT_CACHE_TTL_SECONDS)
+        self.clear()
+
+    def get(self, model, entity_id):
+        """The row's to_dict() or None, from the cache when possible"""
+        if not entity_id:
+            return None
+        key = cache_key(model, entity_id)
+        session = db.session()
+        if _uncommitted(session, model, entity_id):
+            # Read this transaction's own change; it must not leak to other sessions
+            obj = session.get(model, entity_id)
+            return obj.to_dict() if obj else None
+        with self._lock:
+            record = self._lookup(key)
+            if record is not None:
+                self.hits += 1
+                return None if record is MISSING else dict(record)
+            self.misses += 1
+            generation = self._generation
+
+        obj = session.get(model, entity_id)
+        record = obj.to_dict() if obj else MISSING
+        # The load may have autoflushed this session's own change to the row
+        if not _uncommitted(session, model, entity_id):
+            self._store(key, record, generation)
+        return None if record is MISSING else dict(record)
+
+    def facility(self, entity_id):
+        """The hospital or blood bank with this id as a facility record (with its 'kind'), or None"""
+        return self.get(Facility, entity_id)
+
+    def facilities(self, entity_ids):
+        """{id: facility record} for the ids that name a facility; all misses resolved in one IN query"""
+        session = db.session()
+        result, missing = {}, set()
+        own = {entity_id for entity_id in entity_ids if entity_id and _uncommitted(session, Facility, entity_id)}
+        with self._lock:
+            for entity_id in set(entity_ids) - own:
+                if not entity_id:
+                    continue
+                record = self._lookup(cache_key(Facility, entity_id))
+                if record is None:
+                    self.misses += 1
+                    missing.add(entity_id)
+                    continue
+                self.hits += 1
+                if record is not MISSING:
+                    result[entity_id] = dict(record)
+            generation = self._generation
+
+        loaded = resolve_facilities(missing | own)
+        for entity_id in missing:
+            record = loaded.get(entity_id, MISSING)
+            if not _uncommitted(session, Facility, entity_id):
+                self._store(cache_key(Facility, entity_id), record, generation)
+        result.update(loaded)
+        return result
+
+    def _lookup(self, key):
+        # Called with the lock held; None for absent and expired entries
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        record, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return record
+
+    def _store(self, key, record, generation):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (record, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def warm(self):
+        """Load every hospital, blood bank, driver and facility up to the cache size; returns the number cached"""
+        with self._lock:
+            generation = self._generation
+        loaded = 0
+        for model in CACHED_MODELS + (Facility,):
+            for obj in model.query.limit(self.maxsize - loaded):
+                self._store(cache_key(model, obj.id), obj.to_dict(), generation)
+                loaded += 1
+        return loaded
+
+    def invalidate(self, keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.maxsize,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'invalidations': self.invalidations,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+entity_cache = EntityCache()
+
+def _uncommitted(session, model, entity_id):
+    """Whether this session has flushed or pending changes to the row (or the rows it derives from)"""
+    if cache_key(model, entity_id) in session.info.get('entity_cache_keys', ()):
+        return True
+    for source in SOURCE_MODELS.get(model, (model,)):
+        obj = session.identity_map.get(identity_key(source, entity_id))
+        if obj is not None and (obj in session.deleted or session.is_modified(obj)):
+            return True
+    return False
+
+def _changed_keys(session):
+    keys = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CACHED_MODELS):
+            keys.add(cache_key(type(obj), obj.id))
+        if type(obj) in FACILITY_KINDS:
+            keys.add(cache_key(Facility, obj.id))
+    return keys
+
+# after_flush, so inserted rows already have their ids
+@event.listens_for(Session, 'after_flush')
+def _note_entity_writes(session, flush_context):
+    keys = _changed_keys(session)
+    if keys:
+        session.info.setdefault('entity_cache_keys', set()).update(keys)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _note_bulk_entity_writes(orm_execute_state):
+    """Bulk Query.update()/delete() skips the flush; note the rows they target the same way"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in CACHED_MODELS:
+        return
+    model = mapper.class_
+    matched = select(model.id)
+    if orm_execute_state.statement.whereclause is not None:
+        matched = matched.where(orm_execute_state.statement.whereclause)
+    ids = orm_execute_state.session.execute(matched).scalars().all()
+    keys = {cache_key(model, entity_id) for entity_id in ids}
+    if model in FACILITY_KINDS:
+        keys |= {cache_key(Facility, entity_id) for entity_id in ids}
+    if keys:
+        orm_execute_state.session.info.setdefault('entity_cache_keys', set()).update(keys)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_entities(session):
+    keys = session.info.pop('entity_cache_keys', None)
+    if keys:
+        entity_cache.invalidate(keys)
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_entity_writes(session):
+    session.info.pop('entity_cache_keys', None)
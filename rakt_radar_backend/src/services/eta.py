@@ -0,0 +1,360 @@
+import json
+import math
+import os
+import re
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from src.models.models import EmergencyRequest, Route, TrackPoint, db
+from src.services.geo import haversine
+
+# The pre-model heuristic: 60 km/h, faster for more urgent requests
+BASE_SPEED_KMH = 60
+URGENCY_SPEED = {'low': 0.8, 'medium': 1.0, 'high': 1.2, 'critical': 1.5}
+URGENCY_LEVELS = ('low', 'medium', 'high', 'critical')
+FEATURES = ['intercept', 'log_distance', 'distance_100km', 'hour_sin', 'hour_cos', 'hour_sin_2', 'hour_cos_2',
+            'urgency_low', 'urgency_high', 'urgency_critical']
+# Corridors are (origin cell, destination cell) pairs on this grid; one needs
+# MIN_CORRIDOR_SAMPLES trips before it earns its own offset
+CORRIDOR_CELL_DEG = 0.5
+MIN_CORRIDOR_SAMPLES = 5
+# Ridge penalties on the shared coefficients and on the corridor offsets
+RIDGE = 1e-3
+CORRIDOR_RIDGE = 2.0
+# Partial-trip samples taken from each completed route's GPS track
+TRACK_SAMPLES_PER_ROUTE = 8
+MIN_TRAINING_ROUTES = 20
+BACKTEST_HOLDOUT = 0.2
+IN_CHUNK = 500
+
+MODEL_FILE = re.compile(r'^eta_model_v(\d+)\.json$')
+
+def baseline_minutes(distance_km, urgency):
+    """Heuristic trip minutes, used until a model has been trained"""
+    speeds = np.vectorize(lambda level: URGENCY_SPEED.get(level, 1.0), otypes=[np.float64])(urgency)
+    return np.asarray(distance_km, dtype=np.float64) / (BASE_SPEED_KMH * speeds) * 60
+
+def corridor_key(from_latitude, from_longitude, to_latitude, to_longitude):
+    """Grid-cell pair identifying the corridor a trip runs along"""
+    def cell(latitude, longitude):
+        return f"{math.floor(latitude / CORRIDOR_CELL_DEG)}:{math.floor(longitude / CORRIDOR_CELL_DEG)}"
+    return f"{cell(from_latitude, from_longitude)}>{cell(to_latitude, to_longitude)}"
+
+def hour_of_day(moment):
+    return moment.hour + moment.minute / 60
+
+def base_features(distance_km, hours, urgencies):
+    """Design matrix of the shared features (see FEATURES), one row per trip"""
+    distance_km = np.asarray(distance_km, dtype=np.float64).reshape(-1)
+    angle = np.broadcast_to(np.asarray(hours, dtype=np.float64), distance_km.shape) * (2 * np.pi / 24)
+    urgencies = np.broadcast_to(np.asarray(urgencies, dtype=object), distance_km.shape)
+    columns = [
+        np.ones_like(distance_km), np.log1p(distance_km), distance_km / 100,
+        np.sin(angle), np.cos(angle), np.sin(2 * angle), np.cos(2 * angle)
+    ]
+    columns += [(urgencies == level).astype(np.float64) for level in URGENCY_LEVELS if level != 'medium']
+    return np.column_stack(columns)
+
+
+class EtaModel:
+    """Log-linear trip-time model: log(minutes) = features . coefficients + corridor offset"""
+
+    def __init__(self, coefficients, corridors, residual_std=0.0, version=None, trained_at=None,
+                 training=None, backtest=None):
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+        self.corridors = dict(corridors)
+        self.residual_std = residual_std
+        self.version = version
+        self.trained_at = trained_at
+        self.training = training or {}
+        self.backtest = backtest
+
+    def predict(self, distance_km, urgencies, hours, corridors=None):
+        """Vectorized: minutes for every trip at once"""
+        log_minutes = base_features(distance_km, hours, urgencies) @ self.coefficients
+        if corridors is not None:
+            log_minutes = log_minutes + np.array([self.corridors.get(key, 0.0) for key in corridors], dtype=np.float64)
+        return np.exp(log_minutes)
+
+    def summary(self):
+        return {
+            'version': self.version,
+            'trained_at': self.trained_at,
+            'features': FEATURES,
+            'corridors': len(self.corridors),
+            'residual_std': round(self.residual_std, 4),
+            'training': self.training,
+            'backtest': self.backtest
+        }
+
+    def to_dict(self):
+        return dict(self.summary(), coefficients=self.coefficients.tolist(), corridors=self.corridors,
+                    corridor_cell_deg=CORRIDOR_CELL_DEG)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['coefficients'], data['corridors'], data.get('residual_std', 0.0), data.get('version'),
+                   data.get('trained_at'), data.get('training'), data.get('backtest'))
+
+
+def fit_eta_model(samples, ridge=RIDGE, corridor_ridge=CORRIDOR_RIDGE, min_corridor_samples=MIN_CORRIDOR_SAMPLES):
+    """Ridge least squares on log minutes over the shared features plus one offset per busy corridor.
+
+    The corridor block is one-hot, so its normal equations are assembled with
+    bincount/add.at instead of materialising an n x corridors matrix.
+    """
+    features = base_features(samples['distance_km'], samples['hour'], samples['urgency'])
+    target = np.log(np.maximum(np.asarray(samples['minutes'], dtype=np.float64), 1.0))
+    keys, codes, counts = np.unique(np.asarray(samples['corridor'], dtype=str), return_inverse=True,
+                                    return_counts=True)
+    kept = counts >= min_corridor_samples
+    columns = np.full(keys.size, -1)
+    columns[kept] = np.arange(int(kept.sum()))
+    codes = columns[codes.reshape(-1)]
+    member = codes >= 0
+    p, k = features.shape[1], int(kept.sum())
+
+    gram = np.zeros((p + k, p + k))
+    gram[:p, :p] = features.T @ features
+    cross = np.zeros((k, p))
+    np.add.at(cross, codes[member], features[member])
+    gram[p:, :p] = cross
+    gram[:p, p:] = cross.T
+    gram[p:, p:] = np.diag(np.bincount(codes[member], minlength=k).astype(np.float64))
+    rhs = np.concatenate([features.T @ target, np.bincount(codes[member], weights=target[member], minlength=k)])
+    penalty = np.concatenate([[0.0], np.full(p - 1, ridge), np.full(k, corridor_ridge)])
+    weights = np.linalg.lstsq(gram + np.diag(penalty), rhs, rcond=None)[0]
+
+    offsets = np.zeros(target.size)
+    offsets[member] = weights[p:][codes[member]]
+    residual = target - features @ weights[:p] - offsets
+    return EtaModel(weights[:p], dict(zip(keys[kept].tolist(), weights[p:].tolist())), float(residual.std()))
+
+def error_report(actual, predicted):
+    errors = predicted - actual
+    return {
+        'mae_minutes': round(float(np.abs(errors).mean()), 2),
+        'p90_abs_error_minutes': round(float(np.percentile(np.abs(errors), 90)), 2),
+        'mape': round(float((np.abs(errors) / actual).mean()), 4),
+        'bias_minutes': round(float(errors.mean()), 2)
+    }
+
+def select(samples, mask):
+    return {key: values[mask] for key, values in samples.items()}
+
+def backtest(samples, holdout=BACKTEST_HOLDOUT):
+    """Fit on the earliest routes and score whole-trip predictions on the most recent ones.
+
+    Splitting by completion order (never by sample) keeps a route's GPS
+    samples on one side and scores the model the way it will be used: on
+    trips that happen after it was trained. The speed heuristic is scored
+    on the same trips for comparison.
+    """
+    routes = int(samples['order'].max()) + 1 if samples['order'].size else 0
+    cut = int(round(routes * (1 - holdout)))
+    if cut < 1 or cut >= routes:
+        raise ValueError('Not enough routes for a backtest holdout')
+    train = samples['order'] < cut
+    test = select(samples, ~train & samples['full'])
+    model = fit_eta_model(select(samples, train))
+    actual = test['minutes']
+    return {
+        'train_routes': cut,
+        'test_routes': routes - cut,
+        'train_samples': int(train.sum()),
+        'model': error_report(actual, model.predict(test['distance_km'], test['urgency'], test['hour'], test['corridor'])),
+        'baseline': error_report(actual, baseline_minutes(test['distance_km'], test['urgency']))
+    }
+
+def training_samples():
+    """Trip samples from completed routes: each whole trip, plus remaining-time samples along its track.
+
+    A track point at time t contributes (distance still to go, hour at t,
+    minutes until completion); the distance still to go is the planned
+    distance scaled by the share of the GPS path not yet driven.
+    """
+    rows = db.session.query(Route, EmergencyRequest.urgency).join(
+        EmergencyRequest, EmergencyRequest.id == Route.request_id
+    ).filter(
+        Route.status == 'completed',
+        Route.started_at.isnot(None),
+        Route.completed_at.isnot(None)
+    ).order_by(Route.completed_at, Route.id).all()
+    rows = [(route, urgency) for route, urgency in rows
+            if route.completed_at > route.started_at and route.distance_km and route.distance_km > 0]
+
+    tracks = {}
+    route_ids = [route.id for route, _ in rows]
+    for start in range(0, len(route_ids), IN_CHUNK):
+        points = db.session.query(
+            TrackPoint.route_id, TrackPoint.latitude, TrackPoint.longitude, TrackPoint.timestamp
+        ).filter(
+            TrackPoint.route_id.in_(route_ids[start:start + IN_CHUNK])
+        ).order_by(TrackPoint.route_id, TrackPoint.timestamp).all()
+        for route_id, latitude, longitude, timestamp in points:
+            tracks.setdefault(route_id, []).append((latitude, longitude, timestamp))
+
+    columns = {key: [] for key in ('distance_km', 'hour', 'urgency', 'corridor', 'minutes', 'order', 'full')}
+
+    def add(distance_km, moment, urgency, corridor, minutes, order, full):
+        for key, value in zip(columns, (distance_km, hour_of_day(moment), urgency, corridor, minutes, order, full)):
+            columns[key].append(value)
+
+    for order, (route, urgency) in enumerate(rows):
+        corridor = corridor_key(route.start_latitude, route.start_longitude, route.end_latitude, route.end_longitude)
+        add(route.distance_km, route.started_at, urgency, corridor,
+            (route.completed_at - route.started_at).total_seconds() / 60, order, True)
+
+        points = [point for point in tracks.get(route.id, []) if route.started_at < point[2] < route.completed_at]
+        if not points:
+            continue
+        lats = np.array([route.start_latitude] + [point[0] for point in points] + [route.end_latitude])
+        lons = np.array([route.start_longitude] + [point[1] for point in points] + [route.end_longitude])
+        driven = np.cumsum(haversine(lats[:-1], lons[:-1], lats[1:], lons[1:]))
+        if driven[-1] <= 0:
+            continue
+        for index in np.unique(np.linspace(0, len(points) - 1, TRACK_SAMPLES_PER_ROUTE).round().astype(int)).tolist():
+            remaining_km = route.distance_km * (1 - driven[index] / driven[-1])
+            moment = points[index][2]
+            add(remaining_km, moment, urgency, corridor,
+                (route.completed_at - moment).total_seconds() / 60, order, False)
+
+    return {
+        'distance_km': np.array(columns['distance_km'], dtype=np.float64),
+        'hour': np.array(columns['hour'], dtype=np.float64),
+        'urgency': np.array(columns['urgency'], dtype=object),
+        'corridor': np.array(columns['corridor'], dtype=object),
+        'minutes': np.array(columns['minutes'], dtype=np.float64),
+        'order': np.array(columns['order'], dtype=np.int64),
+        'full': np.array(columns['full'], dtype=bool)
+    }
+
+
+class EtaService:
+    """Serves trip-time predictions from the active model version, hot-swappable at runtime.
+
+    Each trained model is written to ETA_MODEL_DIR as eta_model_v<N>.json and
+    active.json names the version in use. Until a model exists, predictions
+    fall back to the speed heuristic.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._model = None
+        self._loaded = False
+        self.predictions = 0
+        self.fallback_predictions = 0
+
+    def init_app(self, app):
+        """Read ETA_MODEL_DIR from the app config; the active model loads on first use"""
+        with self._lock:
+            self.directory = app.config.get('ETA_MODEL_DIR')
+            self._model = None
+            self._loaded = False
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def versions(self):
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        return sorted(int(match.group(1)) for match in map(MODEL_FILE.match, os.listdir(self.directory)) if match)
+
+    def _read(self, version):
+        path = self._path(f'eta_model_v{version}.json')
+        if not os.path.exists(path):
+            raise LookupError(f'ETA model version {version} not found')
+        with open(path) as handle:
+            return EtaModel.from_dict(json.load(handle))
+
+    @property
+    def model(self):
+        """The active model, or None while predictions use the heuristic"""
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                pointer = self._path('active.json') if self.directory else None
+                if pointer and os.path.exists(pointer):
+                    with open(pointer) as handle:
+                        self._model = self._read(json.load(handle)['version'])
+            return self._model
+
+    def train(self, holdout=BACKTEST_HOLDOUT, activate=True):
+        """Fit a new version on every completed route, backtest it, save it and (optionally) make it active"""
+        samples = training_samples()
+        routes = int(samples['order'].max()) + 1 if samples['order'].size else 0
+        if routes < MIN_TRAINING_ROUTES:
+            raise ValueError(f'At least {MIN_TRAINING_ROUTES} completed routes are needed to train, found {routes}')
+        report = backtest(samples, holdout)
+        model = fit_eta_model(samples)
+        model.trained_at = datetime.utcnow().isoformat()
+        model.training = {
+            'routes': routes,
+            'samples': int(samples['minutes'].size),
+            'track_samples': int((~samples['full']).sum())
+        }
+        model.backtest = report
+
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            model.version = max(self.versions(), default=0) + 1
+            path = self._path(f'eta_model_v{model.version}.json')
+            with open(f'{path}.tmp', 'w') as handle:
+                json.dump(model.to_dict(), handle)
+            os.replace(f'{path}.tmp', path)
+        if activate:
+            self.activate(model.version)
+        return model
+
+    def activate(self, version):
+        """Swap the serving model for a saved version; in-flight predictions finish on the old one"""
+        model = self._read(int(version))
+        with self._lock:
+            pointer = self._path('active.json')
+            with open(f'{pointer}.tmp', 'w') as handle:
+                json.dump({'version': model.version}, handle)
+            os.replace(f'{pointer}.tmp', pointer)
+            self._model = model
+            self._loaded = True
+        return model
+
+    def predict_batch(self, distance_km, urgencies, hours=None, corridors=None):
+        """Trip minutes for many trips in one pass; hours default to now (UTC, like every stored timestamp)"""
+        distance_km = np.asarray(distance_km, dtype=np.float64).reshape(-1)
+        model = self.model
+        with self._lock:
+            self.predictions += distance_km.size
+            if model is None:
+                self.fallback_predictions += distance_km.size
+        if model is None:
+            return baseline_minutes(distance_km, urgencies)
+        if hours is None:
+            hours = hour_of_day(datetime.utcnow())
+        return model.predict(distance_km, urgencies, hours, corridors)
+
+    def predict(self, distance_km, urgency, hour=None, corridor=None):
+        return float(self.predict_batch([distance_km], urgency, hour, None if corridor is None else [corridor])[0])
+
+    def remaining_minutes(self, route, remaining_km, urgency):
+        """Minutes left on an active route: the model on the distance to go, else its ETA scaled linearly"""
+        if self.model is None:
+            return route.eta_minutes * remaining_km / route.distance_km if route.distance_km else route.eta_minutes
+        corridor = corridor_key(route.start_latitude, route.start_longitude, route.end_latitude, route.end_longitude)
+        return self.predict(remaining_km, urgency, corridor=corridor)
+
+    def metrics(self):
+        model = self.model
+        with self._lock:
+            return {
+                'active_version': model.version if model else None,
+                'versions': self.versions(),
+                'model': model.summary() if model else None,
+                'predictions': self.predictions,
+                'fallback_predictions': self.fallback_predictions
+            }
+
+
+eta_service = EtaService()
@@ -0,0 +1,113 @@
+import itertools
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+
+class Subscription:
+    """A subscriber's bounded inbox on the event bus.
+
+    `viewer` is the set of (role, key) pairs the subscriber answers to; it only
+    receives events whose audience shares one of them. None (admins and
+    in-process listeners) receives every event.
+    """
+
+    def __init__(self, bus, event_types=None, max_pending=256, viewer=None):
+        self.bus = bus
+        self.event_types = set(event_types) if event_types else None
+        self.viewer = set(viewer) if viewer is not None else None
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+
+    def wants(self, event, audience=None):
+        if self.event_types is not None and event['type'] not in self.event_types:
+            return False
+        return self.viewer is None or bool(audience and self.viewer.intersection(audience))
+
+    def deliver(self, event, audience=None):
+        # Called with the bus lock held, so events arrive in id order and
+        # drop-oldest-then-put cannot be overtaken by another publisher's put
+        if not self.wants(event, audience):
+            return
+        try:
+            self.queue.put_nowait(event)
+            return
+        except queue.Full:
+            pass
+        # Slow consumer: drop its oldest pending event rather than block publishers
+        try:
+            self.queue.get_nowait()
+            self.dropped += 1
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Never fail the publisher (its transaction has already committed)
+            self.dropped += 1
+
+    def get(self, timeout=None):
+        """Next event, or None if nothing arrived within `timeout` seconds"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """In-process publish/subscribe bus for realtime deltas.
+
+    Every event gets a monotonically increasing id and is kept in a short replay
+    buffer, so a reconnecting client can pass its last seen id and catch up on
+    what it missed. Ids are assigned and events delivered under one lock, so
+    every subscriber sees them in id order. An event may name its audience,
+    the (role, key) pairs allowed to see it; events without one only reach
+    unrestricted subscribers.
+    """
+
+    def __init__(self, history_size=500):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._ids = itertools.count(1)
+
+    def publish(self, event_type, data, audience=None):
+        audience = frozenset(audience) if audience else None
+        with self._lock:
+            event = {
+                'id': next(self._ids),
+                'type': event_type,
+                'data': data,
+                'timestamp': datetime.utcnow().isoformat()
+            }
+            self._history.append((event, audience))
+            # Delivery never blocks (full inboxes drop their oldest event), so it is cheap to do under the lock
+            for subscription in self._subscribers:
+                subscription.deliver(event, audience)
+        return event
+
+    def subscribe(self, event_types=None, last_event_id=None, viewer=None):
+        """Register a subscriber, replaying buffered events newer than last_event_id"""
+        subscription = Subscription(self, event_types, viewer=viewer)
+        with self._lock:
+            if last_event_id is not None:
+                for event, audience in self._history:
+                    if event['id'] > last_event_id:
+                        subscription.deliver(event, audience)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+# Process-wide bus shared by the route handlers and the /api/stream endpoint
+event_bus = EventBus()
@@ -0,0 +1,152 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, or_, select, update
+
+from src.models.models import BloodUnit, db
+from src.services.analytics import dashboard_cache
+from src.services.inventory import refresh_inventory_keys
+
+DEFAULT_HORIZON_DAYS = 7
+DEFAULT_INTERVAL_SECONDS = 3600
+
+units_table = BloodUnit.__table__
+
+def sweep_expiry(today=None, horizon_days=DEFAULT_HORIZON_DAYS):
+    """Expire and (un)flag blood units with set-based UPDATEs in one transaction.
+
+    Available units whose expiry date has arrived become 'expired'; available
+    units expiring within `horizon_days` are flagged, and flags on anything
+    else are cleared. Every statement is a range read of the
+    (status, expiry_date) or is_flagged_for_expiry index. The bulk UPDATEs
+    bypass the ORM hooks, so the inventory summary rows of expired units are
+    refreshed here. Returns the row counts.
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=horizon_days)
+    connection = db.session.connection()
+
+    due = and_(units_table.c.status == 'available', units_table.c.expiry_date <= today)
+    expired_keys = connection.execute(
+        select(units_table.c.blood_bank_id, units_table.c.blood_type).where(due).distinct()
+    ).all()
+    expired = connection.execute(
+        update(units_table).where(due).values(status='expired', is_flagged_for_expiry=False)
+    ).rowcount
+
+    flagged = connection.execute(
+        update(units_table).where(
+            units_table.c.status == 'available',
+            units_table.c.expiry_date > today,
+            units_table.c.expiry_date <= horizon,
+            units_table.c.is_flagged_for_expiry == False
+        ).values(is_flagged_for_expiry=True)
+    ).rowcount
+
+    unflagged = connection.execute(
+        update(units_table).where(
+            units_table.c.is_flagged_for_expiry == True,
+            or_(units_table.c.status != 'available',
+                units_table.c.expiry_date <= today,
+                units_table.c.expiry_date > horizon)
+        ).values(is_flagged_for_expiry=False)
+    ).rowcount
+
+    refresh_inventory_keys(connection, {(row.blood_bank_id, row.blood_type) for row in expired_keys})
+    db.session.commit()
+    # Units left the ORM's view of the world; drop anything stale it was holding
+    db.session.expire_all()
+    if expired or flagged or unflagged:
+        dashboard_cache.invalidate()
+    return {'expired': expired, 'flagged': flagged, 'unflagged': unflagged}
+
+
+class ExpirySweeper:
+    """Runs sweep_expiry on a daemon thread every `interval_seconds`, keeping run metrics"""
+
+    def __init__(self, app=None, horizon_days=DEFAULT_HORIZON_DAYS, interval_seconds=DEFAULT_INTERVAL_SECONDS):
+        self.app = app
+        self.horizon_days = horizon_days
+        self.interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at = None
+        self.last_duration_ms = None
+        self.last_result = None
+        self.last_error = None
+        self.totals = {'expired': 0, 'flagged': 0, 'unflagged': 0}
+
+    def init_app(self, app):
+        """Bind to an app and read EXPIRY_HORIZON_DAYS / EXPIRY_SWEEP_INTERVAL_SECONDS from its config"""
+        self.app = app
+        self.horizon_days = app.config.get('EXPIRY_HORIZON_DAYS', DEFAULT_HORIZON_DAYS)
+        self.interval_seconds = app.config.get('EXPIRY_SWEEP_INTERVAL_SECONDS', DEFAULT_INTERVAL_SECONDS)
+
+    def run_once(self, today=None):
+        """Sweep now (inside an app context) and record the outcome"""
+        started = time.perf_counter()
+        try:
+            result = sweep_expiry(today, self.horizon_days)
+        except Exception as e:
+            db.session.rollback()
+            with self._lock:
+                self.failures += 1
+                self.last_error = str(e)
+                self.last_run_at = datetime.utcnow()
+            raise
+        with self._lock:
+            self.runs += 1
+            self.last_run_at = datetime.utcnow()
+            self.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            self.last_result = result
+            self.last_error = None
+            for key, count in result.items():
+                self.totals[key] += count
+        return result
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    result = self.run_once()
+                if any(result.values()):
+                    print(f"🧊 Expiry sweep: {result['expired']} expired, "
+                          f"{result['flagged']} flagged, {result['unflagged']} unflagged")
+            except Exception as e:
+                print(f"❌ Expiry sweep failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        """Start the background thread; the first sweep runs immediately"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='expiry-sweeper', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'horizon_days': self.horizon_days,
+                'interval_seconds': self.interval_seconds,
+                'runs': self.runs,
+                'failures': self.failures,
+                'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+                'last_duration_ms': self.last_duration_ms,
+                'last_result': self.last_result,
+                'last_error': self.last_error,
+                'totals': dict(self.totals)
+            }
+
+
+expiry_sweeper = ExpirySweeper()
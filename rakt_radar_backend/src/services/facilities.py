@@ -0,0 +1,81 @@
+from itertools import chain
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from src.models.models import BloodBank, Facility, Hospital, db
+
+facilities_table = Facility.__table__
+FACILITY_KINDS = {Hospital: 'hospital', BloodBank: 'blood_bank'}
+FACILITY_COLUMNS = ('name', 'city', 'state', 'latitude', 'longitude')
+
+def facility_values(obj):
+    """The facilities row for a hospital or blood bank"""
+    values = {column: getattr(obj, column) for column in FACILITY_COLUMNS}
+    values.update(id=obj.id, kind=FACILITY_KINDS[type(obj)])
+    return values
+
+def resolve_facilities(ids):
+    """{id: facility record} for the ids that name a hospital or blood bank, in one IN query"""
+    ids = {entity_id for entity_id in ids if entity_id}
+    if not ids:
+        return {}
+    return {facility.id: facility.to_dict() for facility in Facility.query.filter(Facility.id.in_(ids))}
+
+@event.listens_for(Session, 'after_flush')
+def _sync_facilities(session, flush_context):
+    """Mirror flushed hospital and blood bank changes into facilities, in the same transaction"""
+    changed = [obj for obj in chain(session.new, session.dirty, session.deleted) if type(obj) in FACILITY_KINDS]
+    if not changed:
+        return
+    connection = session.connection()
+    connection.execute(facilities_table.delete().where(facilities_table.c.id.in_([obj.id for obj in changed])))
+    rows = [facility_values(obj) for obj in changed if obj not in session.deleted]
+    if rows:
+        connection.execute(facilities_table.insert(), rows)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _sync_bulk_facilities(orm_execute_state):
+    """Mirror bulk Query.update()/delete() of hospitals and blood banks, which never reach after_flush"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ not in FACILITY_KINDS:
+        return None
+    model = mapper.class_
+    session = orm_execute_state.session
+    # Resolve the targeted ids first: an update may change the very columns it filters on
+    matched = select(model.id)
+    if orm_execute_state.statement.whereclause is not None:
+        matched = matched.where(orm_execute_state.statement.whereclause)
+    ids = session.execute(matched).scalars().all()
+    result = orm_execute_state.invoke_statement()
+    if ids:
+        connection = session.connection()
+        connection.execute(facilities_table.delete().where(facilities_table.c.id.in_(ids)))
+        if orm_execute_state.is_update:
+            updated = session.execute(
+                select(model).where(model.id.in_(ids)), execution_options={'populate_existing': True}
+            ).scalars()
+            rows = [facility_values(obj) for obj in updated]
+            if rows:
+                connection.execute(facilities_table.insert(), rows)
+    return result
+
+def check_facilities(repair=False):
+    """Ids whose facilities row is missing, stale or orphaned; repair=True rebuilds the table"""
+    expected = {
+        obj.id: facility_values(obj)
+        for obj in chain(Hospital.query, BloodBank.query)
+    }
+    stored = {facility.id: facility.to_dict() for facility in Facility.query}
+    mismatches = sorted(
+        entity_id for entity_id in expected.keys() | stored.keys()
+        if expected.get(entity_id) != stored.get(entity_id)
+    )
+    if repair and mismatches:
+        db.session.execute(facilities_table.delete())
+        if expected:
+            db.session.execute(facilities_table.insert(), list(expected.values()))
+        db.session.commit()
+    return mismatches
@@ -0,0 +1,48 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371  # Earth's radius in kilometers
+
+def calculate_distance(lat1, lon1, lat2, lon2):
+    """Calculate distance between two points using Haversine formula"""
+    lat1_rad = math.radians(lat1)
+    lon1_rad = math.radians(lon1)
+    lat2_rad = math.radians(lat2)
+    lon2_rad = math.radians(lon2)
+
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+
+    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+
+    return EARTH_RADIUS_KM * c
+
+def haversine(lats1, lons1, lats2, lons2):
+    """Element-wise Haversine distance in km; inputs broadcast like NumPy arrays"""
+    lats1 = np.radians(np.asarray(lats1, dtype=np.float64))
+    lons1 = np.radians(np.asarray(lons1, dtype=np.float64))
+    lats2 = np.radians(np.asarray(lats2, dtype=np.float64))
+    lons2 = np.radians(np.asarray(lons2, dtype=np.float64))
+
+    a = np.sin((lats2 - lats1) / 2) ** 2 + np.cos(lats1) * np.cos(lats2) * np.sin((lons2 - lons1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def distances(origin, lats, lons):
+    """Distances in km from one (lat, lon) origin to every point in lats/lons"""
+    return haversine(origin[0], origin[1], lats, lons)
+
+def distance_matrix(lats1, lons1, lats2, lons2):
+    """Pairwise distances in km, shape (len(lats1), len(lats2))"""
+    lats1 = np.asarray(lats1, dtype=np.float64)[:, None]
+    lons1 = np.asarray(lons1, dtype=np.float64)[:, None]
+    return haversine(lats1, lons1, lats2, lons2)
+
+def path_length(lats, lons):
+    """Total length in km of a polyline given as ordered lat/lon sequences"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if lats.size < 2:
+        return 0.0
+    return float(haversine(lats[:-1], lons[:-1], lats[1:], lons[1:]).sum())
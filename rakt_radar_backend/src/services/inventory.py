@@ -0,0 +1,192 @@
+from datetime import datetime
+from itertools import chain
+
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from src.models.models import BloodUnit, InventorySummary, db
+
+summary_table = InventorySummary.__table__
+units_table = BloodUnit.__table__
+# INSERT ... ON CONFLICT DO NOTHING, for the backends that have it
+SUMMARY_UPSERTS = {'postgresql': postgresql_insert, 'sqlite': sqlite_insert}
+EMPTY_SUMMARY = {'available_ml': 0, 'unit_count': 0, 'min_expiry': None, 'expiry_ordinal_sum': 0}
+
+def _aggregate(rows):
+    """Fold (quantity_ml, expiry_date) rows into summary column values"""
+    available_ml = 0
+    unit_count = 0
+    min_expiry = None
+    expiry_ordinal_sum = 0
+    for quantity_ml, expiry_date in rows:
+        available_ml += quantity_ml or 0
+        unit_count += 1
+        if expiry_date:
+            expiry_ordinal_sum += expiry_date.toordinal()
+            if min_expiry is None or expiry_date < min_expiry:
+                min_expiry = expiry_date
+    return {
+        'available_ml': available_ml,
+        'unit_count': unit_count,
+        'min_expiry': min_expiry,
+        'expiry_ordinal_sum': expiry_ordinal_sum
+    }
+
+def refresh_inventory_keys(connection, keys):
+    """Recompute the summary rows for the given (blood_bank_id, blood_type) keys.
+
+    Runs on the caller's connection, so the refresh commits or rolls back together
+    with the unit changes that triggered it. Each summary row is locked before its
+    units are read: a concurrent transaction refreshing the same key waits for
+    this one to commit and then counts its units too (PostgreSQL reads committed
+    rows afresh per statement; SQLite already serializes writers). Keys are
+    locked in sorted order so two multi-key refreshes cannot deadlock.
+    """
+    keys = sorted((blood_bank_id, blood_type) for blood_bank_id, blood_type in keys if blood_bank_id and blood_type)
+    for blood_bank_id, blood_type in keys:
+        key_filter = (summary_table.c.blood_bank_id == blood_bank_id, summary_table.c.blood_type == blood_type)
+        while True:
+            _ensure_summary_row(connection, blood_bank_id, blood_type)
+            locked = connection.execute(
+                summary_table.select().with_only_columns(summary_table.c.blood_bank_id)
+                .where(*key_filter).with_for_update()
+            ).first()
+            # Gone when the transaction we waited on emptied and deleted it; recreate and lock again
+            if locked:
+                break
+
+        rows = connection.execute(
+            units_table.select()
+            .with_only_columns(units_table.c.quantity_ml, units_table.c.expiry_date)
+            .where(
+                units_table.c.blood_bank_id == blood_bank_id,
+                units_table.c.blood_type == blood_type,
+                units_table.c.status == 'available'
+            )
+        ).all()
+        values = _aggregate(rows)
+        if values['unit_count']:
+            connection.execute(summary_table.update().where(*key_filter).values(updated_at=datetime.utcnow(), **values))
+        else:
+            connection.execute(summary_table.delete().where(*key_filter))
+
+def _ensure_summary_row(connection, blood_bank_id, blood_type):
+    """Insert an empty summary row for the key unless one exists (or is being inserted) already"""
+    insert = SUMMARY_UPSERTS.get(connection.dialect.name)
+    if insert is None:
+        # No portable insert-if-absent: check first, which can still race on the very first row of a key
+        exists = connection.execute(
+            summary_table.select().with_only_columns(summary_table.c.blood_bank_id).where(
+                summary_table.c.blood_bank_id == blood_bank_id, summary_table.c.blood_type == blood_type
+            )
+        ).first()
+        if not exists:
+            connection.execute(summary_table.insert().values(
+                blood_bank_id=blood_bank_id, blood_type=blood_type, updated_at=datetime.utcnow(), **EMPTY_SUMMARY
+            ))
+        return
+    connection.execute(
+        insert(summary_table)
+        .values(blood_bank_id=blood_bank_id, blood_type=blood_type, updated_at=datetime.utcnow(), **EMPTY_SUMMARY)
+        .on_conflict_do_nothing(index_elements=['blood_bank_id', 'blood_type'])
+    )
+
+def _unit_keys(unit):
+    """Current and previous (blood_bank_id, blood_type) keys of a pending unit change"""
+    state = inspect(unit)
+    bank_history = state.attrs.blood_bank_id.history
+    type_history = state.attrs.blood_type.history
+    banks = set(bank_history.deleted) | {unit.blood_bank_id}
+    types = set(type_history.deleted) | {unit.blood_type}
+    return {(bank_id, blood_type) for bank_id in banks for blood_type in types}
+
+@event.listens_for(Session, 'before_flush')
+def _collect_unit_keys(session, flush_context, instances):
+    """Record which summary keys the pending BloodUnit changes touch"""
+    keys = session.info.setdefault('inventory_keys', set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, BloodUnit):
+            keys |= _unit_keys(obj)
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_after_flush(session, flush_context):
+    """Refresh the touched summary rows inside the same transaction as the unit changes"""
+    keys = session.info.pop('inventory_keys', None)
+    if keys:
+        refresh_inventory_keys(session.connection(), keys)
+
+def _load_previous_value(target, value, oldvalue, initiator):
+    return value
+
+# Load the previous bank/type on assignment so a unit moving between keys refreshes both
+for _attr in (BloodUnit.blood_bank_id, BloodUnit.blood_type):
+    event.listen(_attr, 'set', _load_previous_value, active_history=True, retval=True)
+
+def compute_inventory_summary():
+    """Aggregate every available unit into {(blood_bank_id, blood_type): values}"""
+    grouped = {}
+    rows = db.session.query(
+        BloodUnit.blood_bank_id, BloodUnit.blood_type, BloodUnit.quantity_ml, BloodUnit.expiry_date
+    ).filter(BloodUnit.status == 'available')
+    for blood_bank_id, blood_type, quantity_ml, expiry_date in rows:
+        grouped.setdefault((blood_bank_id, blood_type), []).append((quantity_ml, expiry_date))
+    return {key: _aggregate(key_rows) for key, key_rows in grouped.items()}
+
+def check_inventory_summary(repair=False):
+    """Diff inventory_summary against the live units.
+
+    Returns a list of mismatches, each with the key plus the stored and expected
+    values (None when the row is missing on either side). With repair=True the
+    table is rebuilt from the units afterwards.
+    """
+    fields = ('available_ml', 'unit_count', 'min_expiry', 'expiry_ordinal_sum')
+    expected = compute_inventory_summary()
+    stored = {
+        (row.blood_bank_id, row.blood_type): {field: getattr(row, field) for field in fields}
+        for row in InventorySummary.query.all()
+    }
+
+    def serializable(values):
+        if values is None:
+            return None
+        values = dict(values)
+        values['min_expiry'] = values['min_expiry'].isoformat() if values['min_expiry'] else None
+        return values
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        if expected.get(key) != stored.get(key):
+            mismatches.append({
+                'blood_bank_id': key[0],
+                'blood_type': key[1],
+                'stored': serializable(stored.get(key)),
+                'expected': serializable(expected.get(key))
+            })
+
+    if repair and mismatches:
+        rebuild_inventory_summary(expected)
+
+    return mismatches
+
+def rebuild_inventory_summary(expected=None):
+    """Replace inventory_summary with a fresh aggregate of the live units"""
+    expected = compute_inventory_summary() if expected is None else expected
+    now = datetime.utcnow()
+    db.session.execute(summary_table.delete())
+    if expected:
+        db.session.execute(summary_table.insert(), [
+            dict(blood_bank_id=blood_bank_id, blood_type=blood_type, updated_at=now, **values)
+            for (blood_bank_id, blood_type), values in expected.items()
+        ])
+    db.session.commit()
+    return len(expected)
+
+def get_available_ml(blood_bank_id, blood_type):
+    """Available quantity for one bank and blood type, from the summary table"""
+    available_ml = db.session.query(InventorySummary.available_ml).filter_by(
+        blood_bank_id=blood_bank_id,
+        blood_type=blood_type
+    ).scalar()
+    return available_ml or 0
@@ -0,0 +1,109 @@
+import json
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from src.models.models import Notification, db
+from src.services.event_bus import event_bus
+
+def notify(recipients, notification_type, payload, message=None, request_id=None, route_id=None):
+    """Add one Notification row per (role, entity_id) recipient to the current session.
+
+    Nothing is committed here: the rows land in the same transaction as the state
+    change the caller commits next, so a notification exists if and only if that
+    change does.
+    """
+    body = json.dumps(payload, default=str) if payload is not None else None
+    rows = [
+        Notification(
+            recipient_role=role,
+            recipient_id=entity_id,
+            type=notification_type,
+            request_id=request_id,
+            route_id=route_id,
+            message=message,
+            payload=body
+        )
+        for role, entity_id in dict.fromkeys(recipients)
+    ]
+    db.session.add_all(rows)
+    return rows
+
+def request_audience(request_obj, routes=()):
+    """Who may see a realtime event about a request: its hospital, its suggested bank and its routes' drivers.
+
+    Drivers are named by login, as routes record them; admins see every event.
+    """
+    audience = [('hospital', request_obj.hospital_id), ('blood_bank', request_obj.suggested_bank_id)]
+    audience.extend(('driver', route.driver_name) for route in routes)
+    return audience
+
+def viewer_keys(principal):
+    """The (role, key) pairs an event audience may name a caller by, or None for an admin who sees everything"""
+    if principal.role == 'admin':
+        return None
+    keys = {(principal.role, principal.entity_id)}
+    if principal.role == 'driver':
+        # Notifications address drivers by Driver id, routes by login name
+        keys.add(('driver', principal.username))
+    return keys
+
+def fetch_notifications(role, entity_id, after=None, limit=50):
+    """A recipient's notifications with seq > after, oldest first.
+
+    With after=None the most recent `limit` notifications are returned instead,
+    which is how a client picks up its starting cursor.
+    """
+    query = Notification.query.filter(
+        Notification.recipient_role == role,
+        Notification.recipient_id == entity_id
+    )
+    if after is None:
+        return list(reversed(query.order_by(Notification.seq.desc()).limit(limit).all()))
+    return query.filter(Notification.seq > after).order_by(Notification.seq).limit(limit).all()
+
+def wait_for_notifications(role, entity_id, after, timeout, limit=50):
+    """Long-poll: return new notifications as soon as any are committed, or [] after `timeout` seconds"""
+    subscription = event_bus.subscribe(['notification'])
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            notifications = fetch_notifications(role, entity_id, after, limit)
+            # End the read transaction so the connection is not held while idle
+            db.session.rollback()
+            remaining = deadline - time.monotonic()
+            if notifications or remaining <= 0:
+                return notifications
+            # Wake on the first commit that reaches this recipient
+            while remaining > 0:
+                event = subscription.get(timeout=remaining)
+                if event and event['data']['recipient_role'] == role and event['data']['recipient_id'] == entity_id:
+                    break
+                remaining = deadline - time.monotonic()
+    finally:
+        subscription.close()
+
+@event.listens_for(Session, 'after_flush')
+def _collect_new_notifications(session, flush_context):
+    """Remember flushed notifications so they can be announced once committed"""
+    pending = session.info.setdefault('new_notifications', [])
+    for obj in session.new:
+        if isinstance(obj, Notification):
+            pending.append({
+                'seq': obj.seq,
+                'recipient_role': obj.recipient_role,
+                'recipient_id': obj.recipient_id,
+                'type': obj.type
+            })
+
+@event.listens_for(Session, 'after_commit')
+def _announce_committed_notifications(session):
+    """Tell /api/stream subscribers and long-pollers which inboxes just changed"""
+    for notification in session.info.pop('new_notifications', []):
+        event_bus.publish('notification', notification,
+                          audience=[(notification['recipient_role'], notification['recipient_id'])])
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_notifications(session):
+    session.info.pop('new_notifications', None)
@@ -0,0 +1,85 @@
+import base64
+import json
+from datetime import date, datetime
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(values):
+    """Opaque URL-safe cursor for the sort-key values of the last row on a page"""
+    plain = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(plain, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, columns):
+    """Sort-key values from a cursor, converted back to each column's Python type"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError('Invalid cursor')
+    decoded = []
+    for column, value in zip(columns, values):
+        python_type = column.type.python_type
+        if value is not None and python_type is datetime:
+            value = datetime.fromisoformat(value)
+        elif value is not None and python_type is date:
+            value = date.fromisoformat(value)
+        decoded.append(value)
+    return decoded
+
+def page_request(args):
+    """(limit, cursor) from query args, or None when the caller did not ask for a page.
+
+    Raises ValueError for a malformed limit.
+    """
+    if 'limit' not in args and 'cursor' not in args:
+        return None
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE), args.get('cursor') or None
+
+def paginate(query, columns, limit, cursor=None, descending=False):
+    """One keyset page of `query` ordered by `columns` (the last must be unique).
+
+    Rows after the cursor are selected with a row-value comparison, so every
+    page is an index range read rather than an OFFSET walk. Returns
+    (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if cursor:
+        key = tuple_(*columns)
+        values = tuple_(*decode_cursor(cursor, columns))
+        query = query.filter(key < values if descending else key > values)
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return rows, next_cursor
+
+def list_body(query, columns, args, serialize, descending=False):
+    """Response body for a list endpoint: a keyset page when `limit`/`cursor` is given.
+
+    Paged responses are {'items', 'next_cursor', 'limit'}; without paging
+    arguments the full list is returned as a plain array in the same order,
+    as existing clients expect. `serialize` turns a list of rows into dicts,
+    so callers can batch related lookups per page. Raises ValueError for a bad
+    limit or cursor.
+    """
+    page = page_request(args)
+    if page is None:
+        order = [column.desc() if descending else column.asc() for column in columns]
+        return serialize(query.order_by(*order).all())
+    limit, cursor = page
+    rows, next_cursor = paginate(query, columns, limit, cursor, descending)
+    return {'items': serialize(rows), 'next_cursor': next_cursor, 'limit': limit}
@@ -0,0 +1,174 @@
+import threading
+from collections import OrderedDict
+from datetime import timezone
+
+import numpy as np
+
+from src.models.models import TrackPoint, db
+from src.services.geo import EARTH_RADIUS_KM
+
+EARTH_RADIUS_M = EARTH_RADIUS_KM * 1000
+
+def douglas_peucker_significance(lats, lons):
+    """Douglas-Peucker significance of every point, in metres.
+
+    A point survives simplification at tolerance t exactly when its significance
+    is greater than t, so one pass serves every tolerance and point budget.
+    Each point's significance is capped by its parent split's, which keeps any
+    threshold consistent with the recursive algorithm. Endpoints are infinite.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    count = lats.size
+    significance = np.zeros(count)
+    if count == 0:
+        return significance
+    significance[0] = significance[-1] = np.inf
+
+    # Local equirectangular projection is accurate to well under a metre at city scale
+    mean_lat = np.radians(lats.mean())
+    x = np.radians(lons) * np.cos(mean_lat) * EARTH_RADIUS_M
+    y = np.radians(lats) * EARTH_RADIUS_M
+
+    stack = [(0, count - 1, np.inf)]
+    while stack:
+        first, last, parent = stack.pop()
+        if last - first < 2:
+            continue
+        seg_x, seg_y = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        length_sq = seg_x * seg_x + seg_y * seg_y
+        if length_sq > 0:
+            # Distance to the segment, not the infinite line, so loops back to the start still count
+            t = np.clip((px * seg_x + py * seg_y) / length_sq, 0.0, 1.0)
+            dist = np.hypot(px - t * seg_x, py - t * seg_y)
+        else:
+            dist = np.hypot(px, py)
+        split = int(np.argmax(dist))
+        value = min(float(dist[split]), parent)
+        index = first + 1 + split
+        significance[index] = value
+        stack.append((first, index, value))
+        stack.append((index, last, value))
+    return significance
+
+def select_points(significance, tolerance_m=None, max_points=None):
+    """Indexes (in path order) kept for a tolerance and/or point budget"""
+    keep = np.arange(significance.size)
+    if tolerance_m is not None:
+        keep = keep[significance > tolerance_m]
+    if max_points is not None and keep.size > max_points:
+        ranked = keep[np.argsort(-significance[keep], kind='stable')]
+        keep = np.sort(ranked[:max(max_points, 2)])
+    return keep
+
+def encode_polyline(lats, lons, precision=5):
+    """Google encoded polyline string for the given coordinates"""
+    factor = 10 ** precision
+    coords = np.column_stack([
+        np.round(np.asarray(lats, dtype=np.float64) * factor),
+        np.round(np.asarray(lons, dtype=np.float64) * factor)
+    ]).astype(np.int64)
+    deltas = np.diff(coords, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    # Zig-zag encode signed deltas into non-negative integers
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    chunks = []
+    for value in values.tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+def decode_polyline(encoded, precision=5):
+    """Inverse of encode_polyline, returning (lats, lons) lists"""
+    values = []
+    value = shift = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    coords = np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return coords[:, 0].tolist(), coords[:, 1].tolist()
+
+def delta_encode(values):
+    """First value followed by successive differences, as plain ints"""
+    values = np.asarray(values, dtype=np.int64)
+    if values.size == 0:
+        return []
+    return np.diff(values, prepend=0).tolist()
+
+
+class TrackCache:
+    """Per-route track arrays plus Douglas-Peucker significance, LRU-bounded.
+
+    Entries are keyed on the route's point_count, which only changes when new
+    points arrive, so an unchanged route never re-reads its track points.
+    """
+
+    def __init__(self, max_routes=256):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.max_routes = max_routes
+
+    def get(self, route):
+        point_count = route.point_count or 0
+        with self._lock:
+            entry = self._entries.get(route.id)
+            if entry and entry['point_count'] == point_count:
+                self._entries.move_to_end(route.id)
+                return entry
+
+        rows = db.session.query(TrackPoint.latitude, TrackPoint.longitude, TrackPoint.timestamp) \
+            .filter(TrackPoint.route_id == route.id).order_by(TrackPoint.timestamp).all()
+        lats = np.array([row[0] for row in rows], dtype=np.float64)
+        lons = np.array([row[1] for row in rows], dtype=np.float64)
+        entry = {
+            'point_count': point_count,
+            'lats': lats,
+            'lons': lons,
+            'epoch_seconds': np.array([
+                int(row[2].replace(tzinfo=timezone.utc).timestamp()) if row[2] else 0 for row in rows
+            ], dtype=np.int64),
+            'significance': douglas_peucker_significance(lats, lons)
+        }
+        with self._lock:
+            self._entries[route.id] = entry
+            self._entries.move_to_end(route.id)
+            while len(self._entries) > self.max_routes:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, route_id):
+        with self._lock:
+            self._entries.pop(route_id, None)
+
+
+track_cache = TrackCache()
+
+def compact_track(route, encoding='polyline', tolerance_m=None, max_points=None, precision=5):
+    """Simplified, encoded track of a route for tracking responses"""
+    entry = track_cache.get(route)
+    keep = select_points(entry['significance'], tolerance_m, max_points)
+    lats, lons = entry['lats'][keep], entry['lons'][keep]
+
+    track = {
+        'encoding': encoding,
+        'precision': precision,
+        'count': int(keep.size),
+        'original_count': int(entry['lats'].size),
+        'tolerance_m': tolerance_m,
+        'max_points': max_points
+    }
+    if encoding == 'polyline':
+        track['polyline'] = encode_polyline(lats, lons, precision)
+    else:
+        factor = 10 ** precision
+        track['lat'] = delta_encode(np.round(lats * factor))
+        track['lon'] = delta_encode(np.round(lons * factor))
+        track['time'] = delta_encode(entry['epoch_seconds'][keep])
+    return track
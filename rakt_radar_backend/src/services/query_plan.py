@@ -0,0 +1,69 @@
+import re
+
+from sqlalchemy import event
+
+WHERE_CLAUSE = re.compile(r'\bWHERE\b', re.IGNORECASE)
+# "SCAN blood_units" or "SCAN blood_units AS b" -- a table walk with no index narrowing it
+TABLE_SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?$')
+
+class QueryRecorder:
+    """Context manager collecting the (statement, parameters) pairs an engine executes"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.queries = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            self.queries.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        return False
+
+
+def explain(connection, statement, parameters=()):
+    """SQLite EXPLAIN QUERY PLAN detail lines for one statement"""
+    cursor = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+    return [row[-1] for row in cursor]
+
+def full_table_scans(connection, statement, parameters=()):
+    """Tables a filtered statement reads by walking every row.
+
+    Unfiltered statements (list-everything endpoints) scan by design and are not
+    reported; a filtered one that still scans is missing an index. Scans of
+    subquery results are not table reads and are skipped.
+    """
+    if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+        return []
+    if not WHERE_CLAUSE.search(statement):
+        return []
+    tables = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    scans = []
+    for detail in explain(connection, statement, parameters):
+        match = TABLE_SCAN.match(detail.strip())
+        if match and match.group(1) in tables:
+            scans.append(match.group(1))
+    return scans
+
+def check_query_plans(engine, queries, allowed_tables=()):
+    """Return [{'statement', 'tables'}] for recorded queries that full-scan a table.
+
+    `allowed_tables` lists tables whose scans are accepted (e.g. unindexable
+    LIKE '%...%' searches over a handful of rows).
+    """
+    violations = []
+    seen = set()
+    with engine.connect() as connection:
+        for statement, parameters in queries:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            tables = [t for t in full_table_scans(connection, statement, parameters) if t not in allowed_tables]
+            if tables:
+                violations.append({'statement': ' '.join(statement.split()), 'tables': tables})
+    return violations
@@ -0,0 +1,394 @@
+import heapq
+import math
+import os
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import numpy as np
+
+from src.services.geo import EARTH_RADIUS_KM, calculate_distance, haversine
+from src.services.polyline import encode_polyline
+from src.services.spatial_index import GridIndex
+
+# Free-flow speeds by OSM highway class, for ways without a usable maxspeed tag
+HIGHWAY_SPEEDS_KMH = {
+    'motorway': 90, 'trunk': 80, 'primary': 65, 'secondary': 55, 'tertiary': 45,
+    'unclassified': 35, 'residential': 25, 'living_street': 10, 'service': 15,
+    'motorway_link': 60, 'trunk_link': 50, 'primary_link': 45, 'secondary_link': 40, 'tertiary_link': 35
+}
+# Off-graph legs between a point and its nearest road node, and the no-graph fallback
+ACCESS_SPEED_KMH = 20
+FALLBACK_SPEED_KMH = 50
+SNAP_CELL_DEG = 0.01
+ROUTE_CACHE_SIZE = 1024
+
+class RoadGraph:
+    """Directed road graph in CSR form.
+
+    Edges leaving node i are offsets[i]:offsets[i + 1] of targets/lengths_m/
+    durations_s. A reverse CSR over the same edges serves the backward search.
+    """
+
+    def __init__(self, lats, lons, offsets, targets, lengths_m, durations_s):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.lengths_m = np.asarray(lengths_m, dtype=np.float32)
+        self.durations_s = np.asarray(durations_s, dtype=np.float32)
+
+        sources = np.repeat(np.arange(self.node_count, dtype=np.int32), np.diff(self.offsets))
+        order = np.argsort(self.targets, kind='stable')
+        self.reverse_offsets = np.concatenate([[0], np.cumsum(np.bincount(self.targets, minlength=self.node_count))])
+        self.reverse_sources = sources[order]
+        self.reverse_edges = order.astype(np.int64)
+
+        # Fastest speed on the network, in metres per second, keeps the A* heuristic admissible
+        moving = self.durations_s > 0
+        self.max_speed_ms = float((self.lengths_m[moving] / self.durations_s[moving]).max()) if moving.any() else 1.0
+
+        # Python lists are much faster than NumPy scalars inside the search loop
+        self._lat_rad = np.radians(self.lats).tolist()
+        self._lon_rad = np.radians(self.lons).tolist()
+        self._cos_lat = np.cos(np.radians(self.lats)).tolist()
+        self._forward = (self.offsets.tolist(), self.targets.tolist(), None, self.durations_s.tolist())
+        self._backward = (self.reverse_offsets.tolist(), self.reverse_sources.tolist(),
+                          self.reverse_edges.tolist(), self._forward[3])
+        self._lengths = self.lengths_m.tolist()
+
+        self._snap = GridIndex(cell_size_deg=SNAP_CELL_DEG)
+        routable = np.flatnonzero(np.diff(self.offsets) + np.diff(self.reverse_offsets))
+        self._snap.load(zip(routable.tolist(), self.lats[routable].tolist(), self.lons[routable].tolist()))
+
+    @property
+    def node_count(self):
+        return int(self.lats.size)
+
+    @property
+    def edge_count(self):
+        return int(self.targets.size)
+
+    @classmethod
+    def from_edges(cls, lats, lons, sources, targets, lengths_m, durations_s):
+        """Build the CSR arrays from parallel edge lists"""
+        sources = np.asarray(sources, dtype=np.int64)
+        order = np.argsort(sources, kind='stable')
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=len(lats)))])
+        return cls(lats, lons, offsets, np.asarray(targets)[order],
+                   np.asarray(lengths_m)[order], np.asarray(durations_s)[order])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['lats'], data['lons'], data['offsets'], data['targets'],
+                       data['lengths_m'], data['durations_s'])
+
+    def save(self, path):
+        np.savez_compressed(
+            path, lats=self.lats, lons=self.lons, offsets=self.offsets, targets=self.targets,
+            lengths_m=self.lengths_m, durations_s=self.durations_s
+        )
+
+    def snap(self, latitude, longitude):
+        """Nearest routable node and its distance in km, or (None, None) on an empty graph"""
+        nearest = self._snap.nearest(latitude, longitude, 1)
+        return nearest[0] if nearest else (None, None)
+
+    def _heuristic_seconds(self, a, b):
+        """Haversine travel time between two nodes at the network's top speed"""
+        dlat = self._lat_rad[b] - self._lat_rad[a]
+        dlon = self._lon_rad[b] - self._lon_rad[a]
+        h = math.sin(dlat / 2) ** 2 + self._cos_lat[a] * self._cos_lat[b] * math.sin(dlon / 2) ** 2
+        return 2000 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h))) / self.max_speed_ms
+
+    def shortest_path(self, source, target):
+        """Fastest path by bidirectional A*.
+
+        Both searches run on the same reduced costs, using the average of the
+        forward and backward potentials, so the usual bidirectional stopping
+        rule stays exact. Returns (nodes, edge indexes) or None if unreachable.
+        """
+        if source == target:
+            return [source], []
+        potentials = {}
+
+        def potential(node):
+            value = potentials.get(node)
+            if value is None:
+                value = potentials[node] = (self._heuristic_seconds(node, target)
+                                            - self._heuristic_seconds(source, node)) / 2
+            return value
+
+        distance = ({source: 0.0}, {target: 0.0})
+        parent = ({source: None}, {target: None})
+        settled = (set(), set())
+        heaps = ([(0.0, source)], [(0.0, target)])
+        graphs = (self._forward, self._backward)
+        best, meeting = math.inf, None
+
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            node_distance, node = heapq.heappop(heaps[side])
+            if node in settled[side] or node_distance > distance[side][node]:
+                continue
+            settled[side].add(node)
+            offsets, neighbours, edge_ids, durations = graphs[side]
+            other = distance[1 - side]
+            node_potential = potential(node)
+            for position in range(offsets[node], offsets[node + 1]):
+                neighbour = neighbours[position]
+                edge = edge_ids[position] if edge_ids else position
+                # Forward: w - p(u) + p(v); backward over a reversed edge v <- u: w + p(u) - p(v)
+                step = durations[edge] - node_potential + potential(neighbour) if side == 0 \
+                    else durations[edge] + node_potential - potential(neighbour)
+                candidate = node_distance + max(0.0, step)
+                if candidate < distance[side].get(neighbour, math.inf):
+                    distance[side][neighbour] = candidate
+                    parent[side][neighbour] = (node, edge)
+                    heapq.heappush(heaps[side], (candidate, neighbour))
+                if neighbour in other and candidate + other[neighbour] < best:
+                    best, meeting = candidate + other[neighbour], neighbour
+
+        if meeting is None:
+            return None
+        nodes, edges = [meeting], []
+        node = meeting
+        while parent[0][node]:
+            node, edge = parent[0][node]
+            nodes.append(node)
+            edges.append(edge)
+        nodes.reverse()
+        edges.reverse()
+        node = meeting
+        while parent[1][node]:
+            node, edge = parent[1][node]
+            nodes.append(node)
+            edges.append(edge)
+        return nodes, edges
+
+    def one_to_many(self, source, targets, reverse=False):
+        """Fastest durations (s) and their lengths (m) from source to each target node.
+
+        With reverse=True the times are from each target to source instead. One
+        Dijkstra run, stopped once every reachable target is settled; unreachable
+        targets get inf.
+        """
+        offsets, neighbours, edge_ids, durations = self._backward if reverse else self._forward
+        lengths = self._lengths
+        remaining = set(targets)
+        best = {source: (0.0, 0.0)}
+        settled = set()
+        heap = [(0.0, 0.0, source)]
+        while heap and remaining:
+            duration, length, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            remaining.discard(node)
+            for position in range(offsets[node], offsets[node + 1]):
+                neighbour = neighbours[position]
+                edge = edge_ids[position] if edge_ids else position
+                candidate = duration + durations[edge]
+                if neighbour not in settled and candidate < best.get(neighbour, (math.inf,))[0]:
+                    best[neighbour] = (candidate, length + lengths[edge])
+                    heapq.heappush(heap, (candidate, length + lengths[edge], neighbour))
+
+        found = [best[target] if target in settled else (math.inf, math.inf) for target in targets]
+        return (np.array([duration for duration, _ in found], dtype=np.float64),
+                np.array([length for _, length in found], dtype=np.float64))
+
+
+def parse_maxspeed(value):
+    """km/h from an OSM maxspeed tag ('60', '40 mph'), or None if unusable"""
+    if not value:
+        return None
+    parts = value.replace(';', ' ').split()
+    try:
+        speed = float(parts[0])
+    except ValueError:
+        return None
+    return speed * 1.609344 if len(parts) > 1 and parts[1] == 'mph' else speed
+
+def graph_from_osm(path):
+    """Build a RoadGraph from an OSM XML extract (.osm), streaming it once.
+
+    Only drivable highway classes are kept; oneway tags are honoured and
+    edge durations use maxspeed where given, else the class default.
+    """
+    node_coords, ways = {}, []
+    for _, element in ET.iterparse(path, events=('end',)):
+        if element.tag == 'node':
+            node_coords[int(element.get('id'))] = (float(element.get('lat')), float(element.get('lon')))
+            element.clear()
+        elif element.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in element.iter('tag')}
+            highway = tags.get('highway')
+            if highway in HIGHWAY_SPEEDS_KMH:
+                speed = parse_maxspeed(tags.get('maxspeed')) or HIGHWAY_SPEEDS_KMH[highway]
+                oneway = tags.get('oneway')
+                if oneway is None and (highway.startswith('motorway') or tags.get('junction') == 'roundabout'):
+                    oneway = 'yes'
+                refs = [int(nd.get('ref')) for nd in element.iter('nd')]
+                ways.append((refs, speed, oneway))
+            element.clear()
+
+    index = {}
+    sources, targets, speeds = [], [], []
+    for refs, speed, oneway in ways:
+        refs = [ref for ref in refs if ref in node_coords]
+        if oneway == '-1':
+            refs.reverse()
+        for a, b in zip(refs, refs[1:]):
+            a, b = index.setdefault(a, len(index)), index.setdefault(b, len(index))
+            sources.append(a)
+            targets.append(b)
+            speeds.append(speed)
+            if oneway not in ('yes', 'true', '1', '-1'):
+                sources.append(b)
+                targets.append(a)
+                speeds.append(speed)
+
+    coords = np.array([node_coords[ref] for ref in index], dtype=np.float64).reshape(-1, 2)
+    sources, targets = np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+    lengths_m = haversine(coords[sources, 0], coords[sources, 1], coords[targets, 0], coords[targets, 1]) * 1000
+    durations_s = lengths_m / (np.array(speeds, dtype=np.float64) / 3.6)
+    return RoadGraph.from_edges(coords[:, 0], coords[:, 1], sources, targets, lengths_m, durations_s)
+
+
+class RoutingEngine:
+    """Offline road routing over a graph file, with an LRU cache of hot node pairs.
+
+    Without a graph file (or when the points are not connected) routes fall
+    back to the straight line at FALLBACK_SPEED_KMH, flagged as such.
+    """
+
+    def __init__(self, path=None, cache_size=ROUTE_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._graph = None
+        self._loaded = False
+        self._signature = 'straight_line'
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app):
+        """Read ROAD_GRAPH_PATH from the app config; the graph loads on first use"""
+        self.path = app.config.get('ROAD_GRAPH_PATH')
+        self.set_graph(None)
+
+    def set_graph(self, graph):
+        """Use an in-memory graph (None to reload from path on next use) and drop cached routes"""
+        with self._lock:
+            self._graph = graph
+            self._loaded = graph is not None
+            self._signature = f'memory:{id(graph)}' if graph is not None else 'straight_line'
+            self._cache.clear()
+
+    @property
+    def graph(self):
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                if self.path and os.path.exists(self.path):
+                    self._graph = RoadGraph.load(self.path)
+                    self._signature = f'file:{os.path.abspath(self.path)}:{os.path.getmtime(self.path)}'
+                    print(f"🛣️ Road graph loaded: {self._graph.node_count} nodes, {self._graph.edge_count} edges")
+            return self._graph
+
+    def signature(self):
+        """Identifies the graph in use, so tables derived from it know when to rebuild"""
+        self.graph
+        with self._lock:
+            return self._signature
+
+    def _path(self, graph, source, target):
+        key = (source, target)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+        result = graph.shortest_path(source, target)
+        if result is not None:
+            nodes, edges = result
+            result = (nodes, float(graph.lengths_m[edges].sum()), float(graph.durations_s[edges].sum()))
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def route(self, from_latitude, from_longitude, to_latitude, to_longitude):
+        """Road distance, duration and encoded polyline between two points"""
+        graph = self.graph
+        if graph is not None:
+            source, source_gap_km = graph.snap(from_latitude, from_longitude)
+            target, target_gap_km = graph.snap(to_latitude, to_longitude)
+            result = self._path(graph, source, target) if source is not None else None
+            if result is not None:
+                nodes, length_m, duration_s = result
+                access_km = source_gap_km + target_gap_km
+                lats = [from_latitude] + graph.lats[nodes].tolist() + [to_latitude]
+                lons = [from_longitude] + graph.lons[nodes].tolist() + [to_longitude]
+                return {
+                    'source': 'road_graph',
+                    'distance_km': length_m / 1000 + access_km,
+                    'duration_minutes': duration_s / 60 + access_km / ACCESS_SPEED_KMH * 60,
+                    'polyline': encode_polyline(lats, lons),
+                    'point_count': len(lats)
+                }
+
+        distance_km = calculate_distance(from_latitude, from_longitude, to_latitude, to_longitude)
+        return {
+            'source': 'straight_line',
+            'distance_km': distance_km,
+            'duration_minutes': distance_km / FALLBACK_SPEED_KMH * 60,
+            'polyline': encode_polyline([from_latitude, to_latitude], [from_longitude, to_longitude]),
+            'point_count': 2
+        }
+
+    def table(self, latitude, longitude, latitudes, longitudes, reverse=False):
+        """Distances (km) and durations (minutes) from one point to many, or from many to it.
+
+        One Dijkstra run over the road graph; pairs it cannot connect (or every
+        pair, without a graph) use the straight-line fallback.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        distance_km = haversine(latitude, longitude, latitudes, longitudes)
+        duration_minutes = distance_km / FALLBACK_SPEED_KMH * 60
+        graph = self.graph
+        if graph is None or not latitudes.size:
+            return distance_km, duration_minutes
+
+        source, source_gap_km = graph.snap(latitude, longitude)
+        if source is None:
+            return distance_km, duration_minutes
+        snapped = [graph.snap(lat, lon) for lat, lon in zip(latitudes.tolist(), longitudes.tolist())]
+        durations_s, lengths_m = graph.one_to_many(source, [node for node, _ in snapped], reverse)
+        access_km = source_gap_km + np.array([gap for _, gap in snapped], dtype=np.float64)
+        routed = np.isfinite(durations_s)
+        distance_km = np.where(routed, lengths_m / 1000 + access_km, distance_km)
+        duration_minutes = np.where(routed, durations_s / 60 + access_km / ACCESS_SPEED_KMH * 60, duration_minutes)
+        return distance_km, duration_minutes
+
+    def metrics(self):
+        with self._lock:
+            graph = self._graph
+            return {
+                'graph_loaded': graph is not None,
+                'nodes': graph.node_count if graph is not None else 0,
+                'edges': graph.edge_count if graph is not None else 0,
+                'cached_routes': len(self._cache),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+routing_engine = RoutingEngine()
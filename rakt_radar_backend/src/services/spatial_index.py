@@ -0,0 +1,182 @@
+import heapq
+import math
+import threading
+
+from src.services.geo import EARTH_RADIUS_KM, distances
+
+class GridIndex:
+    """In-memory lat/lon grid index for facility lookups.
+
+    Points are bucketed into square cells of `cell_size_deg` degrees. Searches walk
+    outward ring by ring from the origin cell, so callers can stop as soon as the
+    minimum distance of the next ring can no longer improve their result.
+    """
+
+    def __init__(self, cell_size_deg=0.25):
+        self.cell_size_deg = cell_size_deg
+        self._cells = {}
+        self._points = {}
+        self._bounds = None  # (min row, max row, min col, max col) of occupied cells, or None if stale
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def _cell(self, latitude, longitude):
+        return (int(math.floor(latitude / self.cell_size_deg)),
+                int(math.floor(longitude / self.cell_size_deg)))
+
+    def insert(self, point_id, latitude, longitude):
+        """Add a point, or move it if it is already indexed"""
+        with self._lock:
+            self.remove(point_id)
+            cell = self._cell(latitude, longitude)
+            self._cells.setdefault(cell, {})[point_id] = (latitude, longitude)
+            self._points[point_id] = cell
+            if self._bounds:
+                min_row, max_row, min_col, max_col = self._bounds
+                self._bounds = (min(min_row, cell[0]), max(max_row, cell[0]),
+                                min(min_col, cell[1]), max(max_col, cell[1]))
+
+    def remove(self, point_id):
+        """Drop a point from the index (no-op if it is not indexed)"""
+        with self._lock:
+            cell = self._points.pop(point_id, None)
+            if cell is not None:
+                bucket = self._cells.get(cell, {})
+                bucket.pop(point_id, None)
+                if not bucket:
+                    self._cells.pop(cell, None)
+                    self._bounds = None
+
+    def clear(self):
+        with self._lock:
+            self._cells = {}
+            self._points = {}
+            self._bounds = None
+            self.loaded = False
+
+    def load(self, points):
+        """Replace the index contents with an iterable of (id, latitude, longitude)"""
+        with self._lock:
+            self.clear()
+            for point_id, latitude, longitude in points:
+                self.insert(point_id, latitude, longitude)
+            self.loaded = True
+
+    def __len__(self):
+        return len(self._points)
+
+    def _ring_cells(self, center, ring):
+        """Cells at Chebyshev distance `ring` from the center cell"""
+        ci, cj = center
+        if ring == 0:
+            return [center]
+        cells = []
+        for dj in range(-ring, ring + 1):
+            cells.append((ci - ring, cj + dj))
+            cells.append((ci + ring, cj + dj))
+        for di in range(-ring + 1, ring):
+            cells.append((ci + di, cj - ring))
+            cells.append((ci + di, cj + ring))
+        return cells
+
+    def _ring_min_distance_km(self, latitude, ring):
+        """Lower bound on the distance from the origin to any point outside the first `ring` rings.
+
+        Such a point is at least `ring` cells away in latitude or in longitude. A
+        latitude gap is a plain meridian distance; a longitude gap is shortest at
+        the highest latitude the next ring reaches, where the great circle across
+        it is 2 asin(cos(lat) sin(gap / 2)). That is never more than the meridian
+        distance, so it bounds both.
+        """
+        gap_deg = ring * self.cell_size_deg
+        # Longitude degrees shrink towards the poles, down to nothing at the pole itself
+        widest_lat = min(90.0, abs(latitude) + (ring + 1) * self.cell_size_deg)
+        half_gap = math.radians(min(gap_deg, 180.0)) / 2
+        return 2 * EARTH_RADIUS_KM * math.asin(math.cos(math.radians(widest_lat)) * math.sin(half_gap))
+
+    def iter_rings(self, latitude, longitude):
+        """Yield (min_distance_km, [(id, lat, lon), ...]) for each ring, nearest first.
+
+        `min_distance_km` is a lower bound on the distance of every point in this ring
+        and all rings after it, so a caller can break once it cannot beat its best match.
+        """
+        with self._lock:
+            if not self._points:
+                return
+            if not self._bounds:
+                rows = [cell[0] for cell in self._cells]
+                cols = [cell[1] for cell in self._cells]
+                self._bounds = (min(rows), max(rows), min(cols), max(cols))
+            min_row, max_row, min_col, max_col = self._bounds
+            center = self._cell(latitude, longitude)
+            max_ring = max(
+                abs(center[0] - min_row), abs(center[0] - max_row),
+                abs(center[1] - min_col), abs(center[1] - max_col)
+            )
+
+        for ring in range(max_ring + 1):
+            with self._lock:
+                candidates = []
+                for cell in self._ring_cells(center, ring):
+                    for point_id, (lat, lon) in self._cells.get(cell, {}).items():
+                        candidates.append((point_id, lat, lon))
+            yield self._ring_min_distance_km(latitude, max(0, ring - 1)), candidates
+
+    def nearest(self, latitude, longitude, k=1, exclude=()):
+        """The k nearest points as [(id, distance_km), ...], nearest first.
+
+        Rings are read only until the k-th distance found is no farther than the
+        next ring's lower bound, so the cost tracks the neighbourhood, not the index.
+        """
+        found = []
+        for min_distance, candidates in self.iter_rings(latitude, longitude):
+            if len(found) >= k and found[k - 1][1] <= min_distance:
+                break
+            candidates = [row for row in candidates if row[0] not in exclude]
+            if not candidates:
+                continue
+            ring_distances = distances(
+                (latitude, longitude),
+                [lat for _, lat, _ in candidates],
+                [lon for _, _, lon in candidates]
+            )
+            found = heapq.nsmallest(
+                k, found + [(point_id, distance) for (point_id, _, _), distance in zip(candidates, ring_distances.tolist())],
+                key=lambda row: row[1]
+            )
+        return found
+
+
+# Process-wide index of blood bank locations, kept current by the blood_banks routes
+blood_bank_index = GridIndex()
+
+def get_blood_bank_index():
+    """Return the blood bank index, loading it from the database on first use"""
+    if not blood_bank_index.loaded:
+        from src.models.models import BloodBank
+        rows = BloodBank.query.with_entities(BloodBank.id, BloodBank.latitude, BloodBank.longitude).all()
+        blood_bank_index.load(rows)
+    return blood_bank_index
+
+
+# Process-wide index of available drivers with a known position, kept current by the routes endpoints
+driver_index = GridIndex(cell_size_deg=0.05)
+
+def get_driver_index():
+    """Return the driver index, loading available located drivers from the database on first use"""
+    if not driver_index.loaded:
+        from src.models.models import Driver
+        rows = Driver.query.with_entities(Driver.id, Driver.current_latitude, Driver.current_longitude).filter(
+            Driver.is_available == True,
+            Driver.current_latitude.isnot(None),
+            Driver.current_longitude.isnot(None)
+        ).all()
+        driver_index.load(rows)
+    return driver_index
+
+def track_driver(driver):
+    """Index a driver if available with a known position, otherwise drop it"""
+    if driver.is_available and driver.current_latitude is not None and driver.current_longitude is not None:
+        driver_index.insert(driver.id, driver.current_latitude, driver.current_longitude)
+    else:
+        driver_index.remove(driver.id)
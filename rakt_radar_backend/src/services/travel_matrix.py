@@ -0,0 +1,201 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from src.services.routing import routing_engine
+
+# Slots allocated up front; the files double when either side fills up
+INITIAL_HOSPITAL_SLOTS = 64
+INITIAL_BANK_SLOTS = 256
+
+class TravelMatrix:
+    """Bank-to-hospital travel distance and duration, persisted as memory-mapped .npy files.
+
+    Cell [row, col] holds the trip from the bank in `col` to the hospital in
+    `row`, from the routing engine (road graph, else straight line). Every
+    facility remembers the coordinates its row or column was computed for;
+    a lookup for a new or moved facility recomputes just that row or column
+    (one one-to-many search), so the rest of the matrix is never touched.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._opened = False
+        self._signature = None
+        self._hospitals = {}  # id -> [row, latitude, longitude]
+        self._banks = {}  # id -> [col, latitude, longitude]
+        self._distance = None
+        self._duration = None
+        self.lookups = 0
+        self.rows_built = 0
+        self.columns_built = 0
+
+    def init_app(self, app):
+        """Read TRAVEL_MATRIX_DIR from the app config; files open on first use"""
+        with self._lock:
+            self.directory = app.config.get('TRAVEL_MATRIX_DIR')
+            self._reset()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _open(self):
+        """Open the files, starting afresh if they were built over a different road graph"""
+        signature = routing_engine.signature()
+        if self._opened and self._signature == signature:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        index_path = self._path('index.json')
+        index = None
+        if os.path.exists(index_path):
+            with open(index_path) as handle:
+                index = json.load(handle)
+        self._hospitals, self._banks = {}, {}
+        self._distance = self._duration = None
+        if index and index.get('graph') == signature:
+            self._hospitals = index['hospitals']
+            self._banks = index['banks']
+            self._distance = np.load(self._path('distance_km.npy'), mmap_mode='r+')
+            self._duration = np.load(self._path('duration_min.npy'), mmap_mode='r+')
+        else:
+            self._allocate(INITIAL_HOSPITAL_SLOTS, INITIAL_BANK_SLOTS)
+        self._signature = signature
+        self._opened = True
+
+    def _allocate(self, rows, cols):
+        """(Re)create the files with room for rows x cols, keeping existing cells"""
+        old = (self._distance, self._duration)
+        arrays = []
+        for name, previous in zip(('distance_km', 'duration_min'), old):
+            path = self._path(f'{name}.tmp.npy')
+            array = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(rows, cols))
+            array[:] = np.nan
+            if previous is not None:
+                array[:previous.shape[0], :previous.shape[1]] = previous
+            array.flush()
+            arrays.append((path, array))
+        for (path, _), name in zip(arrays, ('distance_km', 'duration_min')):
+            os.replace(path, self._path(f'{name}.npy'))
+        self._distance = np.load(self._path('distance_km.npy'), mmap_mode='r+')
+        self._duration = np.load(self._path('duration_min.npy'), mmap_mode='r+')
+
+    def _save_index(self):
+        self._distance.flush()
+        self._duration.flush()
+        path = self._path('index.json.tmp')
+        with open(path, 'w') as handle:
+            json.dump({'graph': self._signature, 'hospitals': self._hospitals, 'banks': self._banks}, handle)
+        os.replace(path, self._path('index.json'))
+
+    def _slot(self, entries, capacity):
+        """Next free slot, growing the files when the side is full"""
+        slot = max((entry[0] for entry in entries.values()), default=-1) + 1
+        if slot >= capacity:
+            rows, cols = self._distance.shape
+            if entries is self._hospitals:
+                self._allocate(rows * 2, cols)
+            else:
+                self._allocate(rows, cols * 2)
+        return slot
+
+    def _hospital_row(self, hospital_id, latitude, longitude):
+        entry = self._hospitals.get(hospital_id)
+        if entry and entry[1] == latitude and entry[2] == longitude:
+            return entry[0], False
+        row = entry[0] if entry else self._slot(self._hospitals, self._distance.shape[0])
+        self._hospitals[hospital_id] = [row, latitude, longitude]
+        banks = list(self._banks.values())
+        if banks:
+            cols = [col for col, _, _ in banks]
+            # Trips run bank -> hospital, so search backwards from the hospital
+            distance, duration = routing_engine.table(
+                latitude, longitude, [lat for _, lat, _ in banks], [lon for _, _, lon in banks], reverse=True
+            )
+            self._distance[row, cols] = distance
+            self._duration[row, cols] = duration
+        self.rows_built += 1
+        return row, True
+
+    def _bank_column(self, bank_id, latitude, longitude):
+        entry = self._banks.get(bank_id)
+        if entry and entry[1] == latitude and entry[2] == longitude:
+            return entry[0], False
+        col = entry[0] if entry else self._slot(self._banks, self._distance.shape[1])
+        self._banks[bank_id] = [col, latitude, longitude]
+        hospitals = list(self._hospitals.values())
+        if hospitals:
+            rows = [row for row, _, _ in hospitals]
+            distance, duration = routing_engine.table(
+                latitude, longitude, [lat for _, lat, _ in hospitals], [lon for _, _, lon in hospitals]
+            )
+            self._distance[rows, col] = distance
+            self._duration[rows, col] = duration
+        self.columns_built += 1
+        return col, True
+
+    def from_hospital(self, hospital, banks):
+        """(distance_km, duration_min) arrays for [(bank_id, latitude, longitude), ...] to one hospital"""
+        with self._lock:
+            self._open()
+            row, changed = self._hospital_row(hospital.id, hospital.latitude, hospital.longitude)
+            cols = []
+            for bank_id, latitude, longitude in banks:
+                col, built = self._bank_column(bank_id, latitude, longitude)
+                cols.append(col)
+                changed = changed or built
+            if changed:
+                self._save_index()
+            self.lookups += len(cols)
+            return (np.asarray(self._distance[row, cols], dtype=np.float64),
+                    np.asarray(self._duration[row, cols], dtype=np.float64))
+
+    def pair(self, hospital, bank):
+        """(distance_km, duration_min) of the trip from a bank to a hospital"""
+        distance, duration = self.from_hospital(hospital, [(bank.id, bank.latitude, bank.longitude)])
+        return float(distance[0]), float(duration[0])
+
+    def update_hospital(self, hospital):
+        """Recompute a created or moved hospital's row now rather than on its next lookup"""
+        with self._lock:
+            self._open()
+            if self._hospital_row(hospital.id, hospital.latitude, hospital.longitude)[1]:
+                self._save_index()
+
+    def update_bank(self, bank):
+        with self._lock:
+            self._open()
+            if self._bank_column(bank.id, bank.latitude, bank.longitude)[1]:
+                self._save_index()
+
+    def remove_hospital(self, hospital_id):
+        """Forget a deleted hospital; its row is left for the file's lifetime"""
+        with self._lock:
+            self._open()
+            if self._hospitals.pop(hospital_id, None):
+                self._save_index()
+
+    def remove_bank(self, bank_id):
+        with self._lock:
+            self._open()
+            if self._banks.pop(bank_id, None):
+                self._save_index()
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'hospitals': len(self._hospitals),
+                'banks': len(self._banks),
+                'capacity': list(self._distance.shape) if self._distance is not None else None,
+                'lookups': self.lookups,
+                'rows_built': self.rows_built,
+                'columns_built': self.columns_built
+            }
+
+
+travel_matrix = TravelMatrix()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the multi-bank split allocator and split approvals
+"""
+
+import itertools
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def brute_force(supply, fixed, per_ml, need):
+    """Cheapest cost over every subset of banks (each filled cheapest per-ml first)"""
+    from src.services.allocation import fill_cost
+
+    best = float('inf')
+    for size in range(1, len(supply) + 1):
+        for subset in itertools.combinations(range(len(supply)), size):
+            cost, _ = fill_cost(list(subset), supply, fixed, per_ml, need)
+            best = min(best, cost)
+    return best
+
+
+def test_split_matches_brute_force_and_the_bound():
+    """On small random instances the split matches brute force and never beats the LP bound"""
+    import numpy as np
+    from src.services.allocation import lower_bound, solve_split
+
+    rng = np.random.default_rng(16)
+    worst_gap = 0.0
+    for _ in range(40):
+        n = int(rng.integers(3, 10))
+        supply = rng.choice([450.0, 900.0, 1350.0, 1800.0], size=n)
+        fixed = rng.uniform(5, 90, size=n)
+        per_ml = rng.uniform(0, 0.05, size=n)
+        need = float(rng.choice([900, 1800, 2700, 3600]))
+        amounts, cost = solve_split(supply, fixed, per_ml, need)
+        optimum = brute_force(supply, fixed, per_ml, need)
+        if optimum == float('inf'):
+            assert amounts is None
+            continue
+        assert abs(sum(amounts.values()) - need) < 1e-6
+        assert all(amount <= supply[index] + 1e-6 for index, amount in amounts.items())
+        assert lower_bound(supply, fixed, per_ml, need) <= optimum + 1e-6 <= cost + 1e-6
+        worst_gap = max(worst_gap, cost / optimum - 1)
+    assert worst_gap < 1e-9
+    print("✅ Split costs match brute force and sit above the LP bound")
+
+
+def test_approval_splits_across_nearby_banks(facilities):
+    """A bank short of stock approves its share; nearby banks cover the rest with their own routes"""
+    from src.main import app, db
+    from src.models.models import (BloodUnit, Driver, EmergencyRequest, InventorySummary, Notification,
+                                   RequestItem, Route)
+    from src.models.user import User
+    from src.routes.emergency_requests import match_score, ml_predict_bank
+    from src.services.allocation import plan_allocation
+    from src.services.spatial_index import blood_bank_index
+
+    tag = facilities.tag
+    # Far from the seeded Tamil Nadu network, so only the test banks are in reach
+    base_lat, base_lon = 21.5, 86.5
+    with app.app_context():
+        db.create_all()
+        hospital = facilities.hospital(f"Split Test Hospital {tag}", base_lat, base_lon,
+                                       city="Balasore", state="Odisha")
+
+        def bank(name, offset_km, units):
+            blood_bank = facilities.blood_bank(f"Split {name} {tag}", base_lat + offset_km / 111.0, base_lon,
+                                               city="Balasore", state="Odisha")
+            db.session.flush()
+            db.session.add_all([BloodUnit(
+                blood_bank_id=blood_bank.id, blood_type='B+', quantity_ml=450,
+                collection_date=date.today(), expiry_date=date.today() + timedelta(days=10), status='available',
+                current_location_latitude=blood_bank.latitude, current_location_longitude=blood_bank.longitude
+            ) for _ in range(units)])
+            return blood_bank
+
+        approving = bank('approving', 2.0, 2)
+        near = bank('near', 4.0, 2)
+        far = bank('far', 40.0, 4)
+        db.session.flush()
+        bank_user = User(
+            username=f"split_bank_{tag}", email=f"split-bank-{tag}@example.com", password_hash="unused",
+            role='blood_bank', entity_id=approving.id
+        )
+        driver_user = User(
+            username=f"split_driver_{tag}", email=f"split-driver-{tag}@example.com", password_hash="unused",
+            role='driver'
+        )
+        request_obj = EmergencyRequest(
+            hospital_id=hospital.id, blood_type='B+', quantity_ml=1800, urgency='high',
+            notes='split allocation test', suggested_bank_id=approving.id, status='created',
+            predicted_eta_minutes=5
+        )
+        db.session.add_all([bank_user, driver_user, request_obj])
+        db.session.commit()
+        ids = {
+            'hospital': hospital.id, 'banks': [approving.id, near.id, far.id], 'request': request_obj.id,
+            'users': [bank_user.id, driver_user.id], 'approving': approving.id, 'near': near.id
+        }
+    blood_bank_index.clear()
+
+    client = app.test_client()
+    try:
+        with app.app_context():
+            # All three banks' stock: no single bank covers it, so the suggestion scores the split plan,
+            # expiry included (every unit has 10 days left, a full expiry score)
+            match, score = ml_predict_bank(ids['hospital'], 'B+', 3600, 'high')
+            plan = plan_allocation(base_lat, base_lon, 'B+', 3600, 'high')
+            assert match.id in ids['banks'] and {leg['blood_bank_id'] for leg in plan['legs']} == set(ids['banks'])
+            assert all(leg['avg_days_until_expiry'] == 10 for leg in plan['legs'])
+            expected = sum(match_score(leg['distance_km'], 10, 0, 1.5) * leg['quantity_ml'] for leg in plan['legs']) / 3600
+            assert score == pytest.approx(expected) and score > 0.6 * 100 * 1.5
+
+        with client.session_transaction() as flask_session:
+            flask_session['user_id'] = ids['users'][0]
+        response = client.post(f"/api/emergency_requests/{ids['request']}/approve")
+        assert response.status_code == 200, response.get_json()
+        body = response.get_json()
+        assert body['reserved_units'] == 4
+        legs = {leg['blood_bank_id']: leg['quantity_ml'] for leg in body['allocation']['legs']}
+        # The approving bank gives everything it has; the nearby bank beats the far one
+        assert legs == {ids['approving']: 900, ids['near']: 900}
+        assert body['allocation']['lower_bound'] <= body['allocation']['cost']
+        assert len(body['routes']) == 2 and body['route']['start_latitude'] == body['routes'][0]['start_latitude']
+
+        with app.app_context():
+            items = RequestItem.query.filter_by(request_id=ids['request']).all()
+            by_bank = {}
+            for item in items:
+                by_bank[item.source_bank_id] = by_bank.get(item.source_bank_id, 0) + item.quantity_ml
+            assert by_bank == legs
+            routes = Route.query.filter_by(request_id=ids['request']).all()
+            assert len(routes) == 2
+            # No located driver nearby: the fallback driver login is linked to the Driver it was given,
+            # so its inbox (keyed by Driver id) holds the assignments
+            fallback_user = User.query.filter_by(username=routes[0].driver_name).one()
+            fallback_driver = Driver.query.filter_by(name=fallback_user.username).one()
+            assert fallback_user.entity_id == fallback_driver.id
+            assert Notification.query.filter_by(recipient_role='driver', recipient_id=fallback_driver.id,
+                                                type='route_assigned', request_id=ids['request']).count() == 2
+        print(f"✅ 1800ml split as {sorted(legs.values())} across two banks with a route each")
+    finally:
+        blood_bank_index.clear()
+        with app.app_context():
+            Notification.query.filter_by(request_id=ids['request']).delete()
+            Route.query.filter_by(request_id=ids['request']).delete()
+            RequestItem.query.filter_by(request_id=ids['request']).delete()
+            EmergencyRequest.query.filter_by(id=ids['request']).delete()
+            BloodUnit.query.filter(BloodUnit.blood_bank_id.in_(ids['banks'])).delete()
+            InventorySummary.query.filter(InventorySummary.blood_bank_id.in_(ids['banks'])).delete()
+            Driver.query.filter_by(name=f"split_driver_{tag}").delete()
+            User.query.filter(User.id.in_(ids['users'])).delete()
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
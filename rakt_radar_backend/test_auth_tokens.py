@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test script to verify signed bearer tokens: stateless checks, expiry, tampering and revocation
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+import uuid
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+@contextlib.contextmanager
+def users_queries(engine):
+    """Collect the statements that read the users table while the block runs"""
+    from sqlalchemy import event
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM users' in statement:
+            statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_bearer_tokens_and_revocation():
+    """Login issues a token that authorizes without the users table until it expires or is revoked"""
+    from src.main import app, db
+    from src.models.user import TokenRevocation, User
+    from src.routes.user import hash_password
+    from src.services.auth import token_authority
+
+    tag = uuid.uuid4().hex[:8]
+    with app.app_context():
+        db.create_all()
+        admin = User(username=f"auth_admin_{tag}", email=f"auth-admin-{tag}@example.com",
+                     password_hash=hash_password('secret'), role='admin')
+        driver = User(username=f"auth_driver_{tag}", email=f"auth-driver-{tag}@example.com",
+                      password_hash=hash_password('secret'), role='driver')
+        db.session.add_all([admin, driver])
+        db.session.commit()
+        ids = {'admin': admin.id, 'driver': driver.id}
+
+    def login(username):
+        response = app.test_client().post('/api/auth/login', json={'username': username, 'password': 'secret'})
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()
+
+    # No cookies: the Authorization header is the only credential
+    client = app.test_client(use_cookies=False)
+
+    def get(path, token):
+        return client.get(path, headers={'Authorization': f'Bearer {token}'})
+
+    try:
+        body = login(f"auth_driver_{tag}")
+        assert body['token_type'] == 'Bearer' and body['expires_in'] == token_authority.ttl_seconds
+        token = body['session_token']
+
+        with app.app_context(), users_queries(db.engine) as statements:
+            assert get('/api/notifications', token).status_code == 200
+            assert get('/api/routes', token).status_code == 200
+        assert statements == [], statements
+        # The role claim is what the admin check sees
+        assert client.post('/api/eta/model/train', headers={'Authorization': f'Bearer {token}'}).status_code == 403
+        print("✅ Bearer token authorizes without touching the users table")
+
+        assert get('/api/notifications', token[:-2] + ('AA' if not token.endswith('AA') else 'BB')).status_code == 401
+        ttl = token_authority.ttl_seconds
+        token_authority.ttl_seconds = -1
+        try:
+            assert get('/api/notifications', token).status_code == 401
+        finally:
+            token_authority.ttl_seconds = ttl
+        assert client.get('/api/notifications').status_code == 401
+        print("✅ Tampered, expired and missing tokens are refused")
+
+        # Correctly signed claims still have to match a stored, active user
+        def signed(**claims):
+            claims = dict({'sub': ids['driver'], 'username': f"auth_driver_{tag}", 'role': 'driver',
+                           'entity_id': None, 'jti': uuid.uuid4().hex, 'iat': time.time()}, **claims)
+            return token_authority._serializer.dumps(claims)
+
+        assert get('/api/notifications', signed()).status_code == 200
+        assert get('/api/notifications', signed(sub='nobody', role='admin')).status_code == 401
+        assert get('/api/notifications', signed(role='admin')).status_code == 401
+        assert get('/api/notifications', signed(entity_id='someone-elses-bank')).status_code == 401
+        print("✅ Signed claims for a missing user or a role the user lacks are refused")
+
+        second = login(f"auth_driver_{tag}")['session_token']
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert client.post('/api/auth/logout', headers={'Authorization': f'Bearer {token}'}).status_code == 200
+        assert get('/api/notifications', token).status_code == 401
+        assert get('/api/notifications', second).status_code == 200
+        print("✅ Logout revokes only the presented token")
+
+        # A legacy cookie session resolves once, then from the principal cache
+        legacy = app.test_client()
+        with legacy.session_transaction() as flask_session:
+            flask_session['user_id'] = ids['driver']
+        assert legacy.get('/api/notifications').status_code == 200
+        with app.app_context(), users_queries(db.engine) as statements:
+            assert legacy.get('/api/notifications').status_code == 200
+        assert statements == []
+
+        admin_token = login(f"auth_admin_{tag}")['session_token']
+        response = client.put(f"/api/users/{ids['driver']}", json={'is_active': False},
+                              headers={'Authorization': f'Bearer {admin_token}'})
+        assert response.status_code == 200, response.get_json()
+        assert get('/api/notifications', second).status_code == 401
+        assert legacy.get('/api/notifications').status_code == 401
+        assert get('/api/notifications', admin_token).status_code == 200
+
+        # Another worker learns of the revocation from the table
+        with app.app_context():
+            token_authority._reset()
+            token_authority._refresh_revocations(force=True)
+        assert get('/api/notifications', second).status_code == 401
+        print("✅ Deactivating a user revokes all their tokens and their cookie session")
+    finally:
+        with app.app_context():
+            TokenRevocation.query.filter(TokenRevocation.user_id.in_(ids.values())).delete()
+            User.query.filter(User.id.in_(ids.values())).delete()
+            db.session.commit()
+
+
+def test_refuses_missing_or_published_secret_key():
+    """Tokens are never signed with an empty key or the one that used to be in the source"""
+    from flask import Flask
+    from src.services.auth import LEGACY_SECRET_KEYS, TokenAuthority
+
+    for secret_key in (None, '', *LEGACY_SECRET_KEYS):
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = secret_key
+        authority = TokenAuthority()
+        try:
+            authority.init_app(app)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError(f"init_app accepted SECRET_KEY={secret_key!r}")
+        try:
+            authority.issue(None)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("issue() signed a token without a key")
+    print("✅ Missing and published SECRET_KEYs are refused")
+
+
+if __name__ == "__main__":
+    test_bearer_tokens_and_revocation()
+    test_refuses_missing_or_published_secret_key()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script to verify ABO/Rh compatibility masks and compatibility-aware bank matching
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Red-cell donors each recipient may receive, from the standard transfusion chart
+TRANSFUSION_CHART = {
+    'O-': {'O-'},
+    'O+': {'O-', 'O+'},
+    'A-': {'O-', 'A-'},
+    'A+': {'O-', 'O+', 'A-', 'A+'},
+    'B-': {'O-', 'B-'},
+    'B+': {'O-', 'O+', 'B-', 'B+'},
+    'AB-': {'O-', 'A-', 'B-', 'AB-'},
+    'AB+': {'O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'},
+}
+
+
+def test_masks_match_the_transfusion_chart():
+    """Precomputed masks reproduce the chart, rank exact first and hold O- back for critical requests"""
+    from src.services.compatibility import DONOR_MASK, donor_types, is_compatible, types_in_mask
+
+    for recipient, donors in TRANSFUSION_CHART.items():
+        assert set(types_in_mask(DONOR_MASK[recipient])) == donors
+        assert set(donor_types(recipient, 'critical')) == donors
+        assert donor_types(recipient, 'critical')[0] == recipient
+        for donor in TRANSFUSION_CHART:
+            assert is_compatible(recipient, donor) == (donor in donors)
+
+    assert 'O-' not in donor_types('AB+', 'high') and donor_types('AB+', 'critical')[-1] == 'O-'
+    assert donor_types('O-', 'low') == ['O-']
+    print("✅ Compatibility masks match the transfusion chart")
+
+
+def test_bank_matching_prefers_exact_and_protects_o_negative(facilities):
+    """An exact-type bank beats a closer substitute; O- stock is only offered to critical requests"""
+    from src.main import app, db
+    from src.models.models import BloodUnit, InventorySummary
+    from src.routes.emergency_requests import ml_predict_bank
+    from src.services.spatial_index import blood_bank_index
+
+    tag = facilities.tag
+    # Far from the seeded Tamil Nadu network, so only the test banks are in reach
+    base_lat, base_lon = 21.0, 86.0
+    with app.app_context():
+        db.create_all()
+        hospital = facilities.hospital(f"Compat Test Hospital {tag}", base_lat, base_lon,
+                                       city="Balasore", state="Odisha")
+
+        def bank(name, offset_km, blood_type):
+            blood_bank = facilities.blood_bank(f"Compat {name} {tag}", base_lat + offset_km / 111.0, base_lon,
+                                               city="Balasore", state="Odisha")
+            db.session.flush()
+            db.session.add_all([BloodUnit(
+                blood_bank_id=blood_bank.id, blood_type=blood_type, quantity_ml=450,
+                collection_date=date.today(), expiry_date=date.today() + timedelta(days=30), status='available',
+                current_location_latitude=blood_bank.latitude, current_location_longitude=blood_bank.longitude
+            ) for _ in range(2)])
+            return blood_bank
+
+        substitute = bank('substitute', 1.0, 'A+')
+        exact = bank('exact', 3.0, 'AB+')
+        universal = bank('universal', 0.5, 'O-')
+        db.session.commit()
+        ids = {'hospital': hospital.id, 'substitute': substitute.id, 'exact': exact.id, 'universal': universal.id}
+    blood_bank_index.clear()
+
+    try:
+        with app.app_context():
+            match, _ = ml_predict_bank(ids['hospital'], 'AB+', 450, 'high')
+            assert match.id == ids['exact']
+            # More than the exact bank holds: the A+ substitute covers it, O- stays protected
+            match, _ = ml_predict_bank(ids['hospital'], 'AB+', 900, 'high')
+            assert match.id == ids['exact']
+            match, _ = ml_predict_bank(ids['hospital'], 'A+', 900, 'high')
+            assert match.id == ids['substitute']
+            match, _ = ml_predict_bank(ids['hospital'], 'A-', 450, 'high')
+            assert match is None or match.id != ids['universal']
+            match, _ = ml_predict_bank(ids['hospital'], 'A-', 450, 'critical')
+            assert match.id == ids['universal']
+        print("✅ Exact matches win, substitutes fill in, and O- is reserved for critical requests")
+    finally:
+        blood_bank_index.clear()
+        with app.app_context():
+            bank_ids = [ids['substitute'], ids['exact'], ids['universal']]
+            BloodUnit.query.filter(BloodUnit.blood_bank_id.in_(bank_ids)).delete()
+            InventorySummary.query.filter(InventorySummary.blood_bank_id.in_(bank_ids)).delete()
+            db.session.commit()
+
+
+def test_ai_request_rejects_unknown_blood_types():
+    """An unknown blood type is the caller's mistake, not a server error"""
+    from src.main import app, db
+
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    response = client.post('/api/ai_blood_request', json={'blood_type': 'C+', 'urgency': 'high'})
+    assert response.status_code == 400 and 'C+' in response.get_json()['error']
+    response = client.post('/api/ai_blood_request', json={'blood_type': 'AB-', 'urgency': 'high'})
+    assert response.status_code == 200
+    assert response.get_json()['summary']['blood_type_requested'] == 'AB-'
+    print("✅ Unknown blood types get a 400")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
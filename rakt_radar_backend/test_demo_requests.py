@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the demo request listing reads routes in one batch, like the authenticated listing
+"""
+
+import os
+import sys
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_demo_listing_reads_routes_once(facilities):
+    """Every request comes back with its route and facilities from a single routes query"""
+    from sqlalchemy import event
+    from src.main import app, db
+    from src.models.models import EmergencyRequest, Route
+    from test_route_progress import seed_route, cleanup
+
+    with app.app_context():
+        db.create_all()
+        ids = seed_route(db, facilities)
+        # More requests with routes, so a per-row route lookup would show up as extra queries
+        extra = []
+        for _ in range(3):
+            request_obj = EmergencyRequest(
+                hospital_id=ids['hospital_id'], blood_type='A+', quantity_ml=450, urgency='medium',
+                notes='demo listing test', suggested_bank_id=ids['bank_id'], status='approved'
+            )
+            db.session.add(request_obj)
+            db.session.flush()
+            db.session.add(Route(
+                request_id=request_obj.id, driver_name='demo listing driver',
+                start_latitude=12.9716, start_longitude=80.2200, end_latitude=13.0827, end_longitude=80.2707,
+                eta_minutes=30, distance_km=20.0, status='pending'
+            ))
+            extra.append(request_obj.id)
+        db.session.commit()
+        engine = db.engine
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM routes' in statement:
+            statements.append(statement)
+
+    client = app.test_client()
+    try:
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            response = client.get('/api/demo/emergency_requests')
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+        assert response.status_code == 200
+
+        rows = {row['id']: row for row in response.get_json()}
+        assert all(rows[request_id]['route']['request_id'] == request_id for request_id in extra)
+        row = rows[ids['request_id']]
+        assert row['route']['id'] == ids['route_id']
+        assert row['hospital']['id'] == ids['hospital_id'] and row['suggested_bank']['id'] == ids['bank_id']
+        assert 'calculated_eta_minutes' in row
+        assert len(statements) == 1, statements
+        print(f"✅ {len(rows)} demo requests listed with one routes query")
+    finally:
+        with app.app_context():
+            Route.query.filter(Route.request_id.in_(extra)).delete()
+            EmergencyRequest.query.filter(EmergencyRequest.id.in_(extra)).delete()
+            db.session.commit()
+            cleanup(db, ids)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
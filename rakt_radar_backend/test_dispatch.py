@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the driver spatial index, k-nearest lookups and Hungarian dispatch
+"""
+
+import itertools
+import os
+import sys
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_hungarian_matches_brute_force():
+    """The assignment is optimal for square and rectangular cost matrices"""
+    import numpy as np
+    from src.services.dispatch import hungarian
+
+    rng = np.random.default_rng(17)
+    for _ in range(200):
+        rows, columns = (int(size) for size in rng.integers(1, 6, 2))
+        cost = rng.uniform(0, 50, (rows, columns))
+        assignment = hungarian(cost)
+        assigned = [column for column in assignment if column >= 0]
+        assert len(assigned) == len(set(assigned)) == min(rows, columns)
+
+        if rows <= columns:
+            best = min(sum(cost[row, perm[row]] for row in range(rows))
+                       for perm in itertools.permutations(range(columns), rows))
+        else:
+            best = min(sum(cost[perm[column], column] for column in range(columns))
+                       for perm in itertools.permutations(range(rows), columns))
+        total = sum(cost[row, column] for row, column in enumerate(assignment) if column >= 0)
+        assert abs(total - best) < 1e-9
+    print("✅ Hungarian assignment matches brute force")
+
+
+def test_nearest_matches_a_full_scan():
+    """k-nearest from the grid equals sorting every point by distance"""
+    import numpy as np
+    from src.services.geo import distances
+    from src.services.spatial_index import GridIndex
+
+    rng = np.random.default_rng(3)
+    lats, lons = rng.uniform(8.0, 13.5, 2000), rng.uniform(76.0, 80.5, 2000)
+    index = GridIndex(cell_size_deg=0.05)
+    index.load((f"d{i}", lat, lon) for i, (lat, lon) in enumerate(zip(lats.tolist(), lons.tolist())))
+
+    for origin in [(13.0827, 80.2707), (10.0, 78.0), (7.5, 75.5)]:
+        expected = np.argsort(distances(origin, lats, lons), kind='stable')[:7]
+        found = index.nearest(origin[0], origin[1], 7)
+        assert [point_id for point_id, _ in found] == [f"d{i}" for i in expected]
+        assert all(a[1] <= b[1] for a, b in zip(found, found[1:]))
+    assert index.nearest(10.0, 78.0, 3, exclude={"d0"}) and "d0" not in dict(index.nearest(10.0, 78.0, 2000, exclude={"d0"}))
+    print("✅ Grid k-nearest matches a full scan")
+
+
+def test_nearest_near_the_pole_at_a_cell_edge():
+    """Many columns away can still be nearest near the pole; the ring bound must not stop the walk early"""
+    from src.services.geo import calculate_distance
+    from src.services.spatial_index import GridIndex
+
+    # Just under the top edge of its cell, so the next rings reach almost to the pole
+    origin = (89.74, 0.0)
+    across_the_pole = ('across_the_pole', 89.99, 20.0)  # 80 columns away
+    down_the_meridian = ('down_the_meridian', 89.45, 0.0)  # two rows away
+    assert (calculate_distance(*origin, *across_the_pole[1:])
+            < calculate_distance(*origin, *down_the_meridian[1:]))
+
+    index = GridIndex(cell_size_deg=0.25)
+    index.load([across_the_pole, down_the_meridian])
+    assert index.nearest(*origin)[0][0] == 'across_the_pole'
+    print("✅ Grid nearest stays exact at high latitude")
+
+
+def test_dispatch_pairs_drivers_and_tracks_route_state(facilities):
+    """Approvals get distinct nearby drivers; starting and completing a route moves them in and out of the index"""
+    from src.main import app, db
+    from src.models.models import Driver, EmergencyRequest, Notification, Route, TrackPoint
+    from src.models.user import User
+    from src.services.dispatch import dispatch_drivers
+    from src.services.spatial_index import driver_index, get_driver_index
+
+    tag = facilities.tag
+    # Far from the seeded Tamil Nadu network, so only the test drivers are nearby
+    base_lat, base_lon = 22.0, 87.0
+    with app.app_context():
+        db.create_all()
+        drivers, users = [], []
+        # Pickups sit at 0 and 10 km east of the bank. Serving the first pickup greedily would
+        # take the middle driver and send the west one 20 km; the joint optimum crosses over
+        for name, offset_km in [('west', -10.0), ('middle', 6.0)]:
+            driver = Driver(
+                name=f"dispatch_{name}_{tag}", phone="+91-00000-00000", vehicle_number="TN-00-XX-0000",
+                current_latitude=base_lat, current_longitude=base_lon + offset_km / 103.0, is_available=True
+            )
+            db.session.add(driver)
+            db.session.flush()
+            users.append(User(
+                username=driver.name, email=f"dispatch-{name}-{tag}@example.com", password_hash="unused",
+                role='driver', entity_id=driver.id
+            ))
+            drivers.append(driver)
+        hospital = facilities.hospital(f"Dispatch Test Hospital {tag}", base_lat + 0.1, base_lon,
+                                       city="Kharagpur", state="West Bengal")
+        bank = facilities.blood_bank(f"Dispatch Test Bank {tag}", base_lat, base_lon,
+                                     city="Kharagpur", state="West Bengal")
+        db.session.add_all(users)
+        db.session.flush()
+        request_obj = EmergencyRequest(
+            hospital_id=hospital.id, blood_type='O+', quantity_ml=450, urgency='high',
+            notes='dispatch test', suggested_bank_id=bank.id, status='approved'
+        )
+        db.session.add(request_obj)
+        db.session.commit()
+        ids = {
+            'drivers': [driver.id for driver in drivers], 'users': [user.id for user in users],
+            'names': [driver.name for driver in drivers], 'hospital': hospital.id, 'bank': bank.id,
+            'request': request_obj.id
+        }
+    driver_index.clear()
+
+    client = app.test_client()
+    route_id = None
+    try:
+        with app.app_context():
+            pickups = [(base_lat, base_lon), (base_lat, base_lon + 10.0 / 103.0)]
+            assigned = [driver.name for driver, _ in dispatch_drivers(pickups)]
+            assert assigned == ids['names']
+
+            route = Route(
+                request_id=ids['request'], driver_name=ids['names'][0],
+                start_latitude=base_lat, start_longitude=base_lon,
+                end_latitude=base_lat + 0.1, end_longitude=base_lon,
+                eta_minutes=20, distance_km=11.0, status='pending'
+            )
+            db.session.add(route)
+            db.session.commit()
+            route_id = route.id
+            # West has a pending route now, so the next approval goes to the middle driver
+            assert [driver.name for driver, _ in dispatch_drivers(pickups[:1])] == ids['names'][1:]
+        print("✅ Drivers are paired jointly and busy drivers are skipped")
+
+        with client.session_transaction() as flask_session:
+            flask_session['user_id'] = ids['users'][0]
+        assert client.post(f'/api/routes/{route_id}/start').status_code == 200
+        assert ids['drivers'][0] not in dict(get_driver_index().nearest(base_lat, base_lon, 10))
+        assert client.post(f'/api/routes/{route_id}/complete').status_code == 200
+        assert get_driver_index().nearest(base_lat, base_lon, 1)[0][0] == ids['drivers'][0]
+        print("✅ Starting a route drops the driver from the index; completing it returns them")
+    finally:
+        driver_index.clear()
+        with app.app_context():
+            Notification.query.filter_by(request_id=ids['request']).delete()
+            if route_id:
+                TrackPoint.query.filter_by(route_id=route_id).delete()
+            Route.query.filter_by(request_id=ids['request']).delete()
+            EmergencyRequest.query.filter_by(id=ids['request']).delete()
+            User.query.filter(User.id.in_(ids['users'])).delete()
+            Driver.query.filter(Driver.id.in_(ids['drivers'])).delete()
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the facility/driver entity cache: read-through hits, commit invalidation and rollbacks
+"""
+
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_cache_hits_and_commit_invalidation(facilities):
+    """Transfer listings read facilities once; PUT/DELETE and rolled-back edits keep the cache truthful"""
+    from sqlalchemy import event
+    from src.main import app, db
+    from src.models.models import BloodUnit, Facility, Hospital, InventorySummary, Transfer
+    from src.services.entity_cache import entity_cache
+
+    tag = facilities.tag
+    base_lat, base_lon = 25.6, 85.1
+    with app.app_context():
+        db.create_all()
+        hospital = facilities.hospital(f"Cache Test Hospital {tag}", base_lat, base_lon, city="Patna", state="Bihar")
+        bank = facilities.blood_bank(f"Cache Test Bank {tag}", base_lat + 0.1, base_lon, city="Patna", state="Bihar")
+        db.session.flush()
+        unit = BloodUnit(blood_bank_id=bank.id, blood_type='B+', quantity_ml=450, collection_date=date.today(),
+                         expiry_date=date.today() + timedelta(days=20), status='available',
+                         current_location_latitude=base_lat + 0.1, current_location_longitude=base_lon)
+        db.session.add(unit)
+        db.session.flush()
+        transfer = Transfer(blood_unit_id=unit.id, from_entity_id=bank.id, to_entity_id=hospital.id,
+                            transfer_date=date.today(), status='pending')
+        db.session.add(transfer)
+        db.session.commit()
+        ids = {'hospital': hospital.id, 'bank': bank.id, 'unit': unit.id, 'transfer': transfer.id}
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if any(f'FROM {table}' in statement for table in ('hospitals', 'blood_banks', 'facilities')):
+            statements.append(statement)
+
+    client = app.test_client()
+    try:
+        path = f"/api/transfers?blood_unit_id={ids['unit']}"
+        first = client.get(path).get_json()[0]
+        assert first['from_entity_name'] == f"Cache Test Bank {tag}" and first['from_entity_type'] == 'blood_bank'
+        assert first['to_entity_name'] == f"Cache Test Hospital {tag}" and first['to_entity_type'] == 'hospital'
+
+        hits = entity_cache.metrics()['hits']
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            assert client.get(path).get_json()[0] == first
+        finally:
+            with app.app_context():
+                event.remove(db.engine, 'before_cursor_execute', record)
+        assert statements == [], statements
+        # One facility record per end of the transfer
+        assert entity_cache.metrics()['hits'] - hits == 2
+        print(f"✅ Second listing served from cache: {entity_cache.metrics()}")
+
+        response = client.put(f"/api/hospitals/{ids['hospital']}", json={'name': f"Renamed Hospital {tag}"})
+        assert response.status_code == 200
+        assert client.get(path).get_json()[0]['to_entity_name'] == f"Renamed Hospital {tag}"
+
+        # An edit that never commits is neither cached nor left behind
+        with app.app_context():
+            hospital = db.session.get(Hospital, ids['hospital'])
+            hospital.name = "Uncommitted"
+            assert entity_cache.get(Hospital, ids['hospital'])['name'] == "Uncommitted"
+            db.session.rollback()
+            assert entity_cache.get(Hospital, ids['hospital'])['name'] == f"Renamed Hospital {tag}"
+
+        assert client.delete(f"/api/hospitals/{ids['hospital']}").status_code == 200
+        assert 'to_entity_name' not in client.get(path).get_json()[0]
+        print("✅ PUT and DELETE invalidate on commit; rolled-back edits never reach the cache")
+    finally:
+        with app.app_context():
+            # Through the session, so the inventory summary and cache hooks see the deletes
+            for model, entity_id in ((Transfer, ids['transfer']), (BloodUnit, ids['unit'])):
+                obj = db.session.get(model, entity_id)
+                if obj:
+                    db.session.delete(obj)
+            db.session.commit()
+        facilities.cleanup()
+        with app.app_context():
+            assert db.session.get(Facility, ids['bank']) is None
+            assert db.session.get(InventorySummary, (ids['bank'], 'B+')) is None
+        entity_cache.clear()
+
+
+def test_lru_eviction():
+    """The cache holds at most maxsize records, dropping the least recently used"""
+    from src.services.entity_cache import MISSING, EntityCache
+
+    cache = EntityCache(maxsize=2)
+    generation = cache._generation
+    cache._store(('hospitals', 'a'), {'id': 'a'}, generation)
+    cache._store(('hospitals', 'b'), {'id': 'b'}, generation)
+    with cache._lock:
+        cache._entries.move_to_end(('hospitals', 'a'))
+    cache._store(('hospitals', 'c'), MISSING, generation)
+    assert list(cache._entries) == [('hospitals', 'a'), ('hospitals', 'c')]
+    assert cache.metrics()['evictions'] == 1
+
+    # A load that raced an invalidation is dropped
+    cache.invalidate([('hospitals', 'a')])
+    cache._store(('hospitals', 'a'), {'id': 'stale'}, generation)
+    assert ('hospitals', 'a') not in cache._entries
+    print("✅ LRU eviction and stale-load rejection")
+
+
+def test_entries_expire_after_ttl():
+    """Commits from other processes never invalidate this cache, so every entry is re-read after the TTL"""
+    from src.services.entity_cache import EntityCache
+
+    cache = EntityCache(maxsize=4, ttl_seconds=0.05)
+    with cache._lock:
+        generation = cache._generation
+    cache._store(('drivers', 'd'), {'id': 'd', 'name': 'before'}, generation)
+    with cache._lock:
+        assert cache._lookup(('drivers', 'd'))['name'] == 'before'
+    time.sleep(0.1)
+    with cache._lock:
+        assert cache._lookup(('drivers', 'd')) is None
+    assert cache.metrics()['expirations'] == 1 and cache.metrics()['size'] == 0
+    print("✅ Entries expire after the TTL")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the /api/stream Server-Sent Events channel
+"""
+
+import json
+import os
+import sys
+import uuid
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def read_event(frames):
+    """Next `id/event/data` frame from the stream, parsed into a dict"""
+    for chunk in frames:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if text.startswith('id:'):
+            fields = dict(line.split(': ', 1) for line in text.strip().splitlines())
+            return {'id': int(fields['id']), 'event': fields['event'], 'data': json.loads(fields['data'])}
+    return None
+
+
+def stream_user(db, role, entity_id=None):
+    """A throwaway login for the stream tests; returns its id"""
+    from src.models.user import User
+
+    tag = uuid.uuid4().hex[:8]
+    user = User(username=f"stream_{role}_{tag}", email=f"stream-{role}-{tag}@example.com",
+                password_hash="unused", role=role, entity_id=entity_id)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def test_stream_delivers_and_replays_events():
+    """Published events reach filtered subscribers and are replayed after Last-Event-ID"""
+    from src.main import app, db
+    from src.models.user import User
+    from src.services.event_bus import event_bus
+
+    with app.app_context():
+        db.create_all()
+        admin_id = stream_user(db, 'admin')
+
+    client = app.test_client()
+    assert client.get('/api/stream').status_code == 401
+    with client.session_transaction() as sess:
+        sess['user_id'] = admin_id
+
+    response = client.get('/api/stream?types=route_progress', buffered=False)
+    frames = iter(response.response)
+    try:
+        assert response.mimetype == 'text/event-stream'
+        assert next(frames).startswith(b'retry:')
+
+        event_bus.publish('request_created', {'request_id': 'ignored'})
+        first = event_bus.publish('route_progress', {'route_id': 'r1'})
+        received = read_event(frames)
+        print(f"📡 Received {received['event']} #{received['id']}")
+        assert received['id'] == first['id']
+        assert received['data']['data'] == {'route_id': 'r1'}
+    finally:
+        response.close()
+
+    # A reconnecting client picks up what it missed while disconnected
+    second = event_bus.publish('route_progress', {'route_id': 'r2'})
+    response = client.get('/api/stream?types=route_progress', headers={'Last-Event-ID': str(first['id'])}, buffered=False)
+    frames = iter(response.response)
+    try:
+        next(frames)
+        replayed = read_event(frames)
+        assert replayed['id'] == second['id']
+    finally:
+        response.close()
+
+    assert event_bus.subscriber_count() == 0
+    with app.app_context():
+        User.query.filter_by(id=admin_id).delete()
+        db.session.commit()
+    print("✅ Event stream delivers and replays events")
+
+
+def test_stream_only_carries_the_callers_events():
+    """A hospital's stream skips other facilities' events and events with no audience"""
+    from src.main import app, db
+    from src.models.user import User
+    from src.services.event_bus import event_bus
+
+    hospital_id = str(uuid.uuid4())
+    with app.app_context():
+        db.create_all()
+        user_id = stream_user(db, 'hospital', hospital_id)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    response = client.get('/api/stream', buffered=False)
+    frames = iter(response.response)
+    try:
+        next(frames)
+        event_bus.publish('route_progress', {'route_id': 'unaddressed'})
+        event_bus.publish('request_created', {'request_id': 'other'}, audience=[('hospital', str(uuid.uuid4()))])
+        event_bus.publish('notification', {'seq': 1}, audience=[('blood_bank', hospital_id)])
+        own = event_bus.publish('request_created', {'request_id': 'own'},
+                                audience=[('hospital', hospital_id), ('blood_bank', 'some-bank')])
+        received = read_event(frames)
+        assert received['id'] == own['id'] and received['data']['data'] == {'request_id': 'own'}
+    finally:
+        response.close()
+        with app.app_context():
+            User.query.filter_by(id=user_id).delete()
+            db.session.commit()
+    print("✅ Stream filtered to the caller's own events")
+
+
+def test_concurrent_publishes_arrive_in_id_order():
+    """Racing publishers never hand a subscriber a later id before an earlier one"""
+    import threading
+    from src.services.event_bus import EventBus
+
+    bus = EventBus()
+    subscription = bus.subscribe()
+    subscription.queue.maxsize = 0
+    barrier = threading.Barrier(8)
+
+    def publisher():
+        barrier.wait()
+        for index in range(500):
+            bus.publish('route_progress', {'index': index})
+
+    # Switch threads as often as possible so a gap between numbering and delivery would be hit
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=publisher) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    ids = [event['id'] for event in iter(lambda: subscription.get(timeout=0), None)]
+    assert ids == sorted(ids) and len(ids) == 8 * 500
+    print("✅ 4000 racing publishes delivered in id order")
+
+
+def test_full_inbox_never_fails_concurrent_publishers():
+    """Publishers racing into a slow subscriber's full inbox drop its oldest events instead of raising"""
+    import threading
+    from src.services.event_bus import EventBus
+
+    bus = EventBus()
+    subscription = bus.subscribe()
+    subscription.queue.maxsize = 4
+    barrier = threading.Barrier(8)
+    errors = []
+
+    def publisher():
+        barrier.wait()
+        try:
+            for index in range(500):
+                bus.publish('route_progress', {'index': index})
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=publisher) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+    assert subscription.queue.qsize() == 4
+    assert subscription.dropped == 8 * 500 - 4
+    print(f"✅ 4000 racing publishes into a 4-slot inbox: {subscription.dropped} dropped, none raised")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the expiry sweeper expires, flags and unflags units and keeps the summary in step
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_sweep_updates_flags_status_and_summary(facilities):
+    """One sweep expires past-date units, flags the horizon, clears stale flags and refreshes inventory_summary"""
+    from src.main import app, db
+    from src.models.models import BloodUnit, InventorySummary
+    from src.models.user import User
+    from src.services.expiry import ExpirySweeper
+    from src.services.inventory import check_inventory_summary
+
+    tag = facilities.tag
+    today = date.today()
+    with app.app_context():
+        db.create_all()
+        bank = facilities.blood_bank(f"Expiry Test Bank {tag}", 12.9716, 80.2200)
+        db.session.flush()
+
+        def unit(days_left, status='available', flagged=False):
+            blood_unit = BloodUnit(
+                blood_bank_id=bank.id, blood_type='AB-', quantity_ml=450,
+                collection_date=today - timedelta(days=30), expiry_date=today + timedelta(days=days_left),
+                status=status, is_flagged_for_expiry=flagged,
+                current_location_latitude=bank.latitude, current_location_longitude=bank.longitude
+            )
+            db.session.add(blood_unit)
+            return blood_unit
+
+        units = {
+            'past_due': unit(-1, flagged=True),
+            'due_today': unit(0),
+            'soon': unit(3),
+            'far_but_flagged': unit(20, flagged=True),
+            'used_but_flagged': unit(2, status='used', flagged=True),
+            'far': unit(25)
+        }
+        db.session.commit()
+        ids = {name: blood_unit.id for name, blood_unit in units.items()}
+        bank_id = bank.id
+        assert db.session.get(InventorySummary, (bank_id, 'AB-')).unit_count == 5
+
+        users = {role: User(username=f"expiry_{role}_{tag}", email=f"expiry-{role}-{tag}@example.com",
+                            password_hash="unused", role=role) for role in ('admin', 'blood_bank')}
+        db.session.add_all(users.values())
+        db.session.commit()
+        user_ids = {role: user.id for role, user in users.items()}
+
+    try:
+        sweeper = ExpirySweeper(app, horizon_days=7)
+        with app.app_context():
+            result = sweeper.run_once()
+            print(f"🧊 Sweep: {result}")
+            assert result['expired'] >= 2 and result['flagged'] >= 1 and result['unflagged'] >= 2
+
+            state = {name: db.session.get(BloodUnit, unit_id) for name, unit_id in ids.items()}
+            assert state['past_due'].status == state['due_today'].status == 'expired'
+            assert not state['past_due'].is_flagged_for_expiry
+            assert state['soon'].is_flagged_for_expiry and state['soon'].status == 'available'
+            assert not state['far_but_flagged'].is_flagged_for_expiry
+            assert not state['used_but_flagged'].is_flagged_for_expiry
+            assert not state['far'].is_flagged_for_expiry
+
+            # Only the three still-available units remain in the summary, and nothing drifted
+            assert db.session.get(InventorySummary, (bank_id, 'AB-')).unit_count == 3
+            assert check_inventory_summary() == []
+
+            # A second pass has nothing left to do
+            assert sweeper.run_once() == {'expired': 0, 'flagged': 0, 'unflagged': 0}
+
+        metrics = sweeper.metrics()
+        assert metrics['runs'] == 2 and metrics['last_run_at'] and metrics['totals']['expired'] >= 2
+        response = app.test_client().get('/api/blood_units/expiry_sweep')
+        assert response.status_code == 200 and 'horizon_days' in response.get_json()
+        print("✅ Sweep keeps flags, status and inventory_summary current")
+
+        # Running a sweep on demand writes to every bank's stock, so only admins may
+        client = app.test_client()
+        assert client.post('/api/blood_units/expiry_sweep').status_code == 401
+        for user_id, status_code in ((user_ids['blood_bank'], 403), (user_ids['admin'], 200)):
+            with client.session_transaction() as flask_session:
+                flask_session['user_id'] = user_id
+            assert client.post('/api/blood_units/expiry_sweep').status_code == status_code
+        print("✅ On-demand sweeps are admin only")
+
+        # Anyone may check the summary; rebuilding it is an admin repair
+        client = app.test_client()
+        assert client.get('/api/blood_units/summary/check').status_code == 200
+        assert client.get('/api/blood_units/summary/check?repair=true').status_code == 401
+        for user_id, status_code in ((user_ids['blood_bank'], 403), (user_ids['admin'], 200)):
+            with client.session_transaction() as flask_session:
+                flask_session['user_id'] = user_id
+            assert client.get('/api/blood_units/summary/check?repair=true').status_code == status_code
+        print("✅ Summary repairs are admin only")
+    finally:
+        with app.app_context():
+            User.query.filter(User.id.in_(user_ids.values())).delete()
+            BloodUnit.query.filter_by(blood_bank_id=bank_id).delete()
+            InventorySummary.query.filter_by(blood_bank_id=bank_id).delete()
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
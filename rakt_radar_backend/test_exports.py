@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script to verify streaming NDJSON/CSV exports and resuming them from a cursor
+"""
+
+import csv
+import io
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_exports_stream_in_chunks_and_resume(facilities):
+    """Exports stream every matching row once, and a row's _cursor resumes right after it"""
+    from src.main import app, db
+    import src.routes.exports as exports
+    from src.models.models import BloodUnit, InventorySummary
+    from src.models.user import User
+
+    tag = facilities.tag
+    with app.app_context():
+        db.create_all()
+        bank = facilities.blood_bank(f"Export Test Bank {tag}", 12.9716, 80.2200)
+        admin = User(username=f"export_admin_{tag}", email=f"export-admin-{tag}@example.com",
+                     password_hash="unused", role='admin')
+        db.session.add(admin)
+        db.session.flush()
+        db.session.add_all([
+            BloodUnit(
+                blood_bank_id=bank.id, blood_type='B+', quantity_ml=450, collection_date=date.today(),
+                expiry_date=date.today() + timedelta(days=i % 4 + 1), status='available',
+                current_location_latitude=bank.latitude, current_location_longitude=bank.longitude
+            ) for i in range(25)
+        ])
+        db.session.commit()
+        bank_id, admin_id = bank.id, admin.id
+
+    client = app.test_client()
+    chunk_rows = exports.EXPORT_CHUNK_ROWS
+    exports.EXPORT_CHUNK_ROWS = 7
+    try:
+        assert client.get('/api/exports/blood_units').status_code == 401
+        with client.session_transaction() as sess:
+            sess['user_id'] = admin_id
+
+        response = client.get(f'/api/exports/blood_units?blood_bank_id={bank_id}')
+        assert response.status_code == 200 and response.is_streamed
+        assert response.mimetype == 'application/x-ndjson'
+        chunks = [chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in response.response]
+        records = [json.loads(line) for line in ''.join(chunks).splitlines()]
+        print(f"📤 {len(records)} NDJSON rows in {len(chunks)} chunks")
+        assert len(records) == 25 and len(chunks) == 4
+        keys = [(record['expiry_date'], record['id']) for record in records]
+        assert keys == sorted(keys) and len(set(keys)) == 25
+
+        # A dropped connection resumes after the last row received
+        resumed = client.get(f"/api/exports/blood_units?blood_bank_id={bank_id}&cursor={records[9]['_cursor']}")
+        rest = [json.loads(line) for line in resumed.get_data(as_text=True).splitlines()]
+        assert [r['id'] for r in rest] == [r['id'] for r in records[10:]]
+        print("✅ Resuming from a _cursor continues with the next row")
+
+        response = client.get(f'/api/exports/blood_units?blood_bank_id={bank_id}&format=csv')
+        assert response.mimetype == 'text/csv'
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        assert [row['id'] for row in rows] == [r['id'] for r in records]
+        assert rows[0]['_cursor'] == records[0]['_cursor']
+
+        assert client.get('/api/exports/users').status_code == 404
+        assert client.get('/api/exports/blood_units?format=xml').status_code == 400
+        assert client.get('/api/exports/blood_units?cursor=garbage').status_code == 400
+        print("✅ CSV export matches and bad arguments are rejected")
+    finally:
+        exports.EXPORT_CHUNK_ROWS = chunk_rows
+        with app.app_context():
+            BloodUnit.query.filter_by(blood_bank_id=bank_id).delete()
+            InventorySummary.query.filter_by(blood_bank_id=bank_id).delete()
+            User.query.filter_by(id=admin_id).delete()
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the facilities registry: kept in step with hospitals and blood banks, resolved in one query
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_registry_follows_hospitals_and_banks(facilities):
+    """Inserts, edits and deletes of hospitals and blood banks show up in facilities in the same commit"""
+    from src.main import app, db
+    from src.models.models import Facility, Hospital
+    from src.services.facilities import check_facilities
+
+    tag = facilities.tag
+    with app.app_context():
+        db.create_all()
+        hospital = facilities.hospital(f"Registry Hospital {tag}", 23.3, 85.3, city="Ranchi", state="Jharkhand")
+        bank = facilities.blood_bank(f"Registry Bank {tag}", 23.4, 85.3, city="Ranchi", state="Jharkhand")
+        db.session.commit()
+        ids = [hospital.id, bank.id]
+
+        assert db.session.get(Facility, hospital.id).to_dict() == {
+            'id': hospital.id, 'kind': 'hospital', 'name': f"Registry Hospital {tag}", 'city': 'Ranchi',
+            'state': 'Jharkhand', 'latitude': 23.3, 'longitude': 85.3
+        }
+        assert db.session.get(Facility, bank.id).kind == 'blood_bank'
+
+        bank.latitude = 23.45
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(Facility, bank.id).latitude == 23.45
+
+        # A rolled-back edit leaves the registry as it was
+        hospital.name = "Never committed"
+        db.session.flush()
+        db.session.rollback()
+        db.session.expire_all()
+        assert db.session.get(Facility, hospital.id).name == f"Registry Hospital {tag}"
+
+        db.session.delete(bank)
+        db.session.commit()
+        assert db.session.get(Facility, ids[1]) is None
+
+        # Bulk Query.update()/delete() skip the flush, but not the registry
+        Hospital.query.filter_by(id=ids[0]).update({'name': f"Bulk Renamed {tag}"})
+        db.session.commit()
+        assert db.session.get(Facility, ids[0]).name == f"Bulk Renamed {tag}"
+        Hospital.query.filter_by(id=ids[0]).delete()
+        db.session.commit()
+        assert db.session.get(Facility, ids[0]) is None
+        assert not set(check_facilities()) & set(ids)
+        print("✅ facilities follows hospital/blood bank inserts, edits, bulk writes, rollbacks and deletes")
+
+
+def test_transfer_page_resolves_entities_in_one_query(facilities):
+    """A page of transfers between many facilities reads the registry once and the facility tables never"""
+    from sqlalchemy import event
+    from src.main import app, db
+    from src.models.models import BloodUnit, InventorySummary, Transfer
+    from src.services.entity_cache import entity_cache
+
+    tag = facilities.tag
+    with app.app_context():
+        db.create_all()
+        hospitals = [facilities.hospital(f"Registry Page Hospital {tag} {index}", 23.3 + index / 100, 85.3,
+                                         city="Ranchi", state="Jharkhand") for index in range(4)]
+        banks = [facilities.blood_bank(f"Registry Page Bank {tag} {index}", 23.5 + index / 100, 85.3,
+                                       city="Ranchi", state="Jharkhand") for index in range(4)]
+        db.session.flush()
+        units = [BloodUnit(blood_bank_id=bank.id, blood_type='AB+', quantity_ml=450, collection_date=date.today(),
+                           expiry_date=date.today() + timedelta(days=25), status='available',
+                           current_location_latitude=bank.latitude, current_location_longitude=bank.longitude)
+                 for bank in banks]
+        db.session.add_all(units)
+        db.session.flush()
+        # Bank to hospital, and hospital to hospital for the second half
+        transfers = [Transfer(blood_unit_id=unit.id, from_entity_id=banks[index].id if index < 2 else hospitals[index - 2].id,
+                              to_entity_id=hospitals[index].id, transfer_date=date.today(), status='pending',
+                              notes=f"registry {tag}")
+                     for index, unit in enumerate(units)]
+        db.session.add_all(transfers)
+        db.session.commit()
+        ids = {
+            'hospitals': [hospital.id for hospital in hospitals], 'banks': [bank.id for bank in banks],
+            'units': [unit.id for unit in units], 'transfers': [transfer.id for transfer in transfers]
+        }
+        entity_cache.clear()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        for table in ('hospitals', 'blood_banks', 'facilities'):
+            if f'FROM {table}' in statement:
+                statements.append(table)
+
+    client = app.test_client()
+    try:
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            rows = client.get("/api/transfers?status=pending&limit=200").get_json()['items']
+        finally:
+            with app.app_context():
+                event.remove(db.engine, 'before_cursor_execute', record)
+
+        rows = sorted((row for row in rows if row['notes'] == f"registry {tag}"),
+                      key=lambda row: ids['units'].index(row['blood_unit_id']))
+        assert [row['from_entity_type'] for row in rows] == ['blood_bank', 'blood_bank', 'hospital', 'hospital']
+        assert all(row['to_entity_type'] == 'hospital' for row in rows)
+        assert rows[2]['from_entity_name'] == f"Registry Page Hospital {tag} 0"
+        assert rows[3]['to_entity_name'] == f"Registry Page Hospital {tag} 3"
+        # Both ends of every row, hospital or blood bank, from a single IN query on the registry
+        assert statements == ['facilities'], statements
+        print("✅ Transfer page resolved both ends of every row with one registry query")
+    finally:
+        with app.app_context():
+            Transfer.query.filter(Transfer.id.in_(ids['transfers'])).delete()
+            BloodUnit.query.filter(BloodUnit.id.in_(ids['units'])).delete()
+            InventorySummary.query.filter(InventorySummary.blood_bank_id.in_(ids['banks'])).delete()
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
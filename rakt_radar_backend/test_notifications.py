@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script to verify durable notifications and the /api/notifications inbox
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def seed_delivery(db, facilities):
+    """Create a hospital, blood bank, driver (with login) and a pending route between them"""
+    from src.models.models import EmergencyRequest, Driver, Route
+    from src.models.user import User
+
+    tag = facilities.tag
+    hospital = facilities.hospital(f"Inbox Test Hospital {tag}", 13.0827, 80.2707)
+    bank = facilities.blood_bank(f"Inbox Test Blood Bank {tag}", 13.0600, 80.2500)
+    driver = Driver(name=f"inbox_driver_{tag}", phone="+91-00000-00000", vehicle_number="TN-00-XX-0000")
+    db.session.add(driver)
+    db.session.flush()
+
+    user = User(
+        username=driver.name, email=f"driver-{tag}@example.com", password_hash="unused",
+        role='driver', entity_id=driver.id
+    )
+    request_obj = EmergencyRequest(
+        hospital_id=hospital.id, blood_type='O+', quantity_ml=450, urgency='high',
+        notes='notification inbox test', suggested_bank_id=bank.id, status='approved'
+    )
+    db.session.add_all([user, request_obj])
+    db.session.flush()
+
+    route = Route(
+        request_id=request_obj.id, driver_name=driver.name,
+        start_latitude=bank.latitude, start_longitude=bank.longitude,
+        end_latitude=hospital.latitude, end_longitude=hospital.longitude,
+        eta_minutes=20, distance_km=3.2, status='pending'
+    )
+    db.session.add(route)
+    db.session.commit()
+    return {
+        'hospital_id': hospital.id, 'bank_id': bank.id, 'driver_id': driver.id,
+        'user_id': user.id, 'request_id': request_obj.id, 'route_id': route.id
+    }
+
+
+def cleanup(db, ids):
+    from src.models.models import EmergencyRequest, Driver, Route, TrackPoint, Notification
+    from src.models.user import User
+
+    Notification.query.filter_by(request_id=ids['request_id']).delete()
+    TrackPoint.query.filter_by(route_id=ids['route_id']).delete()
+    Route.query.filter_by(id=ids['route_id']).delete()
+    EmergencyRequest.query.filter_by(id=ids['request_id']).delete()
+    User.query.filter_by(id=ids['user_id']).delete()
+    Driver.query.filter_by(id=ids['driver_id']).delete()
+    db.session.commit()
+
+
+def test_route_start_notifications_are_durable(facilities):
+    """Starting a route writes inbox rows for all parties, served by cursor and long-poll"""
+    from src.main import app, db
+    from src.models.models import Notification
+    from src.services.notifications import notify
+
+    with app.app_context():
+        db.create_all()
+        ids = seed_delivery(db, facilities)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids['user_id']
+
+    try:
+        response = client.post(f"/api/routes/{ids['route_id']}/start")
+        assert response.status_code == 200, response.get_json()
+
+        inbox = client.get('/api/notifications').get_json()
+        assert [n['type'] for n in inbox['notifications']] == ['route_started']
+        assert inbox['notifications'][0]['payload']['route_id'] == ids['route_id']
+        cursor = inbox['cursor']
+
+        with app.app_context():
+            recipients = {(n.recipient_role, n.recipient_id) for n in Notification.query.filter_by(route_id=ids['route_id'])}
+        assert recipients == {('hospital', ids['hospital_id']), ('blood_bank', ids['bank_id']), ('driver', ids['driver_id'])}
+
+        # Nothing new after the cursor
+        assert client.get(f'/api/notifications?after={cursor}').get_json()['notifications'] == []
+
+        # Rolled-back notifications never reach the inbox
+        with app.app_context():
+            notify([('driver', ids['driver_id'])], 'route_assigned', {}, request_id=ids['request_id'])
+            db.session.rollback()
+        assert client.get(f'/api/notifications?after={cursor}').get_json()['notifications'] == []
+
+        # A long-poll returns as soon as a matching notification commits
+        def publish_later():
+            time.sleep(0.3)
+            with app.app_context():
+                notify([('driver', ids['driver_id'])], 'route_assigned', {'late': True}, request_id=ids['request_id'])
+                db.session.commit()
+
+        publisher = threading.Thread(target=publish_later)
+        started = time.monotonic()
+        publisher.start()
+        waited = client.get(f'/api/notifications?after={cursor}&wait=10').get_json()
+        elapsed = time.monotonic() - started
+        publisher.join()
+        print(f"📬 Long-poll woke after {elapsed:.2f}s")
+        assert [n['payload'] for n in waited['notifications']] == [{'late': True}]
+        assert waited['cursor'] > cursor
+        assert elapsed < 5
+
+        # The inbox lookup is an index range scan, not a table scan
+        with app.app_context():
+            plan = db.session.execute(db.text(
+                "EXPLAIN QUERY PLAN SELECT * FROM notifications "
+                "WHERE recipient_role = 'driver' AND recipient_id = :rid AND seq > 0 ORDER BY seq"
+            ), {'rid': ids['driver_id']}).all()
+        details = ' '.join(row[-1] for row in plan)
+        assert 'ix_notifications_recipient' in details, details
+        print("✅ Notifications are durable and indexed per recipient")
+    finally:
+        with app.app_context():
+            cleanup(db, ids)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
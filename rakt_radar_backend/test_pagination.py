@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test script to verify keyset pagination and SQL filters on the list endpoints
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_keyset_pages_cover_the_filtered_list_once(facilities):
+    """Following next_cursor visits every matching unit exactly once, in stable order"""
+    from src.main import app, db
+    from src.models.models import BloodUnit, InventorySummary
+
+    tag = facilities.tag
+    with app.app_context():
+        db.create_all()
+        bank = facilities.blood_bank(f"Pagination Test Bank {tag}", 12.9716, 80.2200, city=f"Pagetown {tag}")
+        db.session.flush()
+        # Several units share each expiry date so the id tie-breaker matters
+        db.session.add_all([
+            BloodUnit(
+                blood_bank_id=bank.id, blood_type='O+' if i % 3 else 'A-', quantity_ml=450,
+                collection_date=date.today(), expiry_date=date.today() + timedelta(days=i % 5 + 1),
+                status='available', current_location_latitude=bank.latitude,
+                current_location_longitude=bank.longitude
+            ) for i in range(23)
+        ])
+        db.session.commit()
+        bank_id = bank.id
+
+    client = app.test_client()
+    try:
+        base = f'/api/blood_units?blood_bank_id={bank_id}&blood_type=O%2B'
+        full = client.get(base).get_json()
+        assert isinstance(full, list) and len(full) == 15
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            response = client.get(f'{base}&limit=4' + (f'&cursor={cursor}' if cursor else ''))
+            assert response.status_code == 200
+            page = response.get_json()
+            assert len(page['items']) <= 4 and page['limit'] == 4
+            seen.extend(page['items'])
+            pages += 1
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        assert pages == 4
+        assert [unit['id'] for unit in seen] == [unit['id'] for unit in full]
+        assert all(unit['blood_bank_name'] == f"Pagination Test Bank {tag}" for unit in seen)
+        keys = [(unit['expiry_date'], unit['id']) for unit in seen]
+        assert keys == sorted(keys) and len(set(keys)) == len(keys)
+        print(f"✅ {len(seen)} units over {pages} pages, each exactly once")
+
+        page = client.get(f'/api/blood_banks?city=Pagetown%20{tag}&limit=10').get_json()
+        assert [b['id'] for b in page['items']] == [bank_id] and page['next_cursor'] is None
+
+        assert client.get(f'{base}&limit=0').status_code == 400
+        assert client.get(f'{base}&limit=4&cursor=not-a-cursor').status_code == 400
+        print("✅ Filters apply in SQL and bad paging arguments are rejected")
+    finally:
+        with app.app_context():
+            BloodUnit.query.filter_by(blood_bank_id=bank_id).delete()
+            InventorySummary.query.filter_by(blood_bank_id=bank_id).delete()
+            db.session.commit()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
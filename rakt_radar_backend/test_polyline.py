@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script to verify track simplification, polyline encoding and the compact tracking mode
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+
+def reference_douglas_peucker(x, y, tolerance, first=0, last=None):
+    """Textbook recursive Douglas-Peucker on projected coordinates, returning kept indexes"""
+    last = len(x) - 1 if last is None else last
+    best, index = -1.0, None
+    for i in range(first + 1, last):
+        sx, sy = x[last] - x[first], y[last] - y[first]
+        px, py = x[i] - x[first], y[i] - y[first]
+        length_sq = sx * sx + sy * sy
+        t = 0.0 if length_sq == 0 else min(1.0, max(0.0, (px * sx + py * sy) / length_sq))
+        dist = np.hypot(px - t * sx, py - t * sy)
+        if dist > best:
+            best, index = dist, i
+    if index is None or best <= tolerance:
+        return [first, last]
+    left = reference_douglas_peucker(x, y, tolerance, first, index)
+    right = reference_douglas_peucker(x, y, tolerance, index, last)
+    return left[:-1] + right
+
+
+def test_significance_matches_recursive_douglas_peucker():
+    """Thresholding the precomputed significance equals running Douglas-Peucker at that tolerance"""
+    from src.services.polyline import douglas_peucker_significance, select_points, EARTH_RADIUS_M
+
+    rng = np.random.default_rng(11)
+    lats = 12.97 + np.cumsum(rng.normal(0.0004, 0.0003, 400))
+    lons = 80.22 + np.cumsum(rng.normal(0.0002, 0.0003, 400))
+    significance = douglas_peucker_significance(lats, lons)
+
+    mean_lat = np.radians(lats.mean())
+    x = np.radians(lons) * np.cos(mean_lat) * EARTH_RADIUS_M
+    y = np.radians(lats) * EARTH_RADIUS_M
+    for tolerance in (1.0, 5.0, 20.0, 80.0, 500.0):
+        assert select_points(significance, tolerance_m=tolerance).tolist() == reference_douglas_peucker(x, y, tolerance)
+
+    budget = select_points(significance, max_points=50)
+    assert budget.size == 50 and budget[0] == 0 and budget[-1] == 399
+    print("✅ Significance thresholds reproduce Douglas-Peucker")
+
+
+def test_polyline_encoding_round_trip():
+    """Known Google example encodes exactly and random tracks survive a round trip"""
+    from src.services.polyline import encode_polyline, decode_polyline, delta_encode
+
+    assert encode_polyline([38.5, 40.7, 43.252], [-120.2, -120.95, -126.453]) == '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+
+    rng = np.random.default_rng(5)
+    lats, lons = rng.uniform(8.0, 13.5, 200), rng.uniform(76.0, 80.5, 200)
+    decoded_lats, decoded_lons = decode_polyline(encode_polyline(lats, lons))
+    assert np.allclose(decoded_lats, np.round(lats, 5)) and np.allclose(decoded_lons, np.round(lons, 5))
+
+    assert np.cumsum(delta_encode([1300000, 1300012, 1299990])).tolist() == [1300000, 1300012, 1299990]
+    print("✅ Polyline encoding round-trips")
+
+
+def test_compact_tracking_is_cached_until_new_points(facilities):
+    """Opt-in compact tracking simplifies the stored track and only re-reads it after new fixes"""
+    from datetime import datetime, timedelta
+    from src.main import app, db
+    from src.services.polyline import decode_polyline
+    from test_route_progress import seed_route, cleanup
+
+    with app.app_context():
+        db.create_all()
+        ids = seed_route(db, facilities)
+        engine = db.engine
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids['user_id']
+
+    def tracking_queries(query_string):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            response = client.get(f"/api/routes/tracking/{ids['request_id']}?{query_string}")
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        return response, sum('FROM track_points' in statement for statement in statements)
+
+    try:
+        assert client.post(f"/api/routes/{ids['route_id']}/start").status_code == 200
+        base = datetime.utcnow() + timedelta(seconds=1)
+        fixes = [
+            {'latitude': 12.9716 + 0.0005 * step, 'longitude': 80.2200 + 0.00025 * step,
+             'timestamp': (base + timedelta(milliseconds=250 * step)).isoformat()}
+            for step in range(1, 300)
+        ]
+        assert client.post(f"/api/routes/{ids['route_id']}/progress/batch", json={'fixes': fixes}).status_code == 200
+
+        response, reads = tracking_queries('track_format=polyline&tolerance_m=5')
+        track = response.get_json()['tracking']['track_points']
+        lats, lons = decode_polyline(track['polyline'])
+        print(f"🗜️  {track['original_count']} points -> {track['count']} ({len(track['polyline'])} chars)")
+        assert track['original_count'] == 300 and track['count'] == len(lats) < 10
+        assert (lats[0], lons[0]) == (12.9716, 80.22)
+        assert reads == 1
+
+        # Same route, same points: served from the cache
+        response, reads = tracking_queries('track_format=delta&max_points=20')
+        track = response.get_json()['tracking']['track_points']
+        assert reads == 0 and track['count'] <= 20 and len(track['lat']) == len(track['time']) == track['count']
+
+        # A new fix invalidates the cached simplification
+        late = {'latitude': 13.2, 'longitude': 80.4, 'timestamp': (base + timedelta(seconds=100)).isoformat()}
+        client.post(f"/api/routes/{ids['route_id']}/progress/batch", json={'fixes': [late]})
+        response, reads = tracking_queries('track_format=polyline')
+        assert reads == 1 and response.get_json()['tracking']['track_points']['original_count'] == 301
+
+        assert tracking_queries('track_format=gzip')[0].status_code == 400
+        print("✅ Compact tracking is cached per route until new points arrive")
+    finally:
+        with app.app_context():
+            cleanup(db, ids)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Test script to verify hot endpoint queries use indexes (EXPLAIN QUERY PLAN) on a large seeded database
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from flask import Flask
+
+HOSPITALS = 60
+BLOOD_BANKS = 200
+BLOOD_UNITS = 30000
+REQUESTS = 4000
+TRACK_POINTS_PER_ROUTE = 10
+BLOOD_TYPES = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+
+
+def build_app(database_path):
+    """A Flask app with every API blueprint, bound to its own SQLite file"""
+    import src.main  # noqa: F401 -- registers the session hooks used by the routes
+    from src.models.models import db
+    from src.routes.hospitals import hospitals_bp
+    from src.routes.blood_banks import blood_banks_bp
+    from src.routes.blood_units import blood_units_bp
+    from src.routes.transfers import transfers_bp
+    from src.routes.intelligence import intelligence_bp
+    from src.routes.user import user_bp
+    from src.routes.emergency_requests import emergency_requests_bp
+    from src.routes.routes import routes_bp
+    from src.routes.notifications import notifications_bp
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'query-plan-test'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    for blueprint in (hospitals_bp, blood_banks_bp, blood_units_bp, transfers_bp, intelligence_bp,
+                      user_bp, emergency_requests_bp, routes_bp, notifications_bp):
+        app.register_blueprint(blueprint, url_prefix='/api')
+    return app
+
+
+def seed_large_database(db):
+    """Bulk-load a realistically sized network; returns ids of the actors used by the test"""
+    from src.models.models import (Hospital, BloodBank, BloodUnit, EmergencyRequest, Route,
+                                   TrackPoint, Driver, Notification)
+    from src.models.user import User
+    from src.services.inventory import rebuild_inventory_summary
+
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    today = date.today()
+
+    def facility(prefix, index):
+        return {
+            'id': str(uuid.uuid4()), 'name': f'{prefix} {index}', 'address': 'Test Road',
+            'city': f'City {index % 30}', 'state': 'Tamil Nadu',
+            'latitude': rng.uniform(8.2, 13.4), 'longitude': rng.uniform(76.5, 80.3),
+            'contact_person': 'Test', 'contact_email': f'{prefix.lower()}-{index}@example.com',
+            'contact_phone': '+91-00000-00000', 'created_at': now
+        }
+
+    hospitals = [facility('Hospital', i) for i in range(HOSPITALS)]
+    banks = [facility('Bank', i) for i in range(BLOOD_BANKS)]
+    db.session.execute(Hospital.__table__.insert(), hospitals)
+    db.session.execute(BloodBank.__table__.insert(), banks)
+
+    units = []
+    for _ in range(BLOOD_UNITS):
+        bank = rng.choice(banks)
+        collected = today - timedelta(days=rng.randint(0, 40))
+        units.append({
+            'id': str(uuid.uuid4()), 'blood_bank_id': bank['id'], 'blood_type': rng.choice(BLOOD_TYPES),
+            'quantity_ml': 450, 'collection_date': collected, 'expiry_date': collected + timedelta(days=42),
+            'status': rng.choice(['available'] * 6 + ['reserved', 'used', 'expired']),
+            'is_flagged_for_expiry': rng.random() < 0.05,
+            'current_location_latitude': bank['latitude'], 'current_location_longitude': bank['longitude'],
+            'created_at': now
+        })
+    db.session.execute(BloodUnit.__table__.insert(), units)
+
+    drivers = [{'id': str(uuid.uuid4()), 'name': f'plan_driver_{i}', 'phone': '+91-00000-00000',
+                'vehicle_number': f'TN-00-PL-{i:04d}', 'is_available': True, 'created_at': now} for i in range(40)]
+    db.session.execute(Driver.__table__.insert(), drivers)
+
+    requests, routes, points, notifications = [], [], [], []
+    for i in range(REQUESTS):
+        hospital, bank, driver = rng.choice(hospitals), rng.choice(banks), rng.choice(drivers)
+        request_id = str(uuid.uuid4())
+        requests.append({
+            'id': request_id, 'hospital_id': hospital['id'], 'blood_type': rng.choice(BLOOD_TYPES),
+            'quantity_ml': 450, 'urgency': 'high', 'status': rng.choice(['created', 'approved', 'cancelled']),
+            'suggested_bank_id': bank['id'], 'created_at': now - timedelta(minutes=i), 'updated_at': now
+        })
+        if i % 2:
+            route_id = str(uuid.uuid4())
+            routes.append({
+                'id': route_id, 'request_id': request_id, 'driver_name': driver['name'],
+                'start_latitude': bank['latitude'], 'start_longitude': bank['longitude'],
+                'end_latitude': hospital['latitude'], 'end_longitude': hospital['longitude'],
+                'eta_minutes': 30, 'distance_km': 10.0, 'status': rng.choice(['pending', 'active', 'completed']),
+                'created_at': now, 'distance_covered_km': 0.0, 'point_count': TRACK_POINTS_PER_ROUTE
+            })
+            points.extend({
+                'id': str(uuid.uuid4()), 'route_id': route_id, 'latitude': bank['latitude'],
+                'longitude': bank['longitude'], 'timestamp': now + timedelta(seconds=step)
+            } for step in range(TRACK_POINTS_PER_ROUTE))
+            notifications.append({
+                'recipient_role': 'driver', 'recipient_id': driver['id'], 'type': 'route_assigned',
+                'request_id': request_id, 'route_id': route_id, 'created_at': now
+            })
+    db.session.execute(EmergencyRequest.__table__.insert(), requests)
+    db.session.execute(Route.__table__.insert(), routes)
+    db.session.execute(TrackPoint.__table__.insert(), points)
+    db.session.execute(Notification.__table__.insert(), notifications)
+
+    users = {}
+    for role, entity_id in (('hospital', hospitals[0]['id']), ('blood_bank', banks[0]['id']),
+                            ('driver', drivers[0]['id']), ('admin', None)):
+        user = User(username=f'plan_{role}' if role != 'driver' else drivers[0]['name'],
+                    email=f'plan-{role}@example.com', password_hash='unused', role=role, entity_id=entity_id)
+        db.session.add(user)
+        db.session.flush()
+        users[role] = user.id
+    db.session.commit()
+    rebuild_inventory_summary()
+
+    hospital_request = next(r for r in requests if r['hospital_id'] == hospitals[0]['id'])
+    return {
+        'users': users, 'hospital_id': hospitals[0]['id'], 'bank_id': banks[0]['id'],
+        'hospital_request_id': hospital_request['id']
+    }
+
+
+def exercise_endpoints(app, db, ids):
+    """Drive the hot read and write paths for every role"""
+    from src.models.models import BloodUnit, EmergencyRequest, Route
+    from src.models.user import User
+
+    def client_for(role):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = ids['users'][role]
+        return client
+
+    hospital, bank, driver, admin = (client_for(role) for role in ('hospital', 'blood_bank', 'driver', 'admin'))
+    public = app.test_client()
+
+    public.get(f"/api/blood_units?blood_bank_id={ids['bank_id']}&blood_type=O%2B&status=available")
+    public.get('/api/blood_units/flagged_for_expiry')
+    public.get('/api/blood_units/summary?blood_type=O%2B')
+    public.post('/api/ai_blood_request', json={'blood_type': 'B+', 'quantity_ml': 450})
+
+    hospital.get('/api/emergency_requests')
+    hospital.get('/api/routes')
+    hospital.get(f"/api/routes/tracking/{ids['hospital_request_id']}")
+    created = hospital.post('/api/emergency_requests', json={'blood_type': 'O+', 'quantity_ml': 450}).get_json()
+
+    # Route the new request to the test bank so it can approve it
+    with app.app_context():
+        request_obj = db.session.get(EmergencyRequest, created['request']['id'])
+        request_obj.suggested_bank_id = ids['bank_id']
+        stocked_type = db.session.query(BloodUnit.blood_type).filter_by(
+            blood_bank_id=ids['bank_id'], status='available').first()[0]
+        request_obj.blood_type = stocked_type
+        db.session.commit()
+
+    bank.get('/api/emergency_requests')
+    bank.get('/api/routes')
+    approved = bank.post(f"/api/emergency_requests/{created['request']['id']}/approve").get_json()
+    assert approved.get('success'), approved
+
+    # Hand the new route to the driver under test
+    with app.app_context():
+        route = db.session.get(Route, approved['route']['id'])
+        route.driver_name = db.session.get(User, ids['users']['driver']).username
+        db.session.commit()
+        route_id = route.id
+
+    driver.get('/api/routes')
+    driver.get('/api/notifications?after=0')
+    driver.post(f'/api/routes/{route_id}/start')
+    driver.post(f'/api/routes/{route_id}/progress', json={'latitude': 13.0, 'longitude': 80.2})
+    driver.post(f'/api/routes/{route_id}/progress/batch', json={'fixes': [
+        {'latitude': 13.01, 'longitude': 80.21, 'timestamp': (datetime.utcnow() + timedelta(seconds=5)).isoformat()}
+    ]})
+    driver.get(f'/api/routes/{route_id}?track_format=polyline')
+    driver.post(f'/api/routes/{route_id}/complete')
+
+    admin.get('/api/analytics/dashboard')
+    public.post('/api/blood_units/expiry_sweep')
+
+    # Second keyset pages filter on the sort key, so they must range-read an index too
+    for client, path in ((public, '/api/blood_units?limit=50'), (public, '/api/blood_units?status=available&limit=50'),
+                         (public, '/api/hospitals?limit=20'), (public, '/api/blood_banks?limit=50'),
+                         (public, '/api/transfers?limit=20'), (admin, '/api/users?limit=2'),
+                         (admin, '/api/routes?limit=20'), (admin, '/api/emergency_requests?limit=20'),
+                         (hospital, '/api/emergency_requests?limit=5'), (driver, '/api/routes?limit=5')):
+        page = client.get(path).get_json()
+        if page['next_cursor']:
+            client.get(f"{path}&cursor={page['next_cursor']}")
+
+
+def test_hot_queries_use_indexes():
+    """Every filtered query issued by the hot endpoints is an index search, not a table scan"""
+    from src.models.models import db
+    from src.services.query_plan import QueryRecorder, check_query_plans
+    from src.services.spatial_index import blood_bank_index
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, 'plans.db'))
+        try:
+            with app.app_context():
+                db.create_all()
+                ids = seed_large_database(db)
+                engine = db.engine
+            # The spatial index is process-wide; point it at this database
+            blood_bank_index.clear()
+
+            with QueryRecorder(engine) as recorder, contextlib.redirect_stdout(io.StringIO()):
+                exercise_endpoints(app, db, ids)
+
+            # Hospital name search in the order flow is LIKE '%...%' over a few dozen rows
+            violations = check_query_plans(engine, recorder.queries, allowed_tables=('hospitals',))
+            for violation in violations:
+                print(f"❌ full scan of {violation['tables']}: {violation['statement'][:160]}")
+            print(f"🔍 Checked {len(set(q for q, _ in recorder.queries))} distinct statements")
+            assert not violations
+            print("✅ No filtered query does a full table scan")
+        finally:
+            blood_bank_index.clear()
+            with app.app_context():
+                db.engine.dispose()
+
+
+if __name__ == "__main__":
+    test_hot_queries_use_indexes()
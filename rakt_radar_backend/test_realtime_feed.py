@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the realtime emergency request feed runs a fixed number of queries
+"""
+
+import os
+import sys
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import event
+
+
+def count_feed_queries(app, db):
+    """Call the realtime feed once and return (status_code, total_requests, query_count)"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = app.test_client().get('/api/realtime/emergency-requests')
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+    return response.status_code, response.get_json().get('total_requests'), len(statements)
+
+
+def seed_requests(db, facilities, count):
+    """Create a throwaway hospital, blood bank and `count` emergency requests between them"""
+    from src.models.models import EmergencyRequest
+
+    hospital = facilities.hospital(f"Feed Test Hospital {count} {facilities.tag}", 13.0827, 80.2707)
+    bank = facilities.blood_bank(f"Feed Test Blood Bank {count} {facilities.tag}", 13.0600, 80.2500)
+    db.session.flush()
+
+    requests = [
+        EmergencyRequest(
+            hospital_id=hospital.id, blood_type='O+', quantity_ml=450, urgency='high',
+            notes='realtime feed query-count test', suggested_bank_id=bank.id
+        )
+        for _ in range(count)
+    ]
+    db.session.add_all(requests)
+    db.session.commit()
+    return hospital.id
+
+
+def cleanup(db, hospital_id):
+    from src.models.models import EmergencyRequest
+
+    EmergencyRequest.query.filter_by(hospital_id=hospital_id).delete()
+    db.session.commit()
+
+
+def test_realtime_feed_query_count(facilities):
+    """The realtime feed must cost the same number of queries for 5 or 50 extra requests"""
+    from src.main import app, db
+
+    with app.app_context():
+        db.create_all()
+
+    results = {}
+    for count in (5, 50):
+        with app.app_context():
+            hospital_id = seed_requests(db, facilities, count)
+        try:
+            status, total, queries = count_feed_queries(app, db)
+            print(f"🔍 {total} requests in feed -> {queries} queries")
+            assert status == 200
+            results[count] = queries
+        finally:
+            with app.app_context():
+                cleanup(db, hospital_id)
+
+    # One joined SELECT, regardless of how many rows come back
+    assert results[5] == results[50], results
+    assert results[50] <= 1, results
+    print("✅ Realtime feed query count is constant")
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
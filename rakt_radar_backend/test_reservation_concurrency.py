@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Stress test: concurrent reservations and approvals never book a blood unit twice
+"""
+
+import contextlib
+import io
+import os
+import sys
+import threading
+from datetime import date, timedelta
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+THREADS = 12
+
+
+def seed_bank(db, facilities, units, requests):
+    """A remote bank holding `units` A- units, a hospital, its bank user and `requests` 450 ml requests"""
+    from src.models.models import BloodUnit, EmergencyRequest
+    from src.models.user import User
+
+    tag = facilities.tag
+    base_lat, base_lon = 24.5, 89.0
+    hospital = facilities.hospital(f"Reservation Test Hospital {tag}", base_lat + 0.1, base_lon,
+                                   city="Malda", state="West Bengal")
+    bank = facilities.blood_bank(f"Reservation Test Bank {tag}", base_lat, base_lon,
+                                 city="Malda", state="West Bengal")
+    db.session.flush()
+    db.session.add_all([BloodUnit(
+        blood_bank_id=bank.id, blood_type='A-', quantity_ml=450, collection_date=date.today(),
+        expiry_date=date.today() + timedelta(days=10 + index % 5), status='available',
+        current_location_latitude=base_lat, current_location_longitude=base_lon
+    ) for index in range(units)])
+    request_objs = [EmergencyRequest(
+        hospital_id=hospital.id, blood_type='A-', quantity_ml=450, urgency='high', notes='reservation test',
+        suggested_bank_id=bank.id, status='created', predicted_eta_minutes=20
+    ) for _ in range(requests)]
+    bank_user = User(username=f"reserve_bank_{tag}", email=f"reserve-bank-{tag}@example.com",
+                     password_hash="unused", role='blood_bank', entity_id=bank.id)
+    driver_user = User(username=f"reserve_driver_{tag}", email=f"reserve-driver-{tag}@example.com",
+                       password_hash="unused", role='driver')
+    db.session.add_all(request_objs + [bank_user, driver_user])
+    db.session.commit()
+    return {
+        'hospital': hospital.id, 'bank': bank.id, 'requests': [req.id for req in request_objs],
+        'bank_user': bank_user.id, 'users': [bank_user.id, driver_user.id], 'driver': driver_user.username
+    }
+
+
+def cleanup(db, ids):
+    from src.models.models import (BloodUnit, Driver, EmergencyRequest, InventorySummary, Notification,
+                                   RequestItem, Route)
+    from src.models.user import User
+
+    Notification.query.filter(Notification.request_id.in_(ids['requests'])).delete()
+    Route.query.filter(Route.request_id.in_(ids['requests'])).delete()
+    RequestItem.query.filter(RequestItem.request_id.in_(ids['requests'])).delete()
+    EmergencyRequest.query.filter(EmergencyRequest.id.in_(ids['requests'])).delete()
+    BloodUnit.query.filter_by(blood_bank_id=ids['bank']).delete()
+    InventorySummary.query.filter_by(blood_bank_id=ids['bank']).delete()
+    Driver.query.filter_by(name=ids['driver']).delete()
+    User.query.filter(User.id.in_(ids['users'])).delete()
+    db.session.commit()
+
+
+def assert_booked_once(ids, expected_units):
+    """Every reserved unit has exactly one request item, and the summary agrees with the units"""
+    from src.models.models import BloodUnit, InventorySummary, RequestItem
+
+    items = RequestItem.query.filter(RequestItem.request_id.in_(ids['requests'])).all()
+    unit_ids = [item.unit_id for item in items]
+    assert len(unit_ids) == len(set(unit_ids)) == expected_units, (len(unit_ids), len(set(unit_ids)))
+    reserved = BloodUnit.query.filter_by(blood_bank_id=ids['bank'], status='reserved').count()
+    assert reserved == expected_units
+    available = BloodUnit.query.filter_by(blood_bank_id=ids['bank'], status='available').count()
+    summary = InventorySummary.query.filter_by(blood_bank_id=ids['bank'], blood_type='A-').first()
+    assert (summary.available_ml if summary else 0) == available * 450
+
+
+def test_parallel_reservations_never_double_book(facilities):
+    """Twelve threads race reserve_units over the same 20 units for 36 requests"""
+    from src.main import app, db
+    from src.models.models import EmergencyRequest
+    from src.routes.emergency_requests import reserve_units
+
+    with app.app_context():
+        db.create_all()
+        ids = seed_bank(db, facilities, units=20, requests=36)
+
+    barrier = threading.Barrier(THREADS)
+    outcomes, errors = [], []
+    lock = threading.Lock()
+
+    def worker(request_ids):
+        try:
+            with app.app_context():
+                for request_id in request_ids:
+                    barrier.wait(timeout=30)
+                    request_obj = db.session.get(EmergencyRequest, request_id)
+                    units = reserve_units(request_obj, ids['bank'], 450, ['A-'])
+                    if units:
+                        db.session.commit()
+                    else:
+                        db.session.rollback()
+                    with lock:
+                        outcomes.append(len(units))
+        except Exception as e:
+            barrier.abort()
+            errors.append(e)
+
+    chunks = [ids['requests'][index::THREADS] for index in range(THREADS)]
+    threads = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, errors
+        # Each successful request got exactly one unit; the other 16 found the bank empty
+        assert sorted(outcomes) == [0] * 16 + [1] * 20
+        with app.app_context():
+            assert_booked_once(ids, 20)
+        print("✅ 36 racing reservations over 20 units: 20 booked once each, 16 turned away")
+    finally:
+        with app.app_context():
+            cleanup(db, ids)
+
+
+def test_double_clicked_approvals_reserve_once_and_cancel_releases(facilities):
+    """Each request approved from two clients at once: one wins, its units are booked once, cancel frees them"""
+    from src.main import app, db
+    from src.models.models import BloodUnit, EmergencyRequest, RequestItem, Route
+
+    with app.app_context():
+        db.create_all()
+        ids = seed_bank(db, facilities, units=8, requests=8)
+
+    clicks = [request_id for request_id in ids['requests'] for _ in range(2)]
+    barrier = threading.Barrier(len(clicks))
+    statuses = {}
+    lock = threading.Lock()
+
+    def click(index, request_id):
+        client = app.test_client()
+        with client.session_transaction() as flask_session:
+            flask_session['user_id'] = ids['bank_user']
+        barrier.wait(timeout=30)
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = client.post(f'/api/emergency_requests/{request_id}/approve')
+        with lock:
+            statuses.setdefault(request_id, []).append(response.status_code)
+
+    threads = [threading.Thread(target=click, args=(index, request_id)) for index, request_id in enumerate(clicks)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert all(sorted(codes) == [200, 400] for codes in statuses.values()), statuses
+        with app.app_context():
+            assert_booked_once(ids, 8)
+            assert Route.query.filter(Route.request_id.in_(ids['requests'])).count() == 8
+            assert EmergencyRequest.query.filter(EmergencyRequest.id.in_(ids['requests']),
+                                                 EmergencyRequest.status == 'approved').count() == 8
+        print("✅ 16 simultaneous clicks on 8 requests: 8 approvals, 8 rejections, no unit booked twice")
+
+        client = app.test_client()
+        with client.session_transaction() as flask_session:
+            flask_session['user_id'] = ids['bank_user']
+        cancelled = ids['requests'][0]
+        assert client.post(f'/api/emergency_requests/{cancelled}/cancel').status_code == 200
+        with app.app_context():
+            unit_id = RequestItem.query.filter_by(request_id=cancelled).first().unit_id
+            assert db.session.get(BloodUnit, unit_id).status == 'available'
+            RequestItem.query.filter_by(request_id=cancelled).delete()
+            db.session.commit()
+            assert_booked_once(ids, 7)
+        print("✅ Cancelling an approved request returns its unit to stock")
+    finally:
+        with app.app_context():
+            cleanup(db, ids)
+
+
+def test_concurrent_summary_refreshes_on_postgresql(facilities):
+    """Two transactions adding units of one bank and type both land in its summary row (needs TEST_DATABASE_URL)"""
+    url = os.environ.get('TEST_DATABASE_URL', '')
+    if not url.startswith(('postgresql', 'postgres://')):
+        print("ℹ️ TEST_DATABASE_URL is not a PostgreSQL database; skipping the two-connection summary test")
+        return
+
+    from flask import Flask
+    from src.models.models import InventorySummary, db
+    from src.models.user import User  # noqa: F401 -- registers the users table for create_all
+    from src.services.database import database_url, engine_options, init_app
+    from src.services.inventory import refresh_inventory_keys, units_table
+
+    url = database_url({'DATABASE_URL': url})
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url, {})
+    app.config['SQLITE_PRAGMAS'] = {}
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    init_app(app, db)
+
+    with app.app_context():
+        db.create_all()
+        ids = seed_bank(db, facilities, units=0, requests=0)
+        first, second = db.engine.connect(), db.engine.connect()
+
+    def add_unit(connection):
+        connection.execute(units_table.insert().values(
+            blood_bank_id=ids['bank'], blood_type='A-', quantity_ml=450, collection_date=date.today(),
+            expiry_date=date.today() + timedelta(days=10), status='available',
+            current_location_latitude=24.5, current_location_longitude=89.0
+        ))
+        refresh_inventory_keys(connection, {(ids['bank'], 'A-')})
+
+    errors = []
+
+    def add_second_unit():
+        try:
+            with second.begin():
+                add_unit(second)
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        first_transaction = first.begin()
+        add_unit(first)
+        thread = threading.Thread(target=add_second_unit)
+        thread.start()
+        # The second refresh waits on the first transaction's lock on the summary row...
+        thread.join(timeout=1)
+        assert thread.is_alive() and not errors, errors
+        first_transaction.commit()
+        # ...then reads both units instead of overwriting the row with only its own
+        thread.join(timeout=30)
+        assert not thread.is_alive() and not errors, errors
+        with app.app_context():
+            summary = db.session.get(InventorySummary, (ids['bank'], 'A-'))
+            assert (summary.unit_count, summary.available_ml) == (2, 900), summary
+        print("✅ Two connections refreshing one summary key serialize and count both units")
+    finally:
+        first.close()
+        second.close()
+        with app.app_context():
+            cleanup(db, ids)
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
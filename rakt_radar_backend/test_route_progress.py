@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test script to verify a route's running distance matches its recorded track
+"""
+
+import os
+import sys
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def seed_route(db, facilities):
+    """Create a hospital, blood bank, driver login and a pending route between them"""
+    from src.models.models import EmergencyRequest, Driver, Route
+    from src.models.user import User
+
+    tag = facilities.tag
+    hospital = facilities.hospital(f"Progress Test Hospital {tag}", 13.0827, 80.2707)
+    bank = facilities.blood_bank(f"Progress Test Blood Bank {tag}", 12.9716, 80.2200)
+    driver = Driver(name=f"progress_driver_{tag}", phone="+91-00000-00000", vehicle_number="TN-00-XX-0000")
+    db.session.add(driver)
+    db.session.flush()
+
+    user = User(
+        username=driver.name, email=f"driver-{tag}@example.com", password_hash="unused",
+        role='driver', entity_id=driver.id
+    )
+    request_obj = EmergencyRequest(
+        hospital_id=hospital.id, blood_type='O+', quantity_ml=450, urgency='high',
+        notes='route progress test', suggested_bank_id=bank.id, status='approved'
+    )
+    db.session.add_all([user, request_obj])
+    db.session.flush()
+
+    route = Route(
+        request_id=request_obj.id, driver_name=driver.name,
+        start_latitude=bank.latitude, start_longitude=bank.longitude,
+        end_latitude=hospital.latitude, end_longitude=hospital.longitude,
+        eta_minutes=30, distance_km=20.0, status='pending'
+    )
+    db.session.add(route)
+    db.session.commit()
+    return {
+        'hospital_id': hospital.id, 'bank_id': bank.id, 'driver_id': driver.id,
+        'user_id': user.id, 'request_id': request_obj.id, 'route_id': route.id
+    }
+
+
+def cleanup(db, ids):
+    from src.models.models import EmergencyRequest, Driver, Route, TrackPoint, Notification
+    from src.models.user import User
+
+    Notification.query.filter_by(request_id=ids['request_id']).delete()
+    TrackPoint.query.filter_by(route_id=ids['route_id']).delete()
+    Route.query.filter_by(id=ids['route_id']).delete()
+    EmergencyRequest.query.filter_by(id=ids['request_id']).delete()
+    User.query.filter_by(id=ids['user_id']).delete()
+    Driver.query.filter_by(id=ids['driver_id']).delete()
+    db.session.commit()
+
+
+def test_running_distance_matches_track(facilities):
+    """distance_covered_km, updated per fix, equals the Haversine length of the stored track"""
+    from src.main import app, db
+    from src.models.models import Route, TrackPoint
+    from src.services.geo import path_length
+
+    with app.app_context():
+        db.create_all()
+        ids = seed_route(db, facilities)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids['user_id']
+
+    try:
+        assert client.post(f"/api/routes/{ids['route_id']}/start").status_code == 200
+
+        # A slightly wobbly path from the bank towards the hospital
+        for step in range(1, 21):
+            fraction = step / 20
+            latitude = 12.9716 + (13.0827 - 12.9716) * fraction + (0.002 if step % 2 else -0.002)
+            longitude = 80.2200 + (80.2707 - 80.2200) * fraction
+            response = client.post(f"/api/routes/{ids['route_id']}/progress",
+                                   json={'latitude': latitude, 'longitude': longitude})
+            assert response.status_code == 200, response.get_json()
+
+        with app.app_context():
+            route = db.session.get(Route, ids['route_id'])
+            points = TrackPoint.query.filter_by(route_id=route.id).order_by(TrackPoint.timestamp).all()
+            expected = path_length([p.latitude for p in points], [p.longitude for p in points])
+            print(f"📏 {route.point_count} fixes, running {route.distance_covered_km:.3f} km vs recomputed {expected:.3f} km")
+            assert route.point_count == len(points) == 21
+            assert abs(route.distance_covered_km - expected) < 1e-6
+            assert (route.last_latitude, route.last_longitude) == (points[-1].latitude, points[-1].longitude)
+            assert route.last_point_at == points[-1].timestamp
+
+        tracking = client.get(f"/api/routes/tracking/{ids['request_id']}").get_json()['tracking']
+        assert tracking['covered_distance_km'] == round(expected, 2)
+        assert tracking['progress_percentage'] == round(min(100, expected / 20.0 * 100), 1)
+        route_data = client.get(f"/api/routes/{ids['route_id']}").get_json()
+        assert route_data['distance_covered_km'] == round(expected, 2)
+        assert route_data['progress_percent'] == tracking['progress_percentage']
+        print("✅ Running route distance matches the recorded track")
+    finally:
+        with app.app_context():
+            cleanup(db, ids)
+
+
+def test_batch_progress_matches_single_posts(facilities):
+    """A shuffled batch of fixes is validated, time-ordered, bulk-inserted and folded into the totals"""
+    import random
+    from datetime import datetime, timedelta
+    from src.main import app, db
+    from src.models.models import Route, TrackPoint, Driver
+    from src.services.geo import path_length
+
+    with app.app_context():
+        db.create_all()
+        ids = seed_route(db, facilities)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = ids['user_id']
+
+    try:
+        assert client.post(f"/api/routes/{ids['route_id']}/start").status_code == 200
+        batch_url = f"/api/routes/{ids['route_id']}/progress/batch"
+
+        # Bad coordinates reject the whole batch
+        response = client.post(batch_url, json={'fixes': [
+            {'latitude': 13.0, 'longitude': 80.2, 'timestamp': datetime.utcnow().isoformat()},
+            {'latitude': 95.0, 'longitude': 80.2, 'timestamp': datetime.utcnow().isoformat()}
+        ]})
+        assert response.status_code == 400 and '[1]' in response.get_json()['error']
+
+        # So does a fix from a clock running far ahead, which would otherwise mark every real fix stale
+        response = client.post(batch_url, json={'fixes': [
+            {'latitude': 13.0, 'longitude': 80.2, 'timestamp': datetime.utcnow().isoformat()},
+            {'latitude': 13.0, 'longitude': 80.2, 'timestamp': (datetime.utcnow() + timedelta(days=1)).isoformat()}
+        ]})
+        assert response.status_code == 400 and 'future' in response.get_json()['error'], response.get_json()
+        with app.app_context():
+            assert db.session.get(Route, ids['route_id']).point_count == 1
+
+        base = datetime.utcnow() + timedelta(seconds=1)
+        fixes = [
+            {
+                'latitude': 12.9716 + 0.005 * step,
+                'longitude': 80.2200 + 0.0025 * step,
+                'timestamp': (base + timedelta(seconds=step)).isoformat() + 'Z'
+            }
+            for step in range(1, 51)
+        ]
+        random.Random(3).shuffle(fixes)
+        # A fix from before the route started is stale and gets skipped
+        fixes.append({'latitude': 13.5, 'longitude': 80.5, 'timestamp': (base - timedelta(hours=1)).isoformat()})
+
+        result = client.post(batch_url, json={'fixes': fixes}).get_json()
+        assert (result['accepted'], result['skipped']) == (50, 1), result
+
+        with app.app_context():
+            route = db.session.get(Route, ids['route_id'])
+            points = TrackPoint.query.filter_by(route_id=route.id).order_by(TrackPoint.timestamp).all()
+            expected = path_length([p.latitude for p in points], [p.longitude for p in points])
+            assert route.point_count == len(points) == 51
+            assert abs(route.distance_covered_km - expected) < 1e-6
+            assert (route.last_latitude, route.last_longitude) == (points[-1].latitude, points[-1].longitude)
+            driver = db.session.get(Driver, ids['driver_id'])
+            assert (driver.current_latitude, driver.current_longitude) == (points[-1].latitude, points[-1].longitude)
+        print(f"📦 Batch of {result['accepted']} fixes recorded, {route.distance_covered_km:.3f} km covered")
+    finally:
+        with app.app_context():
+            cleanup(db, ids)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
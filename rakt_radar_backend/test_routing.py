@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the offline road routing engine (CSR graph, bidirectional A*, LRU cache)
+"""
+
+import heapq
+import os
+import sys
+import tempfile
+
+import pytest
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+OSM_EXTRACT = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="13.000" lon="80.000"/>
+  <node id="2" lat="13.000" lon="80.010"/>
+  <node id="3" lat="13.010" lon="80.010"/>
+  <node id="4" lat="13.010" lon="80.000"/>
+  <node id="5" lat="13.020" lon="80.020"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/><tag k="highway" v="primary"/><tag k="maxspeed" v="60"/></way>
+  <way id="11"><nd ref="3"/><nd ref="4"/><nd ref="1"/><tag k="highway" v="residential"/><tag k="oneway" v="yes"/></way>
+  <way id="12"><nd ref="3"/><nd ref="5"/><tag k="highway" v="footway"/></way>
+</osm>
+"""
+
+
+def grid_graph(size=30, seed=18):
+    """A jittered street grid with mixed speeds and a few one-way streets"""
+    import numpy as np
+    from src.services.geo import haversine
+    from src.services.routing import RoadGraph
+
+    rng = np.random.default_rng(seed)
+    rows, cols = np.divmod(np.arange(size * size), size)
+    lats = 12.9 + rows * 0.005 + rng.uniform(-0.001, 0.001, size * size)
+    lons = 80.1 + cols * 0.005 + rng.uniform(-0.001, 0.001, size * size)
+    sources, targets = [], []
+    for node in range(size * size):
+        for neighbour in (node + 1 if cols[node] + 1 < size else None, node + size if rows[node] + 1 < size else None):
+            if neighbour is None:
+                continue
+            sources.append(node)
+            targets.append(neighbour)
+            if rng.random() > 0.1:
+                sources.append(neighbour)
+                targets.append(node)
+    sources, targets = np.array(sources), np.array(targets)
+    lengths = haversine(lats[sources], lons[sources], lats[targets], lons[targets]) * 1000
+    speeds = rng.choice([20.0, 40.0, 60.0], size=sources.size) / 3.6
+    return RoadGraph.from_edges(lats, lons, sources, targets, lengths, lengths / speeds)
+
+
+def dijkstra(graph, source, target):
+    """Reference single-direction Dijkstra over the CSR arrays"""
+    best = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if node == target:
+            return distance
+        if distance > best[node]:
+            continue
+        for position in range(graph.offsets[node], graph.offsets[node + 1]):
+            neighbour = int(graph.targets[position])
+            candidate = distance + float(graph.durations_s[position])
+            if candidate < best.get(neighbour, float('inf')):
+                best[neighbour] = candidate
+                heapq.heappush(heap, (candidate, neighbour))
+    return None
+
+
+def test_bidirectional_a_star_matches_dijkstra():
+    """Fastest paths agree with plain Dijkstra and follow real edges"""
+    import numpy as np
+
+    graph = grid_graph()
+    rng = np.random.default_rng(5)
+    for source, target in rng.integers(0, graph.node_count, (60, 2)).tolist():
+        expected = dijkstra(graph, source, target)
+        result = graph.shortest_path(source, target)
+        if expected is None:
+            assert result is None
+            continue
+        nodes, edges = result
+        assert nodes[0] == source and nodes[-1] == target
+        assert [int(graph.targets[edge]) for edge in edges] == nodes[1:]
+        assert abs(float(graph.durations_s[edges].sum()) - expected) < 1e-3
+
+    # One-to-many (and many-to-one over the reverse graph) agrees with pairwise Dijkstra
+    source, targets = 7, rng.integers(0, graph.node_count, 15).tolist()
+    forward, _ = graph.one_to_many(source, targets)
+    backward, _ = graph.one_to_many(source, targets, reverse=True)
+    for target, there, back in zip(targets, forward.tolist(), backward.tolist()):
+        assert abs(there - (dijkstra(graph, source, target) or np.inf)) < 1e-3
+        assert abs(back - (dijkstra(graph, target, source) or np.inf)) < 1e-3
+    print("✅ Bidirectional A* and one-to-many searches match Dijkstra")
+
+
+def test_osm_extract_round_trip():
+    """OSM ways become directed edges, the graph survives save/load and one-way streets are honoured"""
+    from src.services.routing import RoadGraph, graph_from_osm
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, 'extract.osm')
+        with open(source, 'w') as handle:
+            handle.write(OSM_EXTRACT)
+        graph = graph_from_osm(source)
+        # Footways are dropped, so node 5 never enters the graph
+        assert graph.node_count == 4
+        # 1-2 and 2-3 both ways, 3-4 and 4-1 one way only
+        assert graph.edge_count == 6
+
+        path = os.path.join(workdir, 'graph.npz')
+        graph.save(path)
+        loaded = RoadGraph.load(path)
+        assert loaded.edge_count == graph.edge_count
+
+    one, four = loaded.snap(13.000, 80.000)[0], loaded.snap(13.010, 80.000)[0]
+    # 4 -> 1 is a direct one-way hop; 1 -> 4 must go around via 2 and 3
+    assert len(loaded.shortest_path(four, one)[0]) == 2
+    assert len(loaded.shortest_path(one, four)[0]) == 4
+    print("✅ OSM extract converted with one-way streets honoured")
+
+
+def test_routing_endpoint_uses_the_graph_and_caches_pairs(facilities):
+    """/api/routing returns road distance and a polyline, and repeat pairs hit the LRU cache"""
+    from src.main import app, db
+    from src.services.polyline import decode_polyline
+    from src.services.routing import routing_engine
+
+    graph = grid_graph()
+    tag = facilities.tag
+    with app.app_context():
+        db.create_all()
+        hospital = facilities.hospital(f"Routing Test Hospital {tag}", 12.9, 80.1)
+        bank = facilities.blood_bank(f"Routing Test Bank {tag}", 13.0, 80.2)
+        db.session.commit()
+        ids = {'hospital': hospital.id, 'bank': bank.id}
+
+    client = app.test_client()
+    try:
+        routing_engine.set_graph(None)
+        routing_engine.path = None
+        fallback = client.get(f"/api/routing/{ids['hospital']}/{ids['bank']}").get_json()
+        assert fallback['routing_source'] == 'straight_line' and fallback['detour_factor'] == 1.0
+
+        routing_engine.set_graph(graph)
+        hits = routing_engine.hits
+        road = client.get(f"/api/routing/{ids['hospital']}/{ids['bank']}").get_json()
+        assert road['routing_source'] == 'road_graph'
+        # A grid is a Manhattan network, so the road is longer than the diagonal
+        assert road['distance_km'] > road['straight_line_km'] * 1.2
+        lats, lons = decode_polyline(road['polyline'])
+        assert len(lats) == road['polyline_points'] and abs(lats[0] - 12.9) < 1e-5 and abs(lons[-1] - 80.2) < 1e-5
+
+        again = client.get(f"/api/routing/{ids['hospital']}/{ids['bank']}").get_json()
+        assert again['distance_km'] == road['distance_km'] and routing_engine.hits == hits + 1
+        assert client.get('/api/routing/metrics').get_json()['cached_routes'] >= 1
+        print(f"✅ Road route {road['distance_km']}km vs {road['straight_line_km']}km straight, cached on repeat")
+    finally:
+        routing_engine.init_app(app)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, '-q']))
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the memory-mapped bank x hospital travel matrix and its incremental rebuilds
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+from types import SimpleNamespace
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+
+def facility(prefix, index, latitude, longitude):
+    return SimpleNamespace(id=f"{prefix}-{index}", latitude=latitude, longitude=longitude)
+
+
+def test_matrix_builds_incrementally_and_persists():
+    """New or moved facilities rebuild one row/column; reopening from disk rebuilds nothing"""
+    import numpy as np
+    from src.main import app
+    from src.services.geo import calculate_distance
+    from src.services.routing import routing_engine
+    from src.services.travel_matrix import INITIAL_HOSPITAL_SLOTS, TravelMatrix
+
+    # Straight-line travel, so the expected distances are plain Haversine
+    routing_engine.set_graph(None)
+    routing_engine.path = None
+    rng = np.random.default_rng(19)
+    hospitals = [facility('h', i, *rng.uniform([8.0, 76.0], [13.5, 80.5])) for i in range(INITIAL_HOSPITAL_SLOTS + 6)]
+    banks = [facility('b', i, *rng.uniform([8.0, 76.0], [13.5, 80.5])) for i in range(12)]
+    rows = [(bank.id, bank.latitude, bank.longitude) for bank in banks]
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            matrix = TravelMatrix(directory)
+            for hospital in hospitals:
+                distance, duration = matrix.from_hospital(hospital, rows)
+                expected = [calculate_distance(bank.latitude, bank.longitude, hospital.latitude, hospital.longitude)
+                            for bank in banks]
+                assert np.allclose(distance, expected, rtol=1e-5)
+                assert np.all(duration > 0)
+            # One row per hospital and one column per bank, even across the file growing
+            assert matrix.rows_built == len(hospitals) and matrix.columns_built == len(banks)
+            assert matrix.metrics()['capacity'][0] >= len(hospitals)
+
+            moved = banks[3]
+            moved.latitude += 0.5
+            matrix.update_bank(moved)
+            matrix.update_bank(moved)
+            assert matrix.columns_built == len(banks) + 1
+            distance, _ = matrix.pair(hospitals[0], moved)
+            assert abs(distance - calculate_distance(moved.latitude, moved.longitude,
+                                                     hospitals[0].latitude, hospitals[0].longitude)) < 1e-3
+
+            reopened = TravelMatrix(directory)
+            before, _ = matrix.from_hospital(hospitals[-1], rows)
+            after, _ = reopened.from_hospital(hospitals[-1], rows)
+            assert np.array_equal(before, after)
+            assert reopened.rows_built == 0 and reopened.columns_built == 0
+    finally:
+        routing_engine.init_app(app)
+    print(f"✅ {len(hospitals)} x {len(banks)} matrix built one row/column at a time and reopened from disk")
+
+
+def test_facility_routes_keep_the_matrix_current():
+    """Creating or moving a hospital through the API fills or refreshes just its row"""
+    from src.main import app, db
+    from src.services.travel_matrix import travel_matrix
+
+    tag = uuid.uuid4().hex[:8]
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    response = client.post('/api/hospitals', json={
+        'name': f"Matrix Test Hospital {tag}", 'address': "Test Road", 'city': "Chennai", 'state': "Tamil Nadu",
+        'latitude': 13.05, 'longitude': 80.25, 'contact_person': "Test",
+        'contact_email': f"matrix-{tag}@example.com", 'contact_phone': "+91-00000-00000"
+    })
+    assert response.status_code == 201
+    hospital_id = response.get_json()['id']
+    try:
+        with app.app_context():
+            rows_built = travel_matrix.rows_built
+            assert client.put(f'/api/hospitals/{hospital_id}', json={'name': f"Renamed {tag}"}).status_code == 200
+            assert travel_matrix.rows_built == rows_built
+            assert client.put(f'/api/hospitals/{hospital_id}', json={'latitude': 13.06}).status_code == 200
+            assert travel_matrix.rows_built == rows_built + 1
+        print("✅ Renames leave the matrix alone; moves rebuild only the hospital's row")
+    finally:
+        hospitals = travel_matrix.metrics()['hospitals']
+        assert client.delete(f'/api/hospitals/{hospital_id}').status_code == 200
+        assert travel_matrix.metrics()['hospitals'] == hospitals - 1
+
+
+if __name__ == "__main__":
+    test_matrix_builds_incrementally_and_persists()
+    test_facility_routes_keep_the_matrix_current()
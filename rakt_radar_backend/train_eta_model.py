@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Train a new ETA model version on completed routes, print its backtest against the speed heuristic and activate it
+
+Usage: python train_eta_model.py [--no-activate]
+"""
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.main import app
+from src.services.eta import eta_service
+
+
+if __name__ == "__main__":
+    activate = '--no-activate' not in sys.argv[1:]
+    with app.app_context():
+        try:
+            model = eta_service.train(activate=activate)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    report = model.backtest
+    print(f"⏱️ ETA model v{model.version}: {model.training['routes']} routes, "
+          f"{model.training['samples']} samples ({model.training['track_samples']} from GPS tracks), "
+          f"{len(model.corridors)} corridors")
+    print(f"📊 Backtest on the {report['test_routes']} most recent routes (trained on {report['train_routes']}):")
+    for name in ('model', 'baseline'):
+        errors = report[name]
+        print(f"   {name:<9} MAE {errors['mae_minutes']:>7.1f} min | P90 {errors['p90_abs_error_minutes']:>7.1f} min | "
+              f"MAPE {errors['mape'] * 100:>5.1f}% | bias {errors['bias_minutes']:>+6.1f} min")
+    print(f"✅ Active version: v{model.version}" if activate else "ℹ️ Saved without activating")